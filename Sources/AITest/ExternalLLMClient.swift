@@ -49,6 +49,17 @@ public class ExternalLLMClient {
         request.httpMethod = "POST"
         request.setValue("application/json", forHTTPHeaderField: "Content-Type")
         request.setValue("Bearer \(config.apiKey)", forHTTPHeaderField: "Authorization")
+        // @ai[2026-10-19 20:30] 計測プロキシ（scripts/instrumenting_proxy.py）で実行と対応付けるためのヘッダー
+        // 目的: プロキシが記録した時間の内訳・トークン数を、ログの(セル, 実行番号)に結合できるようにする
+        // 意図: AITestAppが実行ごとに設定する環境変数（run番号はAITEST_RUN_NUMBERを起点に採番）から送信し、
+        //       未設定（ウォームアップなど）の場合は送らない
+        let environment = ProcessInfo.processInfo.environment
+        if let run = environment["AITEST_CURRENT_RUN"] {
+            request.setValue(run, forHTTPHeaderField: "X-AITest-Run")
+        }
+        if let cell = environment["AITEST_CURRENT_CELL"] {
+            request.setValue(cell, forHTTPHeaderField: "X-AITest-Cell")
+        }
         
         // リクエスト内容を文字列として保存
         let requestContent: String
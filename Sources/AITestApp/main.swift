@@ -356,7 +356,7 @@ func extractExternalLLMConfigFromArguments() -> LLMConfig? {
 @available(iOS 26.0, macOS 26.0, *)
 func validateArguments() -> (isValid: Bool, errors: [String]) {
     var errors: [String] = []
-    let validOptions = ["--method", "--language", "--testcase", "--testcases", "--algo", "--algos", "--levels", "--runs", "--mode", "--external-llm-url", "--external-llm-model", "--timeout", "--debug-single", "--debug-prompt", "--collect-responses", "--test-extraction-methods", "--experiment", "--test-dir", "--verbose", "-v"]
+    let validOptions = ["--method", "--language", "--testcase", "--testcases", "--algo", "--algos", "--levels", "--runs", "--warmup", "--mode", "--external-llm-url", "--external-llm-model", "--timeout", "--debug-single", "--debug-prompt", "--collect-responses", "--test-extraction-methods", "--experiment", "--test-dir", "--log-layout", "--verbose", "-v"]
     
     // サポートされているオプションをチェック
     for argument in CommandLine.arguments {
@@ -383,6 +383,11 @@ func validateArguments() -> (isValid: Bool, errors: [String]) {
         }
     }
     
+    let logLayout = extractLogLayoutFromArguments()
+    if !validLogLayouts.contains(logLayout) {
+        errors.append("❌ 無効なログレイアウト: \(logLayout)（有効な値: \(validLogLayouts.joined(separator: ", "))）")
+    }
+    
     return (errors.isEmpty, errors)
 }
 
@@ -401,7 +406,10 @@ func printHelp() {
     print("  --mode <mode>         抽出モード (simple, two-steps) [デフォルト: simple]")
     print("  --levels <levels>     テストレベル (例: 1,2) [デフォルト: 1,2,3]")
     print("  --runs <number>       実行回数 [デフォルト: 1]")
+    print("  --warmup <number>     計測前に破棄するウォームアップ抽出回数 [デフォルト: 0]")
     print("  --timeout <seconds>   タイムアウト秒数 [デフォルト: 300]")
+    print("  --test-dir <path>     ログ出力ディレクトリ")
+    print("  --log-layout <layout> ログの配置 (flat, sharded) [デフォルト: flat]")
     print()
     print("デバッグオプション:")
     print("  --debug-single        単一テストデバッグ実行")
@@ -691,6 +699,54 @@ func extractRunsFromArguments() -> Int? {
     return nil
 }
 
+/// コマンドライン引数からウォームアップ回数を抽出
+/// @ai[2026-10-19 10:00] ウォームアップ回数の引数を追加
+/// 目的: プロセス内で最初のFoundationModelsセッション（または外部LLMへの最初のリクエスト）を計測対象から除外する
+/// 背景: 最初の推論は後続より大幅に遅く、avg_extraction_timeを歪めていた
+/// 意図: 指定回数の抽出をログに残さず破棄してから計測を開始する
+func extractWarmupFromArguments() -> Int? {
+    let arguments = CommandLine.arguments
+    
+    // 形式1: --warmup=2 をチェック
+    for argument in arguments {
+        if argument.hasPrefix("--warmup=") {
+            if let warmup = Int(argument.dropFirst("--warmup=".count)) {
+                return warmup
+            }
+        }
+    }
+    
+    // 形式2: --warmup 2 をチェック
+    if let index = arguments.firstIndex(of: "--warmup") {
+        if index + 1 < arguments.count {
+            if let warmup = Int(arguments[index + 1]) {
+                return warmup
+            }
+        }
+    }
+    
+    return nil
+}
+
+/// プロセス内のウォームアップ状態
+/// @ai[2026-10-19 10:00] cold_start判定用の状態を追加
+/// 目的: プロセス内で最初に実行された抽出をcold_startとしてログに記録する
+/// 背景: processExperimentは複数アルゴリズムでrunSpecificExperimentを呼ぶため、状態はプロセス単位で保持する必要がある
+/// 意図: ウォームアップ済み、または一度でも抽出を実行した後はwarmとして扱う
+@MainActor
+enum ProcessWarmupState {
+    static var isWarm = false
+    
+    /// 次の抽出がcold startかどうかを判定
+    /// AITEST_COLD_STARTが設定されている場合は、エンドポイントの状態を把握している実行スクリプトの判定を優先する
+    static func nextExtractionIsColdStart() -> Bool {
+        if let declared = ProcessInfo.processInfo.environment["AITEST_COLD_START"] {
+            return declared == "1" && !isWarm
+        }
+        return !isWarm
+    }
+}
+
 /// コマンドライン引数からテストディレクトリを抽出
 func extractTestDirFromArguments() -> String? {
     let arguments = CommandLine.arguments
@@ -712,6 +768,45 @@ func extractTestDirFromArguments() -> String? {
     return nil
 }
 
+/// 有効なログレイアウト
+let validLogLayouts = ["flat", "sharded"]
+
+/// コマンドライン引数からログレイアウトを抽出
+/// @ai[2026-10-19 14:00] シャーディングされたログ配置を追加
+/// 目的: 数万件のログを1ディレクトリに置くと、Python側の全ての検索がディレクトリ全体の走査になる
+/// 背景: 実行スクリプトは{testcase}/{algo}/level{level}/単位で必要な部分だけを読めるようにしたい
+/// 意図: --log-layout（未指定時は環境変数AITEST_LOG_LAYOUT）がshardedの場合、ログをサブディレクトリに出力する
+///       ファイル名は従来と同じため、フラット配置と同じ規則で解析できる
+func extractLogLayoutFromArguments() -> String {
+    let arguments = CommandLine.arguments
+    
+    // 形式1: --log-layout=sharded をチェック
+    for argument in arguments {
+        if argument.hasPrefix("--log-layout=") {
+            return String(argument.dropFirst("--log-layout=".count))
+        }
+    }
+    
+    // 形式2: --log-layout sharded をチェック
+    if let index = arguments.firstIndex(of: "--log-layout"), index + 1 < arguments.count {
+        return arguments[index + 1]
+    }
+    
+    return ProcessInfo.processInfo.environment["AITEST_LOG_LAYOUT"] ?? "flat"
+}
+
+/// 構造化ログの出力パスを作成（shardedレイアウトの場合はサブディレクトリも作成）
+func structuredLogFilePath(testDir: String, testcase: String, algo: String, method: String, language: String, level: Int, runNumber: Int, isError: Bool) -> String {
+    let suffix = isError ? "_error" : ""
+    let logFileName = "\(testcase)_\(algo)_\(method)_\(language)_level\(level)_run\(runNumber)\(suffix).json"
+    guard extractLogLayoutFromArguments() == "sharded" else {
+        return "\(testDir)/\(logFileName)"
+    }
+    let shardDir = "\(testDir)/\(testcase)/\(algo)/level\(level)"
+    createLogDirectory(shardDir)
+    return "\(shardDir)/\(logFileName)"
+}
+
 /// タイムアウト付きでタスクを実行
 @available(iOS 26.0, macOS 26.0, *)
 func runWithTimeout(timeoutSeconds: Int, task: @escaping @Sendable () async -> Void) async {
@@ -824,6 +919,12 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
     // --runs引数から実行回数を取得
     let runs = extractRunsFromArguments() ?? 1
     
+    // @ai[2026-10-19 11:00] AITEST_RUN_NUMBERで実行番号の開始値を指定可能にする
+    // 目的: 実行スクリプトが1セル1回ずつ起動してもログファイル名（run番号）が衝突しないようにする
+    // 背景: 時間予算モードではラウンドごとに各セルを--runs 1で起動するため、常にrun1になっていた
+    // 意図: 未指定時は従来通り1から採番する
+    let runNumberBase = Int(ProcessInfo.processInfo.environment["AITEST_RUN_NUMBER"] ?? "") ?? 1
+    
     print("\n🔬 特定実験を開始: \(experiment.method.rawValue) (\(experiment.language.rawValue))")
     print("📋 パターン指定: \(pattern.displayName)")
     print("🔄 実行回数: \(runs)回")
@@ -868,6 +969,36 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
     }
     timer.checkpoint("テストケース読み込み完了")
 
+    // @ai[2026-10-19 10:00] ウォームアップ抽出（結果は破棄し、ログにも残さない）
+    // 目的: 最初のセッション生成・接続確立のコストを計測対象から除外する
+    // 背景: プロセス内の最初の抽出は他より大幅に遅い
+    // 意図: プロセスあたり一度だけ実行し、以降の抽出をwarmとして記録する
+    //       計測する抽出と同じalgoで実行し、同じプロンプト・テンプレートを読み込んでおく
+    let warmupCount = extractWarmupFromArguments() ?? 0
+    if warmupCount > 0 && !ProcessWarmupState.isWarm, let warmupCase = testCases.first {
+        let (warmupPattern, warmupLevel) = parseTestCaseName(warmupCase.name)
+        print("🔥 ウォームアップ抽出: \(warmupCount)回（結果は破棄されます）")
+        for warmupRun in 1...warmupCount {
+            let warmupStart = CFAbsoluteTimeGetCurrent()
+            do {
+                let modelExtractor = ExtractorFactory().createExtractor(externalLLMConfig: externalLLMConfig)
+                _ = try await UnifiedExtractor(modelExtractor: modelExtractor).extract(
+                    testcase: warmupPattern,
+                    level: warmupLevel,
+                    method: experiment.method,
+                    algo: experiment.algo,
+                    language: experiment.language,
+                    useTwoSteps: experiment.mode.useTwoSteps
+                )
+                print("  🔥 ウォームアップ \(warmupRun)/\(warmupCount) 完了: \(String(format: "%.3f", CFAbsoluteTimeGetCurrent() - warmupStart))秒")
+            } catch {
+                print("  ⚠️ ウォームアップ \(warmupRun)/\(warmupCount) 失敗: \(error.localizedDescription)")
+            }
+        }
+        ProcessWarmupState.isWarm = true
+        timer.checkpoint("ウォームアップ完了")
+    }
+
     // 各テストケースに対して指定回数実行
     for (index, testCase) in testCases.enumerated() {
         let (testPattern, level) = parseTestCaseName(testCase.name)
@@ -893,8 +1024,22 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
             let testTimer = PerformanceTimer("テストケース\(index + 1)_実行\(run)")
             testTimer.start()
             
-            print("\n🔄 実行 \(run)/\(runs)")
+            let runNumber = runNumberBase + run - 1
+            print("\n🔄 実行 \(run)/\(runs) (run番号: \(runNumber))")
             print(String(repeating: "-", count: 40))
+            
+            let coldStart = ProcessWarmupState.nextExtractionIsColdStart()
+            let runStartTime = CFAbsoluteTimeGetCurrent()
+            defer { ProcessWarmupState.isWarm = true }
+
+            // @ai[2026-10-19 20:30] 外部LLMへのリクエストに付けるセル・実行番号（ExternalLLMClientのX-AITest-*ヘッダー）
+            let (_, currentLevel) = parseTestCaseName(testCase.name)
+            setenv("AITEST_CURRENT_RUN", String(runNumber), 1)
+            setenv("AITEST_CURRENT_CELL", "\(experiment.testcase)_\(experiment.algo)_\(experiment.method.rawValue)_\(experiment.language.rawValue)_level\(currentLevel)", 1)
+            defer {
+                unsetenv("AITEST_CURRENT_RUN")
+                unsetenv("AITEST_CURRENT_CELL")
+            }
         
         do {
             // 新しい統一抽出フローを使用
@@ -917,7 +1062,7 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
                 testcase: testPattern,
                 level: level,
                 method: experiment.method,
-                algo: "abs", // デフォルト値
+                algo: experiment.algo,
                 language: experiment.language,
                 useTwoSteps: experiment.mode.useTwoSteps
             )
@@ -943,7 +1088,7 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
             if LogWrapper.isVerbose {
                 print("🔍 DEBUG: generateStructuredLog呼び出し開始")
             }
-            await generateStructuredLog(testCase: testCase, accountInfo: accountInfo, experiment: experiment, pattern: pattern, iteration: 1, runNumber: run, testDir: finalTestDir, requestContent: requestContent, contentInfo: contentInfo)
+            await generateStructuredLog(testCase: testCase, accountInfo: accountInfo, experiment: experiment, pattern: pattern, iteration: 1, runNumber: runNumber, testDir: finalTestDir, requestContent: requestContent, contentInfo: contentInfo, extractionTime: metrics.extractionTime, coldStart: coldStart)
             if LogWrapper.isVerbose {
                 print("🔍 DEBUG: generateStructuredLog呼び出し完了")
             }
@@ -956,7 +1101,7 @@ func runSpecificExperiment(_ experiment: (method: ExtractionMethod, language: Pr
             }
             
             // エラー時の構造化ログ
-            await generateErrorStructuredLog(testCase: testCase, error: error, experiment: experiment, pattern: pattern, iteration: 1, runNumber: run, testDir: finalTestDir, requestContent: nil)
+            await generateErrorStructuredLog(testCase: testCase, error: error, experiment: experiment, pattern: pattern, iteration: 1, runNumber: runNumber, testDir: finalTestDir, requestContent: nil, extractionTime: CFAbsoluteTimeGetCurrent() - runStartTime, coldStart: coldStart)
             testTimer.checkpoint("エラーログ出力完了")
         }
         
@@ -1096,7 +1241,7 @@ func createLogDirectory(_ path: String) {
 /// 背景: 冗長なDEBUG出力が通常実行時のログを読みにくくしている
 /// 意図: verboseモード時のみ詳細ログを表示
 @available(iOS 26.0, macOS 26.0, *)
-func generateStructuredLog(testCase: (name: String, text: String), accountInfo: AccountInfo, experiment: (method: ExtractionMethod, language: PromptLanguage, testcase: String, algo: String, mode: ExtractionMode, levels: [Int]), pattern: ExperimentPattern, iteration: Int, runNumber: Int, testDir: String, requestContent: String?, contentInfo: ContentInfo?) async {
+func generateStructuredLog(testCase: (name: String, text: String), accountInfo: AccountInfo, experiment: (method: ExtractionMethod, language: PromptLanguage, testcase: String, algo: String, mode: ExtractionMode, levels: [Int]), pattern: ExperimentPattern, iteration: Int, runNumber: Int, testDir: String, requestContent: String?, contentInfo: ContentInfo?, extractionTime: TimeInterval, coldStart: Bool) async {
     if LogWrapper.isVerbose {
         print("🔍 DEBUG: generateStructuredLog開始 - testDir: \(testDir)")
     }
@@ -1117,6 +1262,8 @@ func generateStructuredLog(testCase: (name: String, text: String), accountInfo:
         "language": experiment.language.rawValue,
         "experiment_pattern": pattern.rawValue,
         "request_content": requestContent ?? NSNull(),
+        "extraction_time": extractionTime,
+        "cold_start": coldStart,
         "expected_fields": [],
         "unexpected_fields": []
     ]
@@ -1186,8 +1333,7 @@ func generateStructuredLog(testCase: (name: String, text: String), accountInfo:
             print(jsonString)
             
             // ログファイルに保存
-            let logFileName = "\(experiment.testcase)_\(experiment.algo)_\(experiment.method.rawValue)_\(experiment.language.rawValue)_level\(level)_run\(runNumber).json"
-            let logFilePath = "\(testDir)/\(logFileName)"
+            let logFilePath = structuredLogFilePath(testDir: testDir, testcase: experiment.testcase, algo: experiment.algo, method: experiment.method.rawValue, language: experiment.language.rawValue, level: level, runNumber: runNumber, isError: false)
             if LogWrapper.isVerbose {
                 print("🔍 DEBUG: ログファイル保存開始 - パス: \(logFilePath)")
             }
@@ -1208,7 +1354,7 @@ func generateStructuredLog(testCase: (name: String, text: String), accountInfo:
 /// 背景: _error.jsonが作成される原因を調査できるようにする
 /// 意図: エラーの型、詳細、コンテキスト情報を出力
 @available(iOS 26.0, macOS 26.0, *)
-func generateErrorStructuredLog(testCase: (name: String, text: String), error: Error, experiment: (method: ExtractionMethod, language: PromptLanguage, testcase: String, algo: String, mode: ExtractionMode, levels: [Int]), pattern: ExperimentPattern, iteration: Int, runNumber: Int, testDir: String, requestContent: String?) async {
+func generateErrorStructuredLog(testCase: (name: String, text: String), error: Error, experiment: (method: ExtractionMethod, language: PromptLanguage, testcase: String, algo: String, mode: ExtractionMode, levels: [Int]), pattern: ExperimentPattern, iteration: Int, runNumber: Int, testDir: String, requestContent: String?, extractionTime: TimeInterval, coldStart: Bool) async {
     let (testPattern, level) = parseTestCaseName(testCase.name)
     let expectedFields = getExpectedFields(for: testPattern, level: level)
 
@@ -1293,6 +1439,8 @@ func generateErrorStructuredLog(testCase: (name: String, text: String), error: E
         "language": experiment.language.rawValue,
         "experiment_pattern": pattern.rawValue,
         "request_content": requestContent ?? NSNull(),
+        "extraction_time": extractionTime,
+        "cold_start": coldStart,
         "error": error.localizedDescription,
         "error_type": String(describing: type(of: error)),
         "expected_fields": [],
@@ -1325,8 +1473,7 @@ func generateErrorStructuredLog(testCase: (name: String, text: String), error: E
             print(jsonString)
             
             // ログファイルに保存
-            let logFileName = "\(experiment.testcase)_\(experiment.algo)_\(experiment.method.rawValue)_\(experiment.language.rawValue)_level\(level)_run\(runNumber)_error.json"
-            let logFilePath = "\(testDir)/\(logFileName)"
+            let logFilePath = structuredLogFilePath(testDir: testDir, testcase: experiment.testcase, algo: experiment.algo, method: experiment.method.rawValue, language: experiment.language.rawValue, level: level, runNumber: runNumber, isError: true)
             try jsonString.write(toFile: logFilePath, atomically: true, encoding: .utf8)
             print("💾 エラーログ保存: \(logFilePath)")
         }
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 17:00] プロンプト生成・リクエストボディ作成・JSON応答解析（Swift版のPython移植）
+目的: Python実装のバックエンドが、AITestAppの外部LLM実験と同じリクエストを送り、同じ規則で応答を解析する
+背景: 外部LLM実験でSwiftが行うのは、プロンプトの組み立て、/v1/chat/completionsへのPOST、JSONExtractorでの解析のみで、
+      それ以外は1回ごとのswift run起動のコストになっていた
+意図: 以下のSwift実装と同じ結果になるように移植する（変更時は両方を更新すること）
+      - CommonExtractionProcessor.generatePrompt / completePrompt（Sources/AITest/ModelExtractor.swift）
+      - ExternalLLMClient.createRequestBody（Sources/AITest/ExternalLLMClient.swift）
+      - JSONExtractor.extractFromJSONText とAccountInfoのデコード（Sources/AITest/JSONExtractor.swift）
+"""
+
+import json
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+from aitest_logs import REPO_ROOT, load_test_case
+
+PROMPTS_DIR = REPO_ROOT / "Sources" / "AITest" / "Prompts"
+
+# ExternalLLMClient.createRequestBodyの固定パラメータ
+DEFAULT_SAMPLING = {"temperature": 1.0, "max_tokens": 2000, "top_p": 1.0}
+# LLMConfigのAPIキー（AITestAppは外部LLMテスト用にダミーキーを使用）
+DEFAULT_API_KEY = "dummy-key"
+
+DOCUMENT_LABELS = {
+    "ja": ("====== 以下が添付ドキュメントの内容です ======", "====== 以上 ======"),
+    "en": ("====== Attached document content ======", "====== End of document ======"),
+}
+
+# 複数ドキュメントのバッチプロンプト（multi_document_batch.py）。応答はドキュメントごとに見出し行で区切らせる
+BATCH_SECTION_HEADER = "### DOCUMENT {index}"
+BATCH_INSTRUCTIONS = {
+    "ja": ("以下に{count}件の添付ドキュメントがあります。各ドキュメントについて上記の指示どおりに抽出し、"
+           "ドキュメントの順に「" + BATCH_SECTION_HEADER.format(index="番号") + "」の行に続けてその結果のみを出力してください。"),
+    "en": ("There are {count} attached documents below. Extract each document as instructed above and, in document "
+           "order, output a line \"" + BATCH_SECTION_HEADER.format(index="<number>") + "\" followed only by its result."),
+}
+BATCH_DOCUMENT_LABELS = {
+    "ja": ("====== 添付ドキュメント {index} ======", "====== 以上（ドキュメント {index}） ======"),
+    "en": ("====== Attached document {index} ======", "====== End of document {index} ======"),
+}
+
+# AccountInfo（Codable）の文字列型フィールド。port は Int?、confidence は Double?
+ACCOUNT_STRING_FIELDS = ["title", "userID", "password", "url", "number", "note", "host", "authKey"]
+
+
+class PromptTemplateNotFound(Exception):
+    """ExtractionError.promptTemplateNotFound に相当"""
+
+
+# ---------------------------------------------------------------------------
+# プロンプトとリクエストボディ
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def load_prompt_template(algo: str, method: str, language: str) -> str:
+    """generatePromptTemplateと同じ規則でテンプレートを読み込む（-exの場合は例示を追加）"""
+    is_example = algo.endswith("-ex")
+    base_algo = algo[:-3] if is_example else algo
+    algo_name = "abstract" if base_algo == "abs" else base_algo
+    path = PROMPTS_DIR / f"{algo_name}_{method}_{language}.txt"
+    if not path.exists():
+        raise PromptTemplateNotFound(f"プロンプトテンプレートファイルが見つかりません: {path}")
+    content = path.read_text(encoding="utf-8")
+    if is_example:
+        example_path = PROMPTS_DIR / f"example_{language}.txt"
+        if not example_path.exists():
+            raise PromptTemplateNotFound(f"プロンプトテンプレートファイルが見つかりません: {example_path}")
+        content = content + "\n\n" + example_path.read_text(encoding="utf-8")
+    return content
+
+
+def complete_prompt(base_prompt: str, test_data: str, language: str) -> str:
+    """completePromptと同じ形式でテストデータを添付"""
+    document_label, end_label = DOCUMENT_LABELS["ja" if language == "ja" else "en"]
+    return base_prompt + f"\n\n{document_label}\n" + test_data + "\n\n" + end_label
+
+
+def build_batch_prompt(base_prompt: str, texts: List[str], language: str) -> str:
+    """複数のテストデータを番号付きで添付し、ドキュメントごとに見出し行で区切った出力を指示する"""
+    key = "ja" if language == "ja" else "en"
+    document_label, end_label = BATCH_DOCUMENT_LABELS[key]
+    parts = [base_prompt, BATCH_INSTRUCTIONS[key].format(count=len(texts))]
+    for index, text in enumerate(texts, start=1):
+        parts.append(f"{document_label.format(index=index)}\n{text}\n\n{end_label.format(index=index)}")
+    return "\n\n".join(parts)
+
+
+def build_prompt(testcase: str, algo: str, method: str, language: str, level: int) -> str:
+    """テストケース・レベルの完成したプロンプト"""
+    return complete_prompt(load_prompt_template(algo, method, language),
+                           load_test_case(testcase, level).text, language)
+
+
+def build_request_body(model: str, prompt: str, **overrides) -> Dict:
+    """ExternalLLMClient.createRequestBodyと同じボディ（overridesでサンプリング設定を上書き可能）"""
+    body = {
+        "model": model,
+        "messages": [{"role": "user", "content": prompt}],
+    }
+    body.update(DEFAULT_SAMPLING)
+    body.update(overrides)
+    return body
+
+
+def json_schema_response_format(name: str, properties: Dict[str, Dict]) -> Dict:
+    """
+    OpenAI互換APIのresponse_format（json_schema、strict）
+    strictモードではすべてのキーをrequiredにする必要があるため、省略可能な項目はnullを許す型で表す
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": {"type": "object", "properties": properties, "required": list(properties),
+                       "additionalProperties": False},
+        },
+    }
+
+
+def account_info_response_format() -> Dict:
+    """AccountInfoのデコード（decode_account_info）と同じ型のスキーマ（文字列項目とport）"""
+    properties = {name: {"type": ["string", "null"]} for name in ACCOUNT_STRING_FIELDS}
+    properties["port"] = {"type": ["integer", "null"]}
+    return json_schema_response_format("account_info", properties)
+
+
+def request_content_text(body: Dict) -> str:
+    """ログのrequest_content（Swift版はJSONSerializationの.prettyPrintedで整形した文字列）"""
+    return json.dumps(body, ensure_ascii=False, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# JSON応答の解析（JSONExtractor）
+# ---------------------------------------------------------------------------
+
+_CODE_BLOCK_PATTERN = re.compile(r"```json\s*([\s\S]*?)\s*```")
+_ASSISTANT_FINAL_PATTERN = re.compile(r"assistantfinal\s*:\s*([\s\S]*)", re.IGNORECASE)
+_PORT_STRING_PATTERN = re.compile(r'"port"\s*:\s*"(\d+)"(?=\s*[,}])')
+_BATCH_SECTION_PATTERN = re.compile(r"^[#*\s]*DOCUMENT\s*(\d+)[*:\s]*$", re.MULTILINE | re.IGNORECASE)
+
+
+def sanitize_json_string(text: str) -> str:
+    """文字列リテラル内の生の改行・タブのみをエスケープ（sanitizeJSONString）"""
+    result: List[str] = []
+    in_string = False
+    escape_next = False
+    for char in text:
+        if escape_next:
+            result.append(char)
+            escape_next = False
+        elif char == "\\":
+            result.append(char)
+            escape_next = True
+        elif char == '"':
+            result.append(char)
+            in_string = not in_string
+        elif in_string and char in "\n\r\t":
+            result.append({"\n": "\\n", "\r": "\\r", "\t": "\\t"}[char])
+        else:
+            result.append(char)
+    sanitized = "".join(result)
+    return sanitized.replace("\\\\n", "\\n").replace("\\\\r", "\\r").replace("\\\\t", "\\t")
+
+
+def _from_code_block(text: str) -> str:
+    match = _CODE_BLOCK_PATTERN.search(text)
+    if not match:
+        return ""
+    return match.group(1).strip().replace("\\n", "\n").replace("\\t", "\t").replace("\\r", "\r")
+
+
+def _after_assistant_final(text: str) -> str:
+    match = _ASSISTANT_FINAL_PATTERN.search(text)
+    return match.group(1).strip() if match else ""
+
+
+def _from_braces(text: str) -> str:
+    first, last = text.find("{"), text.rfind("}")
+    if first < 0 or last < 0 or last < first:
+        return ""
+    return text[first:last + 1].strip()
+
+
+def json_candidates(text: str) -> List[str]:
+    """extractFromJSONTextが順に試す候補（コードブロック、assistantfinal以降、{〜}、全体）"""
+    sanitized = sanitize_json_string(text)
+    return [_from_code_block(sanitized), _after_assistant_final(sanitized), _from_braces(sanitized), sanitized.strip()]
+
+
+def normalize_port_field(text: str) -> str:
+    """"port": "22" を "port": 22 に変換（normalizePortField）"""
+    return _PORT_STRING_PATTERN.sub(lambda match: f'"port": {match.group(1)}', text)
+
+
+def decode_account_info(text: str) -> Optional[Dict]:
+    """
+    JSONDecoderでのAccountInfoのデコードを再現（失敗した場合はNone）
+    文字列フィールドに文字列以外、portに整数以外、confidenceに数値以外が入っていると失敗する
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    account: Dict = {}
+    for name in ACCOUNT_STRING_FIELDS:
+        value = data.get(name)
+        if value is not None and not isinstance(value, str):
+            return None
+        account[name] = value
+    port = data.get("port")
+    if port is not None:
+        if isinstance(port, bool) or not isinstance(port, (int, float)) or int(port) != port:
+            return None
+        port = int(port)
+    account["port"] = port
+    confidence = data.get("confidence")
+    if confidence is not None and (isinstance(confidence, bool) or not isinstance(confidence, (int, float))):
+        return None
+    account["confidence"] = confidence
+    return account
+
+
+def parse_account_info(text: str) -> Optional[Dict]:
+    """AI応答からAccountInfoを抽出（extractFromJSONText、全候補で失敗した場合はNone）"""
+    for candidate in json_candidates(text):
+        if not candidate:
+            continue
+        account = decode_account_info(normalize_port_field(candidate))
+        if account is not None:
+            return account
+    return None
+
+
+def json_payload(text: str) -> str:
+    """
+    extractFromJSONTextが解析に使うJSON部分（JSONとして読める最初の候補、なければ空文字列）
+    応答のうちこれ以外の部分（前置き、コードブロックの囲み、assistantfinalまでの分析など）はJSONExtractorが捨てる
+    """
+    for candidate in json_candidates(text):
+        if not candidate:
+            continue
+        try:
+            json.loads(normalize_port_field(candidate))
+        except ValueError:
+            continue
+        return candidate
+    return ""
+
+
+def split_batch_response(text: str, count: int) -> List[str]:
+    """
+    バッチプロンプトの応答をドキュメントごとに分ける（見出し行の番号で対応づけ、見つからないドキュメントは空文字列）
+    見出し行がない場合は、```jsonブロックの数がドキュメント数と一致すれば順に対応づけ、1件のみなら応答全体とする
+    """
+    sections = [""] * count
+    matches = list(_BATCH_SECTION_PATTERN.finditer(text))
+    if matches:
+        for match, following in zip(matches, matches[1:] + [None]):
+            index = int(match.group(1)) - 1
+            if 0 <= index < count and not sections[index]:
+                sections[index] = text[match.end():following.start() if following else len(text)].strip()
+        return sections
+    blocks = _CODE_BLOCK_PATTERN.findall(text)
+    if len(blocks) == count:
+        return [f"```json\n{block}\n```" for block in blocks]
+    if count == 1:
+        return [text]
+    return sections
+
+
+def extracted_field_values(account: Dict) -> Dict[str, Optional[str]]:
+    """ログ出力用の項目値（getFieldValueと同様にportは文字列化）"""
+    values = {name: account.get(name) for name in ACCOUNT_STRING_FIELDS}
+    port = account.get("port")
+    values["port"] = str(port) if port is not None else None
+    return values
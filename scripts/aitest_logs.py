@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 13:00] テストデータ読み込みと構造化ログ生成（docs/LOG_SCHEMA.md準拠）
+目的: AITestApp以外（シミュレーター・Python実装のバックエンド）からも、Swift版と同じ形式のログを出力する
+背景: generateStructuredLog / generateErrorStructuredLog / determineFieldStatus はSwift側にしかなく、
+      Pythonからログを書くとスキーマや判定規則がずれる恐れがあった
+意図: テストデータ（//expectedFields:）、正解データ（expected_answers.json）、項目判定の規則を
+      Swift実装に合わせて一箇所にまとめる（ログの配置・ファイル名はlog_layout.py）
+"""
+
+import json
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+TEST_DATA_DIR = REPO_ROOT / "Tests" / "TestData"
+# Swift側はBundle.moduleのexpected_answers.jsonを使用するため、同じファイルを参照する
+EXPECTED_ANSWERS_PATH = REPO_ROOT / "Sources" / "AITestApp" / "TestData" / "expected_answers.json"
+
+# --testcaseの値 → テストデータのディレクトリ名（logのpatternフィールド）
+TESTCASE_DIRS = {
+    "chat": "Chat",
+    "contract": "Contract",
+    "creditcard": "CreditCard",
+    "password": "PasswordManager",
+    "voice": "VoiceRecognition",
+}
+LEVEL_NAMES = {1: "Level1_Basic", 2: "Level2_General", 3: "Level3_Complex"}
+
+# unexpected_fieldsの判定対象（Swift版generateStructuredLogと同じ）
+ALL_FIELDS = ["title", "userID", "password", "url", "note", "host", "port", "authKey"]
+# 自由記述のためAIによる検証が必要な項目
+AI_VERIFICATION_FIELDS = {"title", "note"}
+AI_VERIFICATION_PLACEHOLDER = "{要AI検証}"
+
+
+class TestCase:
+    """テストデータ1件（レベル単位）"""
+
+    def __init__(self, testcase: str, level: int, text: str, expected_fields: List[str]):
+        self.testcase = testcase
+        self.pattern = TESTCASE_DIRS[testcase]
+        self.level = level
+        self.text = text
+        self.expected_fields = expected_fields
+
+    @property
+    def level_name(self) -> str:
+        return LEVEL_NAMES[self.level]
+
+
+def parse_test_data(content: str) -> Tuple[List[str], str]:
+    """テストデータファイルの先頭コメントから期待フィールドを取得し、コメントを除いた本文を返す"""
+    lines = content.split("\n")
+    expected_fields: List[str] = []
+    first_content_line = 0
+    for index, line in enumerate(lines):
+        trimmed = line.strip()
+        if trimmed.startswith("//"):
+            if trimmed.startswith("//expectedFields:"):
+                fields = trimmed[len("//expectedFields:"):].strip()
+                expected_fields = [field.strip() for field in fields.split(",")]
+            continue
+        first_content_line = index
+        break
+    return expected_fields, "\n".join(lines[first_content_line:])
+
+
+@lru_cache(maxsize=None)
+def load_test_case(testcase: str, level: int) -> TestCase:
+    """テストケース（chat等）とレベルからテストデータを読み込む"""
+    path = TEST_DATA_DIR / TESTCASE_DIRS[testcase] / f"{LEVEL_NAMES[level]}.txt"
+    expected_fields, text = parse_test_data(path.read_text(encoding="utf-8"))
+    if not expected_fields:
+        raise ValueError(f"テストデータファイル '{path}' に //expectedFields: コメントが見つかりません")
+    return TestCase(testcase, level, text, expected_fields)
+
+
+@lru_cache(maxsize=None)
+def load_expected_answers() -> Dict[str, Dict[str, Dict[str, str]]]:
+    with open(EXPECTED_ANSWERS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def expected_value(test_case: TestCase, field_name: str) -> str:
+    return load_expected_answers()[test_case.pattern][test_case.level_name].get(field_name, "")
+
+
+def experiment_pattern_name(algo: str, method: str) -> str:
+    """ExperimentPatternのrawValue（abs_json, strict-ex_gen など）"""
+    suffix = "gen" if method == "generable" else method
+    return f"{algo}_{suffix}"
+
+
+def field_status(field_name: str, extracted: Optional[str], expected: str) -> str:
+    """Swift版determineFieldStatusと同じ規則で項目を判定"""
+    if extracted is None or extracted == "":
+        return "missing"
+    if field_name in AI_VERIFICATION_FIELDS:
+        return "pending"
+    return "correct" if extracted == expected else "wrong"
+
+
+def score_fields(test_case: TestCase, extracted: Dict[str, Optional[str]]) -> Tuple[List[Dict], List[Dict]]:
+    """抽出結果からexpected_fieldsとunexpected_fieldsを作成"""
+    expected_fields = []
+    for name in test_case.expected_fields:
+        value = extracted.get(name)
+        expected_fields.append({
+            "name": name,
+            "value": value,
+            "status": field_status(name, value, expected_value(test_case, name))
+        })
+    unexpected_fields = [
+        {"name": name, "value": extracted[name], "status": "unexpected"}
+        for name in ALL_FIELDS
+        if name not in test_case.expected_fields and extracted.get(name)
+    ]
+    return expected_fields, unexpected_fields
+
+
+def _base_log(test_case: TestCase, algo: str, method: str, language: str, extraction_time: float,
+              cold_start: bool, request_content: Optional[str]) -> Dict:
+    return {
+        "pattern": test_case.pattern,
+        "level": test_case.level,
+        "iteration": 1,
+        "method": method,
+        "language": language,
+        "experiment_pattern": experiment_pattern_name(algo, method),
+        "request_content": request_content,
+        "extraction_time": extraction_time,
+        "cold_start": cold_start,
+    }
+
+
+def build_log(test_case: TestCase, algo: str, method: str, language: str, extracted: Dict[str, Optional[str]],
+              extraction_time: float, cold_start: bool = False, request_content: Optional[str] = None,
+              two_steps_category: Optional[Dict[str, str]] = None) -> Dict:
+    """正常時の構造化ログを作成"""
+    log = _base_log(test_case, algo, method, language, extraction_time, cold_start, request_content)
+    log["expected_fields"], log["unexpected_fields"] = score_fields(test_case, extracted)
+    if two_steps_category:
+        log["two_steps_category"] = two_steps_category
+    log["error"] = None
+    return log
+
+
+def build_error_log(test_case: TestCase, algo: str, method: str, language: str, error: str, extraction_time: float,
+                    cold_start: bool = False, error_type: str = "ExtractionError", ai_response: Optional[str] = None,
+                    request_content: Optional[str] = None) -> Dict:
+    """エラー時の構造化ログを作成（期待フィールドはすべてmissing）"""
+    log = _base_log(test_case, algo, method, language, extraction_time, cold_start, request_content)
+    log["error"] = error
+    log["error_type"] = error_type
+    if ai_response is not None:
+        log["ai_response"] = ai_response
+    log["expected_fields"] = [{"name": name, "value": None, "status": "missing"} for name in test_case.expected_fields]
+    log["unexpected_fields"] = []
+    return log
+
+
+def write_log(path: str, log: Dict) -> str:
+    """ログを書き込む（Swift版と同様に一時ファイル経由で置き換え、途中状態のファイルを見せない）"""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(log, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, path)
+    return path
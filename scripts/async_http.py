@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 17:00] 標準ライブラリのみで実装した非同期HTTP/1.1クライアント（keep-aliveの接続プール付き）
+目的: 外部LLMへのリクエストを、プロセス起動や接続確立のコストなしに高い並列度で送る
+背景: urllib.requestは同期かつリクエストごとに接続を張り直すため、数百並列の実験ではスレッドと
+      TCP/TLSハンドシェイクのコストが無視できない。外部パッケージ（aiohttp等）は導入していない
+意図: asyncioのストリームで接続ごとにHTTP/1.1のリクエストを送り、Content-Length / chunkedの応答を読んで
+      接続を宛先ごとのプールに戻す。各リクエストの接続時間・最初の応答までの時間・合計時間も返す
+
+@ai[2026-10-19 18:30] 同じ仕組みの最小限のHTTPサーバー（AsyncHTTPServer）を追加
+目的: 外部LLMの手前に置くプロキシ（応答キャッシュなど）を、同じイベントループ・同じ接続プールで実装する
+
+@ai[2026-10-20 03:30] 本文を受信しながら呼ぶコールバック（on_data）を追加
+意図: SSEストリーミング応答を受信途中で解析できるようにする（戻り値の本文は従来どおり全体）
+
+@ai[2026-10-20 11:00] ステータス行・チャンクサイズ・Content-Lengthの数値が不正な場合もHTTPClientErrorにする
+意図: 呼び出し側はHTTPClientErrorだけを捕捉しているため、ValueErrorのままだとリクエストの失敗として扱われなかった
+"""
+
+import asyncio
+import json
+import ssl
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+DataCallback = Callable[[bytes], None]
+
+
+class HTTPClientError(Exception):
+    """接続・送受信の失敗（HTTPステータスによる失敗は含まない）"""
+
+
+def _parse_int(value: bytes, base: int, description: str) -> int:
+    """ステータスコード・長さの数値を解析（不正な値はHTTPClientError）"""
+    try:
+        return int(value, base)
+    except ValueError:
+        raise HTTPClientError(f"無効な{description}です: {value[:100]!r}") from None
+
+
+class HTTPResponse:
+    """HTTPレスポンス（ヘッダー名は小文字）"""
+
+    def __init__(self, status: int, reason: str, headers: Dict[str, str], body: bytes,
+                 connect_time: float = 0.0, ttfb: float = 0.0, total_time: float = 0.0, reused: bool = False):
+        self.status = status
+        self.reason = reason
+        self.headers = headers
+        self.body = body
+        self.connect_time = connect_time  # 接続確立（再利用時は0）
+        self.ttfb = ttfb                  # 送信開始から応答ヘッダー受信まで
+        self.total_time = total_time      # 接続取得から本文受信完了まで
+        self.reused = reused
+        self.cached = False               # 応答キャッシュから再生した応答
+        self.throttle_delay = 0.0         # レート制限・Retry-Afterで送信前に待った時間
+
+    def text(self) -> str:
+        return self.body.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.last_used = time.monotonic()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHTTPClient:
+    """
+    宛先（scheme, host, port）ごとに接続を使い回すHTTPクライアント
+    max_connectionsは全宛先合計の同時接続数の上限
+    """
+
+    def __init__(self, max_connections: int = 100, keepalive_timeout: float = 30.0):
+        self.max_connections = max_connections
+        self.keepalive_timeout = keepalive_timeout
+        self._idle: Dict[Tuple[str, str, int], Deque[_Connection]] = {}
+        self._semaphore = asyncio.Semaphore(max_connections)
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self.connections_opened = 0
+        self.requests_sent = 0
+
+    @staticmethod
+    def _target(url: str) -> Tuple[Tuple[str, str, int], str]:
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise HTTPClientError(f"無効なURLです: {url}")
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        return (parts.scheme, parts.hostname, port), path
+
+    async def _open(self, key: Tuple[str, str, int]) -> _Connection:
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context, limit=2 ** 20)
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    def _take_idle(self, key: Tuple[str, str, int]) -> Optional[_Connection]:
+        idle = self._idle.get(key)
+        now = time.monotonic()
+        while idle:
+            connection = idle.pop()
+            if now - connection.last_used < self.keepalive_timeout and not connection.reader.at_eof():
+                return connection
+            connection.close()
+        return None
+
+    def _release(self, key: Tuple[str, str, int], connection: _Connection):
+        connection.last_used = time.monotonic()
+        self._idle.setdefault(key, deque()).append(connection)
+
+    async def request(self, method: str, url: str, body: Optional[bytes] = None,
+                      headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None,
+                      on_data: Optional[DataCallback] = None) -> HTTPResponse:
+        """リクエストを送信し、本文まで受信したレスポンスを返す（on_dataは本文の断片を受信するたびに呼ぶ）"""
+        try:
+            return await asyncio.wait_for(self._request(method, url, body, headers or {}, on_data), timeout=timeout)
+        except asyncio.TimeoutError:
+            raise HTTPClientError(f"リクエストがタイムアウトしました ({timeout:.0f}秒)")
+
+    async def _request(self, method: str, url: str, body: Optional[bytes], headers: Dict[str, str],
+                       on_data: Optional[DataCallback] = None) -> HTTPResponse:
+        key, path = self._target(url)
+        async with self._semaphore:
+            start_time = time.perf_counter()
+            # 再利用した接続がサーバー側で閉じられていた場合は、新しい接続で1回だけやり直す
+            for attempt in range(2):
+                connection = self._take_idle(key) if attempt == 0 else None
+                reused = connection is not None
+                connect_time = 0.0
+                if connection is None:
+                    try:
+                        connection = await self._open(key)
+                    except (OSError, ssl.SSLError) as e:
+                        raise HTTPClientError(f"接続に失敗しました: {e}") from e
+                    connect_time = time.perf_counter() - start_time
+                try:
+                    response = await self._exchange(connection, key, method, path, body, headers,
+                                                    start_time, connect_time, reused, on_data)
+                except (ConnectionError, asyncio.IncompleteReadError, HTTPClientError) as e:
+                    connection.close()
+                    if reused and attempt == 0:
+                        continue
+                    raise HTTPClientError(f"通信に失敗しました: {e}") from e
+                except BaseException:
+                    connection.close()
+                    raise
+                self.requests_sent += 1
+                return response
+        raise HTTPClientError("通信に失敗しました")
+
+    async def _exchange(self, connection: _Connection, key: Tuple[str, str, int], method: str, path: str,
+                        body: Optional[bytes], headers: Dict[str, str], start_time: float,
+                        connect_time: float, reused: bool, on_data: Optional[DataCallback] = None) -> HTTPResponse:
+        scheme, host, port = key
+        default_port = 443 if scheme == "https" else 80
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {host}" if port == default_port else f"Host: {host}:{port}"]
+        request_headers = {"Connection": "keep-alive", "Accept": "*/*"}
+        request_headers.update(headers)
+        if body is not None:
+            request_headers["Content-Length"] = str(len(body))
+        lines.extend(f"{name}: {value}" for name, value in request_headers.items())
+        send_time = time.perf_counter()
+        connection.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + (body or b""))
+        await connection.writer.drain()
+
+        status_line = await connection.reader.readline()
+        if not status_line:
+            raise HTTPClientError("サーバーが応答せずに接続を閉じました")
+        ttfb = time.perf_counter() - send_time
+        version, status, reason = self._parse_status_line(status_line)
+        response_headers = await self._read_headers(connection.reader)
+        response_body, closed = await self._read_body(connection.reader, method, status, response_headers, on_data)
+
+        keep_alive = not closed and response_headers.get("connection", "").lower() != "close" \
+            and not (version == "HTTP/1.0" and response_headers.get("connection", "").lower() != "keep-alive")
+        if keep_alive:
+            self._release(key, connection)
+        else:
+            connection.close()
+        return HTTPResponse(status, reason, response_headers, response_body, connect_time, ttfb,
+                            time.perf_counter() - start_time, reused)
+
+    @staticmethod
+    def _parse_status_line(line: bytes) -> Tuple[str, int, str]:
+        parts = line.decode('latin-1').rstrip("\r\n").split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/"):
+            raise HTTPClientError(f"無効なステータス行です: {line[:100]!r}")
+        return parts[0], _parse_int(parts[1].encode('latin-1'), 10, "ステータスコード"), parts[2] if len(parts) > 2 else ""
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _read_body(reader: asyncio.StreamReader, method: str, status: int,
+                         headers: Dict[str, str], on_data: Optional[DataCallback] = None) -> Tuple[bytes, bool]:
+        """本文を読む（戻り値の2番目は接続が閉じられたかどうか）"""
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            return b"", False
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            chunks = []
+            while True:
+                size_line = await reader.readline()
+                size = _parse_int(size_line.split(b";")[0].strip() or b"0", 16, "チャンクサイズ")
+                if size == 0:
+                    # トレーラーを読み飛ばす
+                    while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return b"".join(chunks), False
+                chunks.append(await reader.readexactly(size))
+                if on_data is not None:
+                    on_data(chunks[-1])
+                await reader.readexactly(2)
+        if "content-length" in headers:
+            data = await reader.readexactly(_parse_int(headers["content-length"].encode('latin-1'), 10, "Content-Length"))
+            if on_data is not None:
+                on_data(data)
+            return data, False
+        # 長さ指定がない場合は接続が閉じられるまで読む
+        if on_data is None:
+            return await reader.read(), True
+        chunks = []
+        while True:
+            data = await reader.read(65536)
+            if not data:
+                return b"".join(chunks), True
+            chunks.append(data)
+            on_data(data)
+
+    async def close(self):
+        """待機中の接続をすべて閉じる"""
+        for idle in self._idle.values():
+            while idle:
+                idle.pop().close()
+        self._idle.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'requests': self.requests_sent, 'connections_opened': self.connections_opened}
+
+
+class HTTPRequest:
+    """サーバーが受信したリクエスト（ヘッダー名は小文字）"""
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self):
+        return json.loads(self.body)
+
+
+RequestHandler = Callable[[HTTPRequest], Awaitable[HTTPResponse]]
+
+
+class AsyncHTTPServer:
+    """
+    handler(HTTPRequest) -> HTTPResponse を呼び出すだけのHTTP/1.1サーバー（keep-alive対応、chunkedの受信は非対応）
+    プロキシ用途のため、ルーティングやストリーミング応答は持たない
+    """
+
+    def __init__(self, handler: RequestHandler, host: str = "127.0.0.1", port: int = 0):
+        self.handler = handler
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._serve_connection, self.host, self.port, limit=2 ** 20)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.url
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                parts = request_line.decode('latin-1').rstrip("\r\n").split(" ")
+                if len(parts) != 3:
+                    break
+                method, path, version = parts
+                headers = await AsyncHTTPClient._read_headers(reader)
+                length = _parse_int((headers.get("content-length") or "0").encode('latin-1'), 10, "Content-Length")
+                body = await reader.readexactly(length) if length else b""
+                try:
+                    response = await self.handler(HTTPRequest(method, path, headers, body))
+                except Exception as e:
+                    response = HTTPResponse(502, "Bad Gateway", {"content-type": "application/json"},
+                                            json.dumps({"error": {"message": str(e)}}, ensure_ascii=False).encode('utf-8'))
+                keep_alive = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+                writer.write(self._response_bytes(response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, HTTPClientError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _response_bytes(response: HTTPResponse, keep_alive: bool) -> bytes:
+        # 本文は受信済みのため、転送時のヘッダー（chunked等）は付け直す
+        skipped = {"content-length", "transfer-encoding", "connection", "keep-alive"}
+        lines = [f"HTTP/1.1 {response.status} {response.reason or 'OK'}"]
+        lines.extend(f"{name}: {value}" for name, value in response.headers.items() if name.lower() not in skipped)
+        lines.append(f"Content-Length: {len(response.body)}")
+        lines.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + response.body
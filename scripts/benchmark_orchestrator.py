@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 13:00] オーケストレーターのオーバーヘッド計測
+目的: 1万〜10万セル規模のスイープで、Python側のオーケストレーションが1セルあたりどれだけ時間を使うかを計測する
+背景: 実験の所要時間のうち推論以外（プロセス起動、ポーリング、glob、JSON入出力、集計）の割合が分からなかった
+意図: simulated_backendでLLMを置き換え、実験エンジン・レジューム解析・レポート集計の各段階の時間を計測する
+      --backend inprocess はエンジン自体のコスト、--backend subprocess はAITestApp互換CLIの起動コストを含めて計測する
+
+使用例:
+    python3 scripts/benchmark_orchestrator.py --cells 10000 100000 --concurrency 8
+    python3 scripts/benchmark_orchestrator.py --cells 2000 --backend subprocess --concurrency 4
+"""
+
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import shutil
+import sys
+import time
+from typing import Dict, List
+
+import generate_combined_report
+from experiment_engine import (
+    CompletionIndex, ExperimentEngine, ExperimentJob, JSONSummarySink, SequentialScheduler, SwiftCLIBackend,
+    create_experiment_dir, scan_completed_cells
+)
+from log_layout import LAYOUT_FLAT, LAYOUTS, discover_log_files
+from simulated_backend import (
+    ENV_CRASH_RATE, ENV_ERROR_RATE, ENV_LATENCY, ENV_SEED, ENV_TIME_SCALE, SimulatedBackend
+)
+
+DEFAULT_PATTERNS = ["chat_abs_json", "chat_strict_json", "chat_persona_json"]
+
+
+def build_cell_jobs(cell_count: int, patterns: List[str], levels: List[int]) -> List[ExperimentJob]:
+    """1ジョブ=1セル（パターン×レベル×実行番号）のジョブをcell_count件作成（実行番号ごとに全セルを一巡）"""
+    cells = ((run, pattern, level) for run in itertools.count(1) for pattern in patterns for level in levels)
+    return [
+        ExperimentJob.from_pattern(pattern, levels=(level,), runs=1, run_start=run)
+        for run, pattern, level in itertools.islice(cells, cell_count)
+    ]
+
+
+def timed(label: str, timings: Dict[str, float], func, *args, **kwargs):
+    """関数の実行時間を計測（標準出力は抑制）"""
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = func(*args, **kwargs)
+    timings[label] = time.perf_counter() - start_time
+    return result
+
+
+def aggregate_logs(log_dir: str) -> int:
+    """generate_combined_report.pyと同じ経路でログを解析・集計（HTML出力は除く）"""
+    all_results = [generate_combined_report.parse_log_file(log.path)
+                   for log in discover_log_files(log_dir, include_errors=False)]
+    generate_combined_report.compute_grouped_item_scores(all_results)
+    generate_combined_report.calculate_timing_stats(all_results)
+    return len(all_results)
+
+
+def recorded_extraction_seconds(log_dir: str) -> float:
+    """ログに記録された抽出時間（シミュレーターが待機した時間）の合計"""
+    total = 0.0
+    for log in discover_log_files(log_dir):
+        with open(log.path, 'r', encoding='utf-8') as f:
+            total += json.load(f).get('extraction_time', 0.0)
+    return total
+
+
+def build_backend(args):
+    if args.backend == "inprocess":
+        return SimulatedBackend(latency=args.latency, error_rate=args.error_rate, crash_rate=args.crash_rate,
+                                time_scale=args.time_scale, seed=args.seed, log_layout=args.log_layout)
+    # AITestApp互換CLIとして起動（SwiftCLIBackendのコマンド組み立て・環境変数・プロセス管理をそのまま通す）
+    os.environ.update({
+        ENV_LATENCY: args.latency,
+        ENV_ERROR_RATE: str(args.error_rate),
+        ENV_CRASH_RATE: str(args.crash_rate),
+        ENV_TIME_SCALE: str(args.time_scale),
+        ENV_SEED: str(args.seed),
+    })
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "simulated_backend.py")
+    return SwiftCLIBackend(command_prefix=[sys.executable, script], log_layout=args.log_layout)
+
+
+def benchmark(cell_count: int, args, base_dir: str) -> Dict:
+    """cell_count件のセルで各段階の時間を計測"""
+    output_dir = os.path.join(base_dir, f"cells_{cell_count}")
+    os.makedirs(output_dir, exist_ok=True)
+    print(f"\n🔬 {cell_count}セルを実行中... ({args.backend}, 並列数 {args.concurrency})")
+
+    timings: Dict[str, float] = {}
+    jobs = build_cell_jobs(cell_count, args.patterns, args.levels)
+    backend = build_backend(args)
+    engine = ExperimentEngine(backend, SequentialScheduler(jobs), output_dir,
+                              sinks=[JSONSummarySink(os.path.join(output_dir, "experiment_summary.json"))],
+                              concurrency=args.concurrency)
+    summary = timed('run', timings, engine.run)
+    completed = timed('resume_index', timings, CompletionIndex(output_dir).completed)
+    timed('resume_scan', timings, scan_completed_cells, output_dir)
+    parsed = timed('aggregate', timings, aggregate_logs, output_dir)
+
+    # 推論に相当する時間（理想的に並列化された場合の下限）を差し引いた分をオーバーヘッドとする
+    if isinstance(backend, SimulatedBackend):
+        simulated_seconds = backend.simulated_seconds
+    else:
+        simulated_seconds = recorded_extraction_seconds(output_dir) if args.time_scale > 0 else 0.0
+    ideal_inference = simulated_seconds * args.time_scale / args.concurrency
+    run_overhead = max(0.0, timings['run'] - ideal_inference)
+
+    result = {
+        'cells': cell_count,
+        'backend': args.backend,
+        'concurrency': args.concurrency,
+        'succeeded_jobs': summary['succeeded'],
+        'failed_jobs': summary['failed'],
+        'logs_found': sum(len(cells) for cells in completed.values()),
+        'logs_aggregated': parsed,
+        'timings_seconds': timings,
+        'ideal_inference_seconds': ideal_inference,
+        'overhead_per_cell_ms': {
+            'run': run_overhead / cell_count * 1000,
+            'resume_index': timings['resume_index'] / cell_count * 1000,
+            'resume_scan': timings['resume_scan'] / cell_count * 1000,
+            'aggregate': timings['aggregate'] / cell_count * 1000,
+            'total': (run_overhead + timings['resume_index'] + timings['aggregate']) / cell_count * 1000
+        }
+    }
+    per_cell = result['overhead_per_cell_ms']
+    print(f"   実行: {timings['run']:.2f}秒 (オーバーヘッド {per_cell['run']:.3f}ms/セル)")
+    print(f"   レジューム解析（索引）: {timings['resume_index']:.2f}秒 ({per_cell['resume_index']:.3f}ms/セル)")
+    print(f"   レジューム解析（ログ探索）: {timings['resume_scan']:.2f}秒 ({per_cell['resume_scan']:.3f}ms/セル)")
+    print(f"   集計: {timings['aggregate']:.2f}秒 ({per_cell['aggregate']:.3f}ms/セル)")
+    print(f"   合計オーバーヘッド: {per_cell['total']:.3f}ms/セル")
+
+    if not args.keep_logs:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="オーケストレーターのオーバーヘッド計測（シミュレーター使用）")
+    parser.add_argument("--cells", nargs="+", type=int, default=[10000, 100000], help="計測するセル数（複数指定可）")
+    parser.add_argument("--backend", default="inprocess", choices=["inprocess", "subprocess"],
+                        help="inprocess: エンジン内で実行 / subprocess: AITestApp互換CLIを起動")
+    parser.add_argument("--concurrency", type=int, default=8, help="並列数（デフォルト: 8）")
+    parser.add_argument("--patterns", nargs="+", default=DEFAULT_PATTERNS, help="パターン")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="レベル")
+    parser.add_argument("--latency", default="lognormal:1.0:0.5", help="ログに記録する遅延分布（デフォルト: lognormal:1.0:0.5）")
+    parser.add_argument("--time-scale", type=float, default=0.0,
+                        help="実際に待機する倍率（デフォルト: 0 = 待機なしでオーバーヘッドのみ計測）")
+    parser.add_argument("--error-rate", type=float, default=0.02, help="エラーログの出力率")
+    parser.add_argument("--crash-rate", type=float, default=0.0, help="ジョブが異常終了する率")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード")
+    parser.add_argument("--output-dir", help="出力ディレクトリ（指定しない場合は自動作成）")
+    parser.add_argument("--log-layout", default=LAYOUT_FLAT, choices=LAYOUTS, help="ログの配置（flat / sharded）")
+    parser.add_argument("--keep-logs", action="store_true", help="シミュレーションログを削除せずに残す")
+    args = parser.parse_args()
+
+    base_dir = args.output_dir or create_experiment_dir("orchestrator_benchmark")
+    os.makedirs(base_dir, exist_ok=True)
+    print("⏱️ オーケストレーターのオーバーヘッド計測を開始します")
+    print(f"   セル数: {', '.join(map(str, args.cells))}")
+    print(f"   遅延分布: {args.latency} (時間倍率: {args.time_scale})")
+    print(f"   出力先: {base_dir}")
+
+    results = [benchmark(cell_count, args, base_dir) for cell_count in args.cells]
+
+    report_path = os.path.join(base_dir, "orchestrator_benchmark.json")
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump({'settings': vars(args), 'results': results}, f, ensure_ascii=False, indent=2)
+
+    print("\n" + "=" * 80)
+    print(f"{'セル数':>10} {'実行(ms/セル)':>14} {'レジューム(ms/セル)':>18} {'集計(ms/セル)':>14} {'合計(ms/セル)':>14}")
+    for result in results:
+        per_cell = result['overhead_per_cell_ms']
+        print(f"{result['cells']:>10} {per_cell['run']:>14.3f} {per_cell['resume_index']:>18.3f} "
+              f"{per_cell['aggregate']:>14.3f} {per_cell['total']:>14.3f}")
+    print(f"💾 結果を保存しました: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 17:00] Python実装のバックエンド（http_backend）とSwift版の一致確認
+目的: aitest_extractionのJSON解析・リクエストボディ・採点がSwift版と同じ結果になることを確認する
+背景: http_backendはSwiftのExternalLLMExtractorを移植したもので、どちらかだけが変更されると
+      同じ実験でもバックエンドによって精度が変わってしまう
+意図: 次の3つを照合し、不一致を一覧表示する（不一致がある場合は終了コード1）
+      1. Tests/TestData/AFMResponseExamplesの生の応答を解析し、Swift版の「Extracted AccountInfo」と比較
+      2. --swift-logs: Swift版のログのrequest_contentとPython版で組み立てたリクエストボディを比較し、
+         ログの抽出値を再採点した結果とai_response（エラーログ）の解析結果を比較
+      3. --python-logs: 同じ条件のSwift版とPython版の実験ディレクトリのパターン×レベル別の正解率を比較
+
+使用例:
+    python3 scripts/check_backend_parity.py
+    python3 scripts/check_backend_parity.py --swift-logs test_logs/swift_run --python-logs test_logs/http_run
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import build_prompt, build_request_body, parse_account_info
+from aitest_logs import TEST_DATA_DIR, load_test_case, score_fields
+from log_layout import discover_log_files
+
+RESPONSE_EXAMPLES_DIR = TEST_DATA_DIR / "AFMResponseExamples"
+
+# 「Extracted AccountInfo」の表示名 → AccountInfoのフィールド名
+EXTRACTED_LABELS = {
+    "Title": "title", "UserID": "userID", "Password": "password", "URL": "url", "Note": "note",
+    "Host": "host", "Port": "port", "AuthKey": "authKey", "Confidence": "confidence",
+}
+_SECTION_PATTERN = re.compile(r"^# (.+)$", re.MULTILINE)
+
+
+def read_sections(path: Path) -> Dict[str, str]:
+    """「# 見出し」で区切られたセクションを読み込む"""
+    content = path.read_text(encoding="utf-8")
+    matches = list(_SECTION_PATTERN.finditer(content))
+    sections = {}
+    for index, match in enumerate(matches):
+        end = matches[index + 1].start() if index + 1 < len(matches) else len(content)
+        sections[match.group(1).strip()] = content[match.end():end].strip("\n")
+    return sections
+
+
+def parse_extracted_account(text: str) -> Dict[str, Optional[str]]:
+    """「Extracted AccountInfo」の各行を読み込む（nilはNone、複数行の値は前の項目に連結）"""
+    values: Dict[str, Optional[str]] = {}
+    current = None
+    for line in text.splitlines():
+        label, separator, value = line.partition(": ")
+        if separator and label in EXTRACTED_LABELS:
+            current = EXTRACTED_LABELS[label]
+            values[current] = None if value == "nil" else value
+        elif current is not None and values.get(current) is not None:
+            values[current] += "\n" + line
+    return values
+
+
+def display_value(account: Dict, name: str) -> Optional[str]:
+    """Swift版の表示形式に合わせた値（数値は文字列化）"""
+    value = account.get(name)
+    if value is None:
+        return None
+    if name == "confidence":
+        return str(float(value))
+    return str(value)
+
+
+def check_response_examples(examples_dir: Path) -> Tuple[int, List[str]]:
+    """応答例の解析結果を比較"""
+    mismatches = []
+    checked = 0
+    for path in sorted(examples_dir.glob("*_response.txt")):
+        sections = read_sections(path)
+        if "Raw AI Response" not in sections or "Extracted AccountInfo" not in sections:
+            continue
+        checked += 1
+        expected = parse_extracted_account(sections["Extracted AccountInfo"])
+        account = parse_account_info(sections["Raw AI Response"])
+        if account is None:
+            mismatches.append(f"{path.name}: Pythonでは解析に失敗しました")
+            continue
+        for name, swift_value in expected.items():
+            python_value = display_value(account, name)
+            if python_value != swift_value:
+                mismatches.append(f"{path.name}: {name} Swift={swift_value!r} Python={python_value!r}")
+    return checked, mismatches
+
+
+def check_swift_logs(log_dir: str) -> Tuple[int, List[str]]:
+    """Swift版のログとPython版のリクエストボディ・採点・解析結果を比較"""
+    mismatches = []
+    checked = 0
+    for log_file in discover_log_files(log_dir):
+        with open(log_file.path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+        name = log_file.path.name
+        if log_file.method != "json":
+            continue
+        checked += 1
+        test_case = load_test_case(log_file.testcase, log_file.level)
+
+        if log.get("request_content"):
+            swift_body = json.loads(log["request_content"])
+            python_body = build_request_body(swift_body.get("model"),
+                                             build_prompt(log_file.testcase, log_file.algo, log_file.method,
+                                                          log_file.language, log_file.level))
+            if swift_body != python_body:
+                differing = sorted(key for key in set(swift_body) | set(python_body)
+                                   if swift_body.get(key) != python_body.get(key))
+                mismatches.append(f"{name}: リクエストボディが異なります（{', '.join(differing)}）")
+
+        if log.get("error"):
+            if log.get("error_type") == "ExtractionError" and log.get("ai_response") is not None \
+                    and parse_account_info(log["ai_response"]) is not None:
+                mismatches.append(f"{name}: Swiftでは解析に失敗した応答をPythonでは解析できました")
+            continue
+
+        extracted = {field["name"]: field.get("value")
+                     for field in log.get("expected_fields", []) + log.get("unexpected_fields", [])}
+        expected_fields, _ = score_fields(test_case, extracted)
+        for swift_field, python_field in zip(log.get("expected_fields", []), expected_fields):
+            if swift_field.get("status") != python_field["status"]:
+                mismatches.append(f"{name}: {python_field['name']} の判定 Swift={swift_field.get('status')} "
+                                  f"Python={python_field['status']}")
+    return checked, mismatches
+
+
+def accuracy_by_cell(log_dir: str) -> Dict[Tuple[str, int], float]:
+    """パターン×レベル別の正解率（correct / 期待フィールド数、エラーログは0点）"""
+    totals: Dict[Tuple[str, int], List[int]] = defaultdict(lambda: [0, 0])
+    for log_file in discover_log_files(log_dir):
+        with open(log_file.path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+        counts = totals[(f"{log_file.testcase}_{log_file.algo}_{log_file.method}", log_file.level)]
+        for field in log.get("expected_fields", []):
+            counts[0] += field.get("status") == "correct"
+            counts[1] += 1
+    return {cell: correct / total for cell, (correct, total) in totals.items() if total}
+
+
+def compare_accuracy(swift_dir: str, python_dir: str, tolerance: float) -> List[str]:
+    """Swift版とPython版の実験で正解率の差がtoleranceを超えるセル"""
+    swift, python = accuracy_by_cell(swift_dir), accuracy_by_cell(python_dir)
+    mismatches = []
+    for cell in sorted(set(swift) & set(python)):
+        difference = python[cell] - swift[cell]
+        print(f"   {cell[0]} level{cell[1]}: Swift {swift[cell]:.1%} / Python {python[cell]:.1%} ({difference:+.1%})")
+        if abs(difference) > tolerance:
+            mismatches.append(f"{cell[0]} level{cell[1]}: 正解率の差 {difference:+.1%}（許容 ±{tolerance:.0%}）")
+    return mismatches
+
+
+def report(title: str, checked: int, mismatches: List[str]) -> bool:
+    status = "✅" if not mismatches else "❌"
+    print(f"{status} {title}: {checked}件を確認、不一致 {len(mismatches)}件")
+    for mismatch in mismatches:
+        print(f"   - {mismatch}")
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Python実装のバックエンドとSwift版の一致確認")
+    parser.add_argument("--examples-dir", default=str(RESPONSE_EXAMPLES_DIR), help="AI応答例のディレクトリ")
+    parser.add_argument("--swift-logs", help="Swift版（--backend swift）の実験ディレクトリ")
+    parser.add_argument("--python-logs", help="Python版（--backend http）の実験ディレクトリ（--swift-logsと同じ条件）")
+    parser.add_argument("--tolerance", type=float, default=0.05, help="正解率の差の許容値（デフォルト: 0.05）")
+    args = parser.parse_args()
+
+    ok = report("AI応答例の解析", *check_response_examples(Path(args.examples_dir)))
+    if args.swift_logs:
+        ok = report("Swift版ログとの照合", *check_swift_logs(args.swift_logs)) and ok
+        if args.python_logs:
+            print("📊 パターン×レベル別の正解率:")
+            mismatches = compare_accuracy(args.swift_logs, args.python_logs, args.tolerance)
+            ok = report("正解率の比較", len(accuracy_by_cell(args.python_logs)), mismatches) and ok
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 06:30] ウィンドウ分割（chunked_extraction）と単一リクエストの抽出の比較
+目的: 長いドキュメントをウィンドウに分けて並行して抽出した場合に、抽出時間と抽出精度が
+      単一リクエストと比べてどう変わるかをレベルごとに示す
+背景: ウィンドウ分割は1セルの時間を短くできるが、ウィンドウの境目にまたがる項目や、ウィンドウ間で値が衝突した
+      項目では精度が下がる可能性があり、時間と精度を同じ条件で比べる必要がある
+意図: 単一リクエスト（00_single）とウィンドウ分割（01_chunked）の2つの設定で同じパターン・レベル・実行回数の実験を
+      HTTPバックエンドで実行し、設定ごとのサブディレクトリに通常のログを出力する
+      - 全体の所要時間: 各設定のexperiment_summary.jsonのelapsed_seconds
+      - 平均・p95抽出時間、正規化スコア、エラー率: sampling_sweep.analyze_setting のレベルごとの集計
+      - 分割されたセル数・ウィンドウ数・値が衝突した項目数: ログのchunked_extraction
+      比較をchunked_summary.jsonに保存し、--analyze-onlyで再集計できる
+      実行・集計・表示の共通部分は comparison_harness.py（本スクリプトはウィンドウの指定と分割の件数の集計のみ）
+
+使用例:
+    python3 scripts/chunked_comparison.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --patterns chat_abs_json password_abs_json voice_abs_json --levels 2 3 --chunk-window 400 --runs 5
+    python3 scripts/chunked_comparison.py --analyze-only --experiment-dir test_logs/202610200630_chunked_extraction
+"""
+
+import argparse
+import json
+from typing import Dict
+
+from chunked_extraction import DEFAULT_OVERLAP_CHARS, DEFAULT_WINDOW_CHARS, WindowSettings
+from comparison_harness import (
+    Comparison, add_comparison_arguments, compare_settings, elapsed_seconds, print_compared, print_header,
+    relative_change, run_comparison, run_setting, save_summary
+)
+from log_layout import discover_log_files
+from metrics_utils import format_value
+
+COMPARISON = Comparison(label="chunked_extraction", emoji="🪟", title="ウィンドウ分割",
+                        baseline_label="00_single", variant_label="01_chunked", baseline_prefix="single",
+                        setting_file="chunked_setting.json", summary_file="chunked_summary.json",
+                        group_by="level")
+
+
+def run_settings(args, compare_dir: str):
+    """単一リクエスト / ウィンドウ分割の2設定で実験を実行"""
+    chunking = WindowSettings(args.chunk_window, args.chunk_overlap)
+    run_setting(args, COMPARISON, compare_dir, False, {'chunking': None}, "単一リクエスト")
+    run_setting(args, COMPARISON, compare_dir, True, {'chunking': chunking.to_dict()},
+                f"ウィンドウ {chunking.window_chars}文字（重なり {chunking.overlap_chars}文字）", chunking=chunking)
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def chunk_counts(setting_dir: str) -> Dict[str, int]:
+    """ログのchunked_extractionから、分割されたセル数・ウィンドウ数・失敗したウィンドウ数・値が衝突した項目数"""
+    counts = {'chunked_cells': 0, 'windows': 0, 'failed_windows': 0, 'conflicting_fields': 0}
+    for log_file in discover_log_files(setting_dir):
+        with open(log_file.path, 'r', encoding='utf-8') as f:
+            chunked = json.load(f).get("chunked_extraction")
+        if not chunked:
+            continue
+        counts['chunked_cells'] += 1
+        counts['windows'] += chunked.get("windows", 0)
+        counts['failed_windows'] += chunked.get("failed_windows", 0)
+        counts['conflicting_fields'] += len(chunked.get("conflicts") or {})
+    return counts
+
+
+def analyze_comparison(compare_dir: str) -> Dict:
+    """単一リクエスト / ウィンドウ分割をレベルごとに比較してchunked_summary.jsonに保存"""
+    by_level = compare_settings(COMPARISON, compare_dir)
+    single_dir, chunked_dir = COMPARISON.setting_dir(compare_dir, False), COMPARISON.setting_dir(compare_dir, True)
+    wall_time, single_wall_time = elapsed_seconds(chunked_dir), elapsed_seconds(single_dir)
+    return save_summary(COMPARISON, compare_dir, {
+        'single': COMPARISON.baseline_label, 'chunked': COMPARISON.variant_label, 'wall_time': wall_time,
+        'single_wall_time': single_wall_time, 'wall_time_change': relative_change(wall_time, single_wall_time),
+        'chunks': chunk_counts(chunked_dir), 'by_level': by_level})
+
+
+def print_comparison(summary: Dict):
+    print_header(COMPARISON, "ウィンドウ分割と単一リクエストの比較（ウィンドウ分割 / 単一リクエスト）")
+    chunks = summary['chunks']
+    print(f"   全体の所要時間: {format_value(summary['wall_time'], '.2f')} / "
+          f"{format_value(summary['single_wall_time'], '.2f')}秒 ({format_value(summary['wall_time_change'], '+.1%')})")
+    print(f"   分割したセル: {chunks['chunked_cells']}件, {chunks['windows']}ウィンドウ "
+          f"(解析失敗 {chunks['failed_windows']}件, 値が衝突した項目 {chunks['conflicting_fields']}件)")
+    for key, stats in summary['by_level'].items():
+        print_compared(COMPARISON, key, stats)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ウィンドウ分割と単一リクエストの抽出の比較（httpバックエンド）")
+    add_comparison_arguments(parser, ["chat_abs_json", "password_abs_json", "voice_abs_json"])
+    parser.add_argument("--chunk-window", type=int, default=DEFAULT_WINDOW_CHARS,
+                        help=f"ウィンドウの文字数（これより長いテストデータを分割、デフォルト: {DEFAULT_WINDOW_CHARS}）")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_OVERLAP_CHARS,
+                        help=f"隣り合うウィンドウの重なり（文字数、デフォルト: {DEFAULT_OVERLAP_CHARS}）")
+    run_comparison(parser, COMPARISON, run_settings, analyze_comparison, print_comparison)
+
+
+if __name__ == "__main__":
+    main()
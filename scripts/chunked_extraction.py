@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 06:30] 長いドキュメントのスライディングウィンドウ分割と、ウィンドウごとの抽出結果の統合
+目的: 1つの長いプロンプトのプレフィルとデコードを直列に待つ代わりに、ドキュメントを重なりのあるウィンドウに分けて
+      並行して抽出し、Level3やOCRのような長い入力の抽出時間を短くする
+背景: 外部LLM実験で最も遅いのはLevel3のセルで、プロンプト全体を1リクエストで処理するため
+      サーバーに余力があっても1セルの時間は短くならなかった
+意図: - split_windows: ウィンドウの文字数（window_chars）ごとに、できるだけ行の境目で区切り、
+        隣のウィンドウとoverlap_chars文字重ねる（境目にまたがる項目を片方のウィンドウで完全に読めるようにする）
+      - merge_accounts: ウィンドウごとのAccountInfo（parse_account_infoの辞書）を項目ごとに統合する
+        - 値（null・空文字列を除く）が1種類ならそれを使う
+        - 複数の値があれば衝突とし、最も多くのウィンドウが返した値を使う（同数ならドキュメントの前のウィンドウ）
+        - noteは補足情報をまとめる項目のため、衝突時は最も長い値を使う
+        衝突した項目と値の候補はログのchunked_extraction.conflictsに残す
+      HTTPバックエンドのchunking（run_external_llm_experiment.pyの --chunk-window）がsimpleモードで使い、
+      ウィンドウのリクエストを並行して送る。単一リクエストとの比較は chunked_comparison.py で行う
+"""
+
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import ACCOUNT_STRING_FIELDS
+
+DEFAULT_WINDOW_CHARS = 400
+DEFAULT_OVERLAP_CHARS = 100
+LONGEST_VALUE_FIELDS = {"note"}
+
+
+@dataclass(frozen=True)
+class WindowSettings:
+    """ウィンドウの大きさと重なり（window_charsより短いドキュメントは分割しない）"""
+    window_chars: int = DEFAULT_WINDOW_CHARS
+    overlap_chars: int = DEFAULT_OVERLAP_CHARS
+
+    def to_dict(self) -> Dict:
+        return {"window_chars": self.window_chars, "overlap_chars": self.overlap_chars}
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """HTTPバックエンドのサマリーのchunkedを実験終了時の表示の1行にする（分割したセルがなければNone）"""
+        if not summary['cells']:
+            return None
+        return (f"ウィンドウ分割: {summary['cells']}セル, {summary['windows']}ウィンドウ "
+                f"(解析失敗 {summary['failed_windows']}件, 値が衝突した項目 {summary['conflicting_fields']}件)")
+
+
+def split_windows(text: str, settings: WindowSettings) -> List[str]:
+    """重なりのあるウィンドウに分割（区切りは後半の行の境目を優先し、行が長い場合は文字数で区切る）"""
+    window, overlap = settings.window_chars, min(settings.overlap_chars, settings.window_chars // 2)
+    if len(text) <= window:
+        return [text]
+    windows: List[str] = []
+    start = 0
+    while True:
+        end = min(len(text), start + window)
+        if end < len(text):
+            newline = text.rfind("\n", start + window // 2, end)
+            if newline > start:
+                end = newline + 1
+        windows.append(text[start:end])
+        if end >= len(text):
+            break
+        next_start = max(start + 1, end - overlap)
+        newline = text.rfind("\n", max(start + 1, next_start - overlap), next_start)
+        start = newline + 1 if newline >= 0 else next_start
+    return [chunk for chunk in windows if chunk.strip()]
+
+
+def _present(value) -> bool:
+    return value is not None and value != ""
+
+
+def merge_accounts(accounts: List[Optional[Dict]]) -> Tuple[Dict, Dict[str, List]]:
+    """
+    ウィンドウ順のAccountInfoを統合し、(統合結果, 衝突した項目ごとの値の候補) を返す
+    解析に失敗したウィンドウ（None）は除く
+    """
+    parsed = [account for account in accounts if account is not None]
+    merged: Dict = {}
+    conflicts: Dict[str, List] = {}
+    for name in ACCOUNT_STRING_FIELDS + ["port"]:
+        values = [account.get(name) for account in parsed if _present(account.get(name))]
+        candidates = list(dict.fromkeys(values))
+        if len(candidates) > 1:
+            conflicts[name] = candidates
+            if name in LONGEST_VALUE_FIELDS:
+                merged[name] = max(candidates, key=len)
+            else:
+                counts = Counter(values)
+                merged[name] = max(candidates, key=lambda value: counts[value])
+        else:
+            merged[name] = candidates[0] if candidates else None
+    confidences = [account["confidence"] for account in parsed if account.get("confidence") is not None]
+    merged["confidence"] = min(confidences) if confidences else None
+    return merged, conflicts
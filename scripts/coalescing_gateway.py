@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 21:30] 同一リクエストの合流（coalescing）
+目的: 並列実行で同時に送られる同じリクエストを上流へ1回だけ送り、推論サーバーの負荷を減らす
+背景: 同じテンプレート・同じ文書のリクエストは実行番号が違うだけでバイト単位で同一になり、
+      two-stepsモードでは大分類の判定プロンプトも実行ごとに同じものが送られていた
+意図: - 正規化したリクエストボディ（response_cache.request_key）が同じリクエストが処理中であれば、
+        上流へは送らずにその応答を待って同じ内容を返す。サンプリングが決定的な場合
+        （temperature 0、またはseed指定）のみ合流し、--coalesce alwaysで常に合流する
+      - 受信数・合流数・上流への送信数と、合流で省いたトークン数を集計し、
+        /gateway/stats と終了時のサマリーに出力する
+      - 異なるリクエストのバッチ化はクライアント側では行わない。OpenAI互換APIにchatリクエストを
+        まとめて送るエンドポイントはなく（/v1/completionsのpromptの配列はチャットテンプレートを
+        クライアント側で適用する必要があり、計測対象のプロンプトが変わる）、vLLM等は同時に届いた
+        リクエストをサーバー側で連続バッチ処理するため、時間枠で待たせても上流の負荷は減らない
+
+使用例:
+    python3 scripts/coalescing_gateway.py proxy --upstream http://host:8000 --port 8400
+    # HTTPバックエンド内で合流のみ使用
+    python3 scripts/run_external_llm_experiment.py --backend http ... --coalesce deterministic
+"""
+
+import argparse
+import asyncio
+import json
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer, HTTPClientError, HTTPRequest, HTTPResponse
+from response_cache import request_key
+
+COALESCE_OFF = "off"
+COALESCE_DETERMINISTIC = "deterministic"
+COALESCE_ALWAYS = "always"
+COALESCE_MODES = [COALESCE_OFF, COALESCE_DETERMINISTIC, COALESCE_ALWAYS]
+COALESCED_HEADER = "x-aitest-coalesced"
+STATS_PATH = "/gateway/stats"
+
+
+def is_deterministic(body: Dict) -> bool:
+    """同じリクエストに同じ応答が返るサンプリング設定か（temperature 0、またはseed指定）"""
+    return body.get("temperature") == 0 or body.get("seed") is not None
+
+
+def should_coalesce(body: Dict, mode: str) -> bool:
+    if mode == COALESCE_OFF or body.get("stream"):
+        return False
+    return mode == COALESCE_ALWAYS or is_deterministic(body)
+
+
+def copy_response(response: HTTPResponse) -> HTTPResponse:
+    """合流した各リクエストに返す応答（ヘッダーは個別に書き換えられるよう複製）"""
+    copied = HTTPResponse(response.status, response.reason, dict(response.headers), response.body,
+                          response.connect_time, response.ttfb, response.total_time, response.reused)
+    copied.throttle_delay = response.throttle_delay
+    return copied
+
+
+def usage_tokens(response: HTTPResponse) -> int:
+    try:
+        usage = response.json().get("usage") or {}
+    except (ValueError, AttributeError):
+        return 0
+    return int(usage.get("total_tokens") or (usage.get("prompt_tokens") or 0) + (usage.get("completion_tokens") or 0))
+
+
+class RequestCoalescer:
+    """同じキーの処理中のリクエストを1つにまとめる（先頭のリクエストのみ送信し、後続は応答を待つ）"""
+
+    def __init__(self, mode: str = COALESCE_DETERMINISTIC):
+        self.mode = mode
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.requests = 0
+        self.coalesced = 0
+        self.saved_tokens = 0
+
+    async def run(self, body: Dict, send: Callable[[], Awaitable[HTTPResponse]]) -> Tuple[HTTPResponse, bool]:
+        """応答と、合流した（上流へ送らなかった）かどうかを返す"""
+        self.requests += 1
+        if not should_coalesce(body, self.mode):
+            return await send(), False
+        key = request_key(body)
+        future = self._inflight.get(key)
+        if future is not None:
+            try:
+                response = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 先頭のリクエストが打ち切られた場合は自分で送り直す
+                if not future.cancelled():
+                    raise
+                self.requests -= 1
+                return await self.run(body, send)
+            self.coalesced += 1
+            self.saved_tokens += usage_tokens(response)
+            return copy_response(response), True
+
+        future = asyncio.get_running_loop().create_future()
+        # 後続がいない場合に「取得されなかった例外」の警告を出さない
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        try:
+            response = await send()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        future.set_result(response)
+        return response, False
+
+    def summary(self) -> Dict:
+        return {'mode': self.mode, 'requests': self.requests, 'coalesced': self.coalesced,
+                'coalesced_rate': self.coalesced / self.requests if self.requests else 0.0,
+                'saved_tokens': self.saved_tokens}
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """summary()を実験終了時の表示の1行にする（リクエストがなければNone）"""
+        if not summary['requests']:
+            return None
+        return (f"同一リクエストの合流: {summary['coalesced']}/{summary['requests']}件 "
+                f"(上流への送信を{summary['coalesced_rate']:.1%}削減, 省いたトークン {summary['saved_tokens']})")
+
+
+class CoalescingGateway:
+    """chat/completionsのリクエストを合流して上流へ転送する（ストリーミングとその他のパスはそのまま転送）"""
+
+    def __init__(self, upstream: str, client: AsyncHTTPClient, coalescer: RequestCoalescer,
+                 timeout: Optional[float] = None):
+        self.upstream = upstream.rstrip("/")
+        self.client = client
+        self.coalescer = coalescer
+        self.timeout = timeout
+        self.upstream_errors = 0
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        if request.method == "GET" and request.path.rstrip("/") == STATS_PATH:
+            return json_response(200, self.summary())
+        headers = {name: value for name, value in request.headers.items()
+                   if name not in ("host", "content-length", "connection")}
+        body = None
+        if request.method == "POST" and request.path.rstrip("/").endswith("/chat/completions"):
+            try:
+                body = request.json()
+            except ValueError:
+                body = None
+        try:
+            if not isinstance(body, dict) or body.get("stream"):
+                return await self.client.request(request.method, self.upstream + request.path, request.body or None,
+                                                 headers, timeout=self.timeout)
+            response, coalesced = await self.coalescer.run(
+                body, lambda: self.client.request("POST", self.upstream + request.path, request.body, headers,
+                                                  timeout=self.timeout))
+        except HTTPClientError as e:
+            self.upstream_errors += 1
+            return json_response(502, {"error": {"message": str(e)}})
+        response.headers[COALESCED_HEADER] = "follower" if coalesced else "leader"
+        return response
+
+    def summary(self) -> Dict:
+        coalesce = self.coalescer.summary()
+        summary = {'received': coalesce['requests'], 'coalesce': coalesce, 'upstream_errors': self.upstream_errors}
+        upstream = coalesce['requests'] - coalesce['coalesced']
+        summary['upstream_requests'] = upstream
+        summary['saved_requests'] = coalesce['requests'] - upstream
+        summary['saved_rate'] = summary['saved_requests'] / coalesce['requests'] if coalesce['requests'] else 0.0
+        return summary
+
+
+def json_response(status: int, data: Dict) -> HTTPResponse:
+    return HTTPResponse(status, "", {"content-type": "application/json"},
+                        json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+def print_summary(summary: Dict):
+    coalesce = summary['coalesce']
+    print(f"🔀 受信: {summary['received']}件, 上流への送信: {summary['upstream_requests']}件 "
+          f"（削減 {summary['saved_requests']}件, {summary['saved_rate']:.1%}）")
+    print(f"   合流: {coalesce['coalesced']}件（{coalesce['mode']}）, 省いたトークン: {coalesce['saved_tokens']}")
+
+
+def add_coalesce_arguments(parser: argparse.ArgumentParser):
+    """合流の引数を追加（HTTPバックエンドとゲートウェイで共通）"""
+    parser.add_argument("--coalesce", choices=COALESCE_MODES, default=None,
+                        help="同一リクエストの合流（deterministic: temperature 0またはseed指定時のみ / always: 常に / off）")
+
+
+async def run_proxy(args):
+    client = AsyncHTTPClient(max_connections=args.max_connections)
+    gateway = CoalescingGateway(args.upstream, client, RequestCoalescer(args.coalesce or COALESCE_DETERMINISTIC),
+                                timeout=args.timeout)
+    server = AsyncHTTPServer(gateway.handle, args.host, args.port)
+    url = await server.start()
+    print(f"🔀 合流ゲートウェイを起動しました: {url} → {args.upstream}")
+    print(f"   合流: {gateway.coalescer.mode}")
+    print(f"   統計: {url}{STATS_PATH}")
+    try:
+        await server.serve_forever()
+    finally:
+        await client.close()
+        print()
+        print_summary(gateway.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="同一リクエストを合流して上流へ転送するゲートウェイ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    proxy_parser = subparsers.add_parser("proxy", help="ゲートウェイを起動")
+    proxy_parser.add_argument("--upstream", required=True, help="転送先のエンドポイント（例: http://host:8000）")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    proxy_parser.add_argument("--port", type=int, default=8400, help="待ち受けポート（デフォルト: 8400）")
+    proxy_parser.add_argument("--max-connections", type=int, default=64, help="上流への最大同時接続数")
+    proxy_parser.add_argument("--timeout", type=float, help="上流へのリクエストのタイムアウト（秒）")
+    add_coalesce_arguments(proxy_parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_proxy(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 05:30] テストデータの圧縮（input_compaction）の効果の比較
+目的: 圧縮によって入力トークン数がどれだけ減り、抽出時間と抽出精度がどう変わるかをalgoごとに示す
+背景: 圧縮はプレフィルのトークン数を減らすが、削った部分に抽出対象が含まれていればスコアが下がるため、
+      トークン数だけでなく精度への影響とあわせて判断する必要がある
+意図: 圧縮なし（00_raw）と圧縮あり（01_compacted）の2つの設定で同じパターン・レベル・実行回数の実験を
+      HTTPバックエンドで実行し、設定ごとのサブディレクトリに通常のログとrequest_metrics.jsonlを出力する
+      - 入力トークン数: request_metrics.jsonlのprompt_tokens（サーバーが返したusage）の平均
+      - 抽出時間・正規化スコア・エラー率: sampling_sweep.analyze_setting の集計
+      algoごと（と全体）の比較をcompaction_summary.jsonに保存し、--analyze-onlyで再集計できる
+      実行・集計・表示の共通部分は comparison_harness.py（本スクリプトは圧縮の指定と入力トークン数の集計のみ）
+      OCRTextは期待値がないため採点できない（圧縮前後の文字数は input_compaction.py で確認する）
+
+使用例:
+    python3 scripts/compaction_comparison.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --patterns voice_abs_json voice_strict_json chat_abs_json --runs 5 --concurrency 8
+    python3 scripts/compaction_comparison.py --analyze-only --experiment-dir test_logs/202610200530_input_compaction
+"""
+
+import argparse
+import os
+from typing import Dict, List
+
+from comparison_harness import (
+    Comparison, add_comparison_arguments, compare_settings, print_compared, print_header, relative_change,
+    run_comparison, run_setting, save_summary
+)
+from input_compaction import COMPACTION_STEPS
+from metrics_utils import format_value
+from request_metrics import REQUEST_METRICS_FILE, parse_request_cell, read_request_metrics
+from sampling_sweep import OVERALL
+
+COMPARISON = Comparison(label="input_compaction", emoji="🗜️", title="テストデータの圧縮",
+                        baseline_label="00_raw", variant_label="01_compacted", baseline_prefix="raw",
+                        setting_file="compaction_setting.json", summary_file="compaction_summary.json",
+                        group_by="algo")
+
+
+def run_settings(args, compare_dir: str):
+    """圧縮なし / ありの2設定で実験を実行（ログとrequest_metrics.jsonlは設定ごとのサブディレクトリに出力）"""
+    for compact in (False, True):
+        steps = args.steps if compact else None
+        run_setting(args, COMPARISON, compare_dir, compact, {'input_compaction': steps},
+                    f"圧縮{'あり' if compact else 'なし'}", record_requests=True, input_compaction=steps)
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def prompt_tokens_by_algo(setting_dir: str) -> Dict[str, float]:
+    """algoごと（と全体）の平均入力トークン数（algoはX-AITest-Cellから判別）"""
+    path = os.path.join(setting_dir, REQUEST_METRICS_FILE)
+    groups: Dict[str, List[int]] = {}
+    for record in read_request_metrics(path) if os.path.exists(path) else []:
+        if record.get('status') != 200 or record.get('prompt_tokens') is None:
+            continue
+        cell = parse_request_cell(record.get('cell'))
+        for key in ([cell['algo']] if cell else []) + [OVERALL]:
+            groups.setdefault(key, []).append(record['prompt_tokens'])
+    return {key: sum(values) / len(values) for key, values in groups.items()}
+
+
+def analyze_comparison(compare_dir: str) -> Dict:
+    """圧縮なし / ありをalgoごとに比較してcompaction_summary.jsonに保存"""
+    comparison = compare_settings(COMPARISON, compare_dir)
+    raw_tokens = prompt_tokens_by_algo(COMPARISON.setting_dir(compare_dir, False))
+    compacted_tokens = prompt_tokens_by_algo(COMPARISON.setting_dir(compare_dir, True))
+    for key, stats in comparison.items():
+        token_change = relative_change(compacted_tokens.get(key), raw_tokens.get(key))
+        stats.update({'prompt_tokens': compacted_tokens.get(key), 'raw_prompt_tokens': raw_tokens.get(key),
+                      'token_reduction': -token_change if token_change is not None else None})
+    return save_summary(COMPARISON, compare_dir, {'raw': COMPARISON.baseline_label,
+                                                  'compacted': COMPARISON.variant_label, 'comparison': comparison})
+
+
+def print_comparison(summary: Dict):
+    print_header(COMPARISON, "テストデータの圧縮の効果（圧縮あり / 圧縮なし）")
+    for key, stats in summary['comparison'].items():
+        print_compared(COMPARISON, key, stats,
+                       prefix=f"入力 {format_value(stats['prompt_tokens'], '.0f')} / "
+                              f"{format_value(stats['raw_prompt_tokens'], '.0f')}トークン "
+                              f"(削減 {format_value(stats['token_reduction'], '.1%')}), ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="テストデータの圧縮なし / ありの比較（httpバックエンド）")
+    add_comparison_arguments(parser, ["voice_abs_json", "chat_abs_json", "contract_abs_json"], modes=True)
+    parser.add_argument("--steps", nargs="+", default=COMPACTION_STEPS, choices=COMPACTION_STEPS,
+                        help="圧縮ありの設定で適用する手順（デフォルト: すべて）")
+    run_comparison(parser, COMPARISON, run_settings, analyze_comparison, print_comparison)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 10:30] 2つの設定（ベースラインと変更後）で同じ実験を実行して比較する共通の仕組み
+目的: compaction_comparison.py（圧縮なし / あり）と chunked_comparison.py（単一リクエスト / ウィンドウ分割）に
+      複製されていた引数・実行・集計・表示を1つにまとめ、各スクリプトには設定ごとのHTTPバックエンドの指定だけを残す
+意図: - Comparison: 比較の定義（設定のラベル、出力ファイル名、集計の単位、ベースラインの項目名の接頭辞）
+      - add_comparison_arguments: 共通の引数（URL・パターン・実行回数・レベル・同時実行数・--analyze-only・レート制限）
+      - run_setting: 1設定の実験を設定ごとのサブディレクトリで実行する（HTTPOptionsの項目は呼び出し側が渡す）
+      - compare_settings: sampling_sweep.analyze_setting の集計を、変更後の値・ベースラインの値・変化で並べる
+        ベースラインの値は {baseline_prefix}_avg_latency のように接頭辞を付けて保存する
+      - run_comparison: --analyze-onlyの再集計、または2設定の実行と集計・表示
+"""
+
+import argparse
+import json
+import os
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from experiment_engine import (
+    ConsoleSink, ExperimentEngine, JSONSummarySink, RoundRobinScheduler, build_jobs, create_experiment_dir
+)
+from http_backend import DEFAULT_MAX_CONNECTIONS, HTTPBackend, HTTPOptions
+from metrics_utils import format_value
+from rate_limiter import add_rate_limit_arguments, rate_limiter_from_args
+from request_metrics import REQUEST_METRICS_FILE, RequestMetricsWriter
+from sampling_sweep import OVERALL, analyze_setting
+
+EXPERIMENT_SUMMARY_FILE = "experiment_summary.json"
+
+
+@dataclass(frozen=True)
+class Comparison:
+    """ベースラインと変更後の2設定の比較"""
+    label: str                  # 自動作成する比較のディレクトリのラベル
+    emoji: str
+    title: str                  # 「{title}の比較を開始します」
+    baseline_label: str         # ベースラインのサブディレクトリ（00_raw など）
+    variant_label: str          # 変更後のサブディレクトリ（01_compacted など）
+    baseline_prefix: str        # ベースラインの値の項目名の接頭辞（raw_avg_latency など）
+    setting_file: str
+    summary_file: str
+    group_by: str = "algo"      # analyze_setting の集計の単位（algo / level）
+
+    def setting_dir(self, compare_dir: str, variant: bool) -> str:
+        return os.path.join(compare_dir, self.variant_label if variant else self.baseline_label)
+
+
+def add_comparison_arguments(parser: argparse.ArgumentParser, default_patterns: List[str], modes: bool = False):
+    """比較のスクリプトに共通の引数（modesがTrueなら --mode も追加）"""
+    parser.add_argument("--external-llm-url", help="外部LLMサーバーのURL")
+    parser.add_argument("--external-llm-model", help="外部LLMモデル名")
+    parser.add_argument("--patterns", nargs="+", default=default_patterns, help="実行するパターン（json方式）")
+    if modes:
+        parser.add_argument("--mode", default="simple", choices=["simple", "two-steps"], help="抽出モード")
+    parser.add_argument("--runs", type=int, default=5, help="設定ごとの各パターンの実行回数（デフォルト: 5）")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="実行するレベル")
+    parser.add_argument("--experiment-dir", help="比較のディレクトリ（指定しない場合は自動作成）")
+    parser.add_argument("--warmup", type=int, default=0, help="設定ごとに計測前に送る破棄用リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同時に実行するジョブ数（デフォルト: 1）")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"最大同時接続数（デフォルト: {DEFAULT_MAX_CONNECTIONS}）")
+    parser.add_argument("--analyze-only", action="store_true", help="実行せず、--experiment-dirの結果を再集計する")
+    add_rate_limit_arguments(parser)
+
+
+def run_setting(args, comparison: Comparison, compare_dir: str, variant: bool, setting: Dict, title: str,
+                record_requests: bool = False, **options):
+    """
+    1設定の実験を実行（settingは設定ファイルに保存する内容、optionsはHTTPOptionsの項目）
+    record_requestsがTrueなら設定ごとのサブディレクトリにrequest_metrics.jsonlを出力する
+    """
+    label = comparison.variant_label if variant else comparison.baseline_label
+    setting_dir = comparison.setting_dir(compare_dir, variant)
+    os.makedirs(setting_dir, exist_ok=True)
+    with open(os.path.join(setting_dir, comparison.setting_file), 'w', encoding='utf-8') as f:
+        json.dump({'label': label, **setting}, f, ensure_ascii=False, indent=2)
+    if record_requests:
+        options['request_metrics'] = RequestMetricsWriter(os.path.join(setting_dir, REQUEST_METRICS_FILE))
+    backend = HTTPBackend(external_llm_url=args.external_llm_url, external_llm_model=args.external_llm_model,
+                          endpoint_warmup=args.warmup, max_connections=args.max_connections,
+                          options=HTTPOptions(rate_limiter=rate_limiter_from_args(args, args.external_llm_url),
+                                              max_throttle_retries=args.max_throttle_retries, **options))
+    scheduler = RoundRobinScheduler(build_jobs(args.patterns, levels=args.levels, runs=args.runs,
+                                               mode=getattr(args, "mode", "simple"), per_run=True))
+    sinks = [ConsoleSink(f"{comparison.emoji} 設定 {label}: {title}", show_errors=False),
+             JSONSummarySink(os.path.join(setting_dir, EXPERIMENT_SUMMARY_FILE))]
+    ExperimentEngine(backend, scheduler, setting_dir, sinks=sinks, concurrency=args.concurrency).run()
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def relative_change(value: Optional[float], baseline: Optional[float]) -> Optional[float]:
+    """ベースラインからの変化率（どちらかがない場合はNone）"""
+    return value / baseline - 1 if value is not None and baseline else None
+
+
+def elapsed_seconds(setting_dir: str) -> Optional[float]:
+    """設定の実験全体の所要時間（experiment_summary.jsonのelapsed_seconds）"""
+    path = os.path.join(setting_dir, EXPERIMENT_SUMMARY_FILE)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f).get('elapsed_seconds')
+
+
+def compare_settings(comparison: Comparison, compare_dir: str) -> Dict[str, Dict]:
+    """group_byごと（と全体）の抽出時間・正規化スコア・エラー率を、変更後 / ベースラインで並べる"""
+    for variant in (False, True):
+        if not os.path.exists(os.path.join(comparison.setting_dir(compare_dir, variant), comparison.setting_file)):
+            label = comparison.variant_label if variant else comparison.baseline_label
+            raise SystemExit(f"{label} の結果が見つかりません: {compare_dir}")
+    baseline_stats = analyze_setting(comparison.setting_dir(compare_dir, False), comparison.group_by)
+    variant_stats = analyze_setting(comparison.setting_dir(compare_dir, True), comparison.group_by)
+    prefix = comparison.baseline_prefix
+    compared = {}
+    for key in sorted(set(baseline_stats) & set(variant_stats), key=lambda name: (name == OVERALL, name)):
+        baseline, variant = baseline_stats[key], variant_stats[key]
+        compared[key] = {
+            'avg_latency': variant['avg_latency'],
+            f'{prefix}_avg_latency': baseline['avg_latency'],
+            'latency_change': relative_change(variant['avg_latency'], baseline['avg_latency']),
+            'p95_latency': variant['p95_latency'],
+            f'{prefix}_p95_latency': baseline['p95_latency'],
+            'normalized_score': variant['normalized_score'],
+            f'{prefix}_normalized_score': baseline['normalized_score'],
+            'score_change': variant['normalized_score'] - baseline['normalized_score'],
+            'error_rate': variant['error_rate'],
+            f'{prefix}_error_rate': baseline['error_rate'],
+        }
+    return compared
+
+
+def save_summary(comparison: Comparison, compare_dir: str, summary: Dict) -> Dict:
+    with open(os.path.join(compare_dir, comparison.summary_file), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_header(comparison: Comparison, heading: str):
+    print("\n" + "=" * 80)
+    print(f"{comparison.emoji} {heading}")
+    print("=" * 80)
+
+
+def print_compared(comparison: Comparison, key: str, stats: Dict, prefix: str = ""):
+    """compare_settings の1行（prefixは各スクリプト固有の項目）"""
+    baseline = comparison.baseline_prefix
+    print(f"   {key}: {prefix}平均 {format_value(stats['avg_latency'], '.2f')} / "
+          f"{format_value(stats[f'{baseline}_avg_latency'], '.2f')}秒 ({format_value(stats['latency_change'], '+.1%')}), "
+          f"p95 {format_value(stats['p95_latency'], '.2f')} / {format_value(stats[f'{baseline}_p95_latency'], '.2f')}秒, "
+          f"スコア {stats['normalized_score']:.3f} / {stats[f'{baseline}_normalized_score']:.3f} "
+          f"({stats['score_change']:+.3f}), エラー率 {stats['error_rate']:.1%} / {stats[f'{baseline}_error_rate']:.1%}")
+
+
+def run_comparison(parser: argparse.ArgumentParser, comparison: Comparison,
+                   run_settings: Callable[[argparse.Namespace, str], None],
+                   analyze: Callable[[str], Dict], show: Callable[[Dict], None]):
+    """引数を解析し、--analyze-onlyなら再集計のみ、それ以外は2設定を実行してから集計・表示する"""
+    args = parser.parse_args()
+    if args.analyze_only:
+        if not args.experiment_dir:
+            parser.error("--analyze-only には --experiment-dir が必要です")
+        show(analyze(args.experiment_dir))
+        return
+    if not (args.external_llm_url and args.external_llm_model):
+        parser.error("--external-llm-url と --external-llm-model が必要です")
+
+    compare_dir = args.experiment_dir or create_experiment_dir(comparison.label)
+    print(f"{comparison.emoji} {comparison.title}の比較を開始します（{', '.join(args.patterns)} × {args.runs}回）")
+    print(f"📁 比較のディレクトリ: {compare_dir}")
+    run_settings(args, compare_dir)
+    show(analyze(compare_dir))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 09:30] プロンプトに添付されたテストデータからテストケースとレベルを判定
+目的: X-AITest-Cellヘッダーを送らないクライアント（AITestAppのSwiftバックエンド）のリクエストを、
+      プロンプトの内容から実験のセルに対応付ける
+背景: モック推論サーバー（mock_llm_server.py）の応答選択と計測プロキシ（instrumenting_proxy.py）の両方が使うが、
+      mock_llm_server.pyにあったため、プロキシがテスト用のモックに依存していた
+意図: テストデータ（と圧縮したテストデータ）をすべて読み込み、プロンプトに含まれる文書を長いものから探す
+      - identify: 全体が含まれる文書
+      - identify_partial: 一部（chunked_extractionのウィンドウ）が含まれる文書（共通する行が最も多いもの）
+      - identify_all: 複数ドキュメントのバッチプロンプトに含まれる文書（出現順）
+"""
+
+from typing import List, Optional, Tuple
+
+from aitest_logs import LEVEL_NAMES, TESTCASE_DIRS, load_test_case
+from input_compaction import compact_text
+
+
+class DocumentIndex:
+    """プロンプトに添付されたテストデータからテストケースとレベルを判定"""
+
+    def __init__(self):
+        self.documents: List[Tuple[str, str, int]] = []
+        for testcase in TESTCASE_DIRS:
+            for level in LEVEL_NAMES:
+                try:
+                    text = load_test_case(testcase, level).text.strip()
+                except (OSError, ValueError):
+                    continue
+                for variant in {text, compact_text(text)}:
+                    if variant:
+                        self.documents.append((variant, testcase, level))
+        # 他の文書を含む長い文書を優先する
+        self.documents.sort(key=lambda document: -len(document[0]))
+
+    def identify(self, prompt: str) -> Tuple[Optional[str], Optional[int]]:
+        for text, testcase, level in self.documents:
+            if text in prompt:
+                return testcase, level
+        return None, None
+
+    def identify_partial(self, prompt: str) -> Tuple[Optional[str], Optional[int]]:
+        """ドキュメントの一部が添付されている場合の判定（共通する行（8文字以上）が最も多いドキュメント）"""
+        lines = {line.strip() for line in prompt.splitlines() if len(line.strip()) >= 8}
+        best, best_count = (None, None), 0
+        for text, testcase, level in self.documents:
+            count = sum(1 for line in text.splitlines() if line.strip() in lines)
+            if count > best_count:
+                best, best_count = (testcase, level), count
+        return best
+
+    def identify_all(self, prompt: str) -> List[Tuple[str, int]]:
+        """プロンプトに添付されたすべてのドキュメント（出現順。長い文書に含まれる部分は数えない）"""
+        spans: List[Tuple[int, int, str, int]] = []
+        for text, testcase, level in self.documents:
+            start = prompt.find(text)
+            while start >= 0:
+                end = start + len(text)
+                if not any(start < other_end and other_start < end for other_start, other_end, _, _ in spans):
+                    spans.append((start, end, testcase, level))
+                start = prompt.find(text, end)
+        return [(testcase, level) for _, _, testcase, level in sorted(spans)]
@@ -0,0 +1,1323 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 12:00] 統一実験エンジン
+目的: 実験実行スクリプト群（run_experiments.py / run_external_llm_experiment.py /
+      run_external_llm_experiment_resumable.py / parallel_experiment_manager.py）の共通処理を一元化する
+背景: 各スクリプトがコマンド組み立て、タイムアウト、ディレクトリ命名、進捗表示をそれぞれ少しずつ異なる形で
+      再実装しており、レジューム版と非レジューム版はほぼ複製になっていた
+意図: バックエンド（実行方法）、スケジューラー（実行順序と打ち切り判定）、結果シンク（出力先）を差し替え可能にし、
+      各スクリプトは引数解析と組み合わせだけを行う薄いCLIにする
+
+構成:
+    ExperimentJob   … 1回のバックエンド呼び出しで実行する単位（パターン×レベル群×実行番号範囲）
+    Backend         … ジョブを実行してJobResultを返す（SwiftCLIBackendなど）
+    Scheduler       … 次に実行するジョブとタイムアウトを決める（Sequential / RoundRobin / TimeBudget）
+                      RetryingSchedulerで包むと、一時的な失敗の再試行と失敗し続けるセルの隔離を行う
+    ResultSink      … 開始・完了・終了イベントを受け取る（ConsoleSink / JSONSummarySink / CombinedReportSink）
+    ExperimentEngine … 上記を組み合わせ、asyncioで指定並列度のワーカーを動かす
+                       slot_pool（worker_slots.WorkerSlotPool）を指定すると、他プロセスの実験とスロットを共有する
+"""
+
+import asyncio
+import fcntl
+import json
+import os
+import random
+import re
+import signal
+import statistics
+import string
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from log_layout import LAYOUT_FLAT, LAYOUT_SHARDED, discover_log_files, log_path, parse_log_file_name
+
+DEFAULT_RUN_TIMEOUT = 600  # 1回のバックエンド呼び出しのタイムアウト（秒）
+LOG_ROOT = "test_logs"
+
+
+# ---------------------------------------------------------------------------
+# ジョブと結果
+# ---------------------------------------------------------------------------
+
+def parse_pattern(pattern: str) -> Tuple[str, str, str]:
+    """パターン名 {testcase}_{algo}_{method} を分解"""
+    parts = pattern.split('_')
+    if len(parts) < 3:
+        raise ValueError(f"無効なパターン形式: {pattern}（{{testcase}}_{{algo}}_{{method}}の形式で指定してください）")
+    return parts[0], parts[1], parts[2]
+
+
+@dataclass(frozen=True)
+class ExperimentJob:
+    """1回のバックエンド呼び出しで実行する単位"""
+    testcase: str
+    algo: str
+    method: str
+    language: str = "ja"
+    mode: str = "simple"
+    levels: Tuple[int, ...] = (1, 2, 3)
+    runs: int = 1
+    run_start: int = 1
+
+    @classmethod
+    def from_pattern(cls, pattern: str, **kwargs) -> "ExperimentJob":
+        testcase, algo, method = parse_pattern(pattern)
+        return cls(testcase=testcase, algo=algo, method=method, **kwargs)
+
+    @property
+    def pattern(self) -> str:
+        return f"{self.testcase}_{self.algo}_{self.method}"
+
+    @property
+    def run_numbers(self) -> range:
+        return range(self.run_start, self.run_start + self.runs)
+
+    @property
+    def label(self) -> str:
+        levels = ",".join(map(str, self.levels))
+        if self.runs == 1:
+            runs = f"run{self.run_start}"
+        else:
+            runs = f"run{self.run_start}-{self.run_start + self.runs - 1}"
+        return f"{self.pattern} level{levels} {runs}"
+
+    def cells(self) -> List[Tuple[int, int]]:
+        """ジョブが生成する (level, run) の一覧"""
+        return [(level, run) for run in self.run_numbers for level in self.levels]
+
+    def log_path(self, output_dir: str, level: int, run: int, error: bool = False,
+                 layout: str = LAYOUT_FLAT, create: bool = False) -> str:
+        return log_path(output_dir, self.testcase, self.algo, self.method, self.language, level, run,
+                        error=error, layout=layout, create=create)
+
+    def to_dict(self) -> Dict:
+        return {
+            'pattern': self.pattern,
+            'language': self.language,
+            'mode': self.mode,
+            'levels': list(self.levels),
+            'runs': self.runs,
+            'run_start': self.run_start
+        }
+
+
+@dataclass
+class JobResult:
+    """ジョブの実行結果"""
+    job: ExperimentJob
+    success: bool
+    elapsed: float
+    timeout: float
+    returncode: Optional[int] = None
+    timed_out: bool = False
+    error: str = ""
+    stdout: str = ""
+    stderr: str = ""
+    log_files: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict:
+        return {
+            'job': self.job.to_dict(),
+            'success': self.success,
+            'elapsed_seconds': self.elapsed,
+            'timeout_seconds': self.timeout,
+            'returncode': self.returncode,
+            'timed_out': self.timed_out,
+            'error': self.error,
+            'log_files': self.log_files
+        }
+
+
+def build_jobs(patterns: Sequence[str], language: str = "ja", levels: Sequence[int] = (1, 2, 3),
+               runs: int = 1, mode: str = "simple", per_run: bool = False) -> Dict[str, List[ExperimentJob]]:
+    """
+    パターンごとのジョブ一覧を作成
+    per_run=Falseの場合はパターンごとに1ジョブ（Swift側で--runs回ループ）、
+    Trueの場合は実行番号ごとに1ジョブ（外部LLM実験のように1回ずつ起動する場合）
+    """
+    lanes: Dict[str, List[ExperimentJob]] = {}
+    for pattern in patterns:
+        if per_run:
+            lanes[pattern] = [
+                ExperimentJob.from_pattern(pattern, language=language, mode=mode, levels=tuple(levels),
+                                           runs=1, run_start=run)
+                for run in range(1, runs + 1)
+            ]
+        else:
+            lanes[pattern] = [
+                ExperimentJob.from_pattern(pattern, language=language, mode=mode, levels=tuple(levels), runs=runs)
+            ]
+    return lanes
+
+
+# ---------------------------------------------------------------------------
+# ディレクトリ・ログ・エンドポイントの共通処理
+# ---------------------------------------------------------------------------
+
+def create_experiment_dir(label: str, random_suffix: bool = False, root: str = LOG_ROOT) -> str:
+    """実験ディレクトリ名 {root}/{yyyyMMddHHmm}_{label}[_{ランダム4文字}] を作成"""
+    timestamp = datetime.now().strftime("%Y%m%d%H%M")
+    name = f"{timestamp}_{label}"
+    if random_suffix:
+        name += "_" + ''.join(random.choices(string.ascii_lowercase + string.digits, k=4))
+    path = os.path.join(root, name)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def scan_completed_cells(experiment_dir: str, language: Optional[str] = None) -> Dict[str, Set[Tuple[int, int]]]:
+    """実験ディレクトリ内の成功ログから、パターンごとの完了済み (level, run) を取得（フラット・シャーディング配置の両方）"""
+    completed: Dict[str, Set[Tuple[int, int]]] = {}
+    for log in discover_log_files(experiment_dir, language=language, include_errors=False):
+        completed.setdefault(log.pattern, set()).add((log.level, log.run))
+    return completed
+
+
+COMPLETION_INDEX_FILE = "completion_index.jsonl"
+CELL_SUCCESS = "success"
+
+
+class CompletionIndex:
+    """
+    @ai[2026-10-19 19:00] 実験ディレクトリのセル単位の完了状況（completion_index.jsonl）
+    目的: レジューム時に全ログファイルを探索せず、未完了の (level, run) だけを求める
+    背景: scan_completed_cellsは実行のたびに実験ディレクトリ全体を探索・ファイル名解析するため、
+          ログ数に比例して遅くなり、シャーディング配置では多数のディレクトリを辿る必要があった
+    意図: エンジンがジョブの結果ごとに (pattern, language, level, run, status) を1行追記し、
+          レジュームはこの索引だけを読む。statusは success / transient / deterministic（classify_cellsの判定）
+          成功は後から失敗が記録されても成功のまま（成功ログは上書きされないため）
+          索引がない実験ディレクトリ（索引導入前の実験）では、最初に1回だけログを探索して作成する
+
+    @ai[2026-10-20 12:00] 追記と書き直しを同じflock（completion_index.jsonl.lock）で排他
+    目的: 並列・レジューム実行の別プロセスが追記している間に、loadの詰め直し（一時ファイル＋os.replace）が
+          その追記を含まない内容で置き換え、完了したセルの記録が失われるのを防ぐ
+    意図: 詰め直しはロックを取ってから読み直し、まだ重複が多い場合のみ書き直す
+    """
+
+    def __init__(self, experiment_dir: str):
+        self.experiment_dir = experiment_dir
+        self.path = os.path.join(experiment_dir, COMPLETION_INDEX_FILE)
+        self.lock_path = f"{self.path}.lock"
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def ensure(self):
+        """索引がなければログから作成"""
+        if not self.exists():
+            self.rebuild()
+
+    def rebuild(self) -> int:
+        """ログファイルを探索して索引を作り直す（登録したセル数を返す）"""
+        cells: Dict[Tuple[str, str, int, int], str] = {}
+        for log in discover_log_files(self.experiment_dir):
+            key = (log.pattern, log.language, log.level, log.run)
+            if not log.error:
+                cells[key] = CELL_SUCCESS
+            elif cells.get(key) != CELL_SUCCESS:
+                try:
+                    with open(log.path, 'r', encoding='utf-8') as f:
+                        cells[key] = classify_error_log(json.load(f))[0]
+                except (OSError, ValueError):
+                    cells[key] = FAILURE_TRANSIENT
+        with self._locked():
+            self._write(cells)
+        return len(cells)
+
+    @contextmanager
+    def _locked(self):
+        """索引への追記・書き直しをプロセス間で排他"""
+        os.makedirs(self.experiment_dir, exist_ok=True)
+        with open(self.lock_path, 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _write(self, cells: Dict[Tuple[str, str, int, int], str]):
+        """一時ファイルに書いてから置き換える（_lockedの中で呼ぶこと）"""
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            for (pattern, language, level, run), status in sorted(cells.items()):
+                f.write(json.dumps({'pattern': pattern, 'language': language, 'level': level, 'run': run,
+                                    'status': status}, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.path)
+
+    def load(self) -> Dict[Tuple[str, str, int, int], str]:
+        """(pattern, language, level, run) → status（追記が重複した分が多い場合は詰めて書き直す）"""
+        cells, lines = self._read()
+        if lines > self._compaction_threshold(cells):
+            with self._locked():
+                # ロックを待つ間に他のプロセスが追記・詰め直しをしている可能性があるため読み直す
+                cells, lines = self._read()
+                if lines > self._compaction_threshold(cells):
+                    self._write(cells)
+        return cells
+
+    @staticmethod
+    def _compaction_threshold(cells: Dict) -> int:
+        return 2 * len(cells) + 1000
+
+    def _read(self) -> Tuple[Dict[Tuple[str, str, int, int], str], int]:
+        """索引を読み込み、(セルごとの状態, 行数) を返す"""
+        cells: Dict[Tuple[str, str, int, int], str] = {}
+        lines = 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # 書き込み途中で中断された行
+                    lines += 1
+                    key = (entry['pattern'], entry['language'], entry['level'], entry['run'])
+                    if cells.get(key) != CELL_SUCCESS:
+                        cells[key] = entry['status']
+        except OSError:
+            pass
+        return cells, lines
+
+    def record(self, result: JobResult):
+        """ジョブ結果のセルごとの状態を追記（詰め直しと重ならないよう、ロックを取ってから追記する）"""
+        lines = []
+        for (level, run), failure in classify_cells(result).items():
+            lines.append(json.dumps({'pattern': result.job.pattern, 'language': result.job.language,
+                                     'level': level, 'run': run,
+                                     'status': CELL_SUCCESS if failure is None else failure[0],
+                                     'time': round(time.time(), 3)}, ensure_ascii=False) + "\n")
+        if lines:
+            with self._locked(), open(self.path, 'a', encoding='utf-8') as f:
+                f.write("".join(lines))
+
+    def completed(self, language: Optional[str] = None) -> Dict[str, Set[Tuple[int, int]]]:
+        """scan_completed_cellsと同じ形式の完了済みセル"""
+        completed: Dict[str, Set[Tuple[int, int]]] = {}
+        for (pattern, cell_language, level, run), status in self.load().items():
+            if status == CELL_SUCCESS and (language is None or cell_language == language):
+                completed.setdefault(pattern, set()).add((level, run))
+        return completed
+
+
+def chat_completions_url(base_url: str) -> str:
+    """ExternalLLMClientと同じ規則でchat/completionsのURLを組み立てる（末尾の/v1は除去）"""
+    clean_base_url = base_url.rstrip('/')
+    if clean_base_url.endswith('/v1'):
+        clean_base_url = clean_base_url[:-3]
+    return f"{clean_base_url}/v1/chat/completions"
+
+
+def warm_up_endpoint(external_llm_url: str, external_llm_model: str, count: int, timeout: int = 600) -> int:
+    """
+    @ai[2026-10-19 10:00] 推論エンドポイントのウォームアップ
+    目的: 起動直後の推論サーバーへの最初のリクエストを計測対象から除外する
+    背景: 最初のリクエストはモデルロードやKVキャッシュ確保で大幅に遅く、avg_extraction_timeを歪めていた
+    意図: 指定回数の短いリクエストを送り、結果は破棄する（成功した回数を返す）
+    """
+    if count <= 0:
+        return 0
+
+    print(f"🔥 エンドポイントのウォームアップ: {count}回（結果は破棄されます）")
+    url = chat_completions_url(external_llm_url)
+    body = json.dumps({
+        "model": external_llm_model,
+        "messages": [{"role": "user", "content": "ping"}],
+        "max_tokens": 16
+    }).encode('utf-8')
+
+    succeeded = 0
+    for i in range(1, count + 1):
+        request = urllib.request.Request(url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Authorization": "Bearer EMPTY"
+        })
+        start_time = time.time()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                response.read()
+            succeeded += 1
+            print(f"   🔥 ウォームアップ {i}/{count} 完了: {time.time() - start_time:.3f}秒")
+        except Exception as e:
+            print(f"   ⚠️ ウォームアップ {i}/{count} 失敗: {e}")
+
+    return succeeded
+
+
+def generate_combined_report(experiment_dir: str) -> bool:
+    """generate_combined_report.pyで統合レポートを生成"""
+    print(f"\n📊 レポート生成中...")
+    script = Path(__file__).resolve().parent / "generate_combined_report.py"
+    try:
+        result = subprocess.run([sys.executable, str(script), experiment_dir], capture_output=True, text=True)
+        if result.returncode == 0:
+            print(f"✅ レポート生成完了: {experiment_dir}/parallel_format_experiment_report.html")
+            return True
+        print(f"❌ レポート生成失敗: {result.stderr}")
+    except Exception as e:
+        print(f"❌ レポート生成エラー: {e}")
+    return False
+
+
+# ---------------------------------------------------------------------------
+# バックエンド
+# ---------------------------------------------------------------------------
+
+class Backend:
+    """ジョブを実行するバックエンドの基底クラス"""
+    name = "base"
+    default_timeout: float = DEFAULT_RUN_TIMEOUT
+
+    def describe(self) -> Dict[str, str]:
+        """開始時に表示する設定"""
+        return {}
+
+    async def prepare(self):
+        """実行開始前の準備（ウォームアップなど）"""
+
+    async def run(self, job: ExperimentJob, output_dir: str, timeout: float) -> JobResult:
+        raise NotImplementedError
+
+    def cancel_all(self):
+        """実行中の処理を中断（シグナル受信時）"""
+
+    async def close(self):
+        """実行終了時の後処理"""
+
+    def summary(self) -> Dict:
+        """終了時のサマリーに含めるバックエンド固有の統計（キャッシュのヒット率など）"""
+        return {}
+
+    def report(self, stats: Dict) -> List[str]:
+        """summary()の統計を終了時の表示の行にする（ConsoleSinkが表示する）"""
+        return []
+
+
+class SwiftCLIBackend(Backend):
+    """
+    @ai[2026-10-19 12:00] AITestApp（swift run）を子プロセスとして起動するバックエンド
+    目的: FoundationModels実験と外部LLM実験のコマンド組み立てを一箇所にまとめる
+    意図: external_llm_urlを指定した場合は外部LLM実験として、エンドポイント単位のウォームアップと
+          AITEST_COLD_STARTの宣言を行う。指定しない場合はFoundationModelsを使い、プロセス単位の--warmupを渡す
+    """
+    name = "swift"
+
+    def __init__(self, external_llm_url: Optional[str] = None, external_llm_model: Optional[str] = None,
+                 process_warmup: int = 0, endpoint_warmup: int = 0, assume_warm: bool = False,
+                 default_timeout: float = DEFAULT_RUN_TIMEOUT, command_prefix: Sequence[str] = ("swift", "run", "AITestApp"),
+                 log_layout: str = LAYOUT_FLAT):
+        self.external_llm_url = external_llm_url
+        self.external_llm_model = external_llm_model
+        self.process_warmup = process_warmup
+        self.endpoint_warmup = endpoint_warmup
+        # エンドポイントがウォームアップ済みかどうか（最初の計測リクエストのcold_start判定に使用）
+        self.endpoint_warm = assume_warm
+        self.default_timeout = default_timeout
+        self.command_prefix = list(command_prefix)
+        self.log_layout = log_layout
+        self._processes: Set[asyncio.subprocess.Process] = set()
+
+    @property
+    def is_external(self) -> bool:
+        return bool(self.external_llm_url and self.external_llm_model)
+
+    def describe(self) -> Dict[str, str]:
+        if self.is_external:
+            return {'外部LLM URL': self.external_llm_url, '外部LLM モデル': self.external_llm_model}
+        return {'モデル': 'FoundationModels', 'ウォームアップ': f"{self.process_warmup}回/プロセス"}
+
+    async def prepare(self):
+        # エンドポイントのウォームアップ（プロセスではなくエンドポイント単位で一度だけ）
+        if self.is_external and not self.endpoint_warm and self.endpoint_warmup > 0:
+            succeeded = await asyncio.to_thread(warm_up_endpoint, self.external_llm_url,
+                                                self.external_llm_model, self.endpoint_warmup)
+            if succeeded > 0:
+                self.endpoint_warm = True
+
+    def build_command(self, job: ExperimentJob, output_dir: str) -> List[str]:
+        """AITestAppの実行コマンドを作成"""
+        cmd = self.command_prefix + [
+            "--method", job.method,
+            "--mode", job.mode,
+            "--testcase", job.testcase,
+        ]
+        # @ai[2025-11-27 07:05] two-stepsモードではalgosパラメータは不要
+        # 理由: two-stepsモードではアルゴリズムの指定が不要で、カテゴリ判定と情報抽出のみを実行する
+        if job.mode != "two-steps":
+            cmd.extend(["--algos", job.algo])
+        cmd.extend([
+            "--language", job.language,
+            "--levels", ",".join(map(str, job.levels)),
+            "--runs", str(job.runs),
+            "--test-dir", output_dir
+        ])
+        if self.is_external:
+            cmd.extend(["--external-llm-url", self.external_llm_url,
+                        "--external-llm-model", self.external_llm_model])
+        if self.process_warmup > 0:
+            cmd.extend(["--warmup", str(self.process_warmup)])
+        if self.log_layout == LAYOUT_SHARDED:
+            cmd.extend(["--log-layout", LAYOUT_SHARDED])
+        return cmd
+
+    def build_env(self, job: ExperimentJob) -> Dict[str, str]:
+        """AITestAppに渡す環境変数を作成"""
+        env = os.environ.copy()
+        # 実行番号の開始値（1回ずつ起動する場合にログファイル名が衝突しないようにする）
+        env["AITEST_RUN_NUMBER"] = str(job.run_start)
+        if self.is_external:
+            # エンドポイントへの最初の計測リクエストのみcold_startとして記録させる
+            env["AITEST_COLD_START"] = "0" if self.endpoint_warm else "1"
+            self.endpoint_warm = True
+        return env
+
+    async def run(self, job: ExperimentJob, output_dir: str, timeout: float) -> JobResult:
+        cmd = self.build_command(job, output_dir)
+        env = self.build_env(job)
+        start_time = time.time()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd, env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+        except OSError as e:
+            return JobResult(job=job, success=False, elapsed=time.time() - start_time, timeout=timeout, error=str(e))
+
+        self._processes.add(process)
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return JobResult(job=job, success=False, elapsed=time.time() - start_time, timeout=timeout,
+                             returncode=process.returncode, timed_out=True, error=f"タイムアウト ({timeout:.0f}秒)",
+                             log_files=self._existing_logs(job, output_dir))
+        finally:
+            self._processes.discard(process)
+
+        stdout_text = stdout.decode('utf-8', errors='replace')
+        stderr_text = stderr.decode('utf-8', errors='replace')
+        success = process.returncode == 0
+        return JobResult(job=job, success=success, elapsed=time.time() - start_time, timeout=timeout,
+                         returncode=process.returncode, error="" if success else stderr_text[-500:],
+                         stdout=stdout_text, stderr=stderr_text, log_files=self._existing_logs(job, output_dir))
+
+    def _existing_logs(self, job: ExperimentJob, output_dir: str) -> List[str]:
+        """ジョブが出力したログファイル（成功・エラー）を列挙"""
+        files = []
+        for level, run in job.cells():
+            for error in (False, True):
+                path = job.log_path(output_dir, level, run, error=error, layout=self.log_layout)
+                if os.path.exists(path):
+                    files.append(path)
+        return files
+
+    def cancel_all(self):
+        for process in list(self._processes):
+            if process.returncode is None:
+                process.terminate()
+
+
+# バックエンド名 → クラス（CLIの--backend指定用）
+BACKENDS: Dict[str, type] = {
+    SwiftCLIBackend.name: SwiftCLIBackend,
+}
+
+
+def register_backend(backend_class: type):
+    """バックエンドを登録（新しいバックエンドモジュールから呼び出す）"""
+    BACKENDS[backend_class.name] = backend_class
+    return backend_class
+
+
+# ---------------------------------------------------------------------------
+# スケジューラー
+# ---------------------------------------------------------------------------
+
+class Scheduler:
+    """
+    次に実行するジョブを決めるスケジューラーの基底クラス
+    next_job()がNoneを返し、is_finished()がFalseの場合、エンジンは実行中のジョブの完了
+    （next_wakeup()が秒数を返す場合はその時間の経過）を待ってから再度問い合わせる
+    """
+
+    def next_job(self) -> Optional[ExperimentJob]:
+        raise NotImplementedError
+
+    def is_finished(self) -> bool:
+        raise NotImplementedError
+
+    def next_wakeup(self) -> Optional[float]:
+        """待機中のジョブ（バックオフ中の再試行など）が実行可能になるまでの秒数"""
+        return None
+
+    def on_result(self, result: JobResult):
+        """ジョブ完了の通知"""
+
+    def timeout_for(self, job: ExperimentJob, default_timeout: float) -> float:
+        return default_timeout
+
+    def total_jobs(self) -> Optional[int]:
+        """事前に分かる場合は総ジョブ数"""
+        return None
+
+    def summary(self) -> Dict:
+        return {}
+
+
+class SequentialScheduler(Scheduler):
+    """ジョブを与えられた順に実行"""
+
+    def __init__(self, jobs: Iterable[ExperimentJob]):
+        self.jobs = list(jobs)
+        self._index = 0
+
+    def next_job(self) -> Optional[ExperimentJob]:
+        if self._index >= len(self.jobs):
+            return None
+        job = self.jobs[self._index]
+        self._index += 1
+        return job
+
+    def is_finished(self) -> bool:
+        return self._index >= len(self.jobs)
+
+    def total_jobs(self) -> Optional[int]:
+        return len(self.jobs)
+
+
+class RoundRobinScheduler(SequentialScheduler):
+    """
+    レーン（パターンなど）ごとのジョブを1つずつ交互に実行
+    途中で打ち切っても全パターンの実行回数が揃うようにする
+    """
+
+    def __init__(self, lanes: Dict[str, List[ExperimentJob]]):
+        queues = [list(jobs) for jobs in lanes.values()]
+        ordered = []
+        depth = max((len(queue) for queue in queues), default=0)
+        for i in range(depth):
+            ordered.extend(queue[i] for queue in queues if i < len(queue))
+        super().__init__(ordered)
+
+
+class LatencyEstimator:
+    """
+    @ai[2026-10-19 11:00] セル単位の実行時間推定
+    目的: 実測した1回あたりの所要時間から、次のラウンドが時間内に収まるかを判断する
+    背景: 共有推論サーバーの混雑度で所要時間が変わるため、固定値の見積もりでは予算を超過する
+    意図: 平均+標準偏差の保守的な推定を使い、未計測セルは全体平均または初期値で代用する
+    """
+    def __init__(self, initial_estimate: float = 60.0):
+        self.initial_estimate = initial_estimate
+        self.samples: Dict[Tuple[str, int], List[float]] = {}
+
+    def record(self, cell: Tuple[str, int], seconds: float):
+        """実測値を記録"""
+        self.samples.setdefault(cell, []).append(seconds)
+
+    def estimate(self, cell: Tuple[str, int]) -> float:
+        """セルの1回あたりの所要時間を保守的に推定"""
+        samples = self.samples.get(cell)
+        if not samples:
+            all_samples = [value for values in self.samples.values() for value in values]
+            samples = all_samples or [self.initial_estimate]
+        mean = statistics.mean(samples)
+        std = statistics.stdev(samples) if len(samples) > 1 else 0.0
+        return mean + std
+
+    def to_dict(self) -> Dict[str, Dict[str, float]]:
+        """サマリー出力用の辞書に変換"""
+        return {
+            f"{pattern}_level{level}": {
+                'samples': len(values),
+                'mean_seconds': statistics.mean(values),
+                'estimate_seconds': self.estimate((pattern, level))
+            }
+            for (pattern, level), values in self.samples.items()
+        }
+
+
+class TimeBudgetScheduler(Scheduler):
+    """
+    @ai[2026-10-19 11:00] 時間予算内でのバランス実行スケジューラー
+    目的: 決められた時間枠の中で、全セルの実行回数を揃えたまま可能な限り多くのラウンドを実行する
+    背景: --runsでは時間枠を表現できず、枠を余らせるか超過するかのどちらかになっていた
+    意図: 1ラウンド=全セル（パターン×レベル）1回ずつとし、次のラウンドが推定上収まる場合のみ開始する
+          実行中のジョブも締め切りを超えないようタイムアウトを残り時間で制限し、締め切りで中断した実行は数えない
+
+    @ai[2026-10-20 13:00] 締め切りで中断した実行を、残り時間でタイムアウトを短くしたジョブかどうかで判定
+    背景: タイムアウトがmax_run_timeoutより短いかどうかで判定していたため、バックエンドのタイムアウトが
+          max_run_timeoutより短い場合、通常のタイムアウトも締め切りによる中断として扱われ、失敗として数えられなかった
+    """
+
+    def __init__(self, cells: List[Tuple[str, int]], budget_seconds: float, language: str = "ja",
+                 mode: str = "simple", estimator: Optional[LatencyEstimator] = None,
+                 safety_margin: float = 0.05, max_run_timeout: float = DEFAULT_RUN_TIMEOUT, concurrency: int = 1):
+        self.cells = cells
+        self.budget_seconds = budget_seconds
+        self.language = language
+        self.mode = mode
+        self.estimator = estimator or LatencyEstimator()
+        self.safety_margin = safety_margin
+        self.max_run_timeout = max_run_timeout
+        self.concurrency = max(1, concurrency)
+        self.start_time: Optional[float] = None
+        self.completed_runs: Dict[Tuple[str, int], int] = {cell: 0 for cell in cells}
+        self.failed_runs: Dict[Tuple[str, int], int] = {cell: 0 for cell in cells}
+        self.completed_rounds = 0
+        self.current_round = 0
+        self.stop_reason = ""
+        self._pending: List[ExperimentJob] = []
+        self._in_flight = 0
+        self._deadline_limited: Set[ExperimentJob] = set()
+        self._deadline_hit = False
+        self._finished = False
+
+    def elapsed(self) -> float:
+        return time.time() - self.start_time if self.start_time else 0.0
+
+    def remaining(self) -> float:
+        return self.budget_seconds - self.elapsed()
+
+    def predicted_round_time(self) -> float:
+        """次のラウンドの所要時間を推定（並列度で割る）"""
+        return sum(self.estimator.estimate(cell) for cell in self.cells) / self.concurrency
+
+    def round_fits(self) -> bool:
+        """次のラウンドが安全マージンを残して時間内に収まるか"""
+        usable = self.remaining() - self.budget_seconds * self.safety_margin
+        return self.predicted_round_time() <= usable
+
+    def _start_round(self) -> bool:
+        if self._in_flight == 0 and self.current_round > 0 and not self._deadline_hit:
+            self.completed_rounds = self.current_round
+        if self._deadline_hit:
+            self.stop_reason = "締め切りに達したため実行中のラウンドを中断"
+            return False
+        if not self.round_fits():
+            self.stop_reason = (f"次のラウンドの推定時間 {self.predicted_round_time():.0f}秒 が"
+                                f"残り時間 {self.remaining():.0f}秒 に収まらないため終了")
+            return False
+        self.current_round += 1
+        print(f"\n⏳ ラウンド {self.current_round} 開始 (経過: {self.elapsed():.0f}秒, 残り: {self.remaining():.0f}秒, "
+              f"推定: {self.predicted_round_time():.0f}秒)")
+        self._pending = [
+            ExperimentJob.from_pattern(pattern, language=self.language, mode=self.mode, levels=(level,),
+                                       runs=1, run_start=self.current_round)
+            for pattern, level in self.cells
+        ]
+        return True
+
+    def next_job(self) -> Optional[ExperimentJob]:
+        if self.start_time is None:
+            self.start_time = time.time()
+        if self._finished:
+            return None
+        if not self._pending:
+            if self._in_flight > 0:
+                return None  # ラウンド内の実行完了を待つ
+            if not self._start_round():
+                self._finished = True
+                return None
+        if self.remaining() <= 0:
+            self._deadline_hit = True
+            self._pending = []
+            return None
+        self._in_flight += 1
+        return self._pending.pop(0)
+
+    def is_finished(self) -> bool:
+        return self._finished
+
+    def timeout_for(self, job: ExperimentJob, default_timeout: float) -> float:
+        timeout = min(default_timeout, self.max_run_timeout)
+        remaining = max(0.0, self.remaining())
+        if remaining < timeout:
+            self._deadline_limited.add(job)
+            return remaining
+        return timeout
+
+    def on_result(self, result: JobResult):
+        self._in_flight -= 1
+        cell = (result.job.pattern, result.job.levels[0])
+        deadline_limited = result.job in self._deadline_limited
+        self._deadline_limited.discard(result.job)
+        if result.timed_out and deadline_limited:
+            # 締め切りで中断した実行は推定値にも回数にも含めない
+            self._deadline_hit = True
+            self._pending = []
+            return
+        self.estimator.record(cell, result.elapsed)
+        if result.success:
+            self.completed_runs[cell] += 1
+        else:
+            self.failed_runs[cell] += 1
+
+    def summary(self) -> Dict:
+        """達成した実行回数のサマリー"""
+        return {
+            'budget_seconds': self.budget_seconds,
+            'elapsed_seconds': self.elapsed(),
+            'completed_rounds': self.completed_rounds,
+            'stop_reason': self.stop_reason,
+            'cells': {
+                f"{pattern}_level{level}": {
+                    'pattern': pattern,
+                    'level': level,
+                    'completed_runs': self.completed_runs[(pattern, level)],
+                    'failed_runs': self.failed_runs[(pattern, level)]
+                }
+                for pattern, level in self.cells
+            },
+            'latency_estimates': self.estimator.to_dict()
+        }
+
+
+# ---------------------------------------------------------------------------
+# リトライと隔離
+# ---------------------------------------------------------------------------
+
+FAILURE_TRANSIENT = "transient"          # 再実行で回復しうる失敗（HTTPエラー、タイムアウト、異常終了）
+FAILURE_DETERMINISTIC = "deterministic"  # 同じ入力では再現する失敗（無効なJSON形式、テンプレート欠落など）
+
+# 再試行で回復しうるHTTPステータス（それ以外の4xxはリクエスト自体の問題として扱う）
+TRANSIENT_HTTP_STATUSES = {408, 425, 429}
+# 通信経路の問題を示すエラー（ExternalLLMClientの応答解析失敗と、Foundationの通信エラー）
+TRANSIENT_ERRORS = {"無効なレスポンスです", "無効なレスポンス形式です", "レスポンスにコンテンツが含まれていません"}
+TRANSIENT_ERROR_TYPES = {"URLError", "NSError", "POSIXError"}
+
+CELL_FAILURES_FILE = "cell_failures.json"
+
+
+def classify_error_log(log: Dict) -> Tuple[str, str]:
+    """
+    @ai[2026-10-19 15:00] エラーログ（_error.json）の失敗種別を判定
+    目的: 再試行すべき一時的な失敗と、何度実行しても同じ結果になる失敗を区別する
+    意図: ExternalLLMErrorのメッセージ（HTTPエラー: 503 など）とerror_typeから判定し、(種別, 理由) を返す
+    """
+    error = log.get('error') or ""
+    error_type = log.get('error_type') or ""
+    match = re.search(r"HTTPエラー: (\d+)", error)
+    if match:
+        status = int(match.group(1))
+        kind = FAILURE_TRANSIENT if status >= 500 or status in TRANSIENT_HTTP_STATUSES else FAILURE_DETERMINISTIC
+        return kind, f"HTTP {status}"
+    if error in TRANSIENT_ERRORS or error_type in TRANSIENT_ERROR_TYPES:
+        return FAILURE_TRANSIENT, error or error_type
+    if "タイムアウト" in error or "timed out" in error.lower():
+        return FAILURE_TRANSIENT, error
+    return FAILURE_DETERMINISTIC, error or error_type or "不明なエラー"
+
+
+def classify_cells(result: JobResult) -> Dict[Tuple[int, int], Optional[Tuple[str, str]]]:
+    """
+    ジョブ結果をセル（level, run）単位に分解し、失敗したセルの (種別, 理由) を返す（成功したセルはNone）
+    成功ログがあれば成功、エラーログがあればその内容で判定、ログがなければプロセスの終了状態で判定する
+    """
+    success_paths: Set[Tuple[int, int]] = set()
+    error_paths: Dict[Tuple[int, int], str] = {}
+    for path in result.log_files:
+        log = parse_log_file_name(path)
+        if log is None:
+            continue
+        if log.error:
+            error_paths[(log.level, log.run)] = path
+        else:
+            success_paths.add((log.level, log.run))
+
+    outcomes: Dict[Tuple[int, int], Optional[Tuple[str, str]]] = {}
+    for cell in result.job.cells():
+        if cell in success_paths:
+            outcomes[cell] = None
+        elif cell in error_paths:
+            try:
+                with open(error_paths[cell], 'r', encoding='utf-8') as f:
+                    outcomes[cell] = classify_error_log(json.load(f))
+            except (OSError, ValueError) as e:
+                outcomes[cell] = (FAILURE_TRANSIENT, f"エラーログを読み込めません: {e}")
+        elif result.timed_out:
+            outcomes[cell] = (FAILURE_TRANSIENT, f"タイムアウト ({result.timeout:.0f}秒)")
+        else:
+            reason = f"ログなし（終了コード: {result.returncode}）"
+            if result.error:
+                reason += f": {result.error.strip()[-200:]}"
+            outcomes[cell] = (FAILURE_TRANSIENT, reason)
+    return outcomes
+
+
+@dataclass
+class RetryPolicy:
+    """
+    セル単位のリトライ方針
+    max_attempts: 一時的な失敗に対する1回の起動内での最大試行回数（初回を含む）
+    quarantine_after: 決定的な失敗がこの回数（レジュームをまたいだ累計）に達したセルを隔離する
+    """
+    max_attempts: int = 3
+    base_delay: float = 5.0
+    max_delay: float = 120.0
+    quarantine_after: int = 3
+
+    def backoff(self, attempt: int, rng: random.Random) -> float:
+        """attempt回目の失敗後の待ち時間（指数バックオフ、複数セルの再試行が重ならないようジッターを付ける）"""
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return delay * rng.uniform(0.5, 1.0)
+
+
+class CellFailureStore:
+    """
+    @ai[2026-10-19 15:00] セルごとの失敗履歴（実験ディレクトリのcell_failures.json）
+    目的: レジュームをまたいで失敗回数を数え、失敗し続けるセルを隔離する
+    背景: 決定的に失敗するセル（毎回無効なJSONを返すプロンプトなど）が、レジュームのたびに再実行されていた
+    意図: キーはログファイル名から拡張子を除いたもの（{pattern}_{language}_level{level}_run{run}）
+          成功したセルは履歴から削除する
+    @ai[2026-10-20 12:30] 隔離は決定的な失敗の回数だけで判定する
+    背景: 一時的な失敗（タイムアウト・5xx・接続エラー）も累計に数えていたため、サーバーの一時的な障害だけで
+          セルが恒久的に隔離されていた
+    意図: 失敗の種類ごとに deterministic_failures / transient_failures を数え（failuresは合計）、
+          一時的な失敗は隔離せず、次のレジュームで再実行する。以前の形式で一時的な失敗により隔離された
+          セルは、決定的な失敗の回数で判定し直す
+    """
+
+    def __init__(self, experiment_dir: str, quarantine_after: int = 3):
+        self.path = os.path.join(experiment_dir, CELL_FAILURES_FILE)
+        self.quarantine_after = quarantine_after
+        self.cells: Dict[str, Dict] = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.cells = json.load(f).get('cells', {})
+
+    @staticmethod
+    def key(job: ExperimentJob, level: int, run: int) -> str:
+        return os.path.basename(job.log_path("", level, run))[:-len(".json")]
+
+    def is_quarantined(self, job: ExperimentJob, level: int, run: int) -> bool:
+        entry = self.cells.get(self.key(job, level, run))
+        return bool(entry and entry.get('quarantined')
+                    and entry.get('deterministic_failures', 0) >= self.quarantine_after)
+
+    def record_failure(self, job: ExperimentJob, level: int, run: int, kind: str, reason: str) -> Dict:
+        entry = self.cells.setdefault(self.key(job, level, run), {
+            'pattern': job.pattern, 'language': job.language, 'level': level, 'run': run,
+            'failures': 0, 'quarantined': False
+        })
+        counter = 'deterministic_failures' if kind == FAILURE_DETERMINISTIC else 'transient_failures'
+        entry['failures'] += 1
+        entry[counter] = entry.get(counter, 0) + 1
+        entry['last_kind'] = kind
+        entry['last_error'] = reason
+        entry['updated_at'] = datetime.now().isoformat()
+        entry['quarantined'] = entry.get('deterministic_failures', 0) >= self.quarantine_after
+        return entry
+
+    def record_success(self, job: ExperimentJob, level: int, run: int):
+        self.cells.pop(self.key(job, level, run), None)
+
+    def quarantined(self) -> List[Dict]:
+        return [dict(entry, cell=key) for key, entry in sorted(self.cells.items())
+                if entry.get('quarantined') and entry.get('deterministic_failures', 0) >= self.quarantine_after]
+
+    def save(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'quarantine_after': self.quarantine_after, 'cells': self.cells}, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.path)
+
+
+class RetryingScheduler(Scheduler):
+    """
+    @ai[2026-10-19 15:00] リトライと隔離を行うスケジューラーのラッパー
+    目的: 一時的な失敗（HTTPエラー、タイムアウト、異常終了）を指数バックオフで再試行し、
+          失敗し続けるセルを隔離してワーカーの時間を使わせない
+    意図: 内側のスケジューラーが出したジョブの結果は内側にも通知し、再試行ジョブは失敗したセルだけに絞って
+          このラッパー内で管理する。決定的な失敗はその場では再試行せず、累計の失敗回数にのみ数える
+    @ai[2026-10-20 12:30] 一時的な失敗で再試行を使い切ったセルは隔離せず、次のレジュームまで未完了のまま残す
+          時間予算モードはラウンド単位で回数を揃えるため、ラップせずに使う
+    """
+
+    def __init__(self, inner: Scheduler, store: CellFailureStore, policy: Optional[RetryPolicy] = None,
+                 rng: Optional[random.Random] = None):
+        self.inner = inner
+        self.store = store
+        self.policy = policy or RetryPolicy()
+        self.rng = rng or random.Random()
+        self.attempts: Dict[Tuple[str, int, int], int] = {}
+        self.retries_scheduled = 0
+        self.recovered_cells = 0
+        self.skipped_cells = 0
+        self.newly_quarantined: List[str] = []
+        self._ready: List[ExperimentJob] = []
+        self._delayed: List[Tuple[float, ExperimentJob]] = []
+        self._retry_jobs: Dict[ExperimentJob, int] = {}
+        self._in_flight = 0
+
+    def _without_quarantined(self, job: ExperimentJob) -> List[ExperimentJob]:
+        """隔離済みのセルを除いたジョブ（除外がある場合は実行番号ごとに分割）"""
+        cells = job.cells()
+        remaining = [(level, run) for level, run in cells if not self.store.is_quarantined(job, level, run)]
+        self.skipped_cells += len(cells) - len(remaining)
+        if len(remaining) == len(cells):
+            return [job]
+        return [
+            replace(job, levels=tuple(level for level, r in remaining if r == run), runs=1, run_start=run)
+            for run in job.run_numbers if any(r == run for _, r in remaining)
+        ]
+
+    def next_job(self) -> Optional[ExperimentJob]:
+        now = time.time()
+        due = [entry for entry in self._delayed if entry[0] <= now]
+        if due:
+            self._delayed = [entry for entry in self._delayed if entry[0] > now]
+            self._ready.extend(job for _, job in sorted(due, key=lambda entry: entry[0]))
+        while not self._ready:
+            job = self.inner.next_job()
+            if job is None:
+                return None
+            self._ready.extend(self._without_quarantined(job))
+            if not self._ready:
+                # 全セルが隔離済みのジョブは実行せず、完了として内側に通知する
+                self.inner.on_result(JobResult(job=job, success=False, elapsed=0.0, timeout=0.0, error="隔離済み"))
+        self._in_flight += 1
+        return self._ready.pop(0)
+
+    def next_wakeup(self) -> Optional[float]:
+        if not self._delayed:
+            return None
+        return max(0.0, min(due for due, _ in self._delayed) - time.time())
+
+    def is_finished(self) -> bool:
+        return self.inner.is_finished() and not self._ready and not self._delayed and self._in_flight == 0
+
+    def timeout_for(self, job: ExperimentJob, default_timeout: float) -> float:
+        return self.inner.timeout_for(job, default_timeout)
+
+    def total_jobs(self) -> Optional[int]:
+        total = self.inner.total_jobs()
+        return total + self.retries_scheduled if total is not None else None
+
+    def on_result(self, result: JobResult):
+        self._in_flight -= 1
+        job = result.job
+        if self._retry_jobs.get(job, 0) > 0:
+            self._retry_jobs[job] -= 1
+        else:
+            self.inner.on_result(result)
+
+        retry_levels: Dict[int, List[int]] = {}
+        max_attempt = 0
+        for (level, run), failure in classify_cells(result).items():
+            cell = (job.pattern, level, run)
+            attempt = self.attempts.get(cell, 0) + 1
+            self.attempts[cell] = attempt
+            if failure is None:
+                if attempt > 1:
+                    self.recovered_cells += 1
+                self.store.record_success(job, level, run)
+                continue
+            kind, reason = failure
+            entry = self.store.record_failure(job, level, run, kind, reason)
+            if entry['quarantined']:
+                key = self.store.key(job, level, run)
+                if key not in self.newly_quarantined:
+                    self.newly_quarantined.append(key)
+                    print(f"      🚫 隔離: {key}（決定的な失敗が累計{entry['deterministic_failures']}回, 最後のエラー: {reason}）")
+            elif kind == FAILURE_TRANSIENT and attempt < self.policy.max_attempts:
+                retry_levels.setdefault(run, []).append(level)
+                max_attempt = max(max_attempt, attempt)
+        self.store.save()
+
+        for run, levels in retry_levels.items():
+            retry_job = replace(job, levels=tuple(levels), runs=1, run_start=run)
+            delay = self.policy.backoff(max_attempt, self.rng)
+            self._delayed.append((time.time() + delay, retry_job))
+            self._retry_jobs[retry_job] = self._retry_jobs.get(retry_job, 0) + 1
+            self.retries_scheduled += 1
+            print(f"      🔁 再試行予定: {retry_job.label}（{delay:.1f}秒後, {max_attempt + 1}/{self.policy.max_attempts}回目）")
+
+    def summary(self) -> Dict:
+        summary = dict(self.inner.summary())
+        summary['retry'] = {
+            'max_attempts': self.policy.max_attempts,
+            'quarantine_after': self.policy.quarantine_after,
+            'retries_scheduled': self.retries_scheduled,
+            'recovered_cells': self.recovered_cells,
+            'skipped_quarantined_cells': self.skipped_cells,
+            'quarantined': self.store.quarantined()
+        }
+        return summary
+
+
+# ---------------------------------------------------------------------------
+# 結果シンク
+# ---------------------------------------------------------------------------
+
+class ResultSink:
+    """エンジンのイベントを受け取る出力先の基底クラス"""
+
+    def on_start(self, engine: "ExperimentEngine"):
+        pass
+
+    def on_job_start(self, job: ExperimentJob, index: int, total: Optional[int]):
+        pass
+
+    def on_result(self, result: JobResult):
+        pass
+
+    def on_finish(self, summary: Dict):
+        pass
+
+
+class ConsoleSink(ResultSink):
+    """
+    従来のスクリプトと同じ絵文字付きの進捗表示
+    @ai[2026-10-20 12:30] バックエンド固有の統計は、機能ごとの分岐ではなくBackend.reportの行を表示する
+    """
+
+    def __init__(self, title: str = "🚀 実験を開始します", show_errors: bool = True):
+        self.title = title
+        self.show_errors = show_errors
+        self.backend: Optional[Backend] = None
+
+    def on_start(self, engine: "ExperimentEngine"):
+        self.backend = engine.backend
+        print(self.title)
+        for key, value in engine.backend.describe().items():
+            print(f"   {key}: {value}")
+        print(f"   並列数: {engine.concurrency}")
+        if engine.slot_pool is not None:
+            print(f"   共有スロット: {engine.slot_pool.slots} ({engine.slot_pool.queue_dir}, 優先度: {engine.slot_pool.priority})")
+        print(f"   実験ディレクトリ: {engine.output_dir}")
+        print("=" * 80)
+
+    def on_job_start(self, job: ExperimentJob, index: int, total: Optional[int]):
+        if total:
+            print(f"    🔄 {job.label} ({index}/{total}, 進捗: {(index - 1) / total * 100:.1f}%)")
+        else:
+            print(f"    🔄 {job.label} ({index}件目)")
+
+    def on_result(self, result: JobResult):
+        label = result.job.label
+        if result.success:
+            print(f"      ✅ 成功: {label} ({result.elapsed:.1f}秒)")
+        elif result.timed_out:
+            print(f"      ⏰ タイムアウト: {label} ({result.timeout:.0f}秒)")
+        else:
+            print(f"      ❌ 失敗: {label} (コード: {result.returncode})")
+            if self.show_errors and result.error:
+                print(f"        エラー: {result.error[:200]}...")
+
+    def on_finish(self, summary: Dict):
+        print("\n" + "=" * 80)
+        print("📋 実行結果")
+        print("=" * 80)
+        print(f"   ジョブ: {summary['succeeded']}件成功, {summary['failed']}件失敗"
+              f"（うちタイムアウト {summary['timed_out']}件）")
+        print(f"   経過時間: {summary['elapsed_seconds']:.1f}秒")
+        if summary.get('slot_pool'):
+            pool = summary['slot_pool']
+            print(f"   スロット待ち: 合計{pool['total_wait_seconds']:.1f}秒, 最大{pool['max_wait_seconds']:.1f}秒")
+        if self.backend is not None:
+            for line in self.backend.report(summary.get('backend_stats') or {}):
+                print(f"   {line}")
+        if summary.get('stopped'):
+            print(f"   ⚠️ 中断されました")
+        scheduler = summary.get('scheduler') or {}
+        if 'cells' in scheduler:
+            print(f"   完了ラウンド数: {scheduler['completed_rounds']}")
+            print(f"   終了理由: {scheduler['stop_reason']}")
+            for key, cell in scheduler['cells'].items():
+                print(f"   {key}: {cell['completed_runs']}回成功, {cell['failed_runs']}回失敗")
+        retry = scheduler.get('retry')
+        if retry:
+            print(f"   再試行: {retry['retries_scheduled']}件, 再試行で回復したセル: {retry['recovered_cells']}件, "
+                  f"隔離によりスキップしたセル: {retry['skipped_quarantined_cells']}件")
+            if retry['quarantined']:
+                print(f"   🚫 隔離中のセル（{len(retry['quarantined'])}件, {CELL_FAILURES_FILE}から解除できます）:")
+                for entry in retry['quarantined']:
+                    print(f"      {entry['cell']}: 決定的な失敗が累計{entry['deterministic_failures']}回 {entry['last_error']}")
+        print(f"📁 結果ディレクトリ: {summary['output_dir']}")
+
+
+class JSONSummarySink(ResultSink):
+    """実行サマリーをJSONファイルに保存"""
+
+    def __init__(self, path: str, include_results: bool = True):
+        self.path = path
+        self.include_results = include_results
+        self.results: List[Dict] = []
+
+    def on_result(self, result: JobResult):
+        if self.include_results:
+            self.results.append(result.to_dict())
+
+    def on_finish(self, summary: Dict):
+        data = dict(summary)
+        if self.include_results:
+            data['results'] = self.results
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+        print(f"💾 サマリーを保存しました: {self.path}")
+
+
+class CombinedReportSink(ResultSink):
+    """終了時にgenerate_combined_report.pyで統合レポートを生成"""
+
+    def __init__(self, experiment_dir: str):
+        self.experiment_dir = experiment_dir
+
+    def on_finish(self, summary: Dict):
+        if not summary.get('stopped'):
+            generate_combined_report(self.experiment_dir)
+
+
+# ---------------------------------------------------------------------------
+# エンジン
+# ---------------------------------------------------------------------------
+
+class ExperimentEngine:
+    """
+    @ai[2026-10-19 12:00] バックエンド・スケジューラー・結果シンクを組み合わせて実験を実行
+    目的: 全実行スクリプトで同じ実行ループ（並列度、タイムアウト、中断処理、進捗表示）を使う
+    意図: asyncioのワーカーをconcurrency個起動し、各ワーカーがスケジューラーからジョブを取得して実行する
+          SIGINT/SIGTERMを受けた場合は新規ジョブの取得を止め、実行中のバックエンド処理を中断する
+          slot_poolを指定した場合は、各ジョブの実行前に共有スロットを確保する（優先度はslot_pool側で判定）
+          ジョブの結果は出力ディレクトリのCompletionIndexに追記し、レジューム時の未完了セルの判定に使う
+    """
+
+    def __init__(self, backend: Backend, scheduler: Scheduler, output_dir: str,
+                 sinks: Optional[List[ResultSink]] = None, concurrency: int = 1, slot_pool=None):
+        self.backend = backend
+        self.slot_pool = slot_pool
+        self.scheduler = scheduler
+        self.output_dir = output_dir
+        self.sinks = sinks or []
+        self.concurrency = max(1, concurrency)
+        self.results: List[JobResult] = []
+        self.completion_index = CompletionIndex(output_dir)
+        self.stop_requested = False
+        self._started = 0
+        self._in_flight = 0
+        self._condition: Optional[asyncio.Condition] = None
+
+    def request_stop(self):
+        """新規ジョブの開始を止め、実行中の処理を中断"""
+        if not self.stop_requested:
+            print(f"\n🛑 停止要求を受信しました。実行中の処理を停止します...")
+        self.stop_requested = True
+        self.backend.cancel_all()
+        # バックオフ待ちのワーカーも起こして終了させる
+        if self._condition is not None:
+            asyncio.get_running_loop().create_task(self._notify_all())
+
+    async def _notify_all(self):
+        async with self._condition:
+            self._condition.notify_all()
+
+    def _emit(self, event: str, *args):
+        for sink in self.sinks:
+            getattr(sink, event)(*args)
+
+    async def _worker(self):
+        while not self.stop_requested:
+            job = self.scheduler.next_job()
+            if job is None:
+                wakeup = self.scheduler.next_wakeup()
+                if self.scheduler.is_finished() or (self._in_flight == 0 and wakeup is None):
+                    return
+                async with self._condition:
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=wakeup)
+                    except asyncio.TimeoutError:
+                        pass
+                continue
+
+            self._in_flight += 1
+            slot = None
+            if self.slot_pool is not None:
+                slot = await self.slot_pool.acquire(job.label, should_stop=lambda: self.stop_requested)
+                if slot is None:
+                    self._in_flight -= 1
+                    break
+            self._started += 1
+            self._emit('on_job_start', job, self._started, self.scheduler.total_jobs())
+            timeout = self.scheduler.timeout_for(job, self.backend.default_timeout)
+            try:
+                result = await self.backend.run(job, self.output_dir, timeout)
+            except Exception as e:
+                result = JobResult(job=job, success=False, elapsed=0.0, timeout=timeout, error=str(e))
+            finally:
+                if slot is not None:
+                    self.slot_pool.release(slot)
+            self._in_flight -= 1
+
+            self.results.append(result)
+            self.completion_index.record(result)
+            self.scheduler.on_result(result)
+            self._emit('on_result', result)
+            async with self._condition:
+                self._condition.notify_all()
+
+        # 停止時は待機中のワーカーも起こして終了させる
+        async with self._condition:
+            self._condition.notify_all()
+
+    def build_summary(self, elapsed: float) -> Dict:
+        by_pattern: Dict[str, Dict[str, int]] = {}
+        for result in self.results:
+            counts = by_pattern.setdefault(result.job.pattern, {'succeeded': 0, 'failed': 0, 'timed_out': 0})
+            counts['succeeded' if result.success else 'failed'] += 1
+            if result.timed_out:
+                counts['timed_out'] += 1
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'backend': self.backend.name,
+            'output_dir': self.output_dir,
+            'concurrency': self.concurrency,
+            'elapsed_seconds': elapsed,
+            'jobs': len(self.results),
+            'succeeded': sum(1 for r in self.results if r.success),
+            'failed': sum(1 for r in self.results if not r.success),
+            'timed_out': sum(1 for r in self.results if r.timed_out),
+            'stopped': self.stop_requested,
+            'by_pattern': by_pattern,
+            'scheduler': self.scheduler.summary(),
+            'slot_pool': self.slot_pool.summary() if self.slot_pool is not None else None,
+            'backend_stats': self.backend.summary()
+        }
+
+    async def run_async(self) -> Dict:
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.completion_index.ensure()
+        self._condition = asyncio.Condition()
+        loop = asyncio.get_running_loop()
+        installed_signals = []
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+                installed_signals.append(sig)
+            except (NotImplementedError, RuntimeError):
+                pass
+
+        self._emit('on_start', self)
+        start_time = time.time()
+        try:
+            await self.backend.prepare()
+            await asyncio.gather(*(self._worker() for _ in range(self.concurrency)))
+        finally:
+            await self.backend.close()
+            for sig in installed_signals:
+                loop.remove_signal_handler(sig)
+
+        summary = self.build_summary(time.time() - start_time)
+        self._emit('on_finish', summary)
+        return summary
+
+    def run(self) -> Dict:
+        """同期的に実行（CLIからの呼び出し用）"""
+        return asyncio.run(self.run_async())
@@ -14,6 +14,8 @@ from pathlib import Path
 from typing import Dict, List, Set
 from datetime import datetime
 
+from log_layout import discover_log_files
+
 class ExperimentLogMonitor:
     def __init__(self, experiment_dir: str, algorithms: List[str], runs_per_algorithm: int = 20):
         self.experiment_dir = Path(experiment_dir)
@@ -76,9 +78,8 @@ class ExperimentLogMonitor:
         return len(completed_algorithms) == len(self.algorithms)
         
     def _count_algorithm_logs(self, algorithm: str) -> int:
-        """特定のアルゴリズムのログファイル数をカウント"""
-        pattern = f"chat_{algorithm}_json_ja_level*_run*.json"
-        log_files = list(self.experiment_dir.glob(pattern))
+        """特定のアルゴリズムのログファイル数をカウント（シャーディング配置では該当algoのディレクトリのみ走査）"""
+        log_files = discover_log_files(self.experiment_dir, testcase="chat", algo=algorithm, method="json", language="ja")
         return len(log_files)
         
     def _print_final_status(self, completed_algorithms: Set[str], elapsed_time: float):
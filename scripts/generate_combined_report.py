@@ -16,6 +16,13 @@ from datetime import datetime
 from pathlib import Path
 from collections import defaultdict, Counter
 
+from log_layout import discover_log_files, parse_log_file_name
+from request_metrics import (
+    REQUEST_METRICS_FILE, index_request_metrics, lookup_request_metrics, read_request_metrics,
+    summarize_request_metrics
+)
+from response_length_profiler import profile_response_lengths
+
 def parse_log_file(log_file_path):
     """構造化JSONログファイルを解析して実験結果を抽出"""
     results = {
@@ -127,7 +134,8 @@ def parse_log_file(log_file_path):
                     'expected_fields': structured_data.get('expected_fields', []),
                     'unexpected_fields': structured_data.get('unexpected_fields', []),
                     'error': structured_data.get('error', None),
-                    'extraction_time': structured_data.get('extraction_time', 0)
+                    'extraction_time': structured_data.get('extraction_time', 0),
+                    'cold_start': structured_data.get('cold_start', False)
                 }
                 
                 # 抽出時間の統計を更新
@@ -199,7 +207,9 @@ def parse_json_file(json_file_path):
             'expected_fields': structured_data.get('expected_fields', []),
             'unexpected_fields': structured_data.get('unexpected_fields', []),
             'error': structured_data.get('error', None),
-            'extraction_time': structured_data.get('extraction_time', 0)
+            'extraction_time': structured_data.get('extraction_time', 0),
+            'cold_start': structured_data.get('cold_start', False),
+            'stream_timing': structured_data.get('stream_timing')
         }
         
         # 抽出時間の統計を更新
@@ -338,26 +348,59 @@ def calculate_rates(metrics):
     
     return rates
 
+def _new_timing_bucket(**extra):
+    """抽出時間集計用のバケットを作成（warm/coldを分けて保持）"""
+    bucket = {
+        'extraction_times': [],
+        'avg_extraction_time': 0,
+        'min_extraction_time': 0,
+        'max_extraction_time': 0,
+        'total_extraction_time': 0,
+        'cold_extraction_times': [],
+        'avg_cold_extraction_time': 0,
+        'max_cold_extraction_time': 0,
+        'cold_start_count': 0
+    }
+    bucket.update(extra)
+    return bucket
+
+def _add_timing_sample(bucket, extraction_time, cold_start):
+    """抽出時間をwarm/coldいずれかの系列に追加"""
+    if cold_start:
+        bucket['cold_extraction_times'].append(extraction_time)
+    else:
+        bucket['extraction_times'].append(extraction_time)
+
+def _finalize_timing_bucket(bucket):
+    """バケットの統計値を計算
+
+    @ai[2026-10-19 10:00] cold start分離
+    目的: avg/min/max/totalはwarm実行のみから計算し、cold startは別系列で報告する
+    背景: 推論サーバー起動直後やプロセス内最初のセッションの遅さが平均値を歪めていた
+    意図: cold_startフラグのない旧ログはwarmとして扱い、既存レポートとの互換性を保つ
+    """
+    times = bucket['extraction_times']
+    if times:
+        bucket['avg_extraction_time'] = sum(times) / len(times)
+        bucket['min_extraction_time'] = min(times)
+        bucket['max_extraction_time'] = max(times)
+        bucket['total_extraction_time'] = sum(times)
+    cold_times = bucket['cold_extraction_times']
+    bucket['cold_start_count'] = len(cold_times)
+    if cold_times:
+        bucket['avg_cold_extraction_time'] = sum(cold_times) / len(cold_times)
+        bucket['max_cold_extraction_time'] = max(cold_times)
+
 def calculate_timing_stats(all_results):
-    """抽出時間の統計を計算"""
+    """抽出時間の統計を計算（cold start実行はwarm実行と分けて集計）"""
     timing_stats = {
-        'overall': {
-            'extraction_times': [],
-            'avg_extraction_time': 0,
-            'min_extraction_time': 0,
-            'max_extraction_time': 0,
-            'total_extraction_time': 0,
-            'test_case_count': 0,
-            'total_extraction_count': 0
-        },
+        'overall': _new_timing_bucket(test_case_count=0, total_extraction_count=0),
         'by_experiment': {},
         'by_pattern': {},
         'by_level': {},
         'by_pattern_level': {}
     }
     
-    all_times = []
-    
     for result in all_results:
         experiment = result['experiment']
         method = result['method']
@@ -365,60 +408,34 @@ def calculate_timing_stats(all_results):
         
         # 実験別の統計
         if experiment not in timing_stats['by_experiment']:
-            timing_stats['by_experiment'][experiment] = {
-                'extraction_times': [],
-                'avg_extraction_time': 0,
-                'min_extraction_time': 0,
-                'max_extraction_time': 0,
-                'total_extraction_time': 0,
-                'method': method,
-                'language': language
-            }
+            timing_stats['by_experiment'][experiment] = _new_timing_bucket(method=method, language=language)
         
         # 各テストケースの抽出時間を収集
         for test_case in result['test_cases']:
             if 'extraction_time' in test_case and test_case['extraction_time'] > 0:
                 extraction_time = test_case['extraction_time']
-                all_times.append(extraction_time)
-                timing_stats['by_experiment'][experiment]['extraction_times'].append(extraction_time)
+                cold_start = bool(test_case.get('cold_start', False))
+                _add_timing_sample(timing_stats['overall'], extraction_time, cold_start)
+                _add_timing_sample(timing_stats['by_experiment'][experiment], extraction_time, cold_start)
                 
                 # パターン別の統計
                 pattern = test_case['pattern']
                 if pattern not in timing_stats['by_pattern']:
-                    timing_stats['by_pattern'][pattern] = {
-                        'extraction_times': [],
-                        'avg_extraction_time': 0,
-                        'min_extraction_time': 0,
-                        'max_extraction_time': 0,
-                        'total_extraction_time': 0
-                    }
-                timing_stats['by_pattern'][pattern]['extraction_times'].append(extraction_time)
+                    timing_stats['by_pattern'][pattern] = _new_timing_bucket()
+                _add_timing_sample(timing_stats['by_pattern'][pattern], extraction_time, cold_start)
                 
                 # レベル別の統計
                 level = test_case['level']
                 if level not in timing_stats['by_level']:
-                    timing_stats['by_level'][level] = {
-                        'extraction_times': [],
-                        'avg_extraction_time': 0,
-                        'min_extraction_time': 0,
-                        'max_extraction_time': 0,
-                        'total_extraction_time': 0
-                    }
-                timing_stats['by_level'][level]['extraction_times'].append(extraction_time)
+                    timing_stats['by_level'][level] = _new_timing_bucket()
+                _add_timing_sample(timing_stats['by_level'][level], extraction_time, cold_start)
                 
                 # パターン・レベル別の統計
                 if pattern not in timing_stats['by_pattern_level']:
                     timing_stats['by_pattern_level'][pattern] = {}
                 if level not in timing_stats['by_pattern_level'][pattern]:
-                    timing_stats['by_pattern_level'][pattern][level] = {
-                        'extraction_times': [],
-                        'avg_extraction_time': 0,
-                        'min_extraction_time': 0,
-                        'max_extraction_time': 0,
-                        'total_extraction_time': 0,
-                        'test_case_count': 0
-                    }
-                timing_stats['by_pattern_level'][pattern][level]['extraction_times'].append(extraction_time)
+                    timing_stats['by_pattern_level'][pattern][level] = _new_timing_bucket(test_case_count=0)
+                _add_timing_sample(timing_stats['by_pattern_level'][pattern][level], extraction_time, cold_start)
     
     # 全体の統計を計算
     total_test_cases = 0
@@ -431,36 +448,117 @@ def calculate_timing_stats(all_results):
     
     timing_stats['overall']['test_case_count'] = total_test_cases
     timing_stats['overall']['total_extraction_count'] = total_extraction_count
-    
-    if all_times:
-        timing_stats['overall']['extraction_times'] = all_times
-        timing_stats['overall']['avg_extraction_time'] = sum(all_times) / len(all_times)
-        timing_stats['overall']['min_extraction_time'] = min(all_times)
-        timing_stats['overall']['max_extraction_time'] = max(all_times)
-        timing_stats['overall']['total_extraction_time'] = sum(all_times)
+    _finalize_timing_bucket(timing_stats['overall'])
     
     # 各カテゴリの統計を計算
     for category in ['by_experiment', 'by_pattern', 'by_level']:
         for key, data in timing_stats[category].items():
-            if data['extraction_times']:
-                data['avg_extraction_time'] = sum(data['extraction_times']) / len(data['extraction_times'])
-                data['min_extraction_time'] = min(data['extraction_times'])
-                data['max_extraction_time'] = max(data['extraction_times'])
-                data['total_extraction_time'] = sum(data['extraction_times'])
+            _finalize_timing_bucket(data)
     
     # パターン・レベル別の統計を計算
     for pattern, level_data in timing_stats['by_pattern_level'].items():
         for level, data in level_data.items():
-            if data['extraction_times']:
-                data['avg_extraction_time'] = sum(data['extraction_times']) / len(data['extraction_times'])
-                data['min_extraction_time'] = min(data['extraction_times'])
-                data['max_extraction_time'] = max(data['extraction_times'])
-                data['total_extraction_time'] = sum(data['extraction_times'])
-                data['test_case_count'] = len(data['extraction_times'])
+            _finalize_timing_bucket(data)
+            data['test_case_count'] = len(data['extraction_times'])
     
     return timing_stats
 
-def generate_html_report(all_results, output_path, rates=None, timing_stats=None, grouped_scores=None):
+def load_request_metrics(log_dir):
+    """実験ディレクトリ（サブディレクトリを含む）の計測プロキシの記録を読み込む"""
+    records = []
+    for path in sorted(Path(log_dir).rglob(REQUEST_METRICS_FILE)):
+        records.extend(read_request_metrics(str(path)))
+    return records
+
+def attach_request_metrics(result, log_file_path, request_index):
+    """ログファイル名の(セル, 実行番号)で計測プロキシの記録をテストケースに結合"""
+    log_file = parse_log_file_name(log_file_path)
+    if log_file is None:
+        return
+    for test_case in result['test_cases']:
+        test_case['run'] = log_file.run
+        test_case['request_metrics'] = lookup_request_metrics(
+            request_index, log_file.testcase, log_file.algo, log_file.method, log_file.language,
+            log_file.level, log_file.run)
+        test_case['latency_group'] = f"{log_file.pattern}_{log_file.language}"
+
+def calculate_latency_breakdown(all_results, request_records):
+    """
+    @ai[2026-10-19 20:30] 抽出時間の内訳（計測プロキシの記録を結合）
+    目的: extraction_timeを送信待ち・接続・最初の応答まで・本文受信・クライアント側の処理に分けて比較する
+    意図: クライアント側の処理はextraction_timeからプロキシで計測した時間（送信待ち＋上流の合計）を引いた残り
+          cold start実行は抽出時間の統計と同様に除外する
+    """
+    latency = {
+        'overall': summarize_request_metrics(request_records),
+        'joined_count': 0,
+        'unjoined_count': 0,
+        'by_experiment': {}
+    }
+    for result in all_results:
+        for test_case in result['test_cases']:
+            if 'request_metrics' not in test_case or test_case.get('cold_start'):
+                continue
+            metrics = test_case['request_metrics']
+            if metrics is None:
+                latency['unjoined_count'] += 1
+                continue
+            latency['joined_count'] += 1
+            group = latency['by_experiment'].setdefault(test_case['latency_group'], defaultdict(list))
+            group['extraction_time'].append(test_case.get('extraction_time', 0))
+            group['requests'].append(metrics['requests'])
+            for name in ('queue_time', 'connect_time', 'ttfb', 'decode_time', 'total_time',
+                         'prompt_tokens', 'completion_tokens'):
+                if metrics.get(name) is not None:
+                    group[name].append(metrics[name])
+            proxy_time = metrics.get('queue_time', 0) + metrics.get('total_time', 0)
+            group['client_time'].append(max(0.0, test_case.get('extraction_time', 0) - proxy_time))
+    for name, group in latency['by_experiment'].items():
+        latency['by_experiment'][name] = {key: sum(values) / len(values) for key, values in group.items() if values}
+        latency['by_experiment'][name]['count'] = len(group['extraction_time'])
+    return latency
+
+def _average(values):
+    return sum(values) / len(values) if values else None
+
+def _format_seconds(value):
+    return f"{value:.3f}秒" if value is not None else "-"
+
+def calculate_stream_timing(all_results):
+    """
+    @ai[2026-10-20 03:30] ストリーミング応答の時間（ログのstream_timing）をパターン・レベル別に集計
+    意図: 最初のトークン・最初の項目・各項目が得られるまでの平均時間と、応答全体の受信時間を比べる
+          cold start実行は抽出時間の統計と同様に除外する
+    """
+    groups = defaultdict(lambda: defaultdict(list))
+    for result in all_results:
+        for test_case in result['test_cases']:
+            timing = test_case.get('stream_timing')
+            if not timing or test_case.get('cold_start'):
+                continue
+            for key in (f"{test_case['pattern']} L{test_case['level']}", 'overall'):
+                group = groups[key]
+                for name in ('time_to_first_token', 'time_to_first_field', 'total_time'):
+                    if timing.get(name) is not None:
+                        group[name].append(timing[name])
+                for field, seconds in (timing.get('field_times') or {}).items():
+                    if seconds is not None:
+                        group[f"field:{field}"].append(seconds)
+                group['count'].append(1)
+    stream_timing = {}
+    for key, group in groups.items():
+        stream_timing[key] = {
+            'count': len(group['count']),
+            'time_to_first_token': _average(group['time_to_first_token']),
+            'time_to_first_field': _average(group['time_to_first_field']),
+            'total_time': _average(group['total_time']),
+            'field_times': dict(sorted(((name[len("field:"):], _average(values)) for name, values in group.items()
+                                        if name.startswith("field:")), key=lambda item: item[1])),
+        }
+    return dict(sorted(stream_timing.items(), key=lambda item: (item[0] == 'overall', item[0])))
+
+def generate_html_report(all_results, output_path, rates=None, timing_stats=None, grouped_scores=None,
+                         latency_breakdown=None, response_profile=None, stream_timing=None):
     """詳細な精度分析HTMLレポートを生成"""
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
@@ -976,9 +1074,14 @@ def generate_html_report(all_results, output_path, rates=None, timing_stats=None
                 <h3>総抽出時間</h3>
                 <p style="font-size: 2em; margin: 0; color: #6f42c1;">{:.3f}秒</p>
             </div>
+            <div class="summary-card">
+                <h3>Cold Start平均時間</h3>
+                <p style="font-size: 2em; margin: 0; color: #17a2b8;">{:.3f}秒</p>
+                <p style="margin: 0;">{}回（平均・最小・最大・総時間から除外）</p>
+            </div>
         </div>
         
-        <h4>実験別抽出時間</h4>
+        <h4>実験別抽出時間（warm実行のみ）</h4>
         <table class="metrics-table">
             <thead>
                 <tr>
@@ -997,7 +1100,9 @@ def generate_html_report(all_results, output_path, rates=None, timing_stats=None
             timing_stats['overall']['avg_extraction_time'],
             timing_stats['overall']['min_extraction_time'],
             timing_stats['overall']['max_extraction_time'],
-            timing_stats['overall']['total_extraction_time']
+            timing_stats['overall']['total_extraction_time'],
+            timing_stats['overall']['avg_cold_extraction_time'],
+            timing_stats['overall']['cold_start_count']
         )
         
         for experiment, data in timing_stats['by_experiment'].items():
@@ -1066,6 +1171,205 @@ def generate_html_report(all_results, output_path, rates=None, timing_stats=None
     </div>
 """
     
+    # @ai[2026-10-19 20:30] 計測プロキシの記録がある場合のみ、抽出時間の内訳セクションを追加
+    if latency_breakdown and latency_breakdown['overall']['requests']:
+        overall = latency_breakdown['overall']
+        html_content += """
+    <div class="section">
+        <h3>📏 抽出時間の内訳（計測プロキシ）</h3>
+        <p>リクエスト {}件（{}）、ログとの結合 {}件、結合できなかったログ {}件</p>
+        <div class="summary">
+            <div class="summary-card">
+                <h3>最初の応答まで (p50 / p95)</h3>
+                <p style="font-size: 1.5em; margin: 0; color: #007bff;">{:.3f}秒 / {:.3f}秒</p>
+            </div>
+            <div class="summary-card">
+                <h3>本文受信 (p50 / p95)</h3>
+                <p style="font-size: 1.5em; margin: 0; color: #28a745;">{:.3f}秒 / {:.3f}秒</p>
+            </div>
+            <div class="summary-card">
+                <h3>送信待ち (p50 / p95)</h3>
+                <p style="font-size: 1.5em; margin: 0; color: #dc3545;">{:.3f}秒 / {:.3f}秒</p>
+            </div>
+            <div class="summary-card">
+                <h3>平均トークン数（プロンプト / 出力）</h3>
+                <p style="font-size: 1.5em; margin: 0; color: #6f42c1;">{:.0f} / {:.0f}</p>
+                <p style="margin: 0;">{:.1f}トークン/秒</p>
+            </div>
+        </div>
+
+        <h4>実験別の内訳（warm実行の平均）</h4>
+        <table class="metrics-table">
+            <thead>
+                <tr>
+                    <th>実験</th>
+                    <th>抽出時間</th>
+                    <th>送信待ち</th>
+                    <th>接続</th>
+                    <th>最初の応答まで</th>
+                    <th>本文受信</th>
+                    <th>クライアント側</th>
+                    <th>プロンプト</th>
+                    <th>出力</th>
+                    <th>リクエスト数</th>
+                    <th>回数</th>
+                </tr>
+            </thead>
+            <tbody>
+""".format(
+            overall['requests'],
+            ", ".join(f"HTTP {status}: {count}件" for status, count in sorted(overall['status'].items())),
+            latency_breakdown['joined_count'], latency_breakdown['unjoined_count'],
+            overall['ttfb']['p50'], overall['ttfb']['p95'],
+            overall['decode_time']['p50'], overall['decode_time']['p95'],
+            overall['queue_time']['p50'], overall['queue_time']['p95'],
+            overall['prompt_tokens']['avg'], overall['completion_tokens']['avg'],
+            overall['completion_tokens_per_second']
+        )
+
+        for experiment, data in sorted(latency_breakdown['by_experiment'].items()):
+            html_content += f"""
+                <tr>
+                    <td>{experiment}</td>
+                    <td>{data.get('extraction_time', 0):.3f}秒</td>
+                    <td>{data.get('queue_time', 0):.3f}秒</td>
+                    <td>{data.get('connect_time', 0):.3f}秒</td>
+                    <td>{data.get('ttfb', 0):.3f}秒</td>
+                    <td>{data.get('decode_time', 0):.3f}秒</td>
+                    <td>{data.get('client_time', 0):.3f}秒</td>
+                    <td>{data.get('prompt_tokens', 0):.0f}</td>
+                    <td>{data.get('completion_tokens', 0):.0f}</td>
+                    <td>{data.get('requests', 0):.1f}</td>
+                    <td>{data['count']}回</td>
+                </tr>
+"""
+
+        html_content += """
+            </tbody>
+        </table>
+    </div>
+"""
+
+    # @ai[2026-10-20 00:30] 応答の文字数が記録されている場合のみ、応答の長さと無駄なデコード時間のセクションを追加
+    if response_profile and response_profile['requests']:
+        decode_rates = ", ".join(f"{model}: {rate['seconds_per_token'] * 1000:.2f}ms"
+                                 for model, rate in response_profile['decode_rates'].items())
+        html_content += f"""
+    <div class="section">
+        <h3>📐 応答の長さと無駄なデコード時間</h3>
+        <p>JSON以外の出力（前置き、コードブロックの囲み、推論・分析）に使われたトークン数を、モデルごとの1トークンあたりのデコード時間（{decode_rates}）で換算した推定値です</p>
+"""
+        for title, name in (("algo別", 'by_algo'), ("レベル別", 'by_level'), ("モデル × algo × レベル", 'by_model_algo_level')):
+            html_content += f"""
+        <h4>{title}</h4>
+        <table class="metrics-table">
+            <thead>
+                <tr>
+                    <th>{title[:-1]}</th>
+                    <th>出力トークン</th>
+                    <th>推論トークン</th>
+                    <th>応答の文字数</th>
+                    <th>JSON以外の割合</th>
+                    <th>応答時間</th>
+                    <th>無駄なデコード時間</th>
+                    <th>相関（トークン数×時間）</th>
+                    <th>リクエスト数</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+            for key, data in response_profile[name].items():
+                correlation = data['token_latency_correlation']
+                html_content += f"""
+                <tr>
+                    <td>{key}</td>
+                    <td>{data['avg_completion_tokens']:.0f}</td>
+                    <td>{data['avg_reasoning_tokens']:.0f}</td>
+                    <td>{data['avg_content_chars']:.0f}</td>
+                    <td>{data['non_json_share']:.1%}</td>
+                    <td>{data['avg_total_time']:.3f}秒</td>
+                    <td>{data['avg_wasted_time']:.3f}秒 ({data['wasted_time_share']:.1%})</td>
+                    <td>{f"{correlation:.2f}" if correlation is not None else "-"}</td>
+                    <td>{data['requests']}</td>
+                </tr>
+"""
+            html_content += """
+            </tbody>
+        </table>
+"""
+        html_content += """
+    </div>
+"""
+
+    # @ai[2026-10-20 03:30] ストリーミングで実行したログがある場合のみ、最初のトークン・項目までの時間のセクションを追加
+    if stream_timing:
+        html_content += """
+    <div class="section">
+        <h3>🌊 ストリーミング: 最初のトークン・項目が得られるまでの時間</h3>
+        <p>リクエスト開始からの平均時間です（最初の項目: 値がnull・空文字列でない最初の項目）</p>
+        <table class="metrics-table">
+            <thead>
+                <tr>
+                    <th>パターン・レベル</th>
+                    <th>最初のトークン</th>
+                    <th>最初の項目</th>
+                    <th>応答全体</th>
+                    <th>項目ごとの時間（早い順）</th>
+                    <th>実行数</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+        for key, data in stream_timing.items():
+            field_times = ", ".join(f"{name} {seconds:.2f}秒" for name, seconds in data['field_times'].items())
+            html_content += f"""
+                <tr>
+                    <td>{key}</td>
+                    <td>{_format_seconds(data['time_to_first_token'])}</td>
+                    <td>{_format_seconds(data['time_to_first_field'])}</td>
+                    <td>{_format_seconds(data['total_time'])}</td>
+                    <td>{field_times or "-"}</td>
+                    <td>{data['count']}回</td>
+                </tr>
+"""
+        chart_keys = [key for key in stream_timing if key != 'overall']
+        overall_fields = stream_timing.get('overall', {}).get('field_times', {})
+        html_content += f"""
+            </tbody>
+        </table>
+        <div class="chart-grid">
+            <div class="chart-container"><canvas id="streamTimingChart"></canvas></div>
+            <div class="chart-container"><canvas id="streamFieldChart"></canvas></div>
+        </div>
+        <script>
+            new Chart(document.getElementById('streamTimingChart'), {{
+                type: 'bar',
+                data: {{
+                    labels: {json.dumps(chart_keys, ensure_ascii=False)},
+                    datasets: [
+                        {{ label: '最初のトークン', data: {json.dumps([stream_timing[key]['time_to_first_token'] for key in chart_keys])},
+                           backgroundColor: 'rgba(0, 123, 255, 0.7)' }},
+                        {{ label: '最初の項目', data: {json.dumps([stream_timing[key]['time_to_first_field'] for key in chart_keys])},
+                           backgroundColor: 'rgba(40, 167, 69, 0.7)' }},
+                        {{ label: '応答全体', data: {json.dumps([stream_timing[key]['total_time'] for key in chart_keys])},
+                           backgroundColor: 'rgba(108, 117, 125, 0.7)' }}
+                    ]
+                }},
+                options: {{ responsive: true, maintainAspectRatio: false, scales: {{ y: {{ beginAtZero: true, title: {{ display: true, text: '秒' }} }} }} }}
+            }});
+            new Chart(document.getElementById('streamFieldChart'), {{
+                type: 'bar',
+                data: {{
+                    labels: {json.dumps(list(overall_fields), ensure_ascii=False)},
+                    datasets: [{{ label: '項目が得られるまでの平均時間（全体）', data: {json.dumps(list(overall_fields.values()))},
+                                  backgroundColor: 'rgba(255, 193, 7, 0.7)' }}]
+                }},
+                options: {{ indexAxis: 'y', responsive: true, maintainAspectRatio: false, scales: {{ x: {{ beginAtZero: true }} }} }}
+            }});
+        </script>
+    </div>
+"""
+
     # 項目数ベースのメトリクスセクションを追加
     if grouped_scores and 'by_pattern_level' in grouped_scores and grouped_scores['by_pattern_level']:
         html_content += """
@@ -1617,23 +1921,15 @@ def main():
     report_dir = log_dir
     
     # ログファイルを検索（ディレクトリ構造対応）
-    log_files = []
-    
-    # @ai[2025-01-10 15:45] 新しい命名規則に対応: yyyymmddhhmm_実験名
-    # 指定されたディレクトリ内のJSONファイルを直接検索
-    direct_json_files = list(Path(log_dir).glob("*.json"))
-    if direct_json_files:
-        log_files.extend(direct_json_files)
-        print(f"📁 指定ディレクトリ内: {len(direct_json_files)}個のJSONファイル")
+    # @ai[2026-10-19 14:00] log_layout.discover_log_filesで探索（フラット・シャーディング配置、
+    # yyyymmddhhmm_実験名形式の実験サブディレクトリの両方に対応）
+    log_files = [log.path for log in discover_log_files(log_dir, include_subexperiments=True)]
+    print(f"📁 構造化ログ: {len(log_files)}個のJSONファイル")
     
-    # 新しい形式の実験ディレクトリを検索
-    experiment_dirs = [d for d in Path(log_dir).iterdir() if d.is_dir() and "_" in d.name and len(d.name.split("_")) == 2]
-    
-    for exp_dir in experiment_dirs:
-        # 各実験ディレクトリ内のJSONファイルを収集
-        json_files = list(exp_dir.glob("*.json"))
-        log_files.extend(json_files)
-        print(f"📁 実験ディレクトリ {exp_dir.name}: {len(json_files)}個のJSONファイル")
+    # 命名規則に合わない旧形式のログのみのディレクトリは、従来通りJSONファイルを直接検索
+    if not log_files:
+        log_files = list(Path(log_dir).glob("*.json"))
+        print(f"📁 指定ディレクトリ内（旧形式）: {len(log_files)}個のJSONファイル")
     
     if not log_files:
         print(f"エラー: ログディレクトリ {log_dir} にログファイルが見つかりません")
@@ -1641,6 +1937,12 @@ def main():
     
     print(f"📁 ログファイル数: {len(log_files)}")
     
+    # @ai[2026-10-19 20:30] 計測プロキシ（instrumenting_proxy.py）の記録があればログに結合
+    request_records = load_request_metrics(log_dir)
+    request_index = index_request_metrics(request_records)
+    if request_records:
+        print(f"📏 計測プロキシの記録: {len(request_records)}件")
+
     # 各ログファイルを解析
     all_results = []
     # スキップすべきファイル名のリスト
@@ -1660,6 +1962,8 @@ def main():
         progress = (i / len(log_files)) * 100
         print(f"🔍 解析中: {log_file.name} ({progress:.1f}%)")
         result = parse_log_file(str(log_file))
+        if request_records:
+            attach_request_metrics(result, log_file, request_index)
         all_results.append(result)
     
     print(f"📊 ログファイル解析完了: {len(all_results)}/{len(log_files)} ファイル")
@@ -1686,6 +1990,9 @@ def main():
     
     # 抽出時間の統計を計算
     timing_stats = calculate_timing_stats(all_results)
+    latency_breakdown = calculate_latency_breakdown(all_results, request_records) if request_records else None
+    response_profile = profile_response_lengths(request_records) if request_records else None
+    stream_timing = calculate_stream_timing(all_results)
     
     # 詳細な統計情報を表示
     print(f"\n📊 精度分析結果:")
@@ -1707,14 +2014,17 @@ def main():
         print(f"  最小抽出時間: {timing_stats['overall']['min_extraction_time']:.3f}秒")
         print(f"  最大抽出時間: {timing_stats['overall']['max_extraction_time']:.3f}秒")
         print(f"  総抽出時間: {timing_stats['overall']['total_extraction_time']:.3f}秒")
-        print(f"  抽出回数: {len(timing_stats['overall']['extraction_times'])}回")
+        print(f"  抽出回数: {len(timing_stats['overall']['extraction_times'])}回（warm）")
+        if timing_stats['overall']['cold_start_count']:
+            print(f"  Cold Start平均抽出時間: {timing_stats['overall']['avg_cold_extraction_time']:.3f}秒 ({timing_stats['overall']['cold_start_count']}回, 統計から除外)")
     else:
         print("  抽出時間データがありません。")
     
     # @ai[2025-01-10 15:30] 統一された集計ロジックを使用
     # HTMLレポートを生成
     output_path = os.path.join(report_dir, "parallel_format_experiment_report.html")
-    generate_html_report(all_results, output_path, rates, timing_stats, grouped_scores)
+    generate_html_report(all_results, output_path, rates, timing_stats, grouped_scores, latency_breakdown,
+                         response_profile, stream_timing)
     
     print(f"✅ 統合レポートを生成しました: {output_path}")
     
@@ -1726,6 +2036,12 @@ def main():
         'grouped_scores': grouped_scores,
         'timestamp': datetime.now().isoformat()
     }
+    if latency_breakdown:
+        detailed_data['latency_breakdown'] = latency_breakdown
+    if response_profile and response_profile['requests']:
+        detailed_data['response_length_profile'] = response_profile
+    if stream_timing:
+        detailed_data['stream_timing'] = stream_timing
     
     with open(json_output_path, 'w', encoding='utf-8') as f:
         json.dump(detailed_data, f, ensure_ascii=False, indent=2)
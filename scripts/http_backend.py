@@ -0,0 +1,613 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 17:00] Swiftを起動せずに外部LLM実験を行うPython実装のバックエンド
+目的: 外部LLM実験の1回ごとの swift run 起動をなくし、プールしたkeep-alive接続で高い並列度のリクエストを送る
+背景: 外部LLM実験でSwift側が行うのはプロンプト生成・POST・JSON解析・採点のみだが、Linuxでは実行1回ごとの
+      プロセス起動が所要時間の大半を占めていた
+意図: aitest_extraction（プロンプト・リクエストボディ・JSON解析）とaitest_logs（採点・ログ生成）で
+      ExternalLLMExtractor + generateStructuredLog / generateErrorStructuredLog と同じログを出力する
+      ジョブ内のセル（level, run）は並行して送信し、同時接続数はAsyncHTTPClientのmax_connectionsで制限する
+      Swift版とのログの一致はcheck_backend_parity.pyで確認する
+
+@ai[2026-10-19 18:30] 応答キャッシュ（response_cache）に対応
+意図: キャッシュのサンプル番号は実行番号-1とし、再実行しても同じ実行番号には同じ応答を返す
+      再生した応答のextraction_timeは記録時の応答時間＋解析時間とし、元の実行とレポートの時間が揃うようにする
+
+@ai[2026-10-19 19:30] レート制限（rate_limiter）と429/503のRetry-Afterに対応
+意図: スロットリングで待った時間はextraction_timeから除き、サマリーのthrottleに別途集計する
+
+@ai[2026-10-19 20:30] 計測プロキシ（instrumenting_proxy）用にX-AITest-Run / X-AITest-Cellヘッダーを送信
+意図: Swift版と同じく、プロキシの計測結果をログの(セル, 実行番号)に結合できるようにする
+
+@ai[2026-10-19 21:30] 同一リクエストの合流（coalescing_gateway.RequestCoalescer）に対応
+意図: ジョブ内で並行して送る実行（run）のリクエストは同一になるため、サンプリングが決定的な場合は上流へ1回だけ送る
+
+@ai[2026-10-19 22:30] two-stepsモード（two_steps_extraction）に対応
+意図: Step 1a/1b/2の所要時間をログのtwo_steps_timingに分けて記録し、extraction_timeはSwift版と同じくその合計とする
+      step_memoを指定した場合、同じドキュメントのStep 1a/1bの判定結果を再利用し、抽出（Step 2）のみを計測する
+
+@ai[2026-10-19 23:30] サンプリング設定の上書き（sampling）とリクエストごとの計測（request_metrics）に対応
+意図: sampling_sweep.pyがtemperature・top_p・stop・reasoning_effortを変えて実行し、出力トークン数を
+      計測プロキシと同じ形式のrequest_metrics.jsonlからセル・実行番号ごとに結合できるようにする
+
+@ai[2026-10-20 01:30] 構造化出力（structured_output）に対応
+目的: response_formatでJSONスキーマを指定し、自由形式のJSON出力で起きる解析失敗（無効なJSON形式）をなくす
+意図: simpleモードはAccountInfoの項目、two-stepsモードはカテゴリIDの列挙とサブカテゴリのmappingからスキーマを作る
+      サーバーがresponse_formatに対応していない場合（400 / 422 / 501）は、response_formatを除いて送り直し、
+      送り直しが成功したら以降のリクエストでは指定しない（プロンプトは自由形式のJSON出力と同じ）
+
+@ai[2026-10-20 02:30] ヘッジリクエスト（request_hedging.RequestHedger）に対応
+意図: (algo, レベル)はX-AITest-Cellから判別し、複製はhedge_url（指定しない場合は同じURLへの別の接続）へ送る
+      レート制限は複製にも適用し、request_metricsには使った応答のみを記録する
+
+@ai[2026-10-20 03:30] SSEストリーミング（streaming）に対応
+意図: simpleモードのリクエストを "stream": true で送り、受信しながらstreaming_extraction.StreamTimerで
+      最初のトークン・各項目が得られるまでの時間を計測してログのstream_timingに記録する
+      （時刻はextraction_timeと同じくリクエスト開始からで、スロットリングの待ち時間を除く。
+      キャッシュから再生した応答は受信時刻がないため記録しない）
+
+@ai[2026-10-20 05:30] テストデータの圧縮（input_compaction.compact_text）に対応
+意図: input_compactionに手順を指定した場合、simple / two-stepsモードともプロンプトに添付する前のテストデータを圧縮し、
+      ログのinput_compactionに圧縮前後の文字数を記録する（採点は元のテストケースの期待値で行う）
+
+@ai[2026-10-20 06:30] 長いドキュメントのウィンドウ分割（chunked_extraction）に対応
+意図: chunkingを指定した場合、simpleモードでウィンドウより長いテストデータを重なりのあるウィンドウに分け、
+      ウィンドウごとのリクエストを並行して送って結果を統合する
+      extraction_timeは最も遅いウィンドウの応答時間（各ウィンドウはスロットリングの待ち時間を除く）とし、
+      ログのchunked_extractionにウィンドウ数・ウィンドウごとの時間・解析に失敗したウィンドウ数・衝突した項目を記録する
+      一部のウィンドウが失敗しても、解析できたウィンドウがあれば統合結果を採点する
+
+@ai[2026-10-20 12:30] HTTPバックエンドのみの機能の設定をHTTPOptionsにまとめた
+背景: 機能を追加するたびにHTTPBackendの引数と、ConsoleSinkの終了時の表示の分岐が増えていた
+意図: 機能どうしの組み合わせはHTTPOptionsの作成時に一度だけ検証する
+      終了時の表示は機能ごとのreport（FEATURE_REPORTS）がsummary()の項目を1行にし、ConsoleSinkはreport()の行を表示する
+
+使用例:
+    python3 scripts/run_external_llm_experiment.py --backend http --external-llm-url http://host:8000/v1 \\
+        --external-llm-model gpt-oss-20b --concurrency 64
+"""
+
+import asyncio
+import json
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from aitest_extraction import (
+    DEFAULT_API_KEY, PromptTemplateNotFound, account_info_response_format, build_request_body, complete_prompt,
+    extracted_field_values, load_prompt_template, parse_account_info, request_content_text
+)
+from aitest_logs import build_error_log, build_log, load_test_case, write_log
+from async_http import AsyncHTTPClient, DataCallback, HTTPClientError, HTTPResponse
+from chunked_extraction import WindowSettings, merge_accounts, split_windows
+from coalescing_gateway import RequestCoalescer
+from experiment_engine import (
+    Backend, DEFAULT_RUN_TIMEOUT, ExperimentJob, JobResult, chat_completions_url, register_backend
+)
+from input_compaction import compact_text, compaction_report, compaction_stats
+from log_layout import LAYOUT_FLAT
+from rate_limiter import DEFAULT_MAX_THROTTLE_RETRIES, SharedRateLimiter, send_with_throttle
+from request_hedging import RequestHedger, hedge_key
+from request_metrics import RequestMetricsWriter, message_from_body, metrics_record, request_cell
+from streaming_extraction import StreamTimer
+from response_cache import CacheMiss, ResponseCache
+from two_steps_extraction import (
+    STEP_MAIN_CATEGORY, STEP_SUB_CATEGORY, CategoryNotFound, StepMemo, convert_to_account, extraction_prompt,
+    extraction_response_format, judged_category, main_category_prompt, main_category_response_format,
+    parse_json_object, sub_category_prompt, sub_category_response_format, two_steps_category
+)
+
+DEFAULT_MAX_CONNECTIONS = 64
+STRUCTURED_OUTPUT_OFF = "off"
+STRUCTURED_OUTPUT_JSON_SCHEMA = "json_schema"
+STRUCTURED_OUTPUT_MODES = (STRUCTURED_OUTPUT_OFF, STRUCTURED_OUTPUT_JSON_SCHEMA)
+# response_format（json_schema）に対応していないサーバーが返すステータス
+RESPONSE_FORMAT_UNSUPPORTED_STATUSES = (400, 422, 501)
+STREAM_OPTIONS = {"stream": True, "stream_options": {"include_usage": True}}
+
+
+@dataclass
+class HTTPOptions:
+    """
+    HTTPバックエンドのみで使える機能の設定（指定しない機能はNone / 無効）
+    作成時に機能どうしの組み合わせを検証し、使えない組み合わせはValueErrorとする
+    """
+    cache: Optional[ResponseCache] = None
+    rate_limiter: Optional[SharedRateLimiter] = None
+    max_throttle_retries: int = DEFAULT_MAX_THROTTLE_RETRIES
+    coalescer: Optional[RequestCoalescer] = None
+    step_memo: Optional[StepMemo] = None
+    sampling: Optional[Dict] = None
+    request_metrics: Optional[RequestMetricsWriter] = None
+    structured_output: str = STRUCTURED_OUTPUT_OFF
+    hedger: Optional[RequestHedger] = None
+    hedge_url: Optional[str] = None
+    streaming: bool = False
+    input_compaction: Optional[Sequence[str]] = None
+    chunking: Optional[WindowSettings] = None
+
+    def __post_init__(self):
+        self.sampling = dict(self.sampling or {})
+        self.input_compaction = list(self.input_compaction) if self.input_compaction else None
+        if self.structured_output not in STRUCTURED_OUTPUT_MODES:
+            raise ValueError(f"構造化出力の指定が不正です: {self.structured_output}")
+        if self.hedge_url and self.hedger is None:
+            raise ValueError("ヘッジの送信先はヘッジを有効にした場合のみ指定できます")
+        if self.streaming and (self.hedger is not None or self.coalescer is not None):
+            raise ValueError("ストリーミングはヘッジ・同一リクエストの合流と同時に使用できません（受信時刻を1つのリクエストで計測するため）")
+        if self.streaming and self.chunking is not None:
+            raise ValueError("ストリーミングはウィンドウ分割と同時に使用できません")
+
+
+def structured_output_report(summary: Dict) -> Optional[str]:
+    """サマリーのstructured_outputを実験終了時の表示の1行にする"""
+    return (f"構造化出力: {summary['mode']}, {summary['requests']}件 "
+            f"(response_formatなしで送り直し {summary['fallbacks']}件"
+            f"{'' if summary['supported'] else ', サーバー未対応'})")
+
+
+# HTTPBackend.summary()の項目ごとの、実験終了時の表示の1行を作る関数（表示しない場合はNoneを返す）
+FEATURE_REPORTS: Dict[str, Callable[[Dict], Optional[str]]] = {
+    'cache': ResponseCache.report,
+    'throttle': SharedRateLimiter.report,
+    'coalesce': RequestCoalescer.report,
+    'step_memo': StepMemo.report,
+    'structured_output': structured_output_report,
+    'hedge': RequestHedger.report,
+    'input_compaction': compaction_report,
+    'chunked': WindowSettings.report,
+}
+
+
+class ChatCompletionError(Exception):
+    """ExternalLLMError / ExtractionErrorに相当する失敗（error_typeとai_responseをログに残す）"""
+
+    def __init__(self, message: str, error_type: str = "ExternalLLMError", ai_response: Optional[str] = None):
+        super().__init__(message)
+        self.error_type = error_type
+        self.ai_response = ai_response
+
+
+def message_content(response: HTTPResponse) -> str:
+    """ExternalLLMClientと同じ規則でレスポンスからchoices[0].message.contentを取り出す（SSEの場合はdeltaを連結）"""
+    if response.status != 200:
+        raise ChatCompletionError(f"HTTPエラー: {response.status}")
+    if "text/event-stream" in response.headers.get("content-type", ""):
+        content, _ = message_from_body(response.body)
+        if content is None:
+            raise ChatCompletionError("レスポンスにコンテンツが含まれていません")
+        return content
+    try:
+        data = response.json()
+    except ValueError:
+        raise ChatCompletionError("無効なレスポンス形式です")
+    if not isinstance(data, dict):
+        raise ChatCompletionError("無効なレスポンス形式です")
+    try:
+        content = data["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        content = None
+    if not isinstance(content, str):
+        raise ChatCompletionError("レスポンスにコンテンツが含まれていません")
+    return content
+
+
+@register_backend
+class HTTPBackend(Backend):
+    """
+    @ai[2026-10-19 17:00] OpenAI互換APIへ直接リクエストするバックエンド（JSON方式のみ、simple / two-stepsモード）
+    意図: cold_startの扱いはSwiftCLIBackendと同じく、ウォームアップしていない場合のエンドポイントへの最初のリクエストのみ
+    """
+    name = "http"
+
+    def __init__(self, external_llm_url: str, external_llm_model: str, endpoint_warmup: int = 0,
+                 assume_warm: bool = False, max_connections: int = DEFAULT_MAX_CONNECTIONS,
+                 default_timeout: float = DEFAULT_RUN_TIMEOUT, log_layout: str = LAYOUT_FLAT,
+                 api_key: str = DEFAULT_API_KEY, options: Optional[HTTPOptions] = None):
+        self.external_llm_url = external_llm_url
+        self.external_llm_model = external_llm_model
+        self.url = chat_completions_url(external_llm_url)
+        self.endpoint_warmup = endpoint_warmup
+        self.endpoint_warm = assume_warm
+        self.max_connections = max_connections
+        self.default_timeout = default_timeout
+        self.log_layout = log_layout
+        self.api_key = api_key
+        self.options = options or HTTPOptions()
+        self.structured_output_supported = True
+        self.structured_requests = 0
+        self.structured_fallbacks = 0
+        self.hedge_url = chat_completions_url(self.options.hedge_url) if self.options.hedge_url else self.url
+        self.compaction_totals = {'documents': 0, 'original_chars': 0, 'compacted_chars': 0}
+        self.chunk_totals = {'cells': 0, 'windows': 0, 'failed_windows': 0, 'conflicting_fields': 0}
+        self.client: Optional[AsyncHTTPClient] = None
+        self._tasks: set = set()
+
+    def describe(self) -> Dict[str, str]:
+        options = self.options
+        description = {'バックエンド': 'Python HTTP（Swift起動なし）', '外部LLM URL': self.external_llm_url,
+                       '外部LLM モデル': self.external_llm_model, '最大同時接続数': str(self.max_connections)}
+        if options.cache is not None:
+            description['応答キャッシュ'] = f"{options.cache.cache_dir} ({options.cache.mode})"
+        if options.rate_limiter is not None:
+            description['レート制限'] = (f"{options.rate_limiter.requests_per_second or '-'}リクエスト/秒, "
+                                    f"{options.rate_limiter.tokens_per_minute or '-'}トークン/分")
+        if options.coalescer is not None:
+            description['同一リクエストの合流'] = options.coalescer.mode
+        if options.step_memo is not None:
+            description['カテゴリ判定のメモ'] = options.step_memo.memo_dir
+        if options.sampling:
+            description['サンプリング設定'] = json.dumps(options.sampling, ensure_ascii=False)
+        if options.structured_output != STRUCTURED_OUTPUT_OFF:
+            description['構造化出力'] = options.structured_output
+        if options.hedger is not None:
+            description['ヘッジ'] = (f"p{options.hedger.quantile * 100:g}超過で複製（上限 {options.hedger.max_hedge_rate:.0%}）"
+                                  + (f" → {self.hedge_url}" if self.hedge_url != self.url else ""))
+        if options.streaming:
+            description['ストリーミング'] = "SSE（simpleモード、最初のトークン・各項目までの時間を記録）"
+        if options.input_compaction is not None:
+            description['テストデータの圧縮'] = ", ".join(options.input_compaction)
+        if options.chunking is not None:
+            description['ウィンドウ分割'] = (f"{options.chunking.window_chars}文字（重なり {options.chunking.overlap_chars}文字）、"
+                                       f"simpleモードのみ")
+        return description
+
+    def headers(self, run: Optional[int] = None, cell: Optional[str] = None) -> Dict[str, str]:
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {self.api_key}"}
+        if run is not None:
+            headers["X-AITest-Run"] = str(run)
+        if cell is not None:
+            headers["X-AITest-Cell"] = cell
+        return headers
+
+    def request_body(self, prompt: str, response_format: Optional[Dict] = None) -> Dict:
+        """
+        ExternalLLMClient.createRequestBodyと同じボディ（samplingの指定があれば上書き）
+        構造化出力が有効で、サーバーが対応している場合はresponse_formatを加える
+        """
+        body = build_request_body(self.external_llm_model, prompt, **self.options.sampling)
+        if (response_format is not None and self.options.structured_output != STRUCTURED_OUTPUT_OFF
+                and self.structured_output_supported):
+            body["response_format"] = response_format
+        return body
+
+    async def prepare(self):
+        self.client = AsyncHTTPClient(max_connections=self.max_connections)
+        if self.endpoint_warm or self.endpoint_warmup <= 0:
+            return
+        print(f"🔥 エンドポイントのウォームアップ: {self.endpoint_warmup}回（結果は破棄されます）")
+        body = json.dumps(build_request_body(self.external_llm_model, "ping", max_tokens=16)).encode('utf-8')
+        for i in range(1, self.endpoint_warmup + 1):
+            try:
+                response = await self.client.request("POST", self.url, body, self.headers(), timeout=self.default_timeout)
+                print(f"   🔥 ウォームアップ {i}/{self.endpoint_warmup} 完了: {response.total_time:.3f}秒 (HTTP {response.status})")
+                self.endpoint_warm = True
+            except HTTPClientError as e:
+                print(f"   ⚠️ ウォームアップ {i}/{self.endpoint_warmup} 失敗: {e}")
+
+    async def send(self, body: Dict, timeout: Optional[float], sample: Optional[int] = None,
+                   headers: Optional[Dict[str, str]] = None,
+                   on_data: Optional[DataCallback] = None) -> Tuple[str, HTTPResponse]:
+        """
+        リクエストを送り、応答本文のcontentを返す（後続のバックエンドが送信処理だけを差し替えられるようにする）
+        キャッシュ使用時はsample番目の記録済み応答を返し、なければ送信して記録する
+        on_dataは最初に送ったリクエスト（ヘッジの複製を除く）の本文を受信するたびに呼ぶ
+        """
+        if self.options.cache is not None:
+            try:
+                cached = await asyncio.to_thread(self.options.cache.lookup, body, sample)
+            except CacheMiss as e:
+                raise ChatCompletionError(str(e), error_type="CacheMiss")
+            if cached is not None:
+                cached.cached = True
+                return message_content(cached), cached
+        async def post(request_body: Dict) -> HTTPResponse:
+            received_at, start_time = time.time(), time.perf_counter()
+
+            async def send_to(attempt: int) -> HTTPResponse:
+                return await send_with_throttle(self.client, self.hedge_url if attempt else self.url, request_body,
+                                                headers or self.headers(), timeout, self.options.rate_limiter,
+                                                self.options.max_throttle_retries, on_data=None if attempt else on_data)
+
+            if self.options.hedger is not None:
+                response = await self.options.hedger.run(hedge_key((headers or {}).get("X-AITest-Cell")), send_to)
+            else:
+                response = await send_to(0)
+            if self.options.request_metrics is not None:
+                run = (headers or {}).get("X-AITest-Run")
+                self.options.request_metrics.write(metrics_record(
+                    request_body, response, None, received_at, time.perf_counter() - start_time,
+                    run=int(run) if run else None, cell=(headers or {}).get("X-AITest-Cell"),
+                    request_bytes=len(json.dumps(request_body, ensure_ascii=False).encode('utf-8'))))
+            return response
+
+        async def post_structured() -> HTTPResponse:
+            if "response_format" not in body:
+                return await post(body)
+            self.structured_requests += 1
+            response = await post(body)
+            if response.status not in RESPONSE_FORMAT_UNSUPPORTED_STATUSES:
+                return response
+            fallback = await post({key: value for key, value in body.items() if key != "response_format"})
+            self.structured_fallbacks += 1
+            if fallback.status == 200 and self.structured_output_supported:
+                self.structured_output_supported = False
+                print(f"⚠️ サーバーがresponse_formatに対応していないため、構造化出力なしで送信します "
+                      f"(HTTP {response.status})")
+            return fallback
+
+        try:
+            if self.options.coalescer is not None:
+                response, _ = await self.options.coalescer.run(body, post_structured)
+            else:
+                response = await post_structured()
+        except HTTPClientError as e:
+            raise ChatCompletionError(str(e), error_type="URLError")
+        if self.options.cache is not None:
+            await asyncio.to_thread(self.options.cache.store, body, response, sample)
+        return message_content(response), response
+
+    async def timed_send(self, body: Dict, timeout: Optional[float], sample: Optional[int],
+                         headers: Dict[str, str]) -> Tuple[str, float]:
+        """sendしてcontentと所要時間を返す（スロットリングの待ち時間を除き、再生した応答は記録時の応答時間とする）"""
+        start_time = time.perf_counter()
+        content, response = await self.send(body, timeout, sample=sample, headers=headers)
+        elapsed = time.perf_counter() - start_time - response.throttle_delay
+        if response.cached:
+            elapsed += response.total_time
+        return content, elapsed
+
+    async def judge_category(self, step: str, key: str, document: str, prompt: str, response_format: Dict,
+                             timeout: Optional[float], run: int, headers: Dict[str, str], timing: Dict,
+                             timing_key: str) -> str:
+        """Step 1a/1bの判定（step_memo指定時はメモを参照し、メモから取得した場合の所要時間は0とする）"""
+        body = self.request_body(prompt, response_format)
+
+        async def judge() -> Tuple[str, str]:
+            content, timing[f"{timing_key}_time"] = await self.timed_send(body, timeout, run - 1, headers)
+            value = judged_category(content, key)
+            if value is None:
+                raise ChatCompletionError("無効なJSON形式です", error_type="ExtractionError", ai_response=content)
+            return value, content
+
+        if self.options.step_memo is None:
+            value, _ = await judge()
+            return value
+        value, memoized = await self.options.step_memo.judge(step, document, body, judge)
+        if memoized:
+            timing[f"{timing_key}_time"] = 0.0
+        timing[f"{timing_key}_memoized"] = memoized
+        return value
+
+    def document_text(self, text: str) -> Tuple[str, Optional[Dict]]:
+        """プロンプトに添付するテストデータと、ログのinput_compaction（圧縮しない場合はNone）"""
+        if self.options.input_compaction is None:
+            return text, None
+        compacted = compact_text(text, self.options.input_compaction)
+        stats = compaction_stats(text, compacted)
+        stats["steps"] = self.options.input_compaction
+        self.compaction_totals['documents'] += 1
+        self.compaction_totals['original_chars'] += stats["original_chars"]
+        self.compaction_totals['compacted_chars'] += stats["compacted_chars"]
+        return compacted, stats
+
+    async def extract_two_steps(self, job: ExperimentJob, text: str, timeout: Optional[float], run: int,
+                                headers: Dict[str, str], timing: Dict) -> Tuple[Dict, Dict[str, str], str]:
+        """TwoStepsProcessorと同じ3ステップで抽出し、(AccountInfo相当の辞書, two_steps_category, Step 2の応答)を返す"""
+        main_category = await self.judge_category(STEP_MAIN_CATEGORY, "mainCategory", text,
+                                                  main_category_prompt(text, job.language),
+                                                  main_category_response_format(), timeout, run, headers, timing, "step1a")
+        sub_category = await self.judge_category(STEP_SUB_CATEGORY, "subCategory", text,
+                                                 sub_category_prompt(text, main_category, job.language),
+                                                 sub_category_response_format(main_category), timeout, run, headers, timing, "step1b")
+        body = self.request_body(extraction_prompt(text, sub_category, job.language),
+                                 extraction_response_format(sub_category, job.language))
+        content, timing["step2_time"] = await self.timed_send(body, timeout, run - 1, headers)
+        values = parse_json_object(content)
+        if values is None:
+            raise ChatCompletionError("無効なJSON形式です", error_type="ExtractionError", ai_response=content)
+        return convert_to_account(values, sub_category), two_steps_category(main_category, sub_category), content
+
+    async def extract_cell(self, job: ExperimentJob, level: int, run: int, output_dir: str,
+                           timeout: Optional[float]) -> str:
+        """1セル分のリクエスト・解析・採点を行い、ログ（正常またはエラー）を書き込んでパスを返す"""
+        test_case = load_test_case(job.testcase, level)
+        text, compaction = self.document_text(test_case.text)
+        if job.mode == "two-steps":
+            return await self.extract_two_steps_cell(job, test_case, text, compaction, run, output_dir, timeout)
+        if self.options.chunking is not None and len(text) > self.options.chunking.window_chars:
+            return await self.extract_chunked_cell(job, test_case, text, compaction, run, output_dir, timeout)
+        cold_start = not self.endpoint_warm
+        self.endpoint_warm = True
+        start_time = time.perf_counter()
+        timer = StreamTimer(start_time) if self.options.streaming else None
+        stream_timing = None
+        try:
+            body = self.request_body(complete_prompt(load_prompt_template(job.algo, job.method, job.language),
+                                                     text, job.language),
+                                     account_info_response_format())
+            if timer is not None:
+                body.update(STREAM_OPTIONS)
+            headers = self.headers(run, request_cell(job.testcase, job.algo, job.method, job.language, level))
+            content, response = await self.send(body, timeout, sample=run - 1, headers=headers,
+                                                on_data=timer.on_data if timer is not None else None)
+            if timer is not None and not response.cached:
+                stream_timing = timer.timing(offset=response.throttle_delay)
+            if response.cached:
+                start_time -= response.total_time
+            start_time += response.throttle_delay
+            account = parse_account_info(content)
+            if account is None:
+                raise ChatCompletionError("無効なJSON形式です", error_type="ExtractionError", ai_response=content)
+        except (ChatCompletionError, PromptTemplateNotFound) as e:
+            log = build_error_log(test_case, job.algo, job.method, job.language, str(e),
+                                  time.perf_counter() - start_time, cold_start=cold_start,
+                                  error_type=getattr(e, 'error_type', "ExtractionError"),
+                                  ai_response=getattr(e, 'ai_response', None))
+            if stream_timing is not None:
+                log["stream_timing"] = stream_timing
+            if compaction is not None:
+                log["input_compaction"] = compaction
+            return write_log(job.log_path(output_dir, level, run, error=True, layout=self.log_layout), log)
+
+        log = build_log(test_case, job.algo, job.method, job.language, extracted_field_values(account),
+                        time.perf_counter() - start_time, cold_start=cold_start,
+                        request_content=request_content_text(body))
+        if stream_timing is not None:
+            log["stream_timing"] = stream_timing
+        if compaction is not None:
+            log["input_compaction"] = compaction
+        return write_log(job.log_path(output_dir, level, run, layout=self.log_layout), log)
+
+    async def extract_chunked_cell(self, job: ExperimentJob, test_case, text: str, compaction: Optional[Dict],
+                                   run: int, output_dir: str, timeout: Optional[float]) -> str:
+        """ウィンドウに分けて並行して抽出し、統合した結果を採点する（ログにはchunked_extractionを追加）"""
+        level = test_case.level
+        cold_start = not self.endpoint_warm
+        self.endpoint_warm = True
+        headers = self.headers(run, request_cell(job.testcase, job.algo, job.method, job.language, level))
+        windows = split_windows(text, self.options.chunking)
+        chunked: Dict = dict(self.options.chunking.to_dict(), windows=len(windows), window_times=[None] * len(windows),
+                             failed_windows=0, conflicts={})
+        bodies: List[Dict] = []
+        start_time = time.perf_counter()
+
+        async def extract_window(index: int, body: Dict) -> str:
+            content, chunked["window_times"][index] = await self.timed_send(body, timeout, run - 1, headers)
+            return content
+
+        try:
+            template = load_prompt_template(job.algo, job.method, job.language)
+            bodies = [self.request_body(complete_prompt(template, window, job.language), account_info_response_format())
+                      for window in windows]
+            results = await asyncio.gather(*(extract_window(index, body) for index, body in enumerate(bodies)),
+                                           return_exceptions=True)
+            for result in results:
+                if isinstance(result, BaseException) and not isinstance(result, ChatCompletionError):
+                    raise result
+            accounts = [parse_account_info(result) if isinstance(result, str) else None for result in results]
+            chunked["failed_windows"] = sum(1 for account in accounts if account is None)
+            self.chunk_totals['cells'] += 1
+            self.chunk_totals['windows'] += len(windows)
+            self.chunk_totals['failed_windows'] += chunked["failed_windows"]
+            if chunked["failed_windows"] == len(windows):
+                raise next((result for result in results if isinstance(result, ChatCompletionError)),
+                           ChatCompletionError("無効なJSON形式です", error_type="ExtractionError",
+                                               ai_response=results[0]))
+        except (ChatCompletionError, PromptTemplateNotFound) as e:
+            log = build_error_log(test_case, job.algo, job.method, job.language, str(e),
+                                  time.perf_counter() - start_time, cold_start=cold_start,
+                                  error_type=getattr(e, 'error_type', "ExtractionError"),
+                                  ai_response=getattr(e, 'ai_response', None))
+            log["chunked_extraction"] = chunked
+            if compaction is not None:
+                log["input_compaction"] = compaction
+            return write_log(job.log_path(output_dir, level, run, error=True, layout=self.log_layout), log)
+
+        account, chunked["conflicts"] = merge_accounts(accounts)
+        self.chunk_totals['conflicting_fields'] += len(chunked["conflicts"])
+        extraction_time = max(elapsed for elapsed in chunked["window_times"] if elapsed is not None)
+        log = build_log(test_case, job.algo, job.method, job.language, extracted_field_values(account),
+                        extraction_time, cold_start=cold_start,
+                        request_content="\n".join(request_content_text(body) for body in bodies))
+        log["chunked_extraction"] = chunked
+        if compaction is not None:
+            log["input_compaction"] = compaction
+        return write_log(job.log_path(output_dir, level, run, layout=self.log_layout), log)
+
+    async def extract_two_steps_cell(self, job: ExperimentJob, test_case, text: str, compaction: Optional[Dict],
+                                     run: int, output_dir: str, timeout: Optional[float]) -> str:
+        """two-stepsモードの1セル分（ログにはSwift版のtwo_steps_categoryに加えてステップ別のtwo_steps_timingを記録）"""
+        level = test_case.level
+        cold_start = not self.endpoint_warm
+        self.endpoint_warm = True
+        headers = self.headers(run, request_cell(job.testcase, job.algo, job.method, job.language, level))
+        timing: Dict = {"step1a_time": None, "step1b_time": None, "step2_time": None,
+                        "step1a_memoized": False, "step1b_memoized": False}
+        start_time = time.perf_counter()
+        try:
+            account, category, content = await self.extract_two_steps(job, text, timeout, run, headers, timing)
+        except (ChatCompletionError, CategoryNotFound) as e:
+            log = build_error_log(test_case, job.algo, job.method, job.language, str(e),
+                                  time.perf_counter() - start_time, cold_start=cold_start,
+                                  error_type=getattr(e, 'error_type', "ExtractionError"),
+                                  ai_response=getattr(e, 'ai_response', None))
+            log["two_steps_timing"] = timing
+            if compaction is not None:
+                log["input_compaction"] = compaction
+            return write_log(job.log_path(output_dir, level, run, error=True, layout=self.log_layout), log)
+
+        extraction_time = timing["step1a_time"] + timing["step1b_time"] + timing["step2_time"]
+        log = build_log(test_case, job.algo, job.method, job.language, extracted_field_values(account),
+                        extraction_time, cold_start=cold_start, request_content=content,
+                        two_steps_category=category)
+        log["two_steps_timing"] = timing
+        if compaction is not None:
+            log["input_compaction"] = compaction
+        return write_log(job.log_path(output_dir, level, run, layout=self.log_layout), log)
+
+    async def run(self, job: ExperimentJob, output_dir: str, timeout: float) -> JobResult:
+        start_time = time.time()
+        if job.method != "json" or job.mode not in ("simple", "two-steps"):
+            return JobResult(job=job, success=False, elapsed=0.0, timeout=timeout, returncode=1,
+                             error=f"HTTPバックエンドはjson方式（simple / two-stepsモード）のみ対応しています（{job.method}, {job.mode}）")
+
+        # タイムアウトはジョブ単位で管理し、打ち切ったセルはSwift版のプロセス強制終了と同様にログを残さない
+        tasks = [asyncio.ensure_future(self.extract_cell(job, level, run, output_dir, None))
+                 for level, run in job.cells()]
+        self._tasks.update(tasks)
+        try:
+            done, pending = await asyncio.wait(tasks, timeout=timeout)
+        finally:
+            self._tasks.difference_update(tasks)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        log_files: List[str] = [task.result() for task in done if not task.cancelled() and task.exception() is None]
+        errors = [str(task.exception()) for task in done if not task.cancelled() and task.exception() is not None]
+        elapsed = time.time() - start_time
+        if pending:
+            return JobResult(job=job, success=False, elapsed=elapsed, timeout=timeout, timed_out=True,
+                             error=f"タイムアウト ({timeout:.0f}秒)", log_files=log_files)
+        return JobResult(job=job, success=not errors, elapsed=elapsed, timeout=timeout,
+                         returncode=0 if not errors else 1, error="; ".join(errors)[-500:], log_files=log_files)
+
+    def cancel_all(self):
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def close(self):
+        if self.client is not None:
+            await self.client.close()
+        if self.options.cache is not None:
+            await asyncio.to_thread(self.options.cache.evict)
+
+    def summary(self) -> Dict:
+        options = self.options
+        summary = {'http': self.client.stats() if self.client is not None else None}
+        if options.cache is not None:
+            summary['cache'] = options.cache.summary()
+        if options.rate_limiter is not None:
+            summary['throttle'] = options.rate_limiter.summary()
+        if options.coalescer is not None:
+            summary['coalesce'] = options.coalescer.summary()
+        if options.step_memo is not None:
+            summary['step_memo'] = options.step_memo.summary()
+        if options.structured_output != STRUCTURED_OUTPUT_OFF:
+            summary['structured_output'] = {'mode': options.structured_output,
+                                            'supported': self.structured_output_supported,
+                                            'requests': self.structured_requests,
+                                            'fallbacks': self.structured_fallbacks}
+        if options.hedger is not None:
+            summary['hedge'] = options.hedger.summary()
+        if options.input_compaction is not None:
+            totals = self.compaction_totals
+            summary['input_compaction'] = dict(totals, steps=options.input_compaction, char_reduction=(
+                1 - totals['compacted_chars'] / totals['original_chars'] if totals['original_chars'] else 0.0))
+        if options.chunking is not None:
+            summary['chunked'] = dict(self.chunk_totals, **options.chunking.to_dict())
+        return summary
+
+    def report(self, stats: Dict) -> List[str]:
+        lines = [FEATURE_REPORTS[key](value) for key, value in stats.items() if key in FEATURE_REPORTS and value]
+        return [line for line in lines if line]
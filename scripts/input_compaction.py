@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 05:30] プロンプトに添付するテストデータの圧縮（前処理）
+目的: OCRテキストや音声認識の書き起こしに含まれるレイアウト由来の空白・罫線・重複行・画面の定型文・言いよどみを
+      プロンプトを組み立てる前に取り除き、プレフィルのトークン数を減らす
+背景: Tests/TestData/OCRText や VoiceRecognition のテストデータは、画面のボタン名（コピー、表示 など）や
+      「えー」「あの」のような抽出に関係のない部分が多く、そのままプロンプトに添付していた
+意図: 次の手順を決定的に（同じ入力には常に同じ出力で）適用する。各手順は個別に無効化できる
+      - whitespace: 行末の空白を削除し、連続する空白（全角を含む）・タブを1つにまとめ、連続する空行を1行にする
+      - ruling_lines: 記号のみで3文字以上の行（----- や ＝＝＝ など）を削除する（-----BEGIN ...----- のような文字を含む行は残す）
+      - duplicate_lines: 2回目以降に現れる同じ内容の行を削除する（空行は対象外）
+      - boilerplate: 画面の操作ボタンなどの定型行（BOILERPLATE_LINES / BOILERPLATE_PATTERNS）と、
+        空白で区切られた言いよどみ（FILLER_WORDS）を削除する
+      HTTPバックエンドのinput_compaction（run_external_llm_experiment.pyの --compact-input）で、
+      simple / two-stepsモードのプロンプトに添付する前のテストデータに適用し、ログのinput_compactionに文字数を記録する
+      本スクリプトを直接実行すると、テストデータ（OCRTextを含む）の圧縮前後の文字数・行数を表示する（サーバー不要）
+      実験での効果（入力トークン数・抽出時間・正規化スコアの変化）は compaction_comparison.py で比較する
+
+使用例:
+    python3 scripts/input_compaction.py
+    python3 scripts/input_compaction.py --show Tests/TestData/OCRText/accoca_ocr.txt
+    python3 scripts/run_external_llm_experiment.py --backend http --external-llm-url http://host:8000/v1 \\
+        --external-llm-model gpt-oss-20b --compact-input
+"""
+
+import argparse
+import os
+import re
+from typing import Dict, List, Optional, Sequence
+
+from aitest_logs import LEVEL_NAMES, TEST_DATA_DIR, TESTCASE_DIRS, parse_test_data
+
+STEP_WHITESPACE = "whitespace"
+STEP_RULING_LINES = "ruling_lines"
+STEP_DUPLICATE_LINES = "duplicate_lines"
+STEP_BOILERPLATE = "boilerplate"
+COMPACTION_STEPS = [STEP_WHITESPACE, STEP_RULING_LINES, STEP_DUPLICATE_LINES, STEP_BOILERPLATE]
+
+OCR_TEXT_DIR = TEST_DATA_DIR / "OCRText"
+
+# スクリーンショットのOCRに含まれる画面の操作ボタン・見出し（行全体が一致する場合のみ削除）
+BOILERPLATE_LINES = {
+    "閉じる", "編集", "完了", "キャンセル", "保存", "戻る", "共有", "削除", "コピー", "表示", "表示 コピー",
+    "この設定を変更する",
+}
+BOILERPLATE_PATTERNS = [
+    re.compile(r"^写真[（(]\d+[)）]$"),
+    re.compile(r"^この会話で新しいメッセージが投稿されるたびに通知が届きます。.*$"),
+]
+# 音声認識の書き起こしの言いよどみ（前後が空白・行頭・行末の場合のみ削除）
+FILLER_WORDS = ["えーっと", "えーと", "えっと", "えー", "あのー", "あの", "うーん", "まあ", "なんか"]
+
+_SPACES_PATTERN = re.compile(r"[ \t　]+")
+_RULING_LINE_PATTERN = re.compile(r"^[-=_~*#+|.・･…─━═＝－ー＿〜※]{3,}$")
+_FILLER_PATTERN = re.compile(r"(?:(?<=\s)|^)(?:" + "|".join(map(re.escape, FILLER_WORDS)) + r")(?=\s|$)",
+                             re.MULTILINE)
+
+
+def compact_text(text: str, steps: Sequence[str] = COMPACTION_STEPS) -> str:
+    """テストデータを圧縮（stepsに含まれる手順のみ、COMPACTION_STEPSの順に適用）"""
+    lines = text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    if STEP_BOILERPLATE in steps:
+        lines = [_FILLER_PATTERN.sub("", line) for line in lines]
+    if STEP_WHITESPACE in steps:
+        lines = [_SPACES_PATTERN.sub(" ", line).strip() for line in lines]
+    if STEP_RULING_LINES in steps:
+        lines = [line for line in lines if not _RULING_LINE_PATTERN.match(line.strip())]
+    if STEP_DUPLICATE_LINES in steps:
+        seen = set()
+        unique = []
+        for line in lines:
+            key = line.strip()
+            if key and key in seen:
+                continue
+            seen.add(key)
+            unique.append(line)
+        lines = unique
+    if STEP_BOILERPLATE in steps:
+        lines = [line for line in lines if not is_boilerplate(line.strip())]
+    if STEP_WHITESPACE in steps:
+        collapsed: List[str] = []
+        for line in lines:
+            if not line and (not collapsed or not collapsed[-1]):
+                continue
+            collapsed.append(line)
+        lines = collapsed
+    return "\n".join(lines).strip()
+
+
+def is_boilerplate(line: str) -> bool:
+    return line in BOILERPLATE_LINES or any(pattern.match(line) for pattern in BOILERPLATE_PATTERNS)
+
+
+def compaction_stats(original: str, compacted: str) -> Dict:
+    """ログのinput_compaction"""
+    return {
+        "original_chars": len(original),
+        "compacted_chars": len(compacted),
+        "char_reduction": 1 - len(compacted) / len(original) if original else 0.0,
+    }
+
+
+def compaction_report(summary: Dict) -> Optional[str]:
+    """HTTPバックエンドのサマリーのinput_compactionを実験終了時の表示の1行にする（圧縮していなければNone）"""
+    if not summary['documents']:
+        return None
+    return (f"テストデータの圧縮: {summary['original_chars']} → {summary['compacted_chars']}文字 "
+            f"(-{summary['char_reduction']:.1%}, {summary['documents']}件)")
+
+
+# ---------------------------------------------------------------------------
+# 圧縮前後の確認
+# ---------------------------------------------------------------------------
+
+def default_documents() -> List[str]:
+    """テストケース×レベルのテストデータとOCRTextのすべてのファイル"""
+    paths = [str(TEST_DATA_DIR / directory / f"{LEVEL_NAMES[level]}.txt")
+             for directory in TESTCASE_DIRS.values() for level in LEVEL_NAMES]
+    paths += sorted(str(path) for path in OCR_TEXT_DIR.glob("*.txt"))
+    return [path for path in paths if os.path.exists(path)]
+
+
+def read_document(path: str) -> str:
+    """テストデータを読み込む（先頭の//expectedFieldsのコメントは除く）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        _, text = parse_test_data(f.read())
+    return text
+
+
+def preview(args):
+    total_original = total_compacted = 0
+    print(f"🗜️ テストデータの圧縮（{', '.join(args.steps)}）")
+    for path in args.paths or default_documents():
+        original = read_document(path)
+        compacted = compact_text(original, args.steps)
+        stats = compaction_stats(original, compacted)
+        total_original += stats['original_chars']
+        total_compacted += stats['compacted_chars']
+        print(f"   {os.path.relpath(path)}: {stats['original_chars']} → {stats['compacted_chars']}文字 "
+              f"(-{stats['char_reduction']:.1%}), {len(original.splitlines())} → {len(compacted.splitlines())}行")
+        if args.show:
+            print("-" * 60 + f"\n{compacted}\n" + "-" * 60)
+    if total_original:
+        print(f"   合計: {total_original} → {total_compacted}文字 (-{1 - total_compacted / total_original:.1%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="プロンプトに添付するテストデータの圧縮前後の文字数を表示")
+    parser.add_argument("paths", nargs="*", help="テストデータのファイル（デフォルト: 全テストケースとOCRText）")
+    parser.add_argument("--steps", nargs="+", default=COMPACTION_STEPS, choices=COMPACTION_STEPS,
+                        help="適用する手順（デフォルト: すべて）")
+    parser.add_argument("--show", action="store_true", help="圧縮後のテキストを表示")
+    preview(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
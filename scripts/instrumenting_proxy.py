@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 20:30] 外部LLMへのリクエストを1件ずつ計測するプロキシ
+目的: 抽出時間（extraction_time）を待ち行列・接続・最初の応答まで・本文受信に分解し、トークン数とあわせて実行と対応付ける
+背景: ExternalLLMClientは合計時間しか報告しないため、遅い原因が送信待ち・プレフィル・デコードのどれなのか、
+      また出力トークン数がどれだけだったのかが分からなかった
+意図: AITestAppと推論サーバーの間に置き、chat/completionsへのリクエストごとに次の項目をJSONLへ1行追記する
+      - queue_time: プロキシが受信してから上流への接続を取得するまで（--max-connectionsの待ち）
+      - connect_time / ttfb / total_time: 上流への接続確立・送信から応答ヘッダーまで・接続取得から本文受信完了まで
+        非ストリーミングの応答ではttfbがプレフィル＋デコード、ストリーミングの応答ではほぼプレフィルに相当する
+      - prompt_tokens / completion_tokens: 応答のusage（SSEでは最後のusageチャンク）
+      - run / cell: X-AITest-Run（実行番号）とX-AITest-Cell（ログファイル名のrunより前の部分）ヘッダー
+        ヘッダーがない場合はプロンプトに含まれるテストデータからtestcase・levelを判定する
+      generate_combined_report.pyは実験ディレクトリのrequest_metrics.jsonlを(cell, run)でログに結合する
+
+@ai[2026-10-20 00:30] 応答の長さ（content_chars / payload_chars / reasoning_chars / reasoning_tokens）を記録
+目的: response_length_profiler.pyで、JSON以外の出力（前置き・コードブロックの囲み・分析）にかかったデコード時間を見積もる
+意図: 応答本文は保存せず、文字数だけを記録する。payload_charsはJSONExtractorが解析に使うJSON部分の文字数
+
+@ai[2026-10-20 09:30] 共通の関数を request_metrics.py / metrics_utils.py / document_index.py に移動
+目的: プロキシを汎用の計測プロキシとして保ち、HTTPバックエンドや集計スクリプトがプロキシに依存しないようにする
+意図: 記録の形式（metrics_record / RequestMetricsWriter）と読み込み・集計は request_metrics.py、
+      ヘッダーのないリクエストの判定はコンストラクタのidentifier（CLIではdocument_index.DocumentIndex）で差し替える
+
+使用例:
+    python3 scripts/instrumenting_proxy.py proxy --upstream http://host:8000 --port 8300 \\
+        --output test_logs/202610192030_external_llm/request_metrics.jsonl
+    # AITestApp（Swiftバックエンド）は --external-llm-url http://127.0.0.1:8300/v1 を指定
+    python3 scripts/instrumenting_proxy.py summary test_logs/202610192030_external_llm/request_metrics.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer, HTTPClientError, HTTPRequest, HTTPResponse
+from document_index import DocumentIndex
+from request_metrics import (
+    REQUEST_METRICS_FILE, RequestMetricsWriter, metrics_record, prompt_text, read_request_metrics,
+    summarize_request_metrics
+)
+
+RUN_HEADER = "x-aitest-run"
+CELL_HEADER = "x-aitest-cell"
+
+# プロンプトの本文から (testcase, level) を判定する関数（X-AITest-Cellのないリクエスト用）
+DocumentIdentifier = Callable[[str], Tuple[Optional[str], Optional[int]]]
+
+
+class InstrumentingProxy:
+    """chat/completionsへのリクエストを転送し、時間の内訳・トークン数・ステータスを記録する"""
+
+    def __init__(self, upstream: str, client: AsyncHTTPClient, writer: RequestMetricsWriter,
+                 timeout: Optional[float] = None, identifier: Optional[DocumentIdentifier] = None):
+        self.upstream = upstream.rstrip("/")
+        self.client = client
+        self.writer = writer
+        self.timeout = timeout
+        self.identifier = identifier
+
+    def identify(self, body: Dict) -> Tuple[Optional[str], Optional[int]]:
+        """ヘッダーがない場合に、identifierでプロンプトからtestcase・levelを判定（identifierがなければ判定しない）"""
+        if self.identifier is None:
+            return None, None
+        return self.identifier(prompt_text(body))
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        headers = {name: value for name, value in request.headers.items()
+                   if name not in ("host", "content-length", "connection")}
+        if request.method != "POST" or not request.path.rstrip("/").endswith("/chat/completions"):
+            return (await self.forward(request, headers))[0]
+
+        received_at = time.time()
+        start_time = time.perf_counter()
+        response, error = await self.forward(request, headers)
+        elapsed = time.perf_counter() - start_time
+        try:
+            body = request.json()
+        except ValueError:
+            body = {}
+        self.writer.write(self.record(request, body, response, error, received_at, elapsed))
+        return response
+
+    async def forward(self, request: HTTPRequest, headers: Dict[str, str]) -> Tuple[HTTPResponse, Optional[str]]:
+        try:
+            return await self.client.request(request.method, self.upstream + request.path, request.body or None,
+                                             headers, timeout=self.timeout), None
+        except HTTPClientError as e:
+            return HTTPResponse(502, "Bad Gateway", {"content-type": "application/json"},
+                                json.dumps({"error": {"message": str(e)}}, ensure_ascii=False).encode('utf-8')), str(e)
+
+    def record(self, request: HTTPRequest, body: Dict, response: HTTPResponse, error: Optional[str],
+               received_at: float, elapsed: float) -> Dict:
+        run = request.headers.get(RUN_HEADER, "")
+        cell = request.headers.get(CELL_HEADER)
+        testcase, level = self.identify(body) if not cell else (None, None)
+        return metrics_record(body, response, error, received_at, elapsed, run=int(run) if run.isdigit() else None,
+                              cell=cell, testcase=testcase, level=level, request_bytes=len(request.body))
+
+
+def print_summary(summary: Dict):
+    print(f"📏 リクエスト: {summary['requests']}件 "
+          f"（ステータス: {', '.join(f'{status}={count}' for status, count in sorted(summary['status'].items()))}）")
+    labels = {'queue_time': '送信待ち', 'connect_time': '接続', 'ttfb': '最初の応答まで',
+              'decode_time': '本文受信', 'total_time': '上流の合計'}
+    for name, label in labels.items():
+        stats = summary[name]
+        print(f"   {label}: 平均 {stats['avg']:.3f}秒, p50 {stats['p50']:.3f}秒, p95 {stats['p95']:.3f}秒")
+    print(f"   トークン: プロンプト平均 {summary['prompt_tokens']['avg']:.0f}, "
+          f"出力平均 {summary['completion_tokens']['avg']:.0f} "
+          f"（{summary['completion_tokens_per_second']:.1f}トークン/秒）")
+
+
+async def run_proxy(args):
+    writer = RequestMetricsWriter(args.output)
+    client = AsyncHTTPClient(max_connections=args.max_connections)
+    identifier = None if args.no_identify else DocumentIndex().identify
+    proxy = InstrumentingProxy(args.upstream, client, writer, timeout=args.timeout, identifier=identifier)
+    server = AsyncHTTPServer(proxy.handle, args.host, args.port)
+    url = await server.start()
+    print(f"📏 計測プロキシを起動しました: {url} → {args.upstream}")
+    print(f"   出力: {args.output}")
+    try:
+        await server.serve_forever()
+    finally:
+        await client.close()
+        print(f"\n📏 記録したリクエスト: {writer.records}件")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外部LLMへのリクエストを計測するプロキシ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    proxy_parser = subparsers.add_parser("proxy", help="計測プロキシを起動")
+    proxy_parser.add_argument("--upstream", required=True, help="転送先のエンドポイント（例: http://host:8000）")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    proxy_parser.add_argument("--port", type=int, default=8300, help="待ち受けポート（デフォルト: 8300）")
+    proxy_parser.add_argument("--output", default=REQUEST_METRICS_FILE,
+                              help=f"計測結果のJSONL（追記、デフォルト: {REQUEST_METRICS_FILE}）")
+    proxy_parser.add_argument("--max-connections", type=int, default=64, help="上流への最大同時接続数")
+    proxy_parser.add_argument("--timeout", type=float, help="上流へのリクエストのタイムアウト（秒）")
+    proxy_parser.add_argument("--no-identify", action="store_true",
+                              help="X-AITest-Cellのないリクエストでテストデータからtestcase・levelを判定しない")
+    summary_parser = subparsers.add_parser("summary", help="計測結果の集計を表示")
+    summary_parser.add_argument("path", help="計測結果のJSONL")
+    args = parser.parse_args()
+
+    if args.command == "summary":
+        print_summary(summarize_request_metrics(read_request_metrics(args.path)))
+        return
+    try:
+        asyncio.run(run_proxy(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
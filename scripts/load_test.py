@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 07:30] 推論サーバーの負荷試験（同時実行数の段階的な引き上げ / ポアソン到着）
+目的: ローカルのモデルサーバーの規模を決めるため、同時実行数または到着率を上げてもスループットが伸びなくなる点（ニー）を求める
+背景: scripts/ の実験スクリプトは抽出精度と1セルの時間を測るもので、サーバーの負荷と
+      スループット・レイテンシの関係を測るものがなかった
+意図: テストデータとプロンプトテンプレートから組み立てた実際の抽出リクエスト（build_prompt / build_request_body）を
+      パターン×レベルの順に繰り返し送り、ステップごとに次の指標を記録する
+      - closedモード（--concurrency-levels）: 指定した数のワーカーが応答を受け取るたびに次を送る（クローズドループ）
+      - poissonモード（--arrival-rates）: 指数分布の間隔で応答を待たずに送る（オープンループ。到着率は1秒あたりのリクエスト数）
+      各ステップは --step-duration 秒の間リクエストを送り、送ったリクエストの完了を待ってから次のステップに進む
+      - スループット: 成功したリクエスト数 / ステップの所要時間（最後の応答まで）、出力トークン/秒（usageがある場合）
+      - レイテンシ: 成功したリクエストの送信から応答完了までのp50 / p95 / p99（poissonモードでは接続の空き待ちを含む）
+      - エラー率: HTTPステータスが200以外、または接続エラー・タイムアウトの割合
+      ニーは、エラー率が --max-error-rate 以下のステップのうち、前のステップからの負荷の増加率に対する
+      スループットの増加率（スケーリング効率）が --min-scaling を下回る直前のステップとする
+      （下回らなければ最後のステップ、最初からエラー率を超えた場合はなし）
+      結果は出力ディレクトリのload_test.jsonとload_test.html（スループット・レイテンシのグラフ）に保存する
+
+使用例:
+    python3 scripts/load_test.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --concurrency-levels 1 2 4 8 16 32 64 --step-duration 60
+    python3 scripts/load_test.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --arrival-rates 0.5 1 2 4 8 --step-duration 120 --patterns chat_abs_json voice_strict_json
+"""
+
+import argparse
+import asyncio
+import html
+import itertools
+import json
+import os
+import random
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import DEFAULT_API_KEY, build_prompt, build_request_body
+from async_http import AsyncHTTPClient, HTTPClientError
+from experiment_engine import chat_completions_url, create_experiment_dir, parse_pattern
+from metrics_utils import format_value, percentile
+from request_metrics import request_cell, usage_from_body
+
+MODE_CLOSED = "closed"
+MODE_POISSON = "poisson"
+RESULT_FILE = "load_test.json"
+REPORT_FILE = "load_test.html"
+DEFAULT_TIMEOUT = 300.0
+KNEE_ROW_CLASS = ' class="knee"'
+
+
+def build_request_pool(patterns: List[str], levels: List[int], language: str, model: str) -> List[Tuple[str, bytes]]:
+    """(X-AITest-Cell, リクエストボディ) の一覧（パターン×レベルの順）"""
+    pool = []
+    for pattern in patterns:
+        testcase, algo, method = parse_pattern(pattern)
+        for level in levels:
+            body = build_request_body(model, build_prompt(testcase, algo, method, language, level))
+            pool.append((request_cell(testcase, algo, method, language, level),
+                         json.dumps(body, ensure_ascii=False).encode('utf-8')))
+    return pool
+
+
+class LoadGenerator:
+    """リクエストプールを順に送り、1リクエストごとの結果を記録する"""
+
+    def __init__(self, url: str, pool: List[Tuple[str, bytes]], timeout: float, max_connections: int):
+        self.url = url
+        self.pool = pool
+        self.timeout = timeout
+        self.client = AsyncHTTPClient(max_connections=max_connections)
+        self._next = itertools.cycle(range(len(pool)))
+
+    async def send_one(self, records: List[Dict], step_start: float):
+        cell, body = self.pool[next(self._next)]
+        headers = {"Content-Type": "application/json", "Authorization": f"Bearer {DEFAULT_API_KEY}",
+                   "X-AITest-Cell": cell}
+        start = time.perf_counter()
+        record = {'cell': cell, 'sent_at': start - step_start, 'status': None, 'error': None, 'completion_tokens': None}
+        try:
+            response = await self.client.request("POST", self.url, body, headers, timeout=self.timeout)
+            record['status'] = response.status
+            if response.status == 200:
+                record['completion_tokens'] = (usage_from_body(response.body) or {}).get('completion_tokens')
+            else:
+                record['error'] = f"HTTP {response.status}"
+        except HTTPClientError as e:
+            record['error'] = str(e)
+        record['latency'] = time.perf_counter() - start
+        records.append(record)
+
+    async def closed_step(self, concurrency: int, duration: float) -> Tuple[List[Dict], float]:
+        """concurrency個のワーカーがduration秒の間、応答を受け取るたびに次のリクエストを送る"""
+        records: List[Dict] = []
+        step_start = time.perf_counter()
+
+        async def worker():
+            while time.perf_counter() - step_start < duration:
+                await self.send_one(records, step_start)
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return records, time.perf_counter() - step_start
+
+    async def poisson_step(self, rate: float, duration: float, rng: random.Random) -> Tuple[List[Dict], float]:
+        """duration秒の間、平均rate件/秒のポアソン到着で応答を待たずにリクエストを送る"""
+        records: List[Dict] = []
+        tasks = []
+        step_start = time.perf_counter()
+        next_arrival = rng.expovariate(rate)
+        while next_arrival < duration:
+            delay = next_arrival - (time.perf_counter() - step_start)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(self.send_one(records, step_start)))
+            next_arrival += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+        return records, time.perf_counter() - step_start
+
+    async def close(self):
+        await self.client.close()
+
+
+def step_stats(load: float, records: List[Dict], elapsed: float, duration: float) -> Dict:
+    """1ステップの集計"""
+    latencies = [record['latency'] for record in records if record['error'] is None]
+    tokens = [record['completion_tokens'] for record in records
+              if record['error'] is None and record['completion_tokens'] is not None]
+    errors = len(records) - len(latencies)
+    return {
+        'load': load,
+        'requests': len(records),
+        'successes': len(latencies),
+        'errors': errors,
+        'error_rate': errors / len(records) if records else 0.0,
+        'elapsed': elapsed,
+        'offered_rate': len(records) / duration if duration else None,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'tokens_per_second': sum(tokens) / elapsed if tokens and elapsed else None,
+        'latency': {
+            'mean': sum(latencies) / len(latencies) if latencies else None,
+            'p50': percentile(latencies, 0.50) if latencies else None,
+            'p95': percentile(latencies, 0.95) if latencies else None,
+            'p99': percentile(latencies, 0.99) if latencies else None,
+        },
+        'error_samples': sorted({record['error'] for record in records if record['error']})[:5],
+    }
+
+
+def find_knee(steps: List[Dict], min_scaling: float, max_error_rate: float) -> Dict:
+    """スケーリング効率が閾値を下回る直前（またはエラー率が上限を超える直前）のステップ"""
+    knee: Optional[Dict] = None
+    reason = "last_step"
+    for index, step in enumerate(steps):
+        if step['error_rate'] > max_error_rate:
+            reason = "error_rate"
+            break
+        if knee is not None:
+            load_growth = step['load'] / knee['load'] - 1
+            throughput_growth = step['throughput'] / knee['throughput'] - 1 if knee['throughput'] else 0.0
+            step['scaling_efficiency'] = throughput_growth / load_growth if load_growth > 0 else None
+            if step['scaling_efficiency'] is not None and step['scaling_efficiency'] < min_scaling:
+                reason = "scaling"
+                break
+        knee = step
+    return {
+        'load': knee['load'] if knee else None,
+        'throughput': knee['throughput'] if knee else None,
+        'latency': knee['latency'] if knee else None,
+        'error_rate': knee['error_rate'] if knee else None,
+        'reason': reason if knee else "error_rate",
+        'max_throughput': max((step['throughput'] for step in steps), default=None),
+    }
+
+
+async def run_load_test(args) -> Dict:
+    pool = build_request_pool(args.patterns, args.levels, args.language, args.external_llm_model)
+    mode = MODE_POISSON if args.arrival_rates else MODE_CLOSED
+    loads = args.arrival_rates or args.concurrency_levels
+    max_connections = args.max_connections or (int(max(loads)) if mode == MODE_CLOSED else 256)
+    generator = LoadGenerator(chat_completions_url(args.external_llm_url), pool, args.timeout, max_connections)
+    rng = random.Random(args.seed)
+    unit = "リクエスト/秒" if mode == MODE_POISSON else "並列"
+    print(f"🏋️ 負荷試験を開始します（{mode}, {len(pool)}種類のリクエスト, 1ステップ {args.step_duration:g}秒）")
+    steps = []
+    try:
+        for load in loads:
+            if mode == MODE_POISSON:
+                records, elapsed = await generator.poisson_step(load, args.step_duration, rng)
+            else:
+                records, elapsed = await generator.closed_step(int(load), args.step_duration)
+            step = step_stats(load, records, elapsed, args.step_duration)
+            steps.append(step)
+            latency = step['latency']
+            print(f"   {load:g}{unit}: {step['throughput']:.2f}件/秒, p50 {format_value(latency['p50'], '.2f')}秒, "
+                  f"p95 {format_value(latency['p95'], '.2f')}秒, p99 {format_value(latency['p99'], '.2f')}秒, "
+                  f"エラー率 {step['error_rate']:.1%} ({step['requests']}件)")
+            if step['error_rate'] > args.abort_error_rate:
+                print(f"   ⚠️ エラー率が{args.abort_error_rate:.0%}を超えたため、以降のステップを中止します")
+                break
+    finally:
+        await generator.close()
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'url': args.external_llm_url,
+        'model': args.external_llm_model,
+        'mode': mode,
+        'step_duration': args.step_duration,
+        'patterns': args.patterns,
+        'levels': args.levels,
+        'language': args.language,
+        'min_scaling': args.min_scaling,
+        'max_error_rate': args.max_error_rate,
+        'steps': steps,
+        'knee': find_knee(steps, args.min_scaling, args.max_error_rate),
+    }
+
+
+# ---------------------------------------------------------------------------
+# 出力
+# ---------------------------------------------------------------------------
+
+def generate_html(result: Dict) -> str:
+    """スループット・レイテンシのグラフとステップごとの表（ニーのステップを強調）"""
+    steps, knee = result['steps'], result['knee']
+    load_label = "到着率（リクエスト/秒）" if result['mode'] == MODE_POISSON else "同時実行数"
+    labels = [f"{step['load']:g}" for step in steps]
+    rows = "".join(
+        f"<tr{KNEE_ROW_CLASS if step['load'] == knee['load'] else ''}><td>{step['load']:g}</td>"
+        f"<td>{step['requests']}</td><td>{step['throughput']:.2f}</td><td>{format_value(step['tokens_per_second'], '.1f')}</td>"
+        f"<td>{format_value(step['latency']['p50'], '.3f')}</td><td>{format_value(step['latency']['p95'], '.3f')}</td>"
+        f"<td>{format_value(step['latency']['p99'], '.3f')}</td><td>{step['error_rate']:.1%}</td>"
+        f"<td>{format_value(step.get('scaling_efficiency'), '.2f')}</td></tr>"
+        for step in steps)
+    knee_text = (f"{load_label} {knee['load']:g}: {knee['throughput']:.2f}件/秒, p95 {format_value(knee['latency']['p95'], '.2f')}秒"
+                 if knee['load'] is not None else "なし（最初のステップでエラー率が上限を超えました）")
+    return f"""<!DOCTYPE html>
+<html lang="ja">
+<head>
+    <meta charset="UTF-8">
+    <title>負荷試験レポート</title>
+    <style>
+        body {{ font-family: -apple-system, BlinkMacSystemFont, sans-serif; margin: 20px; background: #f5f5f5; }}
+        .container {{ max-width: 1200px; margin: 0 auto; background: white; padding: 20px; border-radius: 8px; }}
+        .metrics-table {{ width: 100%; border-collapse: collapse; margin: 20px 0; }}
+        .metrics-table th, .metrics-table td {{ border: 1px solid #ddd; padding: 8px; text-align: center; }}
+        .metrics-table th {{ background: #f8f9fa; font-weight: bold; }}
+        .knee {{ background: #fff3cd; font-weight: bold; }}
+        .chart-container {{ position: relative; height: 400px; margin: 20px 0; }}
+        .chart-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(500px, 1fr)); gap: 20px; }}
+    </style>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+</head>
+<body>
+<div class="container">
+    <h1>🏋️ 負荷試験レポート</h1>
+    <p>生成日時: {html.escape(result['timestamp'])} / モデル: {html.escape(str(result['model']))} / モード: {result['mode']}
+       / 1ステップ {result['step_duration']:g}秒</p>
+    <p>パターン: {html.escape(', '.join(result['patterns']))} / レベル: {', '.join(map(str, result['levels']))}</p>
+    <h2>ニー（スループットが伸びなくなる点）</h2>
+    <p>{knee_text}（判定: {knee['reason']}, スケーリング効率の閾値 {result['min_scaling']:g}, エラー率の上限 {result['max_error_rate']:.0%}）</p>
+    <div class="chart-grid">
+        <div class="chart-container"><canvas id="throughputChart"></canvas></div>
+        <div class="chart-container"><canvas id="latencyChart"></canvas></div>
+    </div>
+    <table class="metrics-table">
+        <thead><tr><th>{load_label}</th><th>リクエスト数</th><th>スループット（件/秒）</th><th>出力トークン/秒</th>
+            <th>p50（秒）</th><th>p95（秒）</th><th>p99（秒）</th><th>エラー率</th><th>スケーリング効率</th></tr></thead>
+        <tbody>{rows}</tbody>
+    </table>
+</div>
+<script>
+    new Chart(document.getElementById('throughputChart'), {{
+        type: 'line',
+        data: {{
+            labels: {json.dumps(labels)},
+            datasets: [
+                {{ label: 'スループット（件/秒）', data: {json.dumps([step['throughput'] for step in steps])},
+                   borderColor: 'rgba(0, 123, 255, 0.9)', yAxisID: 'y' }},
+                {{ label: 'エラー率', data: {json.dumps([step['error_rate'] for step in steps])},
+                   borderColor: 'rgba(220, 53, 69, 0.9)', yAxisID: 'y1' }}
+            ]
+        }},
+        options: {{ responsive: true, maintainAspectRatio: false,
+                   scales: {{ x: {{ title: {{ display: true, text: {json.dumps(load_label, ensure_ascii=False)} }} }},
+                             y: {{ beginAtZero: true, title: {{ display: true, text: '件/秒' }} }},
+                             y1: {{ beginAtZero: true, max: 1, position: 'right', grid: {{ drawOnChartArea: false }} }} }} }}
+    }});
+    new Chart(document.getElementById('latencyChart'), {{
+        type: 'line',
+        data: {{
+            labels: {json.dumps(labels)},
+            datasets: [
+                {{ label: 'p50', data: {json.dumps([step['latency']['p50'] for step in steps])}, borderColor: 'rgba(40, 167, 69, 0.9)' }},
+                {{ label: 'p95', data: {json.dumps([step['latency']['p95'] for step in steps])}, borderColor: 'rgba(255, 193, 7, 0.9)' }},
+                {{ label: 'p99', data: {json.dumps([step['latency']['p99'] for step in steps])}, borderColor: 'rgba(220, 53, 69, 0.9)' }}
+            ]
+        }},
+        options: {{ responsive: true, maintainAspectRatio: false,
+                   scales: {{ x: {{ title: {{ display: true, text: {json.dumps(load_label, ensure_ascii=False)} }} }},
+                             y: {{ beginAtZero: true, title: {{ display: true, text: '秒' }} }} }} }}
+    }});
+</script>
+</body>
+</html>
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="推論サーバーの負荷試験（スループットのニーの探索）")
+    parser.add_argument("--external-llm-url", required=True, help="外部LLMサーバーのURL")
+    parser.add_argument("--external-llm-model", required=True, help="外部LLMモデル名")
+    parser.add_argument("--patterns", nargs="+", default=["chat_abs_json", "contract_abs_json", "creditcard_abs_json",
+                                                          "password_abs_json", "voice_abs_json"],
+                        help="リクエストに使うパターン（json方式）")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="使用するレベル")
+    parser.add_argument("--language", default="ja", choices=["ja", "en"], help="プロンプトの言語")
+    load_group = parser.add_mutually_exclusive_group()
+    load_group.add_argument("--concurrency-levels", nargs="+", type=int, default=[1, 2, 4, 8, 16, 32],
+                            help="closedモードの同時実行数のステップ（デフォルト: 1 2 4 8 16 32）")
+    load_group.add_argument("--arrival-rates", nargs="+", type=float,
+                            help="poissonモードの到着率（リクエスト/秒）のステップ（指定した場合はpoissonモード）")
+    parser.add_argument("--step-duration", type=float, default=60.0, help="1ステップでリクエストを送る時間（秒、デフォルト: 60）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"1リクエストのタイムアウト（秒、デフォルト: {DEFAULT_TIMEOUT:g}）")
+    parser.add_argument("--max-connections", type=int,
+                        help="最大同時接続数（デフォルト: closedモードは最大の同時実行数、poissonモードは256）")
+    parser.add_argument("--min-scaling", type=float, default=0.5,
+                        help="ニーの判定に使うスケーリング効率の閾値（負荷の増加率に対するスループットの増加率、デフォルト: 0.5）")
+    parser.add_argument("--max-error-rate", type=float, default=0.05,
+                        help="ニーとみなせるステップのエラー率の上限（デフォルト: 0.05）")
+    parser.add_argument("--abort-error-rate", type=float, default=0.5,
+                        help="このエラー率を超えたら以降のステップを中止（デフォルト: 0.5）")
+    parser.add_argument("--seed", type=int, default=0, help="poissonモードの到着間隔のシード")
+    parser.add_argument("--output-dir", help="結果の出力ディレクトリ（指定しない場合は自動作成）")
+    args = parser.parse_args()
+    loads = args.arrival_rates or args.concurrency_levels
+    if any(load <= 0 for load in loads) or loads != sorted(loads):
+        parser.error("負荷のステップは正の値を昇順で指定してください")
+
+    output_dir = args.output_dir or create_experiment_dir("load_test")
+    os.makedirs(output_dir, exist_ok=True)
+    result = asyncio.run(run_load_test(args))
+    knee = result['knee']
+    if knee['load'] is not None:
+        print(f"\n📈 ニー: {knee['load']:g} ({knee['throughput']:.2f}件/秒, p95 {format_value(knee['latency']['p95'], '.2f')}秒, "
+              f"判定: {knee['reason']}), 最大スループット {knee['max_throughput']:.2f}件/秒")
+    else:
+        print("\n📈 ニー: なし（最初のステップでエラー率が上限を超えました）")
+    with open(os.path.join(output_dir, RESULT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, REPORT_FILE), 'w', encoding='utf-8') as f:
+        f.write(generate_html(result))
+    print(f"💾 結果を保存しました: {os.path.join(output_dir, RESULT_FILE)}, {os.path.join(output_dir, REPORT_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
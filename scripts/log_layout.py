@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 14:00] 実験ログの配置（flat / sharded）と共通の探索処理
+目的: 全ての読み込み処理が同じ関数でログを探索し、フラット配置とシャーディング配置の両方に対応する
+背景: 全ログが1ディレクトリにフラットに置かれるため、数万件規模になると collect_log_files、
+      ExperimentLogMonitor._count_algorithm_logs、レジューム解析、generate_combined_report.main の
+      各globがディレクトリ全体の走査になっていた
+意図: shardedでは {root}/{testcase}/{algo}/level{level}/{ファイル名} に配置し、条件に合うサブディレクトリだけを走査する
+      ファイル名はどちらの配置でも同じ {testcase}_{algo}_{method}_{language}_level{level}_run{run}[_error].json
+      AITestAppには --log-layout sharded（または環境変数AITEST_LOG_LAYOUT）で同じ配置を指定できる
+"""
+
+import os
+import re
+from pathlib import Path
+from typing import Iterator, List, NamedTuple, Optional
+
+LAYOUT_FLAT = "flat"
+LAYOUT_SHARDED = "sharded"
+LAYOUTS = [LAYOUT_FLAT, LAYOUT_SHARDED]
+ENV_LOG_LAYOUT = "AITEST_LOG_LAYOUT"
+
+# 構造化ログのファイル名: {testcase}_{algo}_{method}_{language}_level{level}_run{run}[_error].json
+LOG_FILE_PATTERN = re.compile(
+    r"^(?P<testcase>[^_]+)_(?P<algo>[^_]+)_(?P<method>[^_]+)_(?P<language>[^_]+)"
+    r"_level(?P<level>\d+)_run(?P<run>\d+)(?P<error>_error)?\.json$"
+)
+
+
+class LogFile(NamedTuple):
+    """探索で見つかったログファイル"""
+    path: Path
+    testcase: str
+    algo: str
+    method: str
+    language: str
+    level: int
+    run: int
+    error: bool
+
+    @property
+    def pattern(self) -> str:
+        return f"{self.testcase}_{self.algo}_{self.method}"
+
+
+def log_file_name(testcase: str, algo: str, method: str, language: str, level: int, run: int,
+                  error: bool = False) -> str:
+    suffix = "_error" if error else ""
+    return f"{testcase}_{algo}_{method}_{language}_level{level}_run{run}{suffix}.json"
+
+
+def parse_log_file_name(path) -> Optional[LogFile]:
+    """ファイル名を解析（構造化ログでない場合はNone）"""
+    path = Path(path)
+    match = LOG_FILE_PATTERN.match(path.name)
+    if not match:
+        return None
+    return LogFile(path=path, testcase=match.group('testcase'), algo=match.group('algo'),
+                   method=match.group('method'), language=match.group('language'),
+                   level=int(match.group('level')), run=int(match.group('run')), error=bool(match.group('error')))
+
+
+def shard_dir(root: str, testcase: str, algo: str, level: int, layout: str = LAYOUT_FLAT) -> str:
+    """ログを置くディレクトリ"""
+    if layout == LAYOUT_SHARDED:
+        return os.path.join(root, testcase, algo, f"level{level}")
+    return root
+
+
+def log_path(root: str, testcase: str, algo: str, method: str, language: str, level: int, run: int,
+             error: bool = False, layout: str = LAYOUT_FLAT, create: bool = False) -> str:
+    """ログファイルのパス（create=Trueの場合はディレクトリを作成）"""
+    directory = shard_dir(root, testcase, algo, level, layout)
+    if create:
+        os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, log_file_name(testcase, algo, method, language, level, run, error))
+
+
+def _scan_files(directory: str) -> Iterator[os.DirEntry]:
+    try:
+        with os.scandir(directory) as entries:
+            yield from entries
+    except (FileNotFoundError, NotADirectoryError):
+        return
+
+
+def _matching_dirs(directory: str, value: Optional[str]) -> List[str]:
+    """サブディレクトリのうち、条件（未指定なら全て）に合うもの"""
+    if value is not None:
+        path = os.path.join(directory, value)
+        return [path] if os.path.isdir(path) else []
+    return [entry.path for entry in _scan_files(directory) if entry.is_dir()]
+
+
+def discover_log_files(root, testcase: Optional[str] = None, algo: Optional[str] = None,
+                       method: Optional[str] = None, language: Optional[str] = None,
+                       level: Optional[int] = None, include_errors: bool = True,
+                       include_subexperiments: bool = False) -> List[LogFile]:
+    """
+    構造化ログを探索（フラット配置とシャーディング配置の両方を対象にする）
+    シャーディング配置ではtestcase/algo/levelの条件に合うサブディレクトリだけを走査する
+    include_subexperiments=Trueの場合、{日時}_{実験名}形式の実験サブディレクトリ内も探索する
+    （generate_combined_report.pyの従来の探索範囲）
+    """
+    root = str(root)
+    found: List[LogFile] = []
+
+    def collect(directory: str):
+        for entry in _scan_files(directory):
+            if not entry.name.endswith('.json') or not entry.is_file():
+                continue
+            log = parse_log_file_name(entry.path)
+            if log is None or (log.error and not include_errors):
+                continue
+            if testcase is not None and log.testcase != testcase:
+                continue
+            if algo is not None and log.algo != algo:
+                continue
+            if method is not None and log.method != method:
+                continue
+            if language is not None and log.language != language:
+                continue
+            if level is not None and log.level != level:
+                continue
+            found.append(log)
+
+    # フラット配置
+    collect(root)
+
+    # シャーディング配置: {root}/{testcase}/{algo}/level{level}/
+    level_name = f"level{level}" if level is not None else None
+    for testcase_dir in _matching_dirs(root, testcase):
+        for algo_dir in _matching_dirs(testcase_dir, algo):
+            for level_dir in _matching_dirs(algo_dir, level_name):
+                if os.path.basename(level_dir).startswith("level"):
+                    collect(level_dir)
+
+    if include_subexperiments:
+        for entry in _scan_files(root):
+            if entry.is_dir() and "_" in entry.name and len(entry.name.split("_")) == 2:
+                found.extend(discover_log_files(entry.path, testcase, algo, method, language, level, include_errors))
+
+    return found
+
+
+def detect_layout(root) -> str:
+    """既存ディレクトリの配置を判定（シャーディングされたログが1件でもあればsharded）"""
+    root = str(root)
+    for testcase_dir in _matching_dirs(root, None):
+        for algo_dir in _matching_dirs(testcase_dir, None):
+            if any(os.path.basename(path).startswith("level") for path in _matching_dirs(algo_dir, None)):
+                return LAYOUT_SHARDED
+    return LAYOUT_FLAT
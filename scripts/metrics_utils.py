@@ -0,0 +1,24 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 09:30] 実験スクリプトの集計で共通に使う統計・表示の補助関数
+目的: パーセンタイルの計算を1か所にまとめ、集計の規則がスクリプトごとに異ならないようにする
+背景: percentileは計測プロキシ（instrumenting_proxy.py）にあったため、負荷試験やHTTPバックエンドまで
+      プロキシのモジュールに依存していた
+
+@ai[2026-10-20 10:00] 値がない場合の表示（format_value）を追加
+目的: 各スクリプトに複製されていた _format を1つにまとめ、表示の規則が食い違わないようにする
+"""
+
+from typing import List, Optional
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def format_value(value: Optional[float], spec: str) -> str:
+    """valueをspecの書式で表示（Noneは"-"）"""
+    return format(value, spec) if value is not None else "-"
@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 18:00] OpenAI互換のモック推論サーバー
+目的: 実際のモデルサーバーなしで、外部LLM実験の実行スクリプト・リトライ・並列数制御の性能計測と回帰確認を
+      ノートPC上で再現可能に行う
+背景: 外部LLM実験の経路（プロンプト送信→応答解析→ログ）は推論サーバーがないと動かせず、
+      遅延やエラーの条件を揃えた比較もできなかった
+意図: /v1/chat/completionsで記録済みの応答を返す
+      - 応答は Tests/TestData/AFMResponseExamples の生の応答と、過去の実験ログ（エラーログのai_response、
+        正常ログは抽出値から組み立てたJSON）から読み込み、プロンプトに添付されたテストデータで
+        テストケース×レベルを判定して選ぶ
+      - 遅延（最初のトークンまで＋トークンごとの間隔）、HTTPエラー、不正な応答、接続切断を指定の割合で注入する
+      - 応答の選択と障害の注入は「シード・リクエストボディ・同一ボディの何回目か」だけで決まるため、
+        並列数や到着順が変わっても同じリクエスト列には同じ応答を返す
+      - "stream": true の場合はSSEでトークンごとに送信する
+
+@ai[2026-10-19 22:30] 2ステップ抽出のカテゴリ判定（mainCategory / subCategory）に応答
+意図: テストケースごとに固定の判定結果を```jsonブロックで返し、two-stepsモードの経路をモックで確認できるようにする
+
+@ai[2026-10-20 01:30] 構造化出力（response_format）に対応
+意図: response_formatを指定したリクエストには、制約付きデコードを想定してJSON部分のみを返し、不正な応答を注入しない
+      --reject-response-format では response_format を含むリクエストに400を返し、未対応サーバーへのフォールバックを確認する
+
+@ai[2026-10-20 04:30] 複数ドキュメントのバッチプロンプト（multi_document_batch.py）に応答
+意図: プロンプトにバッチの見出し行（### DOCUMENT 番号）の指示がある場合は、添付されたドキュメントを出現順に判定し、
+      ドキュメントごとに通常と同じ規則で選んだ応答を見出し行で区切って返す
+
+@ai[2026-10-20 05:30] 圧縮したテストデータ（input_compaction）を添付したプロンプトも判定する
+
+@ai[2026-10-20 06:30] ドキュメントの一部（chunked_extractionのウィンドウ）を添付したプロンプトに応答
+意図: 全体が一致するドキュメントがない場合は、添付部分と共通する行が最も多いドキュメントと判定し、
+      選んだ応答のうちウィンドウに現れない値（title / note以外）をnullにして、見えている範囲だけを抽出した応答にする
+
+@ai[2026-10-20 07:30] 同時に処理するリクエスト数の上限（--max-concurrency）を追加
+目的: load_test.pyで、推論サーバーの処理能力の上限（スループットが伸びなくなる点）をモックで再現する
+意図: 上限を超えたリクエストは処理枠が空くまで待たせ（待ち時間は応答時間に含まれる）、/statsのpeak_concurrencyに最大同時処理数を記録する
+
+使用例:
+    python3 scripts/mock_llm_server.py --port 8000 --latency lognormal:0.7:0.4 --token-interval 0.01 \\
+        --error-rate 0.05 --logs test_logs/20261019_external_llm_experiment
+    python3 scripts/run_external_llm_experiment.py --backend http --external-llm-url http://127.0.0.1:8000/v1 \\
+        --external-llm-model mock --concurrency 32
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import BATCH_SECTION_HEADER, json_payload
+from aitest_logs import (
+    AI_VERIFICATION_PLACEHOLDER, TEST_DATA_DIR, TESTCASE_DIRS, expected_value, load_test_case
+)
+from document_index import DocumentIndex
+from log_layout import discover_log_files
+from simulated_backend import LatencyModel
+
+RESPONSE_EXAMPLES_DIR = TEST_DATA_DIR / "AFMResponseExamples"
+DEFAULT_MODEL = "mock"
+DEFAULT_ERROR_STATUSES = [500, 502, 503, 429]
+
+SOURCE_EXAMPLE = "example"
+SOURCE_LOG = "log"
+SOURCE_EXPECTED = "expected"
+SOURCE_CATEGORY = "category"
+
+# 2ステップ抽出のカテゴリ判定に返す (メインカテゴリ, サブカテゴリ)（判定できない文書はwork / workServer）
+CATEGORY_JUDGMENTS = {
+    "chat": ("work", "workServer"),
+    "contract": ("work", "workServer"),
+    "creditcard": ("financial", "financialCreditCard"),
+    "password": ("digital", "digitalApps"),
+    "voice": ("work", "workServer"),
+}
+DEFAULT_CATEGORY_JUDGMENT = ("work", "workServer")
+
+_EXAMPLE_LEVEL_PATTERN = re.compile(r"^level(\d)_run\d+_response\.txt$")
+_RAW_RESPONSE_PATTERN = re.compile(r"# Raw AI Response\n([\s\S]*?)\n# Extracted AccountInfo")
+_TOKEN_PATTERN = re.compile(r"\w+|\s+|[^\w\s]")
+
+
+def split_tokens(text: str) -> List[str]:
+    """ストリーミングと遅延計算用の擬似トークン分割（単語・空白・記号単位）"""
+    return _TOKEN_PATTERN.findall(text)
+
+
+def estimate_tokens(text: str) -> int:
+    return len(split_tokens(text))
+
+
+def category_judgment(prompt: str, testcase: Optional[str]) -> Optional[str]:
+    """カテゴリ判定プロンプトへの応答（判定プロンプトでなければNone）"""
+    main_category, sub_category = CATEGORY_JUDGMENTS.get(testcase, DEFAULT_CATEGORY_JUDGMENT)
+    for key, value in (("mainCategory", main_category), ("subCategory", sub_category)):
+        if f'"{key}"' in prompt:
+            return f'```json\n{{\n  "{key}": "{value}"\n}}\n```'
+    return None
+
+
+def visible_values_only(content: str, prompt: str) -> str:
+    """応答のJSONのうち、プロンプトに現れない値（title / note以外）をnullにする（JSONがなければそのまま）"""
+    try:
+        data = json.loads(json_payload(content) or "null")
+    except ValueError:
+        return content
+    if not isinstance(data, dict):
+        return content
+    for key, value in data.items():
+        if key not in ("title", "note") and value is not None and str(value) not in prompt:
+            data[key] = None
+    return "```json\n" + json.dumps(data, ensure_ascii=False, indent=2) + "\n```"
+
+
+# ---------------------------------------------------------------------------
+# 応答コーパス
+# ---------------------------------------------------------------------------
+
+class ResponseCorpus:
+    """テストケース×レベルごとの記録済み応答"""
+
+    def __init__(self):
+        self.responses: Dict[Tuple[str, int], List[Tuple[str, str]]] = defaultdict(list)
+
+    def add(self, testcase: str, level: int, content: str, source: str):
+        self.responses[(testcase, level)].append((content, source))
+
+    def load_examples(self, examples_dir: Path, testcase: str = "chat") -> int:
+        """AFMResponseExamplesの生の応答を読み込む（エラー例は応答本文がないため対象外）"""
+        count = 0
+        for path in sorted(examples_dir.glob("level*_run*_response.txt")):
+            level_match = _EXAMPLE_LEVEL_PATTERN.match(path.name)
+            raw_match = _RAW_RESPONSE_PATTERN.search(path.read_text(encoding="utf-8"))
+            if level_match and raw_match:
+                self.add(testcase, int(level_match.group(1)), raw_match.group(1).strip(), SOURCE_EXAMPLE)
+                count += 1
+        return count
+
+    def load_logs(self, log_dir: str) -> int:
+        """
+        過去の実験ログから応答を読み込む
+        エラーログはai_responseをそのまま、正常ログは抽出値からJSONを組み立てて使う（正常ログには生の応答がないため）
+        """
+        count = 0
+        for log_file in discover_log_files(log_dir):
+            with open(log_file.path, 'r', encoding='utf-8') as f:
+                log = json.load(f)
+            if log.get("error"):
+                content = log.get("ai_response")
+            else:
+                content = account_json({item["name"]: item.get("value")
+                                        for item in log.get("expected_fields", []) + log.get("unexpected_fields", [])})
+            if content:
+                self.add(log_file.testcase, log_file.level, content, SOURCE_LOG)
+                count += 1
+        return count
+
+    def pick(self, testcase: Optional[str], level: Optional[int], rng: random.Random) -> Tuple[str, str]:
+        """応答を選ぶ（記録がない場合は期待値から組み立てた正解の応答）"""
+        candidates = self.responses.get((testcase, level)) if testcase else None
+        if candidates:
+            return rng.choice(candidates)
+        if testcase and level:
+            test_case = load_test_case(testcase, level)
+            return account_json({name: expected_value(test_case, name) for name in test_case.expected_fields}), \
+                SOURCE_EXPECTED
+        every = [response for responses in self.responses.values() for response in responses]
+        if every:
+            return rng.choice(every)
+        return account_json({}), SOURCE_EXPECTED
+
+    def summary(self) -> Dict[str, int]:
+        return {f"{testcase}_level{level}": len(responses)
+                for (testcase, level), responses in sorted(self.responses.items())}
+
+
+def account_json(values: Dict[str, Optional[str]]) -> str:
+    """抽出値をAIの応答と同じ```jsonブロックの形式にする（portは数値、未設定・要AI検証の値は省略）"""
+    account = {}
+    for name, value in values.items():
+        if value in (None, "", AI_VERIFICATION_PLACEHOLDER):
+            continue
+        account[name] = int(value) if name == "port" and str(value).isdigit() else value
+    return "```json\n" + json.dumps(account, ensure_ascii=False, indent=2) + "\n```"
+
+
+# ---------------------------------------------------------------------------
+# 障害注入と応答計画
+# ---------------------------------------------------------------------------
+
+@dataclass
+class MockSettings:
+    latency: str = "fixed:0"               # 最初のトークンまでの遅延分布（simulated_backendと同じ形式）
+    token_interval: float = 0.0            # トークンごとの生成間隔（秒）
+    error_rate: float = 0.0                # HTTPエラーを返す割合
+    error_statuses: List[int] = field(default_factory=lambda: list(DEFAULT_ERROR_STATUSES))
+    retry_after: Optional[float] = None    # 429/503に付けるRetry-After（秒）
+    malformed_rate: float = 0.0            # JSONを含まない応答を返す割合（ExtractionError）
+    disconnect_rate: float = 0.0           # 応答せずに接続を切る割合（URLError）
+    time_scale: float = 1.0                # 遅延の倍率（0で待機なし）
+    seed: int = 0
+    model: str = DEFAULT_MODEL
+    reject_response_format: bool = False   # response_formatを含むリクエストに400を返す
+    max_concurrency: int = 0               # 同時に処理するリクエスト数の上限（0は無制限）
+
+
+@dataclass
+class ResponsePlan:
+    """1リクエストへの応答内容（リクエストボディとその出現回数から決定的に作る）"""
+    kind: str                              # ok / error / malformed / disconnect
+    status: int = 200
+    content: str = ""
+    source: str = ""
+    first_token_delay: float = 0.0
+    token_interval: float = 0.0
+    testcase: Optional[str] = None
+    level: Optional[int] = None
+
+    @property
+    def tokens(self) -> List[str]:
+        return split_tokens(self.content)
+
+    @property
+    def total_delay(self) -> float:
+        return self.first_token_delay + self.token_interval * len(self.tokens)
+
+
+class MockLLM:
+    """応答の計画と統計（HTTP処理とは独立させ、ベンチマークからも直接使えるようにする）"""
+
+    def __init__(self, settings: MockSettings, corpus: ResponseCorpus, documents: Optional[DocumentIndex] = None):
+        self.settings = settings
+        self.corpus = corpus
+        self.documents = documents or DocumentIndex()
+        self.latency = LatencyModel(settings.latency)
+        self._occurrences: Counter = Counter()
+        self._lock = threading.Lock()
+        self.stats: Counter = Counter()
+        self.started_at = time.time()
+        self._slots = threading.BoundedSemaphore(settings.max_concurrency) if settings.max_concurrency > 0 else None
+        self._active = 0
+
+    @contextmanager
+    def slot(self):
+        """処理枠（max_concurrencyを超えるリクエストは空くまで待つ）"""
+        if self._slots is not None:
+            self._slots.acquire()
+        with self._lock:
+            self._active += 1
+            self.stats['peak_concurrency'] = max(self.stats['peak_concurrency'], self._active)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._active -= 1
+            if self._slots is not None:
+                self._slots.release()
+
+    def plan(self, body: Dict) -> ResponsePlan:
+        canonical = json.dumps(body, ensure_ascii=False, sort_keys=True)
+        digest = hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+        with self._lock:
+            self._occurrences[digest] += 1
+            occurrence = self._occurrences[digest]
+        rng = random.Random(f"{self.settings.seed}:{digest}:{occurrence}")
+
+        settings = self.settings
+        prompt = "\n".join(str(message.get("content", "")) for message in body.get("messages", [])
+                           if isinstance(message, dict))
+        testcase, level = self.documents.identify(prompt)
+        partial = testcase is None
+        if partial:
+            testcase, level = self.documents.identify_partial(prompt)
+        first_token_delay = self.latency.sample(rng) * settings.time_scale
+        token_interval = settings.token_interval * settings.time_scale
+
+        structured = "response_format" in body
+        roll = rng.random()
+        if roll < settings.disconnect_rate:
+            plan = ResponsePlan("disconnect", first_token_delay=first_token_delay)
+        elif roll < settings.disconnect_rate + settings.error_rate:
+            plan = ResponsePlan("error", status=rng.choice(settings.error_statuses), first_token_delay=first_token_delay)
+        elif roll < settings.disconnect_rate + settings.error_rate + settings.malformed_rate and not structured:
+            plan = ResponsePlan("malformed", content="申し訳ありませんが、その情報を抽出できませんでした。",
+                                source="injected", first_token_delay=first_token_delay, token_interval=token_interval)
+        else:
+            content = category_judgment(prompt, testcase)
+            source = SOURCE_CATEGORY
+            if content is None and BATCH_SECTION_HEADER.format(index="") in prompt:
+                sections = []
+                for index, (document_testcase, document_level) in enumerate(self.documents.identify_all(prompt), 1):
+                    section, source = self.corpus.pick(document_testcase, document_level, rng)
+                    sections.append(f"{BATCH_SECTION_HEADER.format(index=index)}\n{section}")
+                content = "\n\n".join(sections) if sections else None
+            if content is None:
+                content, source = self.corpus.pick(testcase, level, rng)
+                if partial and testcase is not None:
+                    content = visible_values_only(content, prompt)
+            if structured:
+                content = json_payload(content) or "{}"
+            plan = ResponsePlan("ok", content=content, source=source, first_token_delay=first_token_delay,
+                                token_interval=token_interval)
+        plan.testcase, plan.level = testcase, level
+        self.record(plan)
+        return plan
+
+    def record(self, plan: ResponsePlan):
+        with self._lock:
+            self.stats['requests'] += 1
+            self.stats[f"kind_{plan.kind}"] += 1
+            if plan.kind == "error":
+                self.stats[f"status_{plan.status}"] += 1
+            if plan.source:
+                self.stats[f"source_{plan.source}"] += 1
+            if plan.testcase is None:
+                self.stats['unidentified_documents'] += 1
+
+    def completion(self, plan: ResponsePlan, prompt_tokens: int) -> Dict:
+        completion_tokens = len(plan.tokens)
+        return {
+            "id": f"chatcmpl-mock-{self.stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": self.settings.model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": plan.content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                      "total_tokens": prompt_tokens + completion_tokens},
+        }
+
+    def summary(self) -> Dict:
+        with self._lock:
+            stats = dict(self.stats)
+        return {'uptime_seconds': time.time() - self.started_at, 'settings': vars(self.settings),
+                'corpus': self.corpus.summary(), 'stats': stats}
+
+
+# ---------------------------------------------------------------------------
+# HTTPサーバー
+# ---------------------------------------------------------------------------
+
+class MockRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "AITestMockLLM/1.0"
+
+    @property
+    def mock(self) -> MockLLM:
+        return self.server.mock
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def send_json(self, status: int, data: Dict, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path in ("/health", "/v1/health"):
+            self.send_json(200, {"status": "ok"})
+        elif path in ("/v1/models", "/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": self.mock.settings.model, "object": "model"}]})
+        elif path == "/stats":
+            self.send_json(200, self.mock.summary())
+        else:
+            self.send_json(404, {"error": {"message": f"not found: {self.path}"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if path not in ("/v1/chat/completions", "/chat/completions"):
+            self.send_json(404, {"error": {"message": f"not found: {self.path}"}})
+            return
+        try:
+            body = json.loads(raw)
+        except ValueError:
+            self.send_json(400, {"error": {"message": "invalid JSON body"}})
+            return
+        if self.mock.settings.reject_response_format and isinstance(body, dict) and "response_format" in body:
+            self.send_json(400, {"error": {"message": "response_format is not supported"}})
+            return
+
+        with self.mock.slot():
+            self.complete(body)
+
+    def complete(self, body: Dict):
+        plan = self.mock.plan(body)
+        if plan.kind == "disconnect":
+            time.sleep(plan.first_token_delay)
+            self.close_connection = True
+            return
+        if plan.kind == "error":
+            time.sleep(plan.first_token_delay)
+            headers = {}
+            if self.mock.settings.retry_after is not None and plan.status in (429, 503):
+                headers["Retry-After"] = f"{self.mock.settings.retry_after:g}"
+            self.send_json(plan.status, {"error": {"message": "injected error", "code": plan.status}}, headers)
+            return
+
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in body.get("messages", [])
+                            if isinstance(message, dict))
+        if body.get("stream"):
+            self.stream(plan, prompt_tokens, bool((body.get("stream_options") or {}).get("include_usage")))
+        else:
+            time.sleep(plan.total_delay)
+            self.send_json(200, self.mock.completion(plan, prompt_tokens))
+
+    def stream(self, plan: ResponsePlan, prompt_tokens: int, include_usage: bool):
+        """SSE（chat.completion.chunk）でトークンごとに送信"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        completion_id = f"chatcmpl-mock-{self.mock.stats['requests']}"
+
+        def send_event(data):
+            payload = ("data: " + (data if isinstance(data, str) else json.dumps(data, ensure_ascii=False))
+                       + "\n\n").encode('utf-8')
+            self.wfile.write(f"{len(payload):x}\r\n".encode('ascii') + payload + b"\r\n")
+            self.wfile.flush()
+
+        def chunk(delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+            return {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": self.mock.settings.model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        time.sleep(plan.first_token_delay)
+        send_event(chunk({"role": "assistant", "content": ""}))
+        tokens = plan.tokens
+        for token in tokens:
+            send_event(chunk({"content": token}))
+            if plan.token_interval:
+                time.sleep(plan.token_interval)
+        send_event(chunk({}, "stop"))
+        if include_usage:
+            usage_chunk = chunk({})
+            usage_chunk["choices"] = []
+            usage_chunk["usage"] = {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+                                    "total_tokens": prompt_tokens + len(tokens)}
+            send_event(usage_chunk)
+        send_event("[DONE]")
+        self.wfile.write(b"0\r\n\r\n")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    """モックサーバー（start()で別スレッドで起動し、ベンチマーク等からプロセス内で使える）"""
+    daemon_threads = True
+    request_queue_size = 1024
+
+    def __init__(self, mock: MockLLM, host: str = "127.0.0.1", port: int = 0, verbose: bool = False):
+        super().__init__((host, port), MockRequestHandler)
+        self.mock = mock
+        self.verbose = verbose
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def build_corpus(examples_dir: Optional[str], examples_testcase: str, log_dirs: List[str]) -> ResponseCorpus:
+    corpus = ResponseCorpus()
+    if examples_dir:
+        count = corpus.load_examples(Path(examples_dir), examples_testcase)
+        print(f"📚 応答例: {count}件 ({examples_dir})")
+    for log_dir in log_dirs:
+        count = corpus.load_logs(log_dir)
+        print(f"📚 実験ログ: {count}件 ({log_dir})")
+    return corpus
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser):
+    """遅延・障害注入の引数を追加"""
+    parser.add_argument("--latency", default="fixed:0",
+                        help="最初のトークンまでの遅延分布（秒、例: fixed:1.5, lognormal:0.7:0.4、デフォルト: fixed:0）")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="トークンごとの生成間隔（秒、デフォルト: 0）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTPエラーを返す割合")
+    parser.add_argument("--error-statuses", nargs="+", type=int, default=DEFAULT_ERROR_STATUSES,
+                        help="返すHTTPステータス（ランダムに選択、デフォルト: 500 502 503 429）")
+    parser.add_argument("--retry-after", type=float, help="429/503の応答に付けるRetry-After（秒）")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="JSONを含まない応答を返す割合")
+    parser.add_argument("--disconnect-rate", type=float, default=0.0, help="応答せずに接続を切る割合")
+    parser.add_argument("--time-scale", type=float, default=1.0, help="遅延の倍率（0で待機なし）")
+    parser.add_argument("--seed", type=int, default=0, help="応答の選択・障害注入のシード")
+    parser.add_argument("--reject-response-format", action="store_true",
+                        help="response_formatを含むリクエストに400を返す（構造化出力に未対応のサーバーを再現）")
+    parser.add_argument("--max-concurrency", type=int, default=0,
+                        help="同時に処理するリクエスト数の上限（超えた分は待たせる、デフォルト: 0 = 無制限）")
+
+
+def settings_from_args(args) -> MockSettings:
+    return MockSettings(latency=args.latency, token_interval=args.token_interval, error_rate=args.error_rate,
+                        error_statuses=args.error_statuses, retry_after=args.retry_after,
+                        malformed_rate=args.malformed_rate, disconnect_rate=args.disconnect_rate,
+                        time_scale=args.time_scale, seed=args.seed, model=args.model,
+                        reject_response_format=args.reject_response_format, max_concurrency=args.max_concurrency)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI互換のモック推論サーバー（記録済み応答の再生・障害注入）")
+    parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    parser.add_argument("--port", type=int, default=8000, help="待ち受けポート（デフォルト: 8000）")
+    parser.add_argument("--model", default=DEFAULT_MODEL, help="応答に含めるモデル名")
+    parser.add_argument("--examples-dir", default=str(RESPONSE_EXAMPLES_DIR), help="AI応答例のディレクトリ")
+    parser.add_argument("--examples-testcase", default="chat", choices=list(TESTCASE_DIRS),
+                        help="応答例のテストケース（デフォルト: chat）")
+    parser.add_argument("--no-examples", action="store_true", help="AI応答例を読み込まない")
+    parser.add_argument("--logs", nargs="+", default=[], help="応答として再生する過去の実験ディレクトリ")
+    parser.add_argument("--verbose", action="store_true", help="リクエストごとにアクセスログを表示")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    corpus = build_corpus(None if args.no_examples else args.examples_dir, args.examples_testcase, args.logs)
+    server = MockLLMServer(MockLLM(settings_from_args(args), corpus), args.host, args.port, verbose=args.verbose)
+    print(f"🧪 モック推論サーバーを起動しました: {server.url}")
+    print(f"   遅延: {args.latency} + {args.token_interval}秒/トークン (倍率 {args.time_scale})")
+    print(f"   エラー率: {args.error_rate}, 不正な応答: {args.malformed_rate}, 切断: {args.disconnect_rate}")
+    print(f"   統計: http://{args.host}:{server.server_address[1]}/stats")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ 停止します")
+        print(json.dumps(server.mock.summary()['stats'], ensure_ascii=False, indent=2))
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 04:30] 複数ドキュメントのバッチプロンプト（実験用）
+目的: K件のドキュメントを1つのプロンプトにまとめて送り、1件ずつ送る場合と比べて
+      1秒あたりの処理ドキュメント数と抽出精度がどう変わるかをKごとに示す
+背景: 外部LLM実験は1リクエストに1ドキュメントを添付しており、プロンプトテンプレート（指示と例示）の部分を
+      ドキュメントの数だけ毎回送って処理させていた
+意図: aitest_extraction.build_batch_prompt でテンプレートの後にK件のドキュメントを番号付きで添付し、
+      ドキュメントごとに「### DOCUMENT 番号」の行で区切った出力を指示する
+      - 応答は split_batch_response でドキュメントごとに分け、通常と同じ規則（parse_account_info）で解析・採点して
+        ドキュメントごとに通常と同じ形式のログを出力する（区切りが見つからないドキュメントは「無効なJSON形式」のエラー）
+      - ログのextraction_timeはバッチ全体の応答時間（そのドキュメントの結果が得られるまでの時間）とし、
+        batch（size / index / batch_time / prompt_tokens / completion_tokens）を追加する
+      - 実行ごとにドキュメントの順序を決定的に並べ替えてからK件ずつまとめ、バッチは --concurrency 件まで並行して送る
+      - Kごとのサブディレクトリ（k01, k02, ...）を sampling_sweep.analyze_setting で集計し、
+        1秒あたりのドキュメント数（ドキュメント数 / 全体の所要時間）・正規化スコア・エラー率・解析失敗率を
+        単一ドキュメント（K=1）と比較してbatch_summary.jsonに保存する（--analyze-onlyで再集計できる）
+      テンプレートはjson方式のみ（構造化出力のスキーマは1ドキュメント分の形のため使わない）
+
+使用例:
+    python3 scripts/multi_document_batch.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --algo abs --batch-sizes 1 2 4 8 --runs 3 --concurrency 4
+    python3 scripts/multi_document_batch.py --analyze-only --experiment-dir test_logs/202610200430_multi_document_batch
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import (
+    PromptTemplateNotFound, build_batch_prompt, extracted_field_values, load_prompt_template, parse_account_info,
+    request_content_text, split_batch_response
+)
+from aitest_logs import TESTCASE_DIRS, build_error_log, build_log, load_test_case, write_log
+from experiment_engine import ExperimentJob, create_experiment_dir
+from http_backend import DEFAULT_MAX_CONNECTIONS, ChatCompletionError, HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+from metrics_utils import format_value
+from rate_limiter import add_rate_limit_arguments, rate_limiter_from_args
+from request_metrics import usage_from_body
+from sampling_sweep import OVERALL, analyze_setting
+
+SETTING_FILE = "batch_setting.json"
+SUMMARY_FILE = "batch_summary.json"
+METHOD = "json"
+
+Document = Tuple[str, int]
+
+
+def batch_label(size: int) -> str:
+    return f"k{size:02d}"
+
+
+def document_batches(documents: List[Document], size: int, run: int, seed: int) -> List[List[Document]]:
+    """実行ごとに決定的に並べ替えたドキュメントをsize件ずつまとめる（Kが違っても同じ実行は同じ順序）"""
+    ordered = list(documents)
+    random.Random(f"{seed}:{run}").shuffle(ordered)
+    return [ordered[start:start + size] for start in range(0, len(ordered), size)]
+
+
+# ---------------------------------------------------------------------------
+# 実行
+# ---------------------------------------------------------------------------
+
+async def extract_batch(backend: HTTPBackend, args, output_dir: str, batch: List[Document], run: int,
+                        size: int) -> List[str]:
+    """1バッチ分のリクエストを送り、ドキュメントごとに解析・採点してログを書き込む"""
+    test_cases = [load_test_case(testcase, level) for testcase, level in batch]
+    cold_start = not backend.endpoint_warm
+    backend.endpoint_warm = True
+    start_time = time.perf_counter()
+    content, response, failure = "", None, None
+    try:
+        body = backend.request_body(build_batch_prompt(load_prompt_template(args.algo, METHOD, args.language),
+                                                       [test_case.text for test_case in test_cases], args.language))
+        content, response = await backend.send(body, None, sample=run - 1, headers=backend.headers(run))
+    except (ChatCompletionError, PromptTemplateNotFound) as e:
+        failure = e
+    batch_time = time.perf_counter() - start_time
+    usage = {}
+    if response is not None:
+        batch_time -= response.throttle_delay
+        if response.cached:
+            batch_time += response.total_time
+        usage = usage_from_body(response.body) or {}
+
+    sections = split_batch_response(content, len(batch)) if failure is None else [""] * len(batch)
+    paths = []
+    for index, (test_case, section) in enumerate(zip(test_cases, sections), start=1):
+        job = ExperimentJob(testcase=test_case.testcase, algo=args.algo, method=METHOD, language=args.language)
+        account = parse_account_info(section) if section else None
+        if failure is not None or account is None:
+            error = failure or ChatCompletionError("無効なJSON形式です", error_type="ExtractionError",
+                                                   ai_response=section or content)
+            log = build_error_log(test_case, args.algo, METHOD, args.language, str(error), batch_time,
+                                  cold_start=cold_start, error_type=getattr(error, 'error_type', "ExtractionError"),
+                                  ai_response=getattr(error, 'ai_response', None))
+            path = job.log_path(output_dir, test_case.level, run, error=True)
+        else:
+            log = build_log(test_case, args.algo, METHOD, args.language, extracted_field_values(account), batch_time,
+                            cold_start=cold_start, request_content=request_content_text(body))
+            path = job.log_path(output_dir, test_case.level, run)
+        log["batch"] = {"size": size, "documents": len(batch), "index": index, "batch_time": batch_time,
+                        "prompt_tokens": usage.get("prompt_tokens"), "completion_tokens": usage.get("completion_tokens")}
+        paths.append(write_log(path, log))
+    return paths
+
+
+async def run_batch_size(args, experiment_dir: str, documents: List[Document], size: int) -> Dict:
+    """バッチサイズ1つ分を実行し、batch_setting.jsonを書き込む"""
+    output_dir = os.path.join(experiment_dir, batch_label(size))
+    os.makedirs(output_dir, exist_ok=True)
+    backend = HTTPBackend(external_llm_url=args.external_llm_url, external_llm_model=args.external_llm_model,
+                          endpoint_warmup=args.warmup, max_connections=args.max_connections,
+                          options=HTTPOptions(rate_limiter=rate_limiter_from_args(args, args.external_llm_url),
+                                              max_throttle_retries=args.max_throttle_retries))
+    batches = [(batch, run) for run in range(1, args.runs + 1)
+               for batch in document_batches(documents, size, run, args.seed)]
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(batch: List[Document], run: int) -> List[str]:
+        async with semaphore:
+            return await extract_batch(backend, args, output_dir, batch, run, size)
+
+    print(f"\n📦 K={size}: {len(batches)}リクエスト（{len(documents) * args.runs}ドキュメント）")
+    await backend.prepare()
+    start_time = time.perf_counter()
+    try:
+        await asyncio.gather(*(bounded(batch, run) for batch, run in batches))
+    finally:
+        wall_time = time.perf_counter() - start_time
+        await backend.close()
+    setting = {'batch_size': size, 'algo': args.algo, 'language': args.language, 'runs': args.runs,
+               'documents': len(documents) * args.runs, 'requests': len(batches), 'wall_time': wall_time,
+               'concurrency': args.concurrency}
+    with open(os.path.join(output_dir, SETTING_FILE), 'w', encoding='utf-8') as f:
+        json.dump(setting, f, ensure_ascii=False, indent=2)
+    print(f"   ✅ {wall_time:.2f}秒（{setting['documents'] / wall_time if wall_time else 0:.2f}ドキュメント/秒）")
+    return setting
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def batch_tokens(output_dir: str) -> Dict[str, Optional[float]]:
+    """1ドキュメントあたりの入力・出力トークン数（バッチのusageをドキュメント数で割った平均）"""
+    prompt, completion, documents = 0, 0, 0
+    for log_file in discover_log_files(output_dir):
+        with open(log_file.path, 'r', encoding='utf-8') as f:
+            batch = json.load(f).get("batch") or {}
+        if batch.get("prompt_tokens") is None or batch.get("completion_tokens") is None:
+            continue
+        prompt += batch["prompt_tokens"] / batch["documents"]
+        completion += batch["completion_tokens"] / batch["documents"]
+        documents += 1
+    return {'prompt_tokens_per_document': prompt / documents if documents else None,
+            'completion_tokens_per_document': completion / documents if documents else None}
+
+
+def analyze_batches(experiment_dir: str) -> Dict:
+    """Kごとの結果を集計し、単一ドキュメント（K=1、なければ最小のK）と比較してbatch_summary.jsonに保存"""
+    results: Dict[str, Dict] = {}
+    for name in sorted(os.listdir(experiment_dir)):
+        path = os.path.join(experiment_dir, name, SETTING_FILE)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            setting = json.load(f)
+        stats = analyze_setting(os.path.join(experiment_dir, name)).get(OVERALL)
+        if stats is None:
+            continue
+        result = dict(setting)
+        result.update(batch_tokens(os.path.join(experiment_dir, name)))
+        result['documents_per_second'] = setting['documents'] / setting['wall_time'] if setting['wall_time'] else None
+        result['stats'] = stats
+        results[name] = result
+    if not results:
+        raise SystemExit(f"バッチの結果が見つかりません: {experiment_dir}")
+    baseline = min(results, key=lambda name: results[name]['batch_size'])
+    base = results[baseline]
+    for result in results.values():
+        result['throughput_ratio'] = (result['documents_per_second'] / base['documents_per_second']
+                                      if result['documents_per_second'] and base['documents_per_second'] else None)
+        result['score_change'] = result['stats']['normalized_score'] - base['stats']['normalized_score']
+        result['error_rate_change'] = result['stats']['error_rate'] - base['stats']['error_rate']
+    summary = {'baseline': baseline, 'batch_sizes': results}
+    with open(os.path.join(experiment_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_batch_summary(summary: Dict):
+    print("\n" + "=" * 80)
+    print(f"📦 複数ドキュメントのバッチプロンプトの結果（比較対象: {summary['baseline']}）")
+    print("=" * 80)
+    for name, result in summary['batch_sizes'].items():
+        stats = result['stats']
+        print(f"   K={result['batch_size']}: {format_value(result['documents_per_second'], '.2f')}ドキュメント/秒 "
+              f"(x{format_value(result['throughput_ratio'], '.2f')}), スコア {stats['normalized_score']:.3f} "
+              f"({result['score_change']:+.3f}), エラー率 {stats['error_rate']:.1%} "
+              f"(解析失敗 {stats['parse_failure_rate']:.1%}), 平均 {format_value(stats['avg_latency'], '.2f')}秒, "
+              f"入力 {format_value(result['prompt_tokens_per_document'], '.0f')} / "
+              f"出力 {format_value(result['completion_tokens_per_document'], '.0f')}トークン/ドキュメント")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="複数ドキュメントのバッチプロンプトの実験（httpバックエンド）")
+    parser.add_argument("--external-llm-url", help="外部LLMサーバーのURL")
+    parser.add_argument("--external-llm-model", help="外部LLMモデル名")
+    parser.add_argument("--testcases", nargs="+", default=list(TESTCASE_DIRS), choices=list(TESTCASE_DIRS),
+                        help="まとめるドキュメントのテストケース")
+    parser.add_argument("--algo", default="abs", help="プロンプトのalgo（json方式、デフォルト: abs）")
+    parser.add_argument("--language", default="ja", choices=["ja", "en"], help="プロンプトの言語")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="使用するレベル")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 2, 4],
+                        help="1プロンプトにまとめるドキュメント数K（デフォルト: 1 2 4）")
+    parser.add_argument("--runs", type=int, default=3, help="Kごとの実行回数（デフォルト: 3）")
+    parser.add_argument("--seed", type=int, default=0, help="実行ごとのドキュメントの並べ替えのシード")
+    parser.add_argument("--experiment-dir", help="実験のディレクトリ（指定しない場合は自動作成）")
+    parser.add_argument("--warmup", type=int, default=0, help="Kごとに計測前に送る破棄用リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同時に送るバッチ数（デフォルト: 1）")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"最大同時接続数（デフォルト: {DEFAULT_MAX_CONNECTIONS}）")
+    parser.add_argument("--analyze-only", action="store_true", help="実行せず、--experiment-dirの結果を再集計する")
+    add_rate_limit_arguments(parser)
+    args = parser.parse_args()
+
+    if args.analyze_only:
+        if not args.experiment_dir:
+            parser.error("--analyze-only には --experiment-dir が必要です")
+        print_batch_summary(analyze_batches(args.experiment_dir))
+        return
+    if not (args.external_llm_url and args.external_llm_model):
+        parser.error("--external-llm-url と --external-llm-model が必要です")
+    if any(size < 1 for size in args.batch_sizes):
+        parser.error("--batch-sizes は1以上で指定してください")
+
+    experiment_dir = args.experiment_dir or create_experiment_dir("multi_document_batch")
+    documents = [(testcase, level) for testcase in args.testcases for level in args.levels]
+    print(f"📦 バッチプロンプトの実験を開始します（{args.algo}_{METHOD}, {len(documents)}ドキュメント × {args.runs}回, "
+          f"K={', '.join(map(str, args.batch_sizes))}）")
+    print(f"📁 実験のディレクトリ: {experiment_dir}")
+    for size in sorted(set(args.batch_sizes)):
+        asyncio.run(run_batch_size(args, experiment_dir, documents, size))
+    print_batch_summary(analyze_batches(experiment_dir))
+
+
+if __name__ == "__main__":
+    main()
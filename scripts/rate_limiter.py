@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 19:30] 外部LLMへのリクエストのレート制限（プロセス間で共有するトークンバケット）
+目的: 共有推論ゲートウェイのリクエスト数・トークン数の上限を超えないように送信し、
+      429（Too Many Requests）を抽出の失敗として数えないようにする
+背景: parallel_experiment_manager.pyで7アルゴリズムを並列実行すると上限を超え、HTTPエラーのログが
+      抽出失敗として集計されていた
+意図: 状態ファイルをflockで排他してリクエスト/秒とトークン/分の2つのバケットを複数プロセスで共有する
+      - 送信前に両方のバケットから取り出せるまで待機し、待機時間はスロットリング遅延として推論時間と分けて集計する
+      - 429/503の応答はRetry-Afterの時間だけ全プロセスの送信を止めてから再送する（再送回数の上限まで）
+      - トークン数は送信前にプロンプト長と平均出力トークン数から見積もり、応答のusageで差分を補正する
+      HTTPバックエンドでは --rps / --tpm で使用し、Swiftバックエンドでは本スクリプトをプロキシとして起動する
+
+使用例:
+    python3 scripts/run_external_llm_experiment.py --backend http ... --rps 5 --tpm 60000
+    # Swiftバックエンド（--external-llm-url http://127.0.0.1:8200/v1 を指定）
+    python3 scripts/rate_limiter.py proxy --upstream http://host:8000 --port 8200 --rps 5 --tpm 60000
+"""
+
+import argparse
+import asyncio
+import fcntl
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer, DataCallback, HTTPClientError, HTTPRequest, HTTPResponse
+from request_metrics import usage_from_body
+
+STATE_FILE = "state.json"
+LOCK_FILE = "state.lock"
+THROTTLE_STATUSES = (429, 503)
+DEFAULT_COMPLETION_TOKENS = 500
+DEFAULT_MAX_THROTTLE_RETRIES = 5
+
+
+def estimate_text_tokens(text: str) -> int:
+    """トークン数の概算（ASCIIは4文字で1トークン、それ以外は1文字1トークン）"""
+    ascii_chars = sum(1 for char in text if ord(char) < 128)
+    return ascii_chars // 4 + (len(text) - ascii_chars) + 1
+
+
+def retry_after_seconds(response: HTTPResponse) -> Optional[float]:
+    """Retry-Afterヘッダー（秒数またはHTTP日付）"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def default_state_dir(endpoint: str) -> str:
+    """同じエンドポイントを使うプロセスが自動的に同じ状態を共有するディレクトリ"""
+    digest = hashlib.sha256(endpoint.rstrip("/").encode('utf-8')).hexdigest()[:12]
+    return os.path.join(tempfile.gettempdir(), "aitest_rate_limit", digest)
+
+
+class SharedRateLimiter:
+    """
+    リクエスト/秒・トークン/分のトークンバケット（state_dirを指定した全プロセスで共有）
+    バケットの容量は、リクエストは burst_seconds 秒分（最低1）、トークンは1分分
+    """
+
+    def __init__(self, state_dir: str, requests_per_second: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, burst_seconds: float = 1.0,
+                 max_poll_interval: float = 1.0):
+        self.state_dir = state_dir
+        self.requests_per_second = requests_per_second
+        self.tokens_per_minute = tokens_per_minute
+        self.burst_seconds = burst_seconds
+        self.max_poll_interval = max_poll_interval
+        os.makedirs(state_dir, exist_ok=True)
+        self._local_lock = threading.Lock()
+        self.average_completion_tokens = float(DEFAULT_COMPLETION_TOKENS)
+        self.requests = 0
+        self.throttled_requests = 0
+        self.throttle_seconds = 0.0
+        self.max_throttle_seconds = 0.0
+        self.retry_after_events = 0
+
+    # --- 共有状態 -----------------------------------------------------------
+
+    def _with_state(self, update):
+        """状態ファイルを排他して読み込み、update(state, now)の結果を返す（状態は書き戻す）"""
+        with self._local_lock, open(os.path.join(self.state_dir, LOCK_FILE), 'a+') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                path = os.path.join(self.state_dir, STATE_FILE)
+                try:
+                    with open(path, 'r', encoding='utf-8') as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {}
+                now = time.time()
+                self._refill(state, now)
+                result = update(state, now)
+                temp_path = f"{path}.tmp"
+                with open(temp_path, 'w', encoding='utf-8') as f:
+                    json.dump(state, f)
+                os.replace(temp_path, path)
+                return result
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _capacities(self) -> Dict[str, float]:
+        capacities = {}
+        if self.requests_per_second:
+            capacities['requests'] = max(1.0, self.requests_per_second * self.burst_seconds)
+        if self.tokens_per_minute:
+            capacities['tokens'] = self.tokens_per_minute
+        return capacities
+
+    def _rates(self) -> Dict[str, float]:
+        rates = {}
+        if self.requests_per_second:
+            rates['requests'] = self.requests_per_second
+        if self.tokens_per_minute:
+            rates['tokens'] = self.tokens_per_minute / 60.0
+        return rates
+
+    def _refill(self, state: Dict, now: float):
+        rates = self._rates()
+        for name, capacity in self._capacities().items():
+            bucket = state.setdefault(name, {'level': capacity, 'updated': now})
+            elapsed = max(0.0, now - bucket['updated'])
+            bucket['level'] = min(capacity, bucket['level'] + elapsed * rates[name])
+            bucket['updated'] = now
+
+    def _try_take(self, tokens: float) -> float:
+        """取り出せた場合は0、取り出せない場合は待つべき秒数"""
+        capacities, rates = self._capacities(), self._rates()
+        needed = {'requests': 1.0, 'tokens': min(tokens, capacities.get('tokens', tokens))}
+
+        def update(state: Dict, now: float) -> float:
+            blocked = state.get('blocked_until', 0.0) - now
+            if blocked > 0:
+                return blocked
+            wait = 0.0
+            for name in capacities:
+                deficit = needed[name] - state[name]['level']
+                if deficit > 0:
+                    wait = max(wait, deficit / rates[name])
+            if wait > 0:
+                return wait
+            for name in capacities:
+                state[name]['level'] -= needed[name]
+            return 0.0
+
+        return self._with_state(update)
+
+    # --- 公開API ------------------------------------------------------------
+
+    def estimate_tokens(self, body: Dict) -> float:
+        """送信前のトークン数の見積もり（プロンプト＋これまでの平均出力トークン数）"""
+        prompt = "".join(str(message.get("content", "")) for message in body.get("messages", [])
+                         if isinstance(message, dict))
+        completion = min(self.average_completion_tokens, body.get("max_tokens") or self.average_completion_tokens)
+        return estimate_text_tokens(prompt) + completion
+
+    async def acquire(self, tokens: float = 0.0) -> float:
+        """送信できるまで待機し、待機した秒数を返す"""
+        start_time = time.monotonic()
+        throttled = False
+        while True:
+            wait = await asyncio.to_thread(self._try_take, tokens)
+            if wait <= 0:
+                break
+            throttled = True
+            await asyncio.sleep(min(wait, self.max_poll_interval))
+        waited = time.monotonic() - start_time if throttled else 0.0
+        self.requests += 1
+        if throttled:
+            self.throttled_requests += 1
+            self.throttle_seconds += waited
+            self.max_throttle_seconds = max(self.max_throttle_seconds, waited)
+        return waited
+
+    def record_usage(self, estimated: float, response: HTTPResponse):
+        """応答のusage（SSEの場合は最後のusageチャンク）で見積もりとの差分をトークンバケットに反映"""
+        usage = usage_from_body(response.body) or {}
+        total = usage.get("total_tokens")
+        if not isinstance(total, (int, float)):
+            return
+        completion = usage.get("completion_tokens")
+        if isinstance(completion, (int, float)):
+            self.average_completion_tokens = 0.9 * self.average_completion_tokens + 0.1 * completion
+        if self.tokens_per_minute and total != estimated:
+            def update(state: Dict, now: float):
+                state['tokens']['level'] -= total - estimated
+            self._with_state(update)
+
+    def block_for(self, seconds: float):
+        """Retry-Afterの時間だけ全プロセスの送信を止める"""
+        self.retry_after_events += 1
+
+        def update(state: Dict, now: float):
+            state['blocked_until'] = max(state.get('blocked_until', 0.0), now + seconds)
+        self._with_state(update)
+
+    def summary(self) -> Dict:
+        return {
+            'state_dir': self.state_dir,
+            'requests_per_second': self.requests_per_second,
+            'tokens_per_minute': self.tokens_per_minute,
+            'requests': self.requests,
+            'throttled_requests': self.throttled_requests,
+            'throttle_seconds': self.throttle_seconds,
+            'max_throttle_seconds': self.max_throttle_seconds,
+            'retry_after_events': self.retry_after_events,
+        }
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """summary()を実験終了時の表示の1行にする"""
+        return (f"スロットリング: {summary['throttled_requests']}/{summary['requests']}件で待機, "
+                f"合計{summary['throttle_seconds']:.1f}秒, 最大{summary['max_throttle_seconds']:.1f}秒 "
+                f"(Retry-After {summary['retry_after_events']}回、抽出時間には含めない)")
+
+
+async def send_with_throttle(client: AsyncHTTPClient, url: str, body: Dict, headers: Dict[str, str],
+                             timeout: Optional[float], limiter: Optional[SharedRateLimiter] = None,
+                             max_throttle_retries: int = DEFAULT_MAX_THROTTLE_RETRIES,
+                             on_data: Optional[DataCallback] = None) -> HTTPResponse:
+    """
+    レート制限と429/503の再送を行ってPOSTする
+    戻り値のthrottle_delayにレート制限とRetry-Afterで待った秒数の合計を設定する
+    on_dataは本文を受信するたびに呼ぶ（ストリーミング応答の逐次解析用）
+    """
+    payload = json.dumps(body, ensure_ascii=False).encode('utf-8')
+    throttle_delay = 0.0
+    for attempt in range(max_throttle_retries + 1):
+        estimated = limiter.estimate_tokens(body) if limiter else 0.0
+        if limiter is not None:
+            throttle_delay += await limiter.acquire(estimated)
+        response = await client.request("POST", url, payload, headers, timeout=timeout, on_data=on_data)
+        delay = retry_after_seconds(response)
+        if response.status in THROTTLE_STATUSES and attempt < max_throttle_retries \
+                and (delay is not None or response.status == 429):
+            # Retry-Afterがない429は指数バックオフ（1, 2, 4...秒）
+            delay = delay if delay is not None else float(2 ** attempt)
+            if limiter is not None:
+                # 待機は次のacquireで行われ、スロットリング遅延として数えられる
+                await asyncio.to_thread(limiter.block_for, delay)
+            else:
+                await asyncio.sleep(delay)
+                throttle_delay += delay
+            continue
+        if limiter is not None and response.status == 200:
+            await asyncio.to_thread(limiter.record_usage, estimated, response)
+        break
+    response.throttle_delay = throttle_delay
+    return response
+
+
+def add_rate_limit_arguments(parser: argparse.ArgumentParser):
+    """レート制限の引数を追加"""
+    parser.add_argument("--rps", type=float, help="リクエスト数の上限（/秒、同じエンドポイントを使う全プロセス合計）")
+    parser.add_argument("--tpm", type=float, help="トークン数の上限（/分、プロンプト＋出力、全プロセス合計）")
+    parser.add_argument("--rate-limit-dir",
+                        help="レート制限の状態を共有するディレクトリ（デフォルト: エンドポイントごとの一時ディレクトリ）")
+    parser.add_argument("--max-throttle-retries", type=int, default=DEFAULT_MAX_THROTTLE_RETRIES,
+                        help=f"429/503（Retry-After付き）の再送回数の上限（デフォルト: {DEFAULT_MAX_THROTTLE_RETRIES}）")
+
+
+def rate_limiter_from_args(args, endpoint: str) -> Optional[SharedRateLimiter]:
+    """--rps / --tpm が指定された場合のみ作成"""
+    if not args.rps and not args.tpm:
+        return None
+    return SharedRateLimiter(args.rate_limit_dir or default_state_dir(endpoint),
+                             requests_per_second=args.rps, tokens_per_minute=args.tpm)
+
+
+# ---------------------------------------------------------------------------
+# プロキシ（Swiftバックエンドなど、Python以外のクライアント用）
+# ---------------------------------------------------------------------------
+
+class RateLimitingProxy:
+    """chat/completionsへのPOSTをレート制限して転送し、429/503はクライアントに返さずに再送する"""
+
+    def __init__(self, upstream: str, client: AsyncHTTPClient, limiter: SharedRateLimiter, max_throttle_retries: int):
+        self.upstream = upstream.rstrip("/")
+        self.client = client
+        self.limiter = limiter
+        self.max_throttle_retries = max_throttle_retries
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        headers = {name: value for name, value in request.headers.items()
+                   if name not in ("host", "content-length", "connection")}
+        try:
+            if request.method == "POST" and request.path.rstrip("/").endswith("/chat/completions"):
+                response = await send_with_throttle(self.client, self.upstream + request.path, request.json(),
+                                                    headers, None, self.limiter, self.max_throttle_retries)
+                response.headers["x-aitest-throttle-delay"] = f"{response.throttle_delay:.3f}"
+                return response
+            return await self.client.request(request.method, self.upstream + request.path, request.body or None,
+                                             headers)
+        except (HTTPClientError, ValueError) as e:
+            return HTTPResponse(502, "Bad Gateway", {"content-type": "application/json"},
+                                json.dumps({"error": {"message": str(e)}}, ensure_ascii=False).encode('utf-8'))
+
+
+async def run_proxy(args):
+    limiter = rate_limiter_from_args(args, args.upstream)
+    client = AsyncHTTPClient(max_connections=args.max_connections)
+    server = AsyncHTTPServer(RateLimitingProxy(args.upstream, client, limiter, args.max_throttle_retries).handle,
+                             args.host, args.port)
+    url = await server.start()
+    print(f"🚦 レート制限プロキシを起動しました: {url} → {args.upstream}")
+    print(f"   上限: {args.rps or '-'}リクエスト/秒, {args.tpm or '-'}トークン/分 (状態: {limiter.state_dir})")
+    try:
+        await server.serve_forever()
+    finally:
+        await client.close()
+        summary = limiter.summary()
+        print(f"\n🚦 スロットリング: {summary['throttled_requests']}/{summary['requests']}件, "
+              f"合計{summary['throttle_seconds']:.1f}秒, Retry-After {summary['retry_after_events']}回")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外部LLMへのリクエストのレート制限プロキシ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    proxy_parser = subparsers.add_parser("proxy", help="レート制限プロキシを起動")
+    proxy_parser.add_argument("--upstream", required=True, help="転送先のエンドポイント（例: http://host:8000）")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    proxy_parser.add_argument("--port", type=int, default=8200, help="待ち受けポート（デフォルト: 8200）")
+    proxy_parser.add_argument("--max-connections", type=int, default=64, help="上流への最大同時接続数")
+    add_rate_limit_arguments(proxy_parser)
+    args = parser.parse_args()
+
+    if not args.rps and not args.tpm:
+        parser.error("--rps または --tpm を指定してください")
+    try:
+        asyncio.run(run_proxy(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
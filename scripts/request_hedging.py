@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 02:30] ヘッジリクエスト（遅いリクエストの複製送信）によるテールレイテンシの短縮
+目的: 推論サーバーでたまに起きる極端に遅いリクエストが、level 3などのp99を決めてしまう状況を改善する
+背景: 同じリクエストでも、推論サーバーの混雑やバッチの組み合わせによって一部だけ数倍遅くなることがあり、
+      遅いリクエストを待つ以外に手段がなかった
+意図: (algo, レベル)ごとに直近の応答時間を記録し、その95パーセンタイル（--hedge-quantile）を超えても応答がない
+      リクエストについて、同じリクエストをもう1つ送る（--hedge-urlで別のエンドポイント、指定しない場合は同じ
+      エンドポイントへの別の接続）。先に成功（HTTP 200）した応答を使い、もう一方はキャンセルする
+      - 記録が--hedge-min-samples件に満たない(algo, レベル)はヘッジしない
+      - 複製による負荷を抑えるため、ヘッジしたリクエストの割合が--max-hedge-rateを超える間はヘッジしない
+      - しきい値の計算には最初に送ったリクエストの応答時間を使う（キャンセルした場合はキャンセルまでの時間。
+        使った応答の時間を記録すると、ヘッジの効果でしきい値が下がり続けるため）
+      - サマリーには、ヘッジ率・複製が先に返った件数と、実際の応答時間・ヘッジしなかった場合の推定応答時間の
+        p50 / p95 / p99を出力する。キャンセルした最初のリクエストの応答時間は分からないため、同じ(algo, レベル)で
+        キャンセルまでの時間より遅く完了したリクエストの応答時間の中央値で補う（該当がなければキャンセルまでの時間）
+      Swiftバックエンドでは proxy サブコマンドを外部LLMのURLとして指定する（X-AITest-Cellで(algo, レベル)を判別）
+
+使用例:
+    python3 scripts/run_external_llm_experiment.py --backend http ... --hedge
+    python3 scripts/run_external_llm_experiment.py --backend http ... --hedge --hedge-url http://host2:8000/v1
+    python3 scripts/request_hedging.py proxy --upstream http://host:8000 --port 8500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer, HTTPClientError, HTTPRequest, HTTPResponse
+from metrics_utils import percentile
+from request_metrics import parse_request_cell
+
+DEFAULT_HEDGE_QUANTILE = 0.95
+DEFAULT_HEDGE_MIN_SAMPLES = 20
+DEFAULT_HEDGE_WINDOW = 200
+DEFAULT_MAX_HEDGE_RATE = 0.1
+HEDGED_HEADER = "x-aitest-hedged"
+STATS_PATH = "/hedging/stats"
+UNKNOWN_KEY = ("unknown", 0)
+
+HedgeKey = Tuple[str, int]
+
+
+def hedge_key(cell: Optional[str]) -> HedgeKey:
+    """X-AITest-Cellの値から(algo, レベル)を取り出す（ヘッダーがない場合はまとめて1つのキーにする）"""
+    parsed = parse_request_cell(cell)
+    return (parsed['algo'], parsed['level']) if parsed else UNKNOWN_KEY
+
+
+def _latency_summary(values: List[float]) -> Dict:
+    return {'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95), 'p99': percentile(values, 0.99),
+            'max': max(values) if values else 0.0}
+
+
+class RequestHedger:
+    """(algo, レベル)ごとの応答時間の分位点を超えたリクエストを複製し、先に返った応答を使う"""
+
+    def __init__(self, quantile: float = DEFAULT_HEDGE_QUANTILE, min_samples: int = DEFAULT_HEDGE_MIN_SAMPLES,
+                 window: int = DEFAULT_HEDGE_WINDOW, max_hedge_rate: float = DEFAULT_MAX_HEDGE_RATE):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.window = window
+        self.max_hedge_rate = max_hedge_rate
+        self.samples: Dict[HedgeKey, Deque[float]] = {}
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.budget_skipped = 0
+        self.latencies: Dict[HedgeKey, List[float]] = {}
+        self.primary_latencies: Dict[HedgeKey, List[Tuple[float, bool]]] = {}
+
+    def threshold(self, key: HedgeKey) -> Optional[float]:
+        """ヘッジするまでの待ち時間（記録が足りない場合はNone）"""
+        samples = self.samples.get(key)
+        if not samples or len(samples) < self.min_samples:
+            return None
+        return percentile(list(samples), self.quantile)
+
+    def _record(self, key: HedgeKey, primary_latency: float, latency: float, cancelled: bool = False):
+        self.samples.setdefault(key, deque(maxlen=self.window)).append(primary_latency)
+        self.primary_latencies.setdefault(key, []).append((primary_latency, cancelled))
+        self.latencies.setdefault(key, []).append(latency)
+
+    def unhedged_latencies(self, key: HedgeKey) -> List[float]:
+        """ヘッジしなかった場合の応答時間の推定（キャンセルした最初のリクエストは、より遅く完了した記録の中央値で補う）"""
+        records = self.primary_latencies.get(key, [])
+        completed = [value for value, cancelled in records if not cancelled]
+        estimated = []
+        for value, cancelled in records:
+            slower = [other for other in completed if other > value] if cancelled else []
+            estimated.append(statistics.median(slower) if slower else value)
+        return estimated
+
+    async def run(self, key: HedgeKey, send: Callable[[int], Awaitable[HTTPResponse]]) -> HTTPResponse:
+        """
+        send(0)で最初のリクエストを送り、しきい値を超えたらsend(1)で複製を送る
+        どちらも成功しなかった場合は最初のリクエストの結果（応答または例外）を返す
+        """
+        self.requests += 1
+        start_time = time.perf_counter()
+        primary = asyncio.ensure_future(send(0))
+        delay = self.threshold(key)
+        if delay is not None and self.hedged >= self.max_hedge_rate * self.requests:
+            self.budget_skipped += 1
+            delay = None
+        if delay is not None:
+            try:
+                await asyncio.wait({primary}, timeout=delay)
+            except asyncio.CancelledError:
+                primary.cancel()
+                raise
+        if delay is None or primary.done():
+            try:
+                return await primary
+            finally:
+                elapsed = time.perf_counter() - start_time
+                self._record(key, elapsed, elapsed)
+
+        self.hedged += 1
+        hedge = asyncio.ensure_future(send(1))
+        pending = {primary, hedge}
+        winner: Optional[asyncio.Future] = None
+        primary_latency: Optional[float] = None
+        try:
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if primary in done:
+                    primary_latency = time.perf_counter() - start_time
+                for task in done:
+                    if task.exception() is None and task.result().status == 200:
+                        winner = task
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        elapsed = time.perf_counter() - start_time
+        self._record(key, primary_latency if primary_latency is not None else elapsed, elapsed,
+                     cancelled=primary_latency is None)
+        if winner is hedge:
+            self.hedge_wins += 1
+        response = await (winner or primary)
+        response.headers[HEDGED_HEADER] = "hedge" if winner is hedge else "primary"
+        return response
+
+    def summary(self) -> Dict:
+        by_key = {}
+        unhedged: List[float] = []
+        for key in sorted(self.latencies):
+            estimated = self.unhedged_latencies(key)
+            unhedged.extend(estimated)
+            by_key[f"{key[0]}_level{key[1]}"] = {
+                'requests': len(self.latencies[key]),
+                'hedge_wins': sum(1 for _, cancelled in self.primary_latencies[key] if cancelled),
+                'threshold': self.threshold(key),
+                'latency': _latency_summary(self.latencies[key]),
+                'unhedged_latency': _latency_summary(estimated),
+            }
+        latencies = [value for values in self.latencies.values() for value in values]
+        overall_latency, overall_unhedged = _latency_summary(latencies), _latency_summary(unhedged)
+        return {
+            'requests': self.requests,
+            'hedged': self.hedged,
+            'hedge_rate': self.hedged / self.requests if self.requests else 0.0,
+            'hedge_wins': self.hedge_wins,
+            'budget_skipped': self.budget_skipped,
+            'quantile': self.quantile,
+            'latency': overall_latency,
+            'unhedged_latency': overall_unhedged,
+            'p95_reduction': overall_unhedged['p95'] - overall_latency['p95'],
+            'p99_reduction': overall_unhedged['p99'] - overall_latency['p99'],
+            'by_cell': by_key,
+        }
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """summary()を実験終了時の表示の1行にする（リクエストがなければNone）"""
+        if not summary['requests']:
+            return None
+        return (f"ヘッジ: {summary['hedged']}/{summary['requests']}件 ({summary['hedge_rate']:.1%}, "
+                f"複製が先に返った件数 {summary['hedge_wins']}), p99 {summary['latency']['p99']:.2f}秒 "
+                f"(ヘッジなしの推定 {summary['unhedged_latency']['p99']:.2f}秒)")
+
+
+def print_summary(summary: Dict):
+    print(f"🪝 ヘッジ: {summary['hedged']}/{summary['requests']}件 ({summary['hedge_rate']:.1%}), "
+          f"複製が先に返った件数 {summary['hedge_wins']}, 上限によりヘッジしなかった件数 {summary['budget_skipped']}")
+    latency, unhedged = summary['latency'], summary['unhedged_latency']
+    print(f"   応答時間 p95 {latency['p95']:.2f}秒 / p99 {latency['p99']:.2f}秒 "
+          f"（ヘッジなしの推定 p95 {unhedged['p95']:.2f}秒 / p99 {unhedged['p99']:.2f}秒）")
+
+
+def add_hedge_arguments(parser: argparse.ArgumentParser):
+    """ヘッジの引数を追加（HTTPバックエンドとプロキシで共通）"""
+    parser.add_argument("--hedge-quantile", type=float, default=DEFAULT_HEDGE_QUANTILE,
+                        help=f"(algo, レベル)ごとの応答時間のこの分位点を超えたら複製を送る（デフォルト: {DEFAULT_HEDGE_QUANTILE}）")
+    parser.add_argument("--hedge-min-samples", type=int, default=DEFAULT_HEDGE_MIN_SAMPLES,
+                        help=f"ヘッジを始めるまでに必要な(algo, レベル)ごとの記録数（デフォルト: {DEFAULT_HEDGE_MIN_SAMPLES}）")
+    parser.add_argument("--max-hedge-rate", type=float, default=DEFAULT_MAX_HEDGE_RATE,
+                        help=f"ヘッジするリクエストの割合の上限（デフォルト: {DEFAULT_MAX_HEDGE_RATE}）")
+    parser.add_argument("--hedge-url", help="複製を送るエンドポイント（指定しない場合は同じエンドポイントへの別の接続）")
+
+
+def hedger_from_args(args) -> RequestHedger:
+    return RequestHedger(quantile=args.hedge_quantile, min_samples=args.hedge_min_samples,
+                         max_hedge_rate=args.max_hedge_rate)
+
+
+class HedgingProxy:
+    """chat/completionsのリクエストをヘッジして上流へ転送する（ストリーミングとその他のパスはそのまま転送）"""
+
+    def __init__(self, upstream: str, client: AsyncHTTPClient, hedger: RequestHedger,
+                 hedge_upstream: Optional[str] = None, timeout: Optional[float] = None):
+        self.upstream = upstream.rstrip("/")
+        self.hedge_upstream = (hedge_upstream or upstream).rstrip("/")
+        self.client = client
+        self.hedger = hedger
+        self.timeout = timeout
+        self.upstream_errors = 0
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        if request.method == "GET" and request.path.rstrip("/") == STATS_PATH:
+            return json_response(200, self.summary())
+        headers = {name: value for name, value in request.headers.items()
+                   if name not in ("host", "content-length", "connection")}
+        hedgeable = request.method == "POST" and request.path.rstrip("/").endswith("/chat/completions")
+        if hedgeable:
+            try:
+                hedgeable = not request.json().get("stream")
+            except (ValueError, AttributeError):
+                hedgeable = False
+        try:
+            if not hedgeable:
+                return await self.client.request(request.method, self.upstream + request.path, request.body or None,
+                                                 headers, timeout=self.timeout)
+            return await self.hedger.run(hedge_key(request.headers.get("x-aitest-cell")),
+                                         lambda attempt: self.client.request(
+                                             "POST", (self.hedge_upstream if attempt else self.upstream) + request.path,
+                                             request.body, headers, timeout=self.timeout))
+        except HTTPClientError as e:
+            self.upstream_errors += 1
+            return json_response(502, {"error": {"message": str(e)}})
+
+    def summary(self) -> Dict:
+        summary = self.hedger.summary()
+        summary['upstream_errors'] = self.upstream_errors
+        return summary
+
+
+def json_response(status: int, data: Dict) -> HTTPResponse:
+    return HTTPResponse(status, "", {"content-type": "application/json"},
+                        json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+async def run_proxy(args):
+    client = AsyncHTTPClient(max_connections=args.max_connections)
+    proxy = HedgingProxy(args.upstream, client, hedger_from_args(args), hedge_upstream=args.hedge_url,
+                         timeout=args.timeout)
+    server = AsyncHTTPServer(proxy.handle, args.host, args.port)
+    url = await server.start()
+    print(f"🪝 ヘッジプロキシを起動しました: {url} → {args.upstream}"
+          + (f"（複製: {args.hedge_url}）" if args.hedge_url else ""))
+    print(f"   しきい値: p{args.hedge_quantile * 100:g}（記録{args.hedge_min_samples}件以上）, "
+          f"ヘッジ率の上限: {args.max_hedge_rate:.0%}")
+    print(f"   統計: {url}{STATS_PATH}")
+    try:
+        await server.serve_forever()
+    finally:
+        await client.close()
+        print()
+        print_summary(proxy.summary())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="遅いリクエストを複製して先に返った応答を使うヘッジプロキシ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    proxy_parser = subparsers.add_parser("proxy", help="プロキシを起動")
+    proxy_parser.add_argument("--upstream", required=True, help="転送先のエンドポイント（例: http://host:8000）")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    proxy_parser.add_argument("--port", type=int, default=8500, help="待ち受けポート（デフォルト: 8500）")
+    proxy_parser.add_argument("--max-connections", type=int, default=64, help="上流への最大同時接続数")
+    proxy_parser.add_argument("--timeout", type=float, help="上流へのリクエストのタイムアウト（秒）")
+    add_hedge_arguments(proxy_parser)
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(run_proxy(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
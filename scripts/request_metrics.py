@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 09:30] リクエストごとの計測結果（request_metrics.jsonl）の記録・読み込みとX-AITest-Cellの形式
+目的: 計測プロキシ（instrumenting_proxy.py）とHTTPバックエンドが同じ形式で記録し、
+      集計スクリプトがプロキシに依存せずに読み込めるようにする
+背景: 以下の関数はinstrumenting_proxy.pyにあり、HTTPバックエンド・レート制限・負荷試験などが
+      ユーティリティのためだけにプロキシのモジュールを読み込んでいた
+意図: - request_cell / parse_request_cell: X-AITest-Cellの値（ログファイル名のrun番号より前の部分）
+      - usage_from_body / message_from_body / response_lengths: 応答本文（JSON、またはSSE）の解析
+      - metrics_record / RequestMetricsWriter: request_metrics.jsonlの1行の作成と追記
+      - read_request_metrics / index_request_metrics / lookup_request_metrics: 読み込みとログとの結合
+      - summarize_request_metrics: 時間の内訳・トークン数の集計
+"""
+
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from aitest_extraction import json_payload
+from async_http import HTTPResponse
+from metrics_utils import percentile
+
+REQUEST_METRICS_FILE = "request_metrics.jsonl"
+# 同じセル・実行番号の複数リクエスト（two-stepsや再送）を合算する項目
+SUMMED_FIELDS = ("queue_time", "connect_time", "ttfb", "decode_time", "total_time",
+                 "prompt_tokens", "completion_tokens")
+_CELL_PATTERN = re.compile(r"^(?P<testcase>[^_]+)_(?P<algo>[^_]+)_(?P<method>[^_]+)_(?P<language>[^_]+)"
+                           r"_level(?P<level>\d+)$")
+
+
+def request_cell(testcase: str, algo: str, method: str, language: str, level: int) -> str:
+    """X-AITest-Cellの値（ログファイル名のrun番号より前の部分）"""
+    return f"{testcase}_{algo}_{method}_{language}_level{level}"
+
+
+def parse_request_cell(cell: Optional[str]) -> Optional[Dict]:
+    """X-AITest-Cellの値を testcase / algo / method / language / level に分解（形式が違う場合はNone）"""
+    match = _CELL_PATTERN.match(cell or "")
+    if not match:
+        return None
+    parsed = match.groupdict()
+    parsed['level'] = int(parsed['level'])
+    return parsed
+
+
+def usage_from_body(body: bytes) -> Optional[Dict]:
+    """応答本文のusage（JSON応答、またはSSEの最後のusageチャンク）"""
+    try:
+        data = json.loads(body)
+        return data.get("usage") if isinstance(data, dict) else None
+    except ValueError:
+        pass
+    usage = None
+    for line in body.decode('utf-8', errors='replace').splitlines():
+        if not line.startswith("data:") or line[5:].strip() == "[DONE]":
+            continue
+        try:
+            chunk = json.loads(line[5:])
+        except ValueError:
+            continue
+        if isinstance(chunk, dict) and chunk.get("usage"):
+            usage = chunk["usage"]
+    return usage
+
+
+def message_from_body(body: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """応答本文の (content, 推論部分) を返す（JSON応答、またはSSEのdeltaを連結。推論部分はreasoning_content / reasoning）"""
+    try:
+        data = json.loads(body)
+    except ValueError:
+        data = None
+    if isinstance(data, dict):
+        try:
+            message = data["choices"][0]["message"]
+        except (KeyError, IndexError, TypeError):
+            return None, None
+        if not isinstance(message, dict):
+            return None, None
+        return message.get("content"), message.get("reasoning_content") or message.get("reasoning")
+    content, reasoning = [], []
+    for line in body.decode('utf-8', errors='replace').splitlines():
+        if not line.startswith("data:") or line[5:].strip() == "[DONE]":
+            continue
+        try:
+            delta = json.loads(line[5:])["choices"][0]["delta"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            continue
+        if not isinstance(delta, dict):
+            continue
+        content.append(delta.get("content") or "")
+        reasoning.append(delta.get("reasoning_content") or delta.get("reasoning") or "")
+    if not content and not reasoning:
+        return None, None
+    return "".join(content), "".join(reasoning)
+
+
+def response_lengths(body: bytes, usage: Dict) -> Dict:
+    """応答の長さ（contentの文字数、そのうちJSON部分の文字数、推論部分の文字数・トークン数）"""
+    content, reasoning = message_from_body(body)
+    details = usage.get('completion_tokens_details') or {}
+    return {
+        'content_chars': len(content) if isinstance(content, str) else None,
+        'payload_chars': len(json_payload(content)) if isinstance(content, str) else None,
+        'reasoning_chars': len(reasoning) if isinstance(reasoning, str) else 0,
+        'reasoning_tokens': details.get('reasoning_tokens') if isinstance(details, dict) else None,
+    }
+
+
+def prompt_text(body: Dict) -> str:
+    return "\n".join(str(message.get("content", "")) for message in body.get("messages", [])
+                     if isinstance(message, dict))
+
+
+def metrics_record(body: Dict, response: HTTPResponse, error: Optional[str], received_at: float, elapsed: float,
+                   run: Optional[int] = None, cell: Optional[str] = None, testcase: Optional[str] = None,
+                   level: Optional[int] = None, request_bytes: int = 0) -> Dict:
+    """request_metrics.jsonlの1行（elapsedは受信から応答完了まで。上流の合計時間を除いた残りをqueue_timeとする）"""
+    usage = (usage_from_body(response.body) if response.status == 200 else None) or {}
+    upstream_time = response.total_time if error is None else 0.0
+    lengths = response_lengths(response.body, usage) if response.status == 200 else {}
+    return {
+        'timestamp': datetime.fromtimestamp(received_at).isoformat(timespec='milliseconds'),
+        'run': run,
+        'cell': cell,
+        'testcase': testcase,
+        'level': level,
+        'model': body.get('model'),
+        'stream': bool(body.get('stream')),
+        'status': response.status,
+        'error': error,
+        'queue_time': round(max(0.0, elapsed - upstream_time) if error is None else elapsed, 6),
+        'connect_time': round(response.connect_time, 6),
+        'ttfb': round(response.ttfb, 6),
+        'decode_time': round(max(0.0, response.total_time - response.connect_time - response.ttfb), 6),
+        'total_time': round(upstream_time, 6),
+        'reused_connection': response.reused,
+        'prompt_tokens': usage.get('prompt_tokens'),
+        'completion_tokens': usage.get('completion_tokens'),
+        'request_bytes': request_bytes,
+        'response_bytes': len(response.body),
+        **lengths,
+    }
+
+
+class RequestMetricsWriter:
+    """
+    計測結果をJSONLに追記（1リクエスト1行）
+    プロキシの起動中に実験ディレクトリが作り直されても記録を続けられるよう、書き込みごとに開き直す
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.records = 0
+
+    def write(self, record: Dict):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.records += 1
+
+
+# ---------------------------------------------------------------------------
+# 読み込み・結合（generate_combined_report.pyから使用）
+# ---------------------------------------------------------------------------
+
+def read_request_metrics(path: str) -> List[Dict]:
+    """JSONLを読み込む（途中で書きかけの行は無視）"""
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+    return records
+
+
+def merge_requests(records: Iterable[Dict]) -> Dict:
+    """同じセル・実行番号のリクエストを合算（時間・トークン数は合計、ステータスは最後のリクエスト）"""
+    merged: Dict = {'requests': 0}
+    for record in records:
+        merged['requests'] += 1
+        for name in SUMMED_FIELDS:
+            if record.get(name) is not None:
+                merged[name] = merged.get(name, 0) + record[name]
+        merged['status'] = record.get('status')
+        merged['model'] = record.get('model')
+    return merged
+
+
+def index_request_metrics(records: Iterable[Dict]) -> Dict[Tuple, Dict]:
+    """
+    ログとの結合用の索引
+    キーは ('cell', cell, run)、ヘッダーのないリクエストは ('document', testcase, level, run)
+    """
+    grouped: Dict[Tuple, List[Dict]] = defaultdict(list)
+    for record in records:
+        if record.get('cell'):
+            grouped[('cell', record['cell'], record.get('run'))].append(record)
+        elif record.get('testcase'):
+            grouped[('document', record['testcase'], record.get('level'), record.get('run'))].append(record)
+    return {key: merge_requests(group) for key, group in grouped.items()}
+
+
+def lookup_request_metrics(index: Dict[Tuple, Dict], testcase: str, algo: str, method: str, language: str,
+                           level: int, run: int) -> Optional[Dict]:
+    """ログ1件に対応する計測結果（X-AITest-Cellのない記録はtestcase・level・runで対応付ける）"""
+    return index.get(('cell', request_cell(testcase, algo, method, language, level), run)) \
+        or index.get(('document', testcase, level, run))
+
+
+def summarize_request_metrics(records: List[Dict]) -> Dict:
+    """時間の内訳（平均・p50・p95）、トークン数、ステータス別の件数"""
+    summary: Dict = {'requests': len(records), 'status': defaultdict(int)}
+    for record in records:
+        summary['status'][str(record.get('status'))] += 1
+    summary['status'] = dict(summary['status'])
+    succeeded = [record for record in records if record.get('status') == 200]
+    for name in ("queue_time", "connect_time", "ttfb", "decode_time", "total_time"):
+        values = [record[name] for record in succeeded if record.get(name) is not None]
+        summary[name] = {'avg': sum(values) / len(values) if values else 0.0,
+                         'p50': percentile(values, 0.5), 'p95': percentile(values, 0.95)}
+    for name in ("prompt_tokens", "completion_tokens"):
+        values = [record[name] for record in succeeded if record.get(name) is not None]
+        summary[name] = {'avg': sum(values) / len(values) if values else 0.0, 'total': sum(values)}
+    generation_rates = [record['completion_tokens'] / record['total_time'] for record in succeeded
+                        if record.get('completion_tokens') and record.get('total_time')]
+    summary['completion_tokens_per_second'] = sum(generation_rates) / len(generation_rates) if generation_rates else 0.0
+    return summary
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 18:30] 外部LLMの応答の記録・再生キャッシュ
+目的: 採点やレポートの処理だけを変更した場合に、モデルを再実行せずに同じ応答からログを作り直す
+背景: ログには抽出後の値しか残らないため、採点規則を変えるたびに同じリクエストを推論サーバーへ送り直していた
+意図: 正規化したリクエストボディ（model, messages, temperature, max_tokens など）のハッシュをキーに、
+      成功した応答（HTTP 200）をキャッシュディレクトリに記録する
+      - 同じリクエストを繰り返す実験（run1〜run20）の分布を保つため、キーごとに複数の応答（サンプル）を記録し、
+        サンプル番号（HTTPバックエンドでは実行番号-1、プロキシではX-AITest-Runヘッダーまたは出現回数）で引く
+      - モード: record（常に送信して追記）/ readwrite（記録があれば再生、なければ送信して記録）/ replay（記録のみ）
+      - 再生時は記録した応答時間もあわせて返し、ログのextraction_timeは元の実行と同じ値になる
+      - 最終利用日時によるサイズ上限の削除（古いものから）と、記録日時による有効期限の削除を行う
+      HTTPバックエンドの --cache-dir で使うか、本スクリプトをプロキシとして起動して任意のクライアントから使う
+
+使用例:
+    # HTTPバックエンド内で使用（1回目で記録し、2回目以降はディスクから再生）
+    python3 scripts/run_external_llm_experiment.py --backend http ... --cache-dir cache/gpt-oss-20b --cache-mode readwrite
+    # プロキシとして起動（Swiftバックエンドなどは --external-llm-url http://127.0.0.1:8100/v1 を指定）
+    python3 scripts/response_cache.py proxy --upstream http://host:8000 --cache-dir cache/gpt-oss-20b --port 8100
+    # 統計と削除
+    python3 scripts/response_cache.py stats --cache-dir cache/gpt-oss-20b
+    python3 scripts/response_cache.py evict --cache-dir cache/gpt-oss-20b --max-size-mb 500 --max-age-days 30
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer, HTTPClientError, HTTPRequest, HTTPResponse
+
+MODE_RECORD = "record"
+MODE_READWRITE = "readwrite"
+MODE_REPLAY = "replay"
+CACHE_MODES = [MODE_READWRITE, MODE_RECORD, MODE_REPLAY]
+
+# キーに含めない項目（応答内容に影響しない）
+IGNORED_REQUEST_FIELDS = {"stream", "stream_options", "user", "n"}
+RUN_HEADER = "x-aitest-run"
+CACHE_STATUS_HEADER = "x-aitest-cache"
+
+
+def canonical_request(body: Dict) -> Dict:
+    """キーの対象とするリクエスト内容（応答に影響しない項目を除き、数値は浮動小数点に揃える）"""
+    canonical = {}
+    for name, value in body.items():
+        if name in IGNORED_REQUEST_FIELDS:
+            continue
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and name != "max_tokens":
+            value = float(value)
+        canonical[name] = value
+    return canonical
+
+
+def request_key(body: Dict) -> str:
+    """正規化したリクエストボディのSHA-256"""
+    text = json.dumps(canonical_request(body), ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CacheMiss(Exception):
+    """replayモードで記録がない"""
+
+
+class ResponseCache:
+    """
+    キャッシュディレクトリ（{cache_dir}/{key[:2]}/{key}.json）
+    エントリ: {'key', 'request', 'created', 'samples': [{'status', 'headers', 'body', 'latency', 'recorded_at'}]}
+    """
+
+    def __init__(self, cache_dir: str, mode: str = MODE_READWRITE, max_size_bytes: Optional[int] = None,
+                 max_age_seconds: Optional[float] = None):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"無効なキャッシュモード: {mode}（{', '.join(CACHE_MODES)}のいずれか）")
+        self.cache_dir = cache_dir
+        self.mode = mode
+        self.max_size_bytes = max_size_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._occurrences: Counter = Counter()
+        self.stats: Counter = Counter()
+
+    def entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self.entry_path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self.max_age_seconds is not None and time.time() - entry.get('created', 0) > self.max_age_seconds:
+            return None
+        return entry
+
+    def next_sample(self, key: str) -> int:
+        """サンプル番号の指定がない場合に使う、このプロセスでの出現回数"""
+        with self._lock:
+            sample = self._occurrences[key]
+            self._occurrences[key] += 1
+        return sample
+
+    def lookup(self, body: Dict, sample: Optional[int] = None) -> Optional[HTTPResponse]:
+        """記録済みの応答（recordモード、または該当サンプルがない場合はNone。replayモードではCacheMiss）"""
+        key = request_key(body)
+        if sample is None:
+            sample = self.next_sample(key)
+        if self.mode == MODE_RECORD:
+            return None
+        entry = self._load(key)
+        samples = entry['samples'] if entry else []
+        if sample < len(samples) and samples[sample] is not None:
+            self.stats['hits'] += 1
+            os.utime(self.entry_path(key))  # サイズ上限の削除で最近使ったエントリを残す
+            recorded = samples[sample]
+            return HTTPResponse(recorded['status'], "OK", recorded.get('headers', {}),
+                                recorded['body'].encode('utf-8'), total_time=recorded.get('latency', 0.0))
+        self.stats['misses'] += 1
+        if self.mode == MODE_REPLAY:
+            raise CacheMiss(f"キャッシュに記録されていません（サンプル{sample + 1}、記録{sum(1 for s in samples if s)}件）")
+        return None
+
+    def store(self, body: Dict, response: HTTPResponse, sample: Optional[int] = None):
+        """成功した応答をsample番目に記録（並行して記録される場合も実行番号と位置が対応するよう、未記録の位置はNoneで埋める）"""
+        if response.status != 200 or self.mode == MODE_REPLAY:
+            return
+        key = request_key(body)
+        recorded = {
+            'status': response.status,
+            'headers': {name: value for name, value in response.headers.items() if name == "content-type"},
+            'body': response.text(),
+            'latency': response.total_time,
+            'recorded_at': time.time(),
+        }
+        path = self.entry_path(key)
+        with self._lock:
+            entry = self._load(key) or {'key': key, 'request': canonical_request(body), 'created': time.time(),
+                                        'samples': []}
+            samples = entry['samples']
+            if sample is None:
+                samples.append(recorded)
+            else:
+                samples.extend([None] * (sample + 1 - len(samples)))
+                samples[sample] = recorded
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f"{path}.tmp{threading.get_ident()}"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(temp_path, path)
+        self.stats['stored'] += 1
+
+    def entries(self) -> List[Dict]:
+        """全エントリのパス・サイズ・最終利用日時"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    entries.append({'path': path, 'size': stat.st_size, 'last_used': stat.st_mtime})
+        return entries
+
+    def evict(self) -> Dict[str, int]:
+        """有効期限切れのエントリを削除し、サイズ上限を超える分を最終利用日時の古い順に削除"""
+        removed_expired = removed_for_size = 0
+        entries = self.entries()
+        if self.max_age_seconds is not None:
+            now = time.time()
+            remaining = []
+            for entry in entries:
+                try:
+                    with open(entry['path'], 'r', encoding='utf-8') as f:
+                        created = json.load(f).get('created', 0)
+                except (OSError, ValueError):
+                    created = 0
+                if now - created > self.max_age_seconds:
+                    os.remove(entry['path'])
+                    removed_expired += 1
+                else:
+                    remaining.append(entry)
+            entries = remaining
+        if self.max_size_bytes is not None:
+            total = sum(entry['size'] for entry in entries)
+            for entry in sorted(entries, key=lambda e: e['last_used']):
+                if total <= self.max_size_bytes:
+                    break
+                os.remove(entry['path'])
+                total -= entry['size']
+                removed_for_size += 1
+        self.stats['evicted'] += removed_expired + removed_for_size
+        return {'expired': removed_expired, 'over_size': removed_for_size}
+
+    def disk_usage(self) -> Dict:
+        entries = self.entries()
+        samples = 0
+        for entry in entries:
+            try:
+                with open(entry['path'], 'r', encoding='utf-8') as f:
+                    samples += sum(1 for sample in json.load(f).get('samples', []) if sample)
+            except (OSError, ValueError):
+                pass
+        return {'entries': len(entries), 'samples': samples, 'bytes': sum(entry['size'] for entry in entries)}
+
+    def summary(self) -> Dict:
+        hits, misses = self.stats['hits'], self.stats['misses']
+        return {
+            'cache_dir': self.cache_dir,
+            'mode': self.mode,
+            'hits': hits,
+            'misses': misses,
+            'hit_rate': hits / (hits + misses) if hits + misses else None,
+            'stored': self.stats['stored'],
+            'evicted': self.stats['evicted'],
+        }
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """summary()を実験終了時の表示の1行にする（参照がなければNone）"""
+        if not summary['hits'] + summary['misses']:
+            return None
+        return (f"応答キャッシュ: ヒット{summary['hits']}件, ミス{summary['misses']}件 "
+                f"(ヒット率 {summary['hit_rate']:.1%})")
+
+
+def add_cache_arguments(parser: argparse.ArgumentParser):
+    """応答キャッシュの引数を追加"""
+    parser.add_argument("--cache-dir", help="応答キャッシュのディレクトリ（指定時のみ使用）")
+    parser.add_argument("--cache-mode", default=MODE_READWRITE, choices=CACHE_MODES,
+                        help="readwrite: 記録があれば再生 / record: 常に送信して記録 / replay: 記録のみで応答（デフォルト: readwrite）")
+    parser.add_argument("--cache-max-size-mb", type=float, help="キャッシュの上限サイズ（MB、終了時に古いものから削除）")
+    parser.add_argument("--cache-max-age-days", type=float, help="キャッシュの有効期限（日）")
+
+
+def cache_from_args(args) -> Optional[ResponseCache]:
+    if not getattr(args, 'cache_dir', None):
+        return None
+    return ResponseCache(
+        args.cache_dir, mode=args.cache_mode,
+        max_size_bytes=int(args.cache_max_size_mb * 1024 * 1024) if args.cache_max_size_mb else None,
+        max_age_seconds=args.cache_max_age_days * 86400 if args.cache_max_age_days else None)
+
+
+# ---------------------------------------------------------------------------
+# プロキシ
+# ---------------------------------------------------------------------------
+
+class CachingProxy:
+    """上流のエンドポイントの手前に置くキャッシュプロキシ（chat/completions以外はそのまま転送）"""
+
+    def __init__(self, cache: ResponseCache, upstream: str, client: AsyncHTTPClient, timeout: Optional[float] = None):
+        self.cache = cache
+        self.upstream = upstream.rstrip("/")
+        self.client = client
+        self.timeout = timeout
+
+    async def handle(self, request: HTTPRequest) -> HTTPResponse:
+        headers = {name: value for name, value in request.headers.items()
+                   if name not in ("host", "content-length", "connection", RUN_HEADER)}
+        if request.method != "POST" or not request.path.rstrip("/").endswith("/chat/completions"):
+            return await self.forward(request, headers)
+        try:
+            body = request.json()
+        except ValueError:
+            return await self.forward(request, headers)
+        if body.get("stream"):
+            # ストリーミング応答はキャッシュしない
+            return await self.forward(request, headers)
+        sample = int(request.headers[RUN_HEADER]) - 1 if request.headers.get(RUN_HEADER, "").isdigit() else None
+        try:
+            cached = await asyncio.to_thread(self.cache.lookup, body, sample)
+        except CacheMiss as e:
+            return json_response(404, {"error": {"message": str(e), "type": "cache_miss"}}, "miss")
+        if cached is not None:
+            cached.headers[CACHE_STATUS_HEADER] = "hit"
+            return cached
+        response = await self.forward(request, headers)
+        await asyncio.to_thread(self.cache.store, body, response, sample)
+        response.headers[CACHE_STATUS_HEADER] = "miss"
+        return response
+
+    async def forward(self, request: HTTPRequest, headers: Dict[str, str]) -> HTTPResponse:
+        try:
+            return await self.client.request(request.method, self.upstream + request.path, request.body or None,
+                                             headers, timeout=self.timeout)
+        except HTTPClientError as e:
+            return json_response(502, {"error": {"message": str(e)}})
+
+
+def json_response(status: int, data: Dict, cache_status: Optional[str] = None) -> HTTPResponse:
+    headers = {"content-type": "application/json"}
+    if cache_status:
+        headers[CACHE_STATUS_HEADER] = cache_status
+    return HTTPResponse(status, "", headers, json.dumps(data, ensure_ascii=False).encode('utf-8'))
+
+
+async def run_proxy(cache: ResponseCache, upstream: str, host: str, port: int, max_connections: int):
+    client = AsyncHTTPClient(max_connections=max_connections)
+    proxy = CachingProxy(cache, upstream, client)
+    server = AsyncHTTPServer(proxy.handle, host, port)
+    url = await server.start()
+    print(f"🗄️ キャッシュプロキシを起動しました: {url} → {upstream} ({cache.mode})")
+    print(f"   キャッシュ: {cache.cache_dir}")
+    try:
+        await server.serve_forever()
+    finally:
+        await client.close()
+
+
+def print_summary(cache: ResponseCache):
+    summary = cache.summary()
+    usage = cache.disk_usage()
+    print(f"🗄️ キャッシュ: {summary['cache_dir']}")
+    print(f"   エントリ: {usage['entries']}件, 応答: {usage['samples']}件, サイズ: {usage['bytes'] / 1024 / 1024:.1f}MB")
+    if summary['hits'] + summary['misses']:
+        print(f"   ヒット: {summary['hits']}件, ミス: {summary['misses']}件, ヒット率: {summary['hit_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="外部LLMの応答の記録・再生キャッシュ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    proxy_parser = subparsers.add_parser("proxy", help="キャッシュプロキシを起動")
+    proxy_parser.add_argument("--upstream", required=True, help="転送先のエンドポイント（例: http://host:8000）")
+    proxy_parser.add_argument("--host", default="127.0.0.1", help="待ち受けアドレス（デフォルト: 127.0.0.1）")
+    proxy_parser.add_argument("--port", type=int, default=8100, help="待ち受けポート（デフォルト: 8100）")
+    proxy_parser.add_argument("--max-connections", type=int, default=64, help="上流への最大同時接続数")
+    add_cache_arguments(proxy_parser)
+
+    for name, help_text in (("stats", "キャッシュの件数・サイズを表示"), ("evict", "有効期限切れ・サイズ超過のエントリを削除")):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--cache-dir", required=True, help="応答キャッシュのディレクトリ")
+        sub.add_argument("--max-size-mb", type=float, help="上限サイズ（MB）")
+        sub.add_argument("--max-age-days", type=float, help="有効期限（日）")
+    args = parser.parse_args()
+
+    if args.command == "proxy":
+        if not args.cache_dir:
+            parser.error("proxy には --cache-dir が必要です")
+        cache = cache_from_args(args)
+        try:
+            asyncio.run(run_proxy(cache, args.upstream, args.host, args.port, args.max_connections))
+        except KeyboardInterrupt:
+            print("\n⏹️ 停止します")
+            cache.evict()
+            print_summary(cache)
+        return
+
+    cache = ResponseCache(args.cache_dir,
+                          max_size_bytes=int(args.max_size_mb * 1024 * 1024) if args.max_size_mb else None,
+                          max_age_seconds=args.max_age_days * 86400 if args.max_age_days else None)
+    if args.command == "evict":
+        removed = cache.evict()
+        print(f"🧹 削除: 期限切れ {removed['expired']}件, サイズ超過 {removed['over_size']}件")
+    print_summary(cache)
+
+
+if __name__ == "__main__":
+    main()
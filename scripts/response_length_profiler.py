@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 00:30] 応答の長さと抽出時間の関係の分析
+目的: プロンプト（algo）・レベル・モデルごとに、応答の冗長さがどれだけデコード時間を使っているかを数値で示す
+背景: persona や -ex のプロンプトは応答が長くなる傾向があるが、ログにはextraction_timeと（エラー時のみ）ai_responseしか
+      残らないため、出力の長さと抽出時間の関係を比較できなかった
+意図: 計測プロキシ（instrumenting_proxy.py）またはHTTPバックエンドが記録するrequest_metrics.jsonlの
+      出力トークン数・応答の文字数（content_chars / payload_chars / reasoning_chars / reasoning_tokens）を集計する
+      - JSON以外の割合: contentのうちJSONExtractorが捨てる部分（前置き、```jsonの囲み、assistantfinalまでの分析）の文字数の割合
+      - 無駄な出力トークン: 推論トークン（usageにない場合は推論部分の文字数の割合から推定）＋ contentのトークンのうちJSON以外の割合
+      - 1トークンあたりのデコード時間: モデルごとに total_time = a + b × completion_tokens を最小二乗法で当てはめたb
+        （出力トークン数がすべて同じ場合は合計時間 / 出力トークン数）
+      - 無駄なデコード時間: 無駄な出力トークン × b
+      algo・レベル・モデル別（およびその組み合わせ）に集計し、出力トークン数と応答時間の相関係数もあわせて出力する
+      generate_combined_report.pyも同じ集計をレポートとdetailed_metrics.jsonに出力する
+
+使用例:
+    python3 scripts/response_length_profiler.py test_logs/202610192030_external_llm
+    python3 scripts/response_length_profiler.py test_logs/a test_logs/b --output response_length_profile.json
+"""
+
+import argparse
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from metrics_utils import format_value
+from request_metrics import REQUEST_METRICS_FILE, parse_request_cell, read_request_metrics
+
+PROFILE_FILE = "response_length_profile.json"
+UNKNOWN = "unknown"
+
+
+def load_records(paths: Iterable[str]) -> List[Dict]:
+    """実験ディレクトリ（サブディレクトリを含む）またはrequest_metrics.jsonlを読み込む"""
+    records: List[Dict] = []
+    for path in paths:
+        if os.path.isfile(path):
+            records.extend(read_request_metrics(path))
+            continue
+        for metrics_path in sorted(Path(path).rglob(REQUEST_METRICS_FILE)):
+            records.extend(read_request_metrics(str(metrics_path)))
+    return records
+
+
+def profiled(records: Iterable[Dict]) -> List[Dict]:
+    """集計対象（成功した応答で、出力トークン数と応答の文字数が記録されているもの）"""
+    return [record for record in records if record.get('status') == 200 and record.get('completion_tokens')
+            and record.get('content_chars') is not None]
+
+
+def record_keys(record: Dict) -> Tuple[str, str, str]:
+    """(モデル, algo, レベル)。X-AITest-Cellがない記録はalgoをunknownとする"""
+    cell = parse_request_cell(record.get('cell'))
+    level = cell['level'] if cell else record.get('level')
+    return (record.get('model') or UNKNOWN, cell['algo'] if cell else UNKNOWN,
+            f"level{level}" if level is not None else UNKNOWN)
+
+
+def correlation(xs: List[float], ys: List[float]) -> Optional[float]:
+    """ピアソンの相関係数（3件未満、または分散が0の場合はNone）"""
+    if len(xs) < 3:
+        return None
+    mean_x, mean_y = sum(xs) / len(xs), sum(ys) / len(ys)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    variance_x = sum((x - mean_x) ** 2 for x in xs)
+    variance_y = sum((y - mean_y) ** 2 for y in ys)
+    if variance_x == 0 or variance_y == 0:
+        return None
+    return covariance / (variance_x * variance_y) ** 0.5
+
+
+def seconds_per_token(records: List[Dict]) -> Dict:
+    """total_time = a + b × completion_tokens の当てはめ（b: 1トークンあたりのデコード時間、a: 固定部分）"""
+    tokens = [record['completion_tokens'] for record in records]
+    times = [record['total_time'] for record in records]
+    mean_tokens, mean_time = sum(tokens) / len(tokens), sum(times) / len(times)
+    variance = sum((value - mean_tokens) ** 2 for value in tokens)
+    if len(records) >= 2 and variance > 0:
+        slope = sum((t - mean_tokens) * (s - mean_time) for t, s in zip(tokens, times)) / variance
+        if slope > 0:
+            return {'seconds_per_token': slope, 'fixed_seconds': mean_time - slope * mean_tokens, 'method': 'regression'}
+    return {'seconds_per_token': sum(times) / sum(tokens), 'fixed_seconds': 0.0, 'method': 'ratio'}
+
+
+def wasted_tokens(record: Dict) -> float:
+    """JSON以外の出力に使われたトークン数の推定（推論トークン＋contentのうちJSON以外の割合）"""
+    completion = record['completion_tokens']
+    reasoning = record.get('reasoning_tokens')
+    if reasoning is None:
+        reasoning_chars, content_chars = record.get('reasoning_chars') or 0, record['content_chars']
+        total_chars = reasoning_chars + content_chars
+        reasoning = completion * reasoning_chars / total_chars if total_chars else 0.0
+    reasoning = min(reasoning, completion)
+    content_chars = record['content_chars']
+    overhead_share = (content_chars - (record.get('payload_chars') or 0)) / content_chars if content_chars else 0.0
+    return reasoning + (completion - reasoning) * overhead_share
+
+
+def _summarize_group(records: List[Dict], rates: Dict[str, Dict]) -> Dict:
+    content_chars = sum(record['content_chars'] for record in records)
+    payload_chars = sum(record.get('payload_chars') or 0 for record in records)
+    total_time = sum(record['total_time'] for record in records)
+    wasted = [wasted_tokens(record) for record in records]
+    wasted_time = [tokens * rates[record.get('model') or UNKNOWN]['seconds_per_token']
+                   for tokens, record in zip(wasted, records)]
+    count = len(records)
+    return {
+        'requests': count,
+        'avg_completion_tokens': sum(record['completion_tokens'] for record in records) / count,
+        'avg_reasoning_tokens': sum(record.get('reasoning_tokens') or 0 for record in records) / count,
+        'avg_content_chars': content_chars / count,
+        'avg_payload_chars': payload_chars / count,
+        'non_json_share': (content_chars - payload_chars) / content_chars if content_chars else 0.0,
+        'avg_total_time': total_time / count,
+        'avg_wasted_tokens': sum(wasted) / count,
+        'avg_wasted_time': sum(wasted_time) / count,
+        'wasted_time_share': sum(wasted_time) / total_time if total_time else 0.0,
+        'token_latency_correlation': correlation([record['completion_tokens'] for record in records],
+                                                 [record['total_time'] for record in records]),
+        'chars_latency_correlation': correlation([record['content_chars'] for record in records],
+                                                 [record['total_time'] for record in records]),
+    }
+
+
+def profile_response_lengths(records: Iterable[Dict]) -> Dict:
+    """algo・レベル・モデル別の応答の長さと無駄なデコード時間（対象の記録がない場合は requests=0）"""
+    records = profiled(records)
+    by_model: Dict[str, List[Dict]] = defaultdict(list)
+    for record in records:
+        by_model[record.get('model') or UNKNOWN].append(record)
+    rates = {model: seconds_per_token(group) for model, group in by_model.items()}
+    groups = {'by_algo': defaultdict(list), 'by_level': defaultdict(list), 'by_model': by_model,
+              'by_model_algo_level': defaultdict(list)}
+    for record in records:
+        model, algo, level = record_keys(record)
+        groups['by_algo'][algo].append(record)
+        groups['by_level'][level].append(record)
+        groups['by_model_algo_level'][f"{model} / {algo} / {level}"].append(record)
+    profile = {'requests': len(records), 'decode_rates': rates,
+               'overall': _summarize_group(records, rates) if records else None}
+    for name, grouped in groups.items():
+        profile[name] = {key: _summarize_group(group, rates) for key, group in sorted(grouped.items())}
+    return profile
+
+
+def print_profile(profile: Dict):
+    print(f"📐 応答の長さの分析: {profile['requests']}件")
+    if not profile['requests']:
+        print("   ⚠️ 応答の文字数が記録されたrequest_metrics.jsonlがありません"
+              "（計測プロキシまたは --backend http で実行してください）")
+        return
+    for model, rate in profile['decode_rates'].items():
+        print(f"   {model}: 1トークンあたり {rate['seconds_per_token'] * 1000:.2f}ms, 固定部分 {rate['fixed_seconds']:.2f}秒"
+              f" ({rate['method']})")
+    for title, name in (("algo別", 'by_algo'), ("レベル別", 'by_level'), ("モデル別", 'by_model'),
+                        ("モデル × algo × レベル", 'by_model_algo_level')):
+        print(f"\n   [{title}]")
+        for key, group in profile[name].items():
+            print(f"   {key}: {group['requests']}件, 出力 {group['avg_completion_tokens']:.0f}トークン "
+                  f"(推論 {group['avg_reasoning_tokens']:.0f}), {group['avg_content_chars']:.0f}文字 "
+                  f"(JSON以外 {group['non_json_share']:.1%}), 平均 {group['avg_total_time']:.2f}秒, "
+                  f"無駄なデコード {group['avg_wasted_time']:.2f}秒 ({group['wasted_time_share']:.1%}), "
+                  f"相関 {format_value(group['token_latency_correlation'], '.2f')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="応答の長さと抽出時間の関係を分析")
+    parser.add_argument("paths", nargs="+", help="実験ディレクトリまたはrequest_metrics.jsonl")
+    parser.add_argument("--output", help=f"結果のJSON（デフォルト: 最初の実験ディレクトリの{PROFILE_FILE}）")
+    args = parser.parse_args()
+
+    profile = profile_response_lengths(load_records(args.paths))
+    print_profile(profile)
+    output = args.output or (os.path.join(args.paths[0], PROFILE_FILE) if os.path.isdir(args.paths[0]) else None)
+    if output and profile['requests']:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 分析結果を保存しました: {output}")
+
+
+if __name__ == "__main__":
+    main()
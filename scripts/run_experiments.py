@@ -4,158 +4,58 @@
 複数のパターン、回数、言語を指定して実験を実行し、結果を一つのディレクトリに整理する
 """
 
-import subprocess
 import json
 import statistics
-import os
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any
 import argparse
-import random
-import string
 
-class ExperimentConfig:
-    """実験設定クラス"""
-    def __init__(self, pattern: str, language: str = "ja", runs: int = 1, mode: str = "simple", levels: List[int] = None):
-        self.pattern = pattern
-        self.language = language
-        self.runs = runs
-        self.mode = mode
-        # @ai[2025-12-03 17:53] levels属性を追加
-        # 目的: Swiftアプリケーションに--levelsパラメータを渡すため
-        # 背景: 指定されたレベル以外も実行される問題を修正
-        # 意図: 指定されたレベルのみを実行するようにする
-        self.levels = levels if levels is not None else [1, 2, 3]
-
-    def get_experiment_name(self) -> str:
-        """実験名を生成"""
-        return f"{self.pattern}_{self.language}_{self.mode}"
-
-    def get_method(self) -> str:
-        """抽出方法を取得"""
-        if "_json" in self.pattern:
-            return "json"
-        elif "_generable" in self.pattern:
-            return "generable"
-        elif "_yaml" in self.pattern:
-            return "yaml"
-        else:
-            return "generable"  # デフォルト
-
-    def to_dict(self) -> Dict[str, Any]:
-        """辞書形式に変換（JSONシリアライゼーション用）"""
-        return {
-            'pattern': self.pattern,
-            'language': self.language,
-            'runs': self.runs,
-            'mode': self.mode,
-            'levels': self.levels,
-            'experiment_name': self.get_experiment_name(),
-            'method': self.get_method()
-        }
+from log_layout import LAYOUT_FLAT, LAYOUTS, discover_log_files
+from experiment_engine import (
+    ConsoleSink, ExperimentEngine, ExperimentJob, JobResult, SequentialScheduler, SwiftCLIBackend,
+    create_experiment_dir
+)
+from worker_slots import add_slot_arguments, slot_pool_from_args
 
 class ExperimentRunner:
-    """実験実行クラス"""
+    """実験実行クラス（実行はexperiment_engineに委譲し、ログ集計と結果保存を行う）"""
     
-    def __init__(self, base_output_dir: str):
+    def __init__(self, base_output_dir: str, warmup: int = 0, concurrency: int = 1, log_layout: str = LAYOUT_FLAT,
+                 slot_pool=None):
         self.base_output_dir = Path(base_output_dir)
+        # Swiftプロセスごとに破棄するウォームアップ抽出回数
+        self.warmup = warmup
+        self.concurrency = concurrency
+        self.log_layout = log_layout
+        # 他の実験プロセスと共有するワーカースロット（worker_slots.WorkerSlotPool）
+        self.slot_pool = slot_pool
         self.base_output_dir.mkdir(parents=True, exist_ok=True)
-        self.results = []
+        self.results: List[JobResult] = []
     
-    def run_single_experiment(self, config: ExperimentConfig) -> Optional[Dict[str, Any]]:
-        """単一の実験設定をまとめて実行"""
-        print(f"🔬 実験実行中: {config.get_experiment_name()} ({config.runs}回実行)")
-
-        # 実験実行コマンド（新しい引数形式）
-        # パターン名は {testcase}_{algo}_{method} の形式
-        pattern_parts = config.pattern.split('_')
-        testcase = pattern_parts[0]  # chat
-        algo = pattern_parts[1]      # abs, strict, etc.
-        method = pattern_parts[2]    # generable, json, yaml
-
-        # ログファイル用のディレクトリを指定（全パターン共通）
-        log_dir = str(self.base_output_dir)
-
-        # @ai[2025-11-27 07:05] two-stepsモードではalgosパラメータは不要
-        # 理由: two-stepsモードではアルゴリズムの指定が不要で、カテゴリ判定と情報抽出のみを実行する
-        # 背景: algosパラメータはsimpleモードでのみ使用される
-        cmd = [
-            "swift", "run", "AITestApp",
-            "--method", method,
-            "--mode", config.mode,
-            "--testcase", testcase,
-        ]
-        
-        # two-stepsモード以外の場合はalgosパラメータを追加
-        if config.mode != "two-steps":
-            cmd.extend(["--algos", algo])
-        
-        # @ai[2025-12-03 17:53] --levelsパラメータを追加
-        # 目的: 指定されたレベルのみを実行するため
-        # 背景: --levelsパラメータが渡されていないため、Swiftアプリケーションがデフォルトで全レベルを実行していた
-        # 意図: 指定されたレベルのみを実行するようにする
-        levels_str = ",".join(map(str, config.levels))
-        cmd.extend([
-            "--language", config.language,
-            "--levels", levels_str,
-            "--runs", str(config.runs),
-            "--test-dir", log_dir
-        ])
-        
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, timeout=600, env=os.environ)
-            if result.returncode != 0:
-                print(f"❌ 実験失敗: {result.stderr}")
-                return None
-            
-            return {
-                'config': config,
-                'success': True,
-                'stdout': result.stdout,
-                'stderr': result.stderr
-            }
-        except subprocess.TimeoutExpired:
-            print(f"⏰ 実験タイムアウト")
-            return None
-        except Exception as e:
-            print(f"❌ 実験例外: {e}")
-            return None
-    
-    def run_experiments(self, configs: List[ExperimentConfig]) -> List[Dict[str, Any]]:
-        """複数の実験設定を実行"""
-        all_results = []
-        
-        # 総実験数を計算
-        total_experiments = len(configs)
-        completed_experiments = 0
-        
-        for config in configs:
-            print(f"\n🚀 パターン {config.pattern} の実験を開始 ({config.runs}回実行)")
-            print(f"📁 出力先: {self.base_output_dir}")
-            
-            # 進捗表示
-            progress = (completed_experiments / total_experiments) * 100
-            print(f"📊 進捗: {progress:.1f}% ({completed_experiments}/{total_experiments})")
-            
-            result = self.run_single_experiment(config)
-            if result:
-                all_results.append(result)
-                self.results.append(result)
-            
-            completed_experiments += 1
-        
-        # 最終進捗表示
-        print(f"📊 進捗: 100.0% ({completed_experiments}/{total_experiments}) - 完了!")
-        
-        return all_results
+    def run_experiments(self, jobs: List[ExperimentJob]) -> List[JobResult]:
+        """
+        複数の実験ジョブを実行
+        @ai[2026-10-19 12:00] コマンド組み立て・タイムアウト・進捗表示はSwiftCLIBackend/ConsoleSinkに移行
+        """
+        # @ai[2026-10-19 10:00] プロセス単位のウォームアップ回数を渡す
+        # 目的: 最初のFoundationModelsセッションの遅さを計測から除外する
+        # 背景: ウォームアップなしの場合、最初の実行はcold_startとしてログに記録される
+        backend = SwiftCLIBackend(process_warmup=self.warmup, log_layout=self.log_layout)
+        engine = ExperimentEngine(
+            backend, SequentialScheduler(jobs), str(self.base_output_dir),
+            sinks=[ConsoleSink("🔬 実験を実行します")], concurrency=self.concurrency, slot_pool=self.slot_pool
+        )
+        engine.run()
+        self.results.extend(engine.results)
+        return engine.results
     
     def collect_log_files(self) -> List[Dict[str, Any]]:
         """ログファイルを収集"""
         log_data = []
         
-        # ベースディレクトリ内のJSONファイルを検索（新しい命名規則のファイルのみ）
-        json_files = list(self.base_output_dir.glob("*_level*_run*.json"))
+        # ベースディレクトリ内のJSONファイルを検索（新しい命名規則のファイルのみ、フラット・シャーディング配置の両方）
+        json_files = [log.path for log in discover_log_files(self.base_output_dir)]
         print(f"📁 ベースディレクトリ: {self.base_output_dir}")
         print(f"🔍 見つかったJSONファイル数: {len(json_files)}")
         
@@ -291,12 +191,12 @@ class ExperimentRunner:
         """結果を保存"""
         output_file = self.base_output_dir / "experiment_results.json"
         
-        # ExperimentConfigオブジェクトを辞書形式に変換
+        # JobResultを辞書形式に変換
         serializable_results = []
         for result in self.results:
-            serializable_result = result.copy()
-            if 'config' in serializable_result:
-                serializable_result['config'] = serializable_result['config'].to_dict()
+            serializable_result = result.to_dict()
+            serializable_result['stdout'] = result.stdout
+            serializable_result['stderr'] = result.stderr
             serializable_results.append(serializable_result)
         
         result_data = {
@@ -338,6 +238,13 @@ def main():
                        help='各パターンの実行回数 (デフォルト: 1)')
     parser.add_argument('--output-dir',
                        help='出力ディレクトリ (指定しない場合は自動生成)')
+    parser.add_argument('--warmup', type=int, default=0,
+                       help='Swiftプロセスごとに計測前に破棄するウォームアップ抽出回数 (デフォルト: 0)')
+    parser.add_argument('--concurrency', type=int, default=1,
+                       help='同時に実行するSwiftプロセス数 (デフォルト: 1)')
+    parser.add_argument('--log-layout', default=LAYOUT_FLAT, choices=LAYOUTS,
+                       help='ログの配置 (flat: 1ディレクトリ / sharded: testcase/algo/level別, デフォルト: flat)')
+    add_slot_arguments(parser)
 
     args = parser.parse_args()
 
@@ -348,9 +255,7 @@ def main():
     if args.output_dir:
         base_output_dir = args.output_dir
     else:
-        timestamp = datetime.now().strftime("%Y%m%d%H%M")
-        random_suffix = ''.join(random.choices(string.ascii_lowercase + string.digits, k=4))
-        base_output_dir = f"test_logs/{timestamp}_{args.method}_{args.language}_{args.mode}_{random_suffix}"
+        base_output_dir = create_experiment_dir(f"{args.method}_{args.language}_{args.mode}", random_suffix=True)
 
     print("🚀 拡張可能な実験実行を開始します（新しい引数方式）...")
     print(f"🔧 抽出方法: {args.method}")
@@ -360,25 +265,26 @@ def main():
     print(f"📊 レベル: {', '.join(map(str, args.levels))}")
     print(f"🌐 言語: {args.language}")
     print(f"🔄 実行回数: {args.runs}回/パターン")
+    print(f"🔥 ウォームアップ: {args.warmup}回/プロセス")
     print(f"📁 出力先: {base_output_dir}")
     print()
 
     # 実験設定を作成（すべての組み合わせを生成）
-    # @ai[2025-12-03 17:53] levelsパラメータをExperimentConfigに渡すように修正
+    # @ai[2025-12-03 17:53] levelsパラメータを実験ジョブに渡すように修正
     # 目的: 指定されたレベルのみを実行するため
     # 背景: レベルごとに個別の実験設定を作成するのではなく、levelsリストを渡すように変更
     # 意図: Swiftアプリケーションに--levelsパラメータを渡すことで、指定されたレベルのみを実行する
-    configs = []
+    jobs = []
     for testcase in args.testcases:
         for algo in args.algos:
             # パターン名を生成: {testcase}_{algo}_{method}
-            pattern = f"{testcase}_{algo}_{args.method}"
-            config = ExperimentConfig(pattern=pattern, language=args.language, runs=args.runs, mode=args.mode, levels=args.levels)
-            configs.append(config)
+            jobs.append(ExperimentJob(testcase=testcase, algo=algo, method=args.method, language=args.language,
+                                      mode=args.mode, levels=tuple(args.levels), runs=args.runs))
     
     # 実験実行
-    runner = ExperimentRunner(base_output_dir)
-    runner.run_experiments(configs)
+    runner = ExperimentRunner(base_output_dir, warmup=args.warmup, concurrency=args.concurrency,
+                              log_layout=args.log_layout, slot_pool=slot_pool_from_args(args))
+    runner.run_experiments(jobs)
     
     # ログファイルを収集
     print("\n📊 ログファイルを収集中...")
@@ -4,165 +4,200 @@
 目的: 外部LLMサーバーを使用してFoundationModelsとの性能比較実験を実行
 背景: ローカルLLM（gpt-oss-20b）との客観的性能比較が必要
 意図: 同一テストケースで異なるLLMの性能を比較し、最適な選択指針を提供
+
+@ai[2026-10-19 12:00] 実行処理はexperiment_engineに移行し、本スクリプトは引数解析のみを行う
+@ai[2026-10-19 17:00] --backend http でSwiftを起動せずにPython実装（http_backend）で実行できるようにした
+@ai[2026-10-19 22:30] --mode two-steps と、httpバックエンドでのカテゴリ判定のメモ（--step-memo-dir）に対応
+@ai[2026-10-20 00:30] --record-requests でhttpバックエンドのリクエストを計測プロキシと同じ形式で記録できるようにした
+@ai[2026-10-20 01:30] --structured-output json_schema でhttpバックエンドからresponse_formatを指定できるようにした
+@ai[2026-10-20 02:30] --hedge でhttpバックエンドの遅いリクエストを複製して送れるようにした
+@ai[2026-10-20 03:30] --stream でhttpバックエンドのリクエストをSSEで受信し、最初のトークン・各項目までの時間を記録できるようにした
+@ai[2026-10-20 05:30] --compact-input でhttpバックエンドのプロンプトに添付するテストデータを圧縮できるようにした
+@ai[2026-10-20 06:30] --chunk-window でhttpバックエンドの長いテストデータをウィンドウに分けて並行して抽出できるようにした
+@ai[2026-10-20 12:30] httpバックエンドのみの引数はHTTP_ONLY_ARGUMENTSで一度に検証し、HTTPOptionsにまとめて渡すようにした
 """
 
-import subprocess
-import sys
-import os
-import time
-from datetime import datetime
-from pathlib import Path
-import json
 import argparse
+import os
 from typing import Optional
 
-class ExternalLLMExperimentRunner:
-    def __init__(self, external_llm_url: str, external_llm_model: str, patterns: list, runs: int = 20, 
-                 generate_report: bool = True, experiment_dir: Optional[str] = None):
-        self.external_llm_url = external_llm_url
-        self.external_llm_model = external_llm_model
-        self.patterns = patterns
-        self.runs = runs
-        self.generate_report = generate_report
-        self.experiment_dir = experiment_dir
-        
-    def run_experiment(self):
-        """外部LLM実験を実行"""
-        print("🌐 外部LLM実験を開始します")
-        print(f"   外部LLM URL: {self.external_llm_url}")
-        print(f"   外部LLM モデル: {self.external_llm_model}")
-        print(f"   パターン: {', '.join(self.patterns)}")
-        print(f"   実行回数: {self.runs}")
-        print("=" * 80)
-        
-        print(f"🔍 デバッグ: パターン数: {len(self.patterns)}")
-        for i, pattern in enumerate(self.patterns):
-            print(f"   パターン {i+1}: {pattern}")
-        
-        # 実験ディレクトリの作成
-        if self.experiment_dir is None:
-            timestamp = datetime.now().strftime("%Y%m%d%H%M")
-            self.experiment_dir = f"test_logs/{timestamp}_external_llm_experiment"
-        
-        os.makedirs(self.experiment_dir, exist_ok=True)
-        print(f"📁 実験ディレクトリ: {self.experiment_dir}")
-        
-        # 各パターンで実験を実行
-        for i, pattern in enumerate(self.patterns):
-            print(f"\n🔬 パターン {i+1}/{len(self.patterns)}: '{pattern}' の実験を開始")
-            self.run_pattern_experiment(pattern)
-        
-        print(f"\n✅ 外部LLM実験完了")
-        print(f"📁 結果ディレクトリ: {self.experiment_dir}")
-        
-        # レポート生成
-        if self.generate_report:
-            self.generate_report()
-        
-    def run_pattern_experiment(self, pattern: str):
-        """特定のパターンで実験を実行"""
-        print(f"  📋 パターン: {pattern}")
-        
-        # パターンから抽出方法と言語を解析
-        parts = pattern.split('_')
-        if len(parts) < 3:
-            print(f"  ❌ 無効なパターン形式: {pattern}")
-            return
-            
-        method = parts[1]  # abs, persona, etc.
-        language = parts[2]  # ja, en
-        
-        # 外部LLM実験では日本語のみをサポート
-        if language != "ja":
-            print(f"  ⚠️ 外部LLM実験では日本語のみサポート: {language} -> ja")
-            language = "ja"
-        
-        # 20回実行
-        for run_num in range(1, self.runs + 1):
-            print(f"    🔄 実行 {run_num}/{self.runs} (進捗: {run_num/self.runs*100:.1f}%)")
-            
-            try:
-                # Swiftアプリケーションを実行
-                cmd = [
-                    "swift", "run", "AITestApp",
-                    "--experiment", f"json_{language}",
-                    "--pattern", pattern,
-                    "--test-dir", self.experiment_dir,
-                    "--external-llm-url", self.external_llm_url,
-                    "--external-llm-model", self.external_llm_model
-                ]
-                
-                # 環境変数でrunNumberを設定
-                env = os.environ.copy()
-                env["AITEST_RUN_NUMBER"] = str(run_num)
-                
-                result = subprocess.run(
-                    cmd,
-                    env=env,
-                    capture_output=True,  # 標準出力をリアルタイムで表示
-                    text=True,
-                    timeout=600  # 10分タイムアウトに延長
-                )
-                
-                if result.returncode == 0:
-                    print(f"      ✅ 成功")
-                else:
-                    print(f"      ❌ 失敗 (コード: {result.returncode})")
-                    # 標準出力はリアルタイムで表示されるため、エラー情報のみ表示
-                    
-            except subprocess.TimeoutExpired:
-                print(f"      ⏰ タイムアウト (10分)")
-            except Exception as e:
-                print(f"      ❌ エラー: {e}")
-            
-            # 進捗表示
-            if run_num % 5 == 0:
-                print(f"    📊 進捗: {run_num}/{self.runs} 完了")
-    
-    def generate_report(self):
-        """実験結果のレポートを生成"""
-        print(f"\n📊 レポート生成中...")
-        
-        try:
-            # 既存のレポート生成スクリプトを使用
-            cmd = [
-                "python3", "scripts/generate_combined_report.py",
-                self.experiment_dir
-            ]
-            
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            if result.returncode == 0:
-                print(f"✅ レポート生成完了: {self.experiment_dir}/parallel_format_experiment_report.html")
-            else:
-                print(f"❌ レポート生成失敗: {result.stderr}")
-                
-        except Exception as e:
-            print(f"❌ レポート生成エラー: {e}")
+from chunked_extraction import DEFAULT_OVERLAP_CHARS, WindowSettings
+from coalescing_gateway import COALESCE_OFF, RequestCoalescer, add_coalesce_arguments
+from experiment_engine import (
+    CellFailureStore, CombinedReportSink, ConsoleSink, ExperimentEngine, JSONSummarySink, LatencyEstimator,
+    RetryingScheduler, RetryPolicy, RoundRobinScheduler, SwiftCLIBackend, TimeBudgetScheduler, build_jobs,
+    create_experiment_dir
+)
+from http_backend import (
+    DEFAULT_MAX_CONNECTIONS, STRUCTURED_OUTPUT_MODES, STRUCTURED_OUTPUT_OFF, HTTPBackend, HTTPOptions
+)
+from input_compaction import COMPACTION_STEPS
+from log_layout import LAYOUTS, detect_layout
+from rate_limiter import add_rate_limit_arguments, rate_limiter_from_args
+from request_hedging import add_hedge_arguments, hedger_from_args
+from request_metrics import REQUEST_METRICS_FILE, RequestMetricsWriter
+from response_cache import add_cache_arguments, cache_from_args
+from two_steps_extraction import StepMemo
+from worker_slots import add_slot_arguments, slot_pool_from_args
 
-def main():
-    parser = argparse.ArgumentParser(description="外部LLM実験実行スクリプト")
+def add_external_llm_arguments(parser: argparse.ArgumentParser):
+    """外部LLM実験スクリプト共通の引数を追加"""
     parser.add_argument("--external-llm-url", required=True, help="外部LLMサーバーのURL")
     parser.add_argument("--external-llm-model", required=True, help="外部LLMモデル名")
     parser.add_argument("--patterns", nargs="+", default=["chat_abs_json", "chat_persona_json", "chat_strict_json"], help="実行するパターン")
     parser.add_argument("--runs", type=int, default=20, help="各パターンの実行回数")
-    parser.add_argument("--no-report", action="store_true", help="レポート生成をスキップ（デフォルト: レポート生成）")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="実行するレベル")
+    parser.add_argument("--mode", default="simple", choices=["simple", "two-steps"],
+                        help="抽出モード (simple/two-steps, デフォルト: simple)")
     parser.add_argument("--experiment-dir", help="実験ディレクトリ（指定しない場合は自動作成）")
-    
+    parser.add_argument("--warmup", type=int, default=0, help="計測前にエンドポイントへ送る破棄用リクエスト数（デフォルト: 0）")
+    parser.add_argument("--concurrency", type=int, default=1, help="同時に実行するジョブ数（デフォルト: 1）")
+    parser.add_argument("--log-layout", choices=LAYOUTS,
+                        help="ログの配置（flat / sharded。指定しない場合は既存ディレクトリの配置、新規はflat）")
+    add_backend_arguments(parser)
+    add_retry_arguments(parser)
+    add_slot_arguments(parser)
+
+def add_backend_arguments(parser: argparse.ArgumentParser):
+    """バックエンド選択の引数を追加"""
+    parser.add_argument("--backend", default="swift", choices=["swift", HTTPBackend.name],
+                        help="swift: 1回ごとにAITestAppを起動 / http: Pythonから直接リクエスト（jsonのみ、デフォルト: swift）")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"httpバックエンドの最大同時接続数（デフォルト: {DEFAULT_MAX_CONNECTIONS}）")
+    add_cache_arguments(parser)
+    add_rate_limit_arguments(parser)
+    add_coalesce_arguments(parser)
+    parser.add_argument("--step-memo-dir",
+                        help="two-stepsモードのカテゴリ判定（Step 1a/1b）をドキュメントごとに記録・再利用するディレクトリ（httpのみ）")
+    parser.add_argument("--record-requests", action="store_true",
+                        help=f"リクエストごとの時間の内訳・トークン数・応答の文字数を実験ディレクトリの{REQUEST_METRICS_FILE}に記録（httpのみ）")
+    parser.add_argument("--structured-output", default=STRUCTURED_OUTPUT_OFF, choices=STRUCTURED_OUTPUT_MODES,
+                        help="json_schema: response_formatでJSONスキーマを指定（未対応のサーバーでは指定なしに切り替え、httpのみ）")
+    parser.add_argument("--hedge", action="store_true",
+                        help="(algo, レベル)ごとの応答時間の分位点を超えたリクエストを複製し、先に返った応答を使う（httpのみ）")
+    add_hedge_arguments(parser)
+    parser.add_argument("--stream", action="store_true",
+                        help="SSEで受信し、最初のトークン・各項目が得られるまでの時間をログのstream_timingに記録（http・simpleモードのみ）")
+    parser.add_argument("--compact-input", action="store_true",
+                        help="プロンプトに添付するテストデータの空白・罫線・重複行・定型文を取り除く（httpのみ）")
+    parser.add_argument("--compaction-steps", nargs="+", default=COMPACTION_STEPS, choices=COMPACTION_STEPS,
+                        help="--compact-input で適用する手順（デフォルト: すべて）")
+    parser.add_argument("--chunk-window", type=int,
+                        help="この文字数より長いテストデータを重なりのあるウィンドウに分けて並行して抽出し、結果を統合（http・simpleモードのみ）")
+    parser.add_argument("--chunk-overlap", type=int, default=DEFAULT_OVERLAP_CHARS,
+                        help=f"--chunk-window の隣り合うウィンドウの重なり（文字数、デフォルト: {DEFAULT_OVERLAP_CHARS}）")
+
+# HTTPバックエンドでのみ使える引数（引数名, 指定されているか, Swiftバックエンドで同じ機能を使う方法）
+HTTP_ONLY_ARGUMENTS = [
+    ("--cache-dir", lambda args: args.cache_dir, "response_cache.py proxy"),
+    ("--rps / --tpm", lambda args: args.rps or args.tpm, "rate_limiter.py proxy"),
+    ("--coalesce", lambda args: args.coalesce, "coalescing_gateway.py proxy"),
+    ("--step-memo-dir", lambda args: args.step_memo_dir, None),
+    ("--record-requests", lambda args: args.record_requests, "instrumenting_proxy.py proxy"),
+    ("--structured-output", lambda args: args.structured_output != STRUCTURED_OUTPUT_OFF, None),
+    ("--hedge", lambda args: args.hedge, "request_hedging.py proxy"),
+    ("--stream", lambda args: args.stream, None),
+    ("--compact-input", lambda args: args.compact_input, None),
+    ("--chunk-window", lambda args: args.chunk_window, None),
+]
+
+def http_options_from_args(args, experiment_dir: str) -> Optional[HTTPOptions]:
+    """
+    HTTPバックエンドのみの引数を検証してHTTPOptionsにまとめる（Swiftバックエンドの場合はNone）
+    Swiftバックエンドで指定された場合と、組み合わせられない指定の場合は終了する
+    """
+    if args.backend != HTTPBackend.name:
+        specified = [(name, proxy) for name, is_specified, proxy in HTTP_ONLY_ARGUMENTS if is_specified(args)]
+        if specified:
+            proxies = [f"{name} は {proxy}" for name, proxy in specified if proxy]
+            raise SystemExit(f"{', '.join(name for name, _ in specified)} は --backend http でのみ使用できます"
+                             + (f"（Swiftバックエンドでは {', '.join(proxies)} を使用してください）" if proxies else ""))
+        return None
+    if args.chunk_window and getattr(args, "mode", "simple") != "simple":
+        raise SystemExit("--chunk-window はsimpleモードでのみ使用できます")
+    try:
+        return HTTPOptions(
+            cache=cache_from_args(args),
+            rate_limiter=rate_limiter_from_args(args, args.external_llm_url),
+            max_throttle_retries=args.max_throttle_retries,
+            coalescer=RequestCoalescer(args.coalesce) if args.coalesce and args.coalesce != COALESCE_OFF else None,
+            step_memo=StepMemo(args.step_memo_dir) if args.step_memo_dir else None,
+            request_metrics=(RequestMetricsWriter(os.path.join(experiment_dir, REQUEST_METRICS_FILE))
+                             if args.record_requests else None),
+            structured_output=args.structured_output,
+            hedger=hedger_from_args(args) if args.hedge else None,
+            hedge_url=args.hedge_url if args.hedge else None,
+            streaming=args.stream,
+            input_compaction=args.compaction_steps if args.compact_input else None,
+            chunking=WindowSettings(args.chunk_window, args.chunk_overlap) if args.chunk_window else None)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+def build_external_backend(args, experiment_dir: str, assume_warm: bool = False, **swift_options):
+    """--backendに応じて外部LLM実験のバックエンドを作成"""
+    log_layout = args.log_layout or detect_layout(experiment_dir)
+    options = http_options_from_args(args, experiment_dir)
+    if options is not None:
+        return HTTPBackend(external_llm_url=args.external_llm_url, external_llm_model=args.external_llm_model,
+                           endpoint_warmup=args.warmup, assume_warm=assume_warm,
+                           max_connections=args.max_connections, log_layout=log_layout, options=options)
+    return SwiftCLIBackend(external_llm_url=args.external_llm_url, external_llm_model=args.external_llm_model,
+                           endpoint_warmup=args.warmup, assume_warm=assume_warm, log_layout=log_layout,
+                           **swift_options)
+
+def add_retry_arguments(parser: argparse.ArgumentParser):
+    """リトライと隔離の引数を追加"""
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="一時的な失敗（HTTPエラー、タイムアウト、異常終了）の最大試行回数（デフォルト: 3, 1で再試行なし）")
+    parser.add_argument("--retry-base-delay", type=float, default=5.0, help="再試行の初回待ち時間（秒、以降は倍々）")
+    parser.add_argument("--quarantine-after", type=int, default=3,
+                        help="決定的な失敗（無効なJSONなど）の累計回数がこの値に達したセルを隔離し、以降は実行しない（デフォルト: 3）")
+
+def with_retries(scheduler, experiment_dir: str, args):
+    """スケジューラーをリトライ・隔離付きにする"""
+    policy = RetryPolicy(max_attempts=args.max_attempts, base_delay=args.retry_base_delay,
+                         quarantine_after=args.quarantine_after)
+    return RetryingScheduler(scheduler, CellFailureStore(experiment_dir, policy.quarantine_after), policy)
+
+def main():
+    parser = argparse.ArgumentParser(description="外部LLM実験実行スクリプト")
+    add_external_llm_arguments(parser)
+    parser.add_argument("--no-report", action="store_true", help="レポート生成をスキップ（デフォルト: レポート生成）")
+    parser.add_argument("--assume-warm", action="store_true", help="エンドポイントをウォームアップ済みとして扱う")
+    parser.add_argument("--time-budget", type=float, help="時間予算（分）。指定時は--runsの代わりに時間内に収まるだけバランスよく実行")
+    parser.add_argument("--initial-estimate", type=float, default=60.0, help="時間予算モードで未計測セルに使う1回あたりの推定秒数")
+
     args = parser.parse_args()
-    
-    # 実験実行
-    generate_report = not args.no_report
-    runner = ExternalLLMExperimentRunner(
-        external_llm_url=args.external_llm_url,
-        external_llm_model=args.external_llm_model,
-        patterns=args.patterns,
-        runs=args.runs,
-        generate_report=generate_report,
-        experiment_dir=args.experiment_dir
-    )
-    
-    runner.run_experiment()
+
+    experiment_dir = args.experiment_dir or create_experiment_dir("external_llm_experiment")
+    backend = build_external_backend(args, experiment_dir, assume_warm=args.assume_warm)
+
+    if args.time_budget:
+        # 時間予算モード: 全セル（パターン×レベル）を1回ずつ実行するラウンドを予算内で繰り返す
+        scheduler = TimeBudgetScheduler(
+            cells=[(pattern, level) for pattern in args.patterns for level in args.levels],
+            budget_seconds=args.time_budget * 60,
+            estimator=LatencyEstimator(initial_estimate=args.initial_estimate),
+            concurrency=args.concurrency,
+            mode=args.mode
+        )
+        title = f"⏳ 時間予算モードで外部LLM実験を開始します（{args.time_budget}分）"
+        summary_name = "time_budget_summary.json"
+    else:
+        # 実行番号ごとにパターンを交互に実行し、途中で中断しても回数が揃うようにする
+        scheduler = with_retries(
+            RoundRobinScheduler(build_jobs(args.patterns, levels=args.levels, runs=args.runs, mode=args.mode,
+                                          per_run=True)),
+            experiment_dir, args)
+        title = f"🌐 外部LLM実験を開始します（{', '.join(args.patterns)} × {args.runs}回）"
+        summary_name = "experiment_summary.json"
+
+    sinks = [ConsoleSink(title), JSONSummarySink(os.path.join(experiment_dir, summary_name))]
+    if not args.no_report:
+        sinks.append(CombinedReportSink(experiment_dir))
+
+    ExperimentEngine(backend, scheduler, experiment_dir, sinks=sinks, concurrency=args.concurrency,
+                     slot_pool=slot_pool_from_args(args)).run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 23:30] サンプリング・推論設定のスイープ
+目的: temperature・top_p・stop・reasoning_effortの組み合わせごとに外部LLM実験を実行し、
+      ベースラインと同等の正規化スコアを保つ中で最も安い設定をalgoごとに推奨する
+背景: ExternalLLMClient.createRequestBodyはtemperature 1.0・top_p 1.0に固定で、stopもreasoning_effortも送らない。
+      JSONExtractorのassistantfinal処理が示すとおり推論型のモデルは回答の前に長い分析を出力し、
+      その分のデコード時間を毎回払っていた
+意図: HTTPバックエンド（http_backend）のsamplingで設定を上書きし、設定ごとのサブディレクトリに通常と同じログと
+      request_metrics.jsonl（計測プロキシと同じ形式）を出力する
+      - ベースラインは現在のSwift版と同じ設定（temperature 1.0, top_p 1.0, stopなし, reasoning_effortなし）で、常に含める
+      - algoごとに、正規化スコア（correct - wrong - unexpected）/ 期待項目数、平均・p95抽出時間（cold startを除く）、
+        平均出力トークン数を集計する
+      - 推奨は、スコアが「ベースライン - 許容差（--tolerance）」以上の設定のうち、--objective（抽出時間または出力トークン数）が
+        最小のもの
+      結果はスイープのディレクトリのsweep_summary.jsonに保存し、--analyze-onlyで再集計できる
+
+@ai[2026-10-20 01:30] 構造化出力（response_format / JSONスキーマ）の比較を追加
+目的: 自由形式のJSON出力と比べて、解析失敗率・避けられた再実行回数・抽出時間がどう変わるかを示す
+意図: --structured-outputs off json_schema で各サンプリング設定を両方の方式で実行する（ベースラインは自由形式）
+      - 解析失敗: エラーが「無効なJSON形式」で始まるログ（応答は得られたがJSONとして解析できなかったもの）
+      - 避けられた再実行: 同じサンプリング設定の自由形式の解析失敗率 × テスト数 − 構造化出力の解析失敗数
+        （解析失敗したセルは結果を得るために実行し直す必要があるため）
+      サーバーがresponse_formatに対応していない場合は自由形式と同じリクエストになり、sweep_setting.jsonのstructured_output_supportedに記録する
+
+使用例:
+    python3 scripts/sampling_sweep.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \\
+        --patterns chat_abs_json chat_strict_json --runs 5 --temperatures 1.0 0.2 0 --top-ps 1.0 0.9 \\
+        --stops none '```' --reasoning-efforts none low --concurrency 8
+    python3 scripts/sampling_sweep.py --external-llm-url http://host:8000/v1 --external-llm-model gpt-oss-20b \
+        --temperatures 1.0 --structured-outputs off json_schema --runs 10
+    python3 scripts/sampling_sweep.py --analyze-only --experiment-dir test_logs/202610192330_sampling_sweep
+"""
+
+import argparse
+import itertools
+import json
+import os
+from typing import Dict, List, Optional, Tuple
+
+from aitest_extraction import DEFAULT_SAMPLING
+from experiment_engine import (
+    ConsoleSink, ExperimentEngine, JSONSummarySink, RoundRobinScheduler, build_jobs, create_experiment_dir
+)
+from http_backend import (
+    DEFAULT_MAX_CONNECTIONS, STRUCTURED_OUTPUT_MODES, STRUCTURED_OUTPUT_OFF, HTTPBackend, HTTPOptions
+)
+from log_layout import discover_log_files
+from metrics_utils import format_value, percentile
+from rate_limiter import add_rate_limit_arguments, rate_limiter_from_args
+from request_metrics import (
+    REQUEST_METRICS_FILE, RequestMetricsWriter, index_request_metrics, lookup_request_metrics, read_request_metrics
+)
+
+SETTING_FILE = "sweep_setting.json"
+SUMMARY_FILE = "sweep_summary.json"
+OBJECTIVE_LATENCY = "latency"
+OBJECTIVE_TOKENS = "completion_tokens"
+OBJECTIVES = [OBJECTIVE_LATENCY, OBJECTIVE_TOKENS]
+NONE_VALUE = "none"
+OVERALL = "overall"
+PARSE_FAILURE_PREFIX = "無効なJSON形式"
+
+BASELINE_SAMPLING = {"temperature": DEFAULT_SAMPLING["temperature"], "top_p": DEFAULT_SAMPLING["top_p"]}
+
+
+def parse_stop(value: str) -> Optional[List[str]]:
+    """--stopsの1要素（none: 送らない、[...]: JSON配列、それ以外: \\nなどのエスケープを解釈した1つの文字列）"""
+    if value == NONE_VALUE:
+        return None
+    if value.startswith("["):
+        return json.loads(value)
+    return [value.encode('utf-8').decode('unicode_escape')]
+
+
+def sampling_grid(temperatures: List[float], top_ps: List[float], stops: List[str],
+                  reasoning_efforts: List[str]) -> List[Dict]:
+    """設定の組み合わせ（先頭はベースライン、重複は除く）"""
+    grid = [dict(BASELINE_SAMPLING)]
+    for temperature, top_p, stop, effort in itertools.product(temperatures, top_ps, stops, reasoning_efforts):
+        sampling = {"temperature": temperature, "top_p": top_p}
+        if parse_stop(stop) is not None:
+            sampling["stop"] = parse_stop(stop)
+        if effort != NONE_VALUE:
+            sampling["reasoning_effort"] = effort
+        if sampling not in grid:
+            grid.append(sampling)
+    return grid
+
+
+def setting_grid(grid: List[Dict], structured_outputs: List[str]) -> List[Tuple[Dict, str]]:
+    """サンプリング設定 × 構造化出力の組み合わせ（先頭はベースライン（自由形式））"""
+    modes = [STRUCTURED_OUTPUT_OFF] + [mode for mode in structured_outputs if mode != STRUCTURED_OUTPUT_OFF]
+    if STRUCTURED_OUTPUT_OFF not in structured_outputs:
+        return [(grid[0], STRUCTURED_OUTPUT_OFF)] + [(sampling, mode) for sampling in grid for mode in modes[1:]]
+    return [(sampling, mode) for sampling in grid for mode in modes]
+
+
+def setting_label(index: int, sampling: Dict, structured_output: str = STRUCTURED_OUTPUT_OFF) -> str:
+    """サブディレクトリ名（stopは内容ではなく有無のみ。詳細はsweep_setting.json）"""
+    label = f"{index:02d}_t{sampling['temperature']:g}_p{sampling['top_p']:g}"
+    if "stop" in sampling:
+        label += f"_stop{len(sampling['stop'])}"
+    if "reasoning_effort" in sampling:
+        label += f"_effort-{sampling['reasoning_effort']}"
+    if structured_output != STRUCTURED_OUTPUT_OFF:
+        label += f"_{structured_output.replace('_', '-')}"
+    return label
+
+
+# ---------------------------------------------------------------------------
+# 実行
+# ---------------------------------------------------------------------------
+
+def run_setting(args, sweep_dir: str, label: str, sampling: Dict, structured_output: str = STRUCTURED_OUTPUT_OFF):
+    """1つの設定で実験を実行（ログとrequest_metrics.jsonlは設定ごとのサブディレクトリに出力）"""
+    setting_dir = os.path.join(sweep_dir, label)
+    os.makedirs(setting_dir, exist_ok=True)
+    setting = {'label': label, 'sampling': sampling, 'structured_output': structured_output}
+    with open(os.path.join(setting_dir, SETTING_FILE), 'w', encoding='utf-8') as f:
+        json.dump(setting, f, ensure_ascii=False, indent=2)
+    backend = HTTPBackend(external_llm_url=args.external_llm_url, external_llm_model=args.external_llm_model,
+                          endpoint_warmup=args.warmup, max_connections=args.max_connections,
+                          options=HTTPOptions(
+                              rate_limiter=rate_limiter_from_args(args, args.external_llm_url),
+                              max_throttle_retries=args.max_throttle_retries, sampling=sampling,
+                              request_metrics=RequestMetricsWriter(os.path.join(setting_dir, REQUEST_METRICS_FILE)),
+                              structured_output=structured_output))
+    scheduler = RoundRobinScheduler(build_jobs(args.patterns, levels=args.levels, runs=args.runs, per_run=True))
+    title = json.dumps(sampling, ensure_ascii=False)
+    if structured_output != STRUCTURED_OUTPUT_OFF:
+        title += f" + {structured_output}"
+    sinks = [ConsoleSink(f"🎛️ 設定 {label}: {title}", show_errors=False),
+             JSONSummarySink(os.path.join(setting_dir, "experiment_summary.json"))]
+    ExperimentEngine(backend, scheduler, setting_dir, sinks=sinks, concurrency=args.concurrency).run()
+    if structured_output != STRUCTURED_OUTPUT_OFF:
+        setting['structured_output_supported'] = backend.structured_output_supported
+        with open(os.path.join(setting_dir, SETTING_FILE), 'w', encoding='utf-8') as f:
+            json.dump(setting, f, ensure_ascii=False, indent=2)
+
+
+# ---------------------------------------------------------------------------
+# 集計と推奨
+# ---------------------------------------------------------------------------
+
+def _new_group() -> Dict:
+    return {'tests': 0, 'errors': 0, 'parse_failures': 0, 'expected_items': 0, 'correct_items': 0, 'wrong_items': 0,
+            'unexpected_items': 0, 'latencies': [], 'completion_tokens': []}
+
+
+def _finalize_group(group: Dict) -> Dict:
+    latencies, tokens = group.pop('latencies'), group.pop('completion_tokens')
+    expected = group['expected_items'] or 1
+    group['normalized_score'] = (group['correct_items'] - group['wrong_items'] - group['unexpected_items']) / expected
+    group['error_rate'] = group['errors'] / group['tests'] if group['tests'] else 0.0
+    group['parse_failure_rate'] = group['parse_failures'] / group['tests'] if group['tests'] else 0.0
+    group['avg_latency'] = sum(latencies) / len(latencies) if latencies else None
+    group['p95_latency'] = percentile(latencies, 0.95) if latencies else None
+    group['avg_completion_tokens'] = sum(tokens) / len(tokens) if tokens else None
+    return group
+
+
+def analyze_setting(setting_dir: str, group_by: str = "algo") -> Dict:
+    """設定1つ分のログをalgoごと（group_by="level"の場合はレベルごと）と全体に集計"""
+    request_index = index_request_metrics(read_request_metrics(os.path.join(setting_dir, REQUEST_METRICS_FILE))
+                                          if os.path.exists(os.path.join(setting_dir, REQUEST_METRICS_FILE)) else [])
+    groups: Dict[str, Dict] = {}
+    for log_file in discover_log_files(setting_dir):
+        with open(log_file.path, 'r', encoding='utf-8') as f:
+            log = json.load(f)
+        for key in (log_file.algo if group_by == "algo" else f"level{log_file.level}", OVERALL):
+            group = groups.setdefault(key, _new_group())
+            group['tests'] += 1
+            group['errors'] += 1 if log.get('error') else 0
+            group['parse_failures'] += 1 if str(log.get('error') or "").startswith(PARSE_FAILURE_PREFIX) else 0
+            fields = log.get('expected_fields', [])
+            group['expected_items'] += len(fields)
+            group['correct_items'] += sum(1 for field in fields if field.get('status') == 'correct')
+            group['wrong_items'] += sum(1 for field in fields if field.get('status') == 'wrong')
+            group['unexpected_items'] += len(log.get('unexpected_fields', []))
+            if log.get('cold_start') or not log.get('extraction_time'):
+                continue
+            group['latencies'].append(log['extraction_time'])
+            metrics = lookup_request_metrics(request_index, log_file.testcase, log_file.algo, log_file.method,
+                                             log_file.language, log_file.level, log_file.run)
+            if metrics and metrics.get('completion_tokens') is not None:
+                group['completion_tokens'].append(metrics['completion_tokens'])
+    return {key: _finalize_group(group) for key, group in groups.items()}
+
+
+def objective_value(stats: Dict, objective: str) -> Optional[float]:
+    """比較に使うコスト（出力トークン数が記録されていない場合は抽出時間）"""
+    if objective == OBJECTIVE_TOKENS and stats.get('avg_completion_tokens') is not None:
+        return stats['avg_completion_tokens']
+    return stats.get('avg_latency')
+
+
+def recommend(settings: Dict[str, Dict], baseline: str, tolerance: float, objective: str) -> Dict[str, Dict]:
+    """algoごとに、スコアがベースライン - 許容差以上の設定のうちコストが最小のものを選ぶ"""
+    recommendations = {}
+    for key in sorted(settings[baseline]['stats'], key=lambda name: (name == OVERALL, name)):
+        baseline_stats = settings[baseline]['stats'][key]
+        candidates: List[Tuple[float, str]] = []
+        for label, setting in settings.items():
+            stats = setting['stats'].get(key)
+            if stats is None or stats['normalized_score'] < baseline_stats['normalized_score'] - tolerance:
+                continue
+            cost = objective_value(stats, objective)
+            if cost is not None:
+                candidates.append((cost, label))
+        if not candidates:
+            continue
+        cost, label = min(candidates)
+        stats, baseline_cost = settings[label]['stats'][key], objective_value(baseline_stats, objective)
+        recommendations[key] = {
+            'setting': label,
+            'sampling': settings[label]['sampling'],
+            'structured_output': settings[label]['structured_output'],
+            'normalized_score': stats['normalized_score'],
+            'baseline_score': baseline_stats['normalized_score'],
+            'cost': cost,
+            'baseline_cost': baseline_cost,
+            'cost_reduction': 1 - cost / baseline_cost if baseline_cost else 0.0,
+            'avg_latency': stats['avg_latency'],
+            'avg_completion_tokens': stats['avg_completion_tokens'],
+        }
+    return recommendations
+
+
+def compare_structured_output(settings: Dict[str, Dict]) -> Dict[str, Dict]:
+    """構造化出力の設定ごとに、同じサンプリング設定の自由形式と解析失敗率・再実行回数・抽出時間を比較"""
+    comparisons = {}
+    for label, setting in settings.items():
+        if setting['structured_output'] == STRUCTURED_OUTPUT_OFF:
+            continue
+        free_form = next((name for name, other in settings.items()
+                          if other['structured_output'] == STRUCTURED_OUTPUT_OFF
+                          and other['sampling'] == setting['sampling']), None)
+        if free_form is None:
+            continue
+        by_key = {}
+        for key, stats in setting['stats'].items():
+            free_stats = settings[free_form]['stats'].get(key)
+            if free_stats is None:
+                continue
+            by_key[key] = {
+                'parse_failure_rate': stats['parse_failure_rate'],
+                'free_form_parse_failure_rate': free_stats['parse_failure_rate'],
+                'retries_avoided': free_stats['parse_failure_rate'] * stats['tests'] - stats['parse_failures'],
+                'avg_latency': stats['avg_latency'],
+                'free_form_avg_latency': free_stats['avg_latency'],
+                'latency_change': (stats['avg_latency'] / free_stats['avg_latency'] - 1
+                                   if stats['avg_latency'] is not None and free_stats['avg_latency'] else None),
+                'normalized_score': stats['normalized_score'],
+                'free_form_score': free_stats['normalized_score'],
+            }
+        comparisons[label] = {'free_form': free_form, 'supported': setting.get('structured_output_supported'),
+                              'stats': dict(sorted(by_key.items(), key=lambda item: (item[0] == OVERALL, item[0])))}
+    return comparisons
+
+
+def analyze_sweep(sweep_dir: str, tolerance: float, objective: str) -> Dict:
+    """スイープのディレクトリ内の全設定を集計し、推奨をsweep_summary.jsonに保存"""
+    settings: Dict[str, Dict] = {}
+    for name in sorted(os.listdir(sweep_dir)):
+        path = os.path.join(sweep_dir, name, SETTING_FILE)
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            setting = json.load(f)
+        settings[setting['label']] = {'sampling': setting['sampling'],
+                                      'structured_output': setting.get('structured_output', STRUCTURED_OUTPUT_OFF),
+                                      'structured_output_supported': setting.get('structured_output_supported'),
+                                      'stats': analyze_setting(os.path.join(sweep_dir, name))}
+    baseline = next((label for label, setting in settings.items() if setting['sampling'] == BASELINE_SAMPLING
+                     and setting['structured_output'] == STRUCTURED_OUTPUT_OFF), None)
+    if baseline is None:
+        raise SystemExit(f"ベースライン（{json.dumps(BASELINE_SAMPLING)}）の結果が見つかりません: {sweep_dir}")
+    summary = {'baseline': baseline, 'tolerance': tolerance, 'objective': objective, 'settings': settings,
+               'recommendations': recommend(settings, baseline, tolerance, objective),
+               'structured_output': compare_structured_output(settings)}
+    with open(os.path.join(sweep_dir, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def print_sweep_summary(summary: Dict):
+    print("\n" + "=" * 80)
+    print(f"🎛️ サンプリング設定のスイープ結果（ベースライン: {summary['baseline']}, 許容差: {summary['tolerance']}）")
+    print("=" * 80)
+    for label, setting in summary['settings'].items():
+        stats = setting['stats'].get(OVERALL)
+        if stats is None:
+            continue
+        print(f"   {label}: スコア {stats['normalized_score']:.3f}, 平均 {format_value(stats['avg_latency'], '.2f')}秒, "
+              f"p95 {format_value(stats['p95_latency'], '.2f')}秒, 出力トークン {format_value(stats['avg_completion_tokens'], '.0f')}, "
+              f"エラー率 {stats['error_rate']:.1%} (解析失敗 {stats['parse_failure_rate']:.1%})")
+    if summary.get('structured_output'):
+        print("\n🧩 構造化出力と自由形式のJSON出力の比較:")
+        for label, comparison in summary['structured_output'].items():
+            stats = comparison['stats'].get(OVERALL)
+            if stats is None:
+                continue
+            unsupported = "（サーバー未対応のため自由形式で送信）" if comparison['supported'] is False else ""
+            print(f"   {label} vs {comparison['free_form']}{unsupported}: "
+                  f"解析失敗 {stats['parse_failure_rate']:.1%}（自由形式 {stats['free_form_parse_failure_rate']:.1%}）, "
+                  f"避けられた再実行 {stats['retries_avoided']:.1f}回, "
+                  f"平均 {format_value(stats['avg_latency'], '.2f')}秒（自由形式 {format_value(stats['free_form_avg_latency'], '.2f')}秒）, "
+                  f"スコア {stats['normalized_score']:.3f}（自由形式 {stats['free_form_score']:.3f}）")
+    print("\n💡 推奨設定（スコアを保つ中でコストが最小）:")
+    for key, recommendation in summary['recommendations'].items():
+        print(f"   {key}: {recommendation['setting']} {json.dumps(recommendation['sampling'], ensure_ascii=False)}"
+              f"{' + ' + recommendation['structured_output'] if recommendation['structured_output'] != STRUCTURED_OUTPUT_OFF else ''} "
+              f"スコア {recommendation['normalized_score']:.3f}（ベースライン {recommendation['baseline_score']:.3f}）, "
+              f"{summary['objective']} {recommendation['cost_reduction']:.1%}削減")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="サンプリング・推論設定のスイープ（httpバックエンド）")
+    parser.add_argument("--external-llm-url", help="外部LLMサーバーのURL")
+    parser.add_argument("--external-llm-model", help="外部LLMモデル名")
+    parser.add_argument("--patterns", nargs="+", default=["chat_abs_json", "chat_persona_json", "chat_strict_json"],
+                        help="実行するパターン（json方式）")
+    parser.add_argument("--runs", type=int, default=5, help="設定ごとの各パターンの実行回数（デフォルト: 5）")
+    parser.add_argument("--levels", nargs="+", type=int, default=[1, 2, 3], choices=[1, 2, 3], help="実行するレベル")
+    parser.add_argument("--temperatures", nargs="+", type=float, default=[1.0, 0.0], help="temperatureの候補")
+    parser.add_argument("--top-ps", nargs="+", type=float, default=[1.0], help="top_pの候補")
+    parser.add_argument("--stops", nargs="+", default=[NONE_VALUE],
+                        help="stopの候補（none: 送らない、JSON配列で複数指定、\\nなどのエスケープ可）")
+    parser.add_argument("--reasoning-efforts", nargs="+", default=[NONE_VALUE],
+                        help="reasoning_effortの候補（none: 送らない、low / medium / high）")
+    parser.add_argument("--structured-outputs", nargs="+", default=[STRUCTURED_OUTPUT_OFF],
+                        choices=STRUCTURED_OUTPUT_MODES,
+                        help="構造化出力の候補（off: 自由形式のJSON出力 / json_schema: response_formatでスキーマを指定）")
+    parser.add_argument("--tolerance", type=float, default=0.02,
+                        help="ベースラインからの正規化スコアの許容低下幅（デフォルト: 0.02）")
+    parser.add_argument("--objective", choices=OBJECTIVES, default=OBJECTIVE_LATENCY,
+                        help="最小化するコスト（latency: 平均抽出時間 / completion_tokens: 平均出力トークン数）")
+    parser.add_argument("--experiment-dir", help="スイープのディレクトリ（指定しない場合は自動作成）")
+    parser.add_argument("--warmup", type=int, default=0, help="設定ごとに計測前に送る破棄用リクエスト数")
+    parser.add_argument("--concurrency", type=int, default=1, help="同時に実行するジョブ数（デフォルト: 1）")
+    parser.add_argument("--max-connections", type=int, default=DEFAULT_MAX_CONNECTIONS,
+                        help=f"最大同時接続数（デフォルト: {DEFAULT_MAX_CONNECTIONS}）")
+    parser.add_argument("--analyze-only", action="store_true", help="実行せず、--experiment-dirの結果を再集計する")
+    add_rate_limit_arguments(parser)
+    args = parser.parse_args()
+
+    if args.analyze_only:
+        if not args.experiment_dir:
+            parser.error("--analyze-only には --experiment-dir が必要です")
+        print_sweep_summary(analyze_sweep(args.experiment_dir, args.tolerance, args.objective))
+        return
+    if not (args.external_llm_url and args.external_llm_model):
+        parser.error("--external-llm-url と --external-llm-model が必要です")
+
+    sweep_dir = args.experiment_dir or create_experiment_dir("sampling_sweep")
+    grid = setting_grid(sampling_grid(args.temperatures, args.top_ps, args.stops, args.reasoning_efforts),
+                        args.structured_outputs)
+    print(f"🎛️ サンプリング設定のスイープを開始します（{len(grid)}設定 × {', '.join(args.patterns)} × {args.runs}回）")
+    print(f"📁 スイープのディレクトリ: {sweep_dir}")
+    for index, (sampling, structured_output) in enumerate(grid):
+        run_setting(args, sweep_dir, setting_label(index, sampling, structured_output), sampling, structured_output)
+    print_sweep_summary(analyze_sweep(sweep_dir, args.tolerance, args.objective))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 13:00] AITestAppのシミュレーター
+目的: SwiftやLLMなしで、スキーマ準拠（docs/LOG_SCHEMA.md）のログを出力する擬似バックエンドを提供する
+背景: スイープ全体の所要時間のうち、Python側のオーケストレーション（起動、ポーリング、glob、JSON入出力）と
+      推論本体がそれぞれどれだけを占めるのか切り分けられなかった
+意図: 遅延分布・エラー率・クラッシュ率を指定できる2つの形態を用意する
+      - SimulatedBackend: experiment_engineのバックエンドとしてプロセス内で動作（--backend simulated）
+      - CLIモード: AITestAppと同じ引数を受け付けるため、SwiftCLIBackendのcommand_prefixに指定してプロセス起動コストも計測できる
+        python3 scripts/simulated_backend.py --method json --testcase chat --algos abs --levels 1,2 --runs 1 --test-dir DIR
+
+遅延分布の指定形式（秒）:
+    fixed:1.5 / uniform:0.5:3.0 / normal:2.0:0.5 / lognormal:0.7:0.4（対数空間のμ,σ） / exponential:2.0（平均）
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from typing import Dict, List, Optional
+
+from aitest_logs import (
+    AI_VERIFICATION_PLACEHOLDER, ALL_FIELDS, build_error_log, build_log, expected_value, load_test_case, write_log
+)
+from experiment_engine import Backend, DEFAULT_RUN_TIMEOUT, ExperimentJob, JobResult, register_backend
+from log_layout import ENV_LOG_LAYOUT, LAYOUT_FLAT
+
+# CLIモードの設定を受け渡す環境変数
+ENV_LATENCY = "AITEST_SIM_LATENCY"
+ENV_ERROR_RATE = "AITEST_SIM_ERROR_RATE"
+ENV_CRASH_RATE = "AITEST_SIM_CRASH_RATE"
+ENV_ACCURACY = "AITEST_SIM_ACCURACY"
+ENV_TIME_SCALE = "AITEST_SIM_TIME_SCALE"
+ENV_SEED = "AITEST_SIM_SEED"
+
+
+class LatencyModel:
+    """遅延分布"""
+
+    def __init__(self, spec: str = "fixed:1.0"):
+        self.spec = spec
+        name, *params = spec.split(":")
+        self.name = name
+        self.params = [float(p) for p in params]
+        expected_params = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if name not in expected_params or len(self.params) != expected_params[name]:
+            raise ValueError(f"無効な遅延分布: {spec}（例: fixed:1.5, uniform:0.5:3, normal:2:0.5, lognormal:0.7:0.4, exponential:2）")
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.name == 'fixed':
+            value = p[0]
+        elif self.name == 'uniform':
+            value = rng.uniform(p[0], p[1])
+        elif self.name == 'normal':
+            value = rng.gauss(p[0], p[1])
+        elif self.name == 'lognormal':
+            value = rng.lognormvariate(p[0], p[1])
+        else:
+            value = rng.expovariate(1.0 / p[0])
+        return max(0.0, value)
+
+
+class CellSimulator:
+    """1セル（パターン×レベル×実行番号）分の抽出結果とログを生成"""
+
+    def __init__(self, latency: LatencyModel, error_rate: float = 0.0, accuracy: float = 0.9,
+                 unexpected_rate: float = 0.05, rng: Optional[random.Random] = None, log_layout: str = LAYOUT_FLAT):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.accuracy = accuracy
+        self.unexpected_rate = unexpected_rate
+        self.rng = rng or random.Random()
+        self.log_layout = log_layout
+
+    def simulate_extraction(self, job: ExperimentJob, level: int) -> Dict[str, Optional[str]]:
+        """期待値を基に、正解・誤り・欠落・余分な項目を確率的に含む抽出結果を作成"""
+        test_case = load_test_case(job.testcase, level)
+        extracted: Dict[str, Optional[str]] = {}
+        for name in test_case.expected_fields:
+            expected = expected_value(test_case, name)
+            roll = self.rng.random()
+            if roll < self.accuracy:
+                extracted[name] = f"simulated {name}" if expected in ("", AI_VERIFICATION_PLACEHOLDER) else expected
+            elif roll < self.accuracy + (1 - self.accuracy) / 2:
+                extracted[name] = f"wrong-{name}"
+            else:
+                extracted[name] = None
+        for name in ALL_FIELDS:
+            if name not in test_case.expected_fields and self.rng.random() < self.unexpected_rate:
+                extracted[name] = f"unexpected-{name}"
+        return extracted
+
+    def write_cell(self, job: ExperimentJob, level: int, run: int, output_dir: str, latency: float,
+                   cold_start: bool) -> str:
+        """セルのログ（正常またはエラー）を書き込む"""
+        test_case = load_test_case(job.testcase, level)
+        if self.rng.random() < self.error_rate:
+            log = build_error_log(test_case, job.algo, job.method, job.language, "無効なJSON形式です", latency,
+                                  cold_start=cold_start, ai_response="simulated invalid response")
+            path = job.log_path(output_dir, level, run, error=True, layout=self.log_layout)
+        else:
+            log = build_log(test_case, job.algo, job.method, job.language, self.simulate_extraction(job, level),
+                            latency, cold_start=cold_start)
+            path = job.log_path(output_dir, level, run, layout=self.log_layout)
+        return write_log(path, log)
+
+
+@register_backend
+class SimulatedBackend(Backend):
+    """
+    @ai[2026-10-19 13:00] プロセス内で動作する擬似バックエンド
+    意図: time_scale=0の場合は待機せずに遅延値だけをログに記録し、オーケストレーションのみのコストを計測できるようにする
+    """
+    name = "simulated"
+
+    def __init__(self, latency: str = "fixed:1.0", error_rate: float = 0.0, crash_rate: float = 0.0,
+                 accuracy: float = 0.9, time_scale: float = 1.0, seed: Optional[int] = None,
+                 default_timeout: float = DEFAULT_RUN_TIMEOUT, log_layout: str = LAYOUT_FLAT):
+        self.latency_model = LatencyModel(latency)
+        self.crash_rate = crash_rate
+        self.time_scale = time_scale
+        self.default_timeout = default_timeout
+        self.rng = random.Random(seed)
+        self.simulator = CellSimulator(self.latency_model, error_rate=error_rate, accuracy=accuracy, rng=self.rng,
+                                       log_layout=log_layout)
+        self.simulated_seconds = 0.0
+        self._warm = False
+
+    def describe(self) -> Dict[str, str]:
+        return {
+            'バックエンド': 'シミュレーター',
+            '遅延分布': self.latency_model.spec,
+            'エラー率': f"{self.simulator.error_rate:.1%}",
+            'クラッシュ率': f"{self.crash_rate:.1%}",
+            '時間倍率': str(self.time_scale)
+        }
+
+    async def run(self, job: ExperimentJob, output_dir: str, timeout: float) -> JobResult:
+        start_time = time.time()
+        log_files: List[str] = []
+        simulated = 0.0
+        for level, run in job.cells():
+            latency = self.latency_model.sample(self.rng)
+            simulated += latency
+            if simulated * self.time_scale > timeout:
+                await asyncio.sleep(max(0.0, timeout - (time.time() - start_time)))
+                return JobResult(job=job, success=False, elapsed=time.time() - start_time, timeout=timeout,
+                                 timed_out=True, error=f"タイムアウト ({timeout:.0f}秒)", log_files=log_files)
+            if self.time_scale > 0:
+                await asyncio.sleep(latency * self.time_scale)
+            cold_start = not self._warm
+            self._warm = True
+            log_files.append(self.simulator.write_cell(job, level, run, output_dir, latency, cold_start))
+        self.simulated_seconds += simulated
+
+        if self.rng.random() < self.crash_rate:
+            return JobResult(job=job, success=False, elapsed=time.time() - start_time, timeout=timeout,
+                             returncode=1, error="simulated crash", log_files=log_files)
+        return JobResult(job=job, success=True, elapsed=time.time() - start_time, timeout=timeout,
+                         returncode=0, log_files=log_files)
+
+
+def main():
+    """AITestApp互換のCLIモード（設定は環境変数 AITEST_SIM_* で指定）"""
+    parser = argparse.ArgumentParser(description="AITestAppシミュレーター（AITestApp互換の引数）")
+    parser.add_argument("--method", default="generable")
+    parser.add_argument("--mode", default="simple")
+    parser.add_argument("--testcase", default="chat")
+    parser.add_argument("--algos", default="abs")
+    parser.add_argument("--language", default="ja")
+    parser.add_argument("--levels", default="1,2,3")
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--test-dir", required=True)
+    parser.add_argument("--warmup", type=int, default=0)
+    parser.add_argument("--external-llm-url")
+    parser.add_argument("--external-llm-model")
+    parser.add_argument("--timeout")
+    parser.add_argument("--log-layout", default=os.environ.get(ENV_LOG_LAYOUT, LAYOUT_FLAT))
+    args = parser.parse_args()
+
+    env = os.environ
+    run_base = int(env.get("AITEST_RUN_NUMBER", "1") or 1)
+    seed = env.get(ENV_SEED)
+    rng = random.Random(f"{seed}:{args.testcase}:{args.algos}:{args.levels}:{run_base}" if seed else None)
+    time_scale = float(env.get(ENV_TIME_SCALE, "1.0"))
+    simulator = CellSimulator(LatencyModel(env.get(ENV_LATENCY, "fixed:1.0")),
+                              error_rate=float(env.get(ENV_ERROR_RATE, "0")),
+                              accuracy=float(env.get(ENV_ACCURACY, "0.9")), rng=rng, log_layout=args.log_layout)
+    # Swift版と同様、AITEST_COLD_STARTが宣言されていればそれを優先し、なければプロセス内最初の抽出をcold扱い
+    declared = env.get("AITEST_COLD_START")
+    warm = args.warmup > 0 or (declared is not None and declared != "1")
+
+    os.makedirs(args.test_dir, exist_ok=True)
+    levels = tuple(int(level) for level in args.levels.split(","))
+    for algo in args.algos.split(","):
+        job = ExperimentJob(testcase=args.testcase, algo=algo, method=args.method, language=args.language,
+                            mode=args.mode, levels=levels, runs=args.runs, run_start=run_base)
+        for level, run in job.cells():
+            latency = simulator.latency.sample(rng)
+            if time_scale > 0:
+                time.sleep(latency * time_scale)
+            path = simulator.write_cell(job, level, run, args.test_dir, latency, cold_start=not warm)
+            warm = True
+            print(f"💾 ログ保存: {path}")
+
+    if rng.random() < float(env.get(ENV_CRASH_RATE, "0")):
+        print("❌ simulated crash", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
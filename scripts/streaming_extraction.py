@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 03:30] SSEストリーミング応答の逐次解析（最初のトークン・各項目が得られるまでの時間）
+目的: 外部LLMの応答を最後まで待たずに、userID / passwordなどの項目が使えるようになった時点を計測する
+背景: 外部LLM実験は応答全体を受信してからJSONを解析しており、ログには合計の抽出時間しか残らなかった。
+      実運用で重要なのは最初に使える項目が得られるまでの時間である
+意図: "stream": true の応答（chat.completion.chunkのSSE）を受信しながら
+      - SSEDecoder: 受信したバイト列をイベント単位に分け、deltaのcontent / 推論部分を取り出す
+      - IncrementalJSONParser: contentの最上位のJSONオブジェクトを逐次解析し、値が閉じた時点で(項目名, 値)を返す
+        （前置きや```jsonの囲みは読み飛ばし、オブジェクトが閉じた後に別のオブジェクトが始まった場合はそちらも解析する）
+      - StreamTimer: 最初のトークン（contentまたは推論部分）・最初の項目（値がnull / 空文字列でないもの）・
+        各項目が得られた時刻を記録する
+      ログのstream_timing（time_to_first_token / time_to_first_field / field_times / total_time）に出力し、
+      generate_combined_report.pyでパターン・レベル別にグラフ化する
+"""
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class SSEDecoder:
+    """SSEのバイト列を受け取り、chat.completion.chunkのdeltaから (content, 推論部分) を取り出す"""
+
+    def __init__(self):
+        self._buffer = b""
+
+    def feed(self, data: bytes) -> List[Tuple[str, str]]:
+        self._buffer += data
+        deltas = []
+        while b"\n" in self._buffer:
+            line, self._buffer = self._buffer.split(b"\n", 1)
+            text = line.decode('utf-8', errors='replace').strip()
+            if not text.startswith("data:") or text[5:].strip() == "[DONE]":
+                continue
+            try:
+                delta = json.loads(text[5:])["choices"][0]["delta"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                continue
+            if isinstance(delta, dict):
+                deltas.append((delta.get("content") or "",
+                               delta.get("reasoning_content") or delta.get("reasoning") or ""))
+        return deltas
+
+
+class IncrementalJSONParser:
+    """最上位のJSONオブジェクトの項目を、値が閉じた時点で返すパーサー（1文字ずつ状態を進める）"""
+
+    def __init__(self):
+        self.text = ""
+        self._position = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"          # key / key_string / colon / value / after_value
+        self._key: Optional[str] = None
+        self._key_start = 0
+        self._value_start = 0
+
+    def _emit(self, end: int) -> List[Tuple[str, Any]]:
+        raw = self.text[self._value_start:end].strip()
+        self._expect = "after_value"
+        try:
+            return [(self._key, json.loads(raw))]
+        except ValueError:
+            return []
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        self.text += text
+        fields: List[Tuple[str, Any]] = []
+        while self._position < len(self.text):
+            index, char = self._position, self.text[self._position]
+            self._position += 1
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key_string":
+                        try:
+                            self._key = json.loads(self.text[self._key_start:index + 1])
+                        except ValueError:
+                            self._key = None
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._expect == "value":
+                        fields.extend(self._emit(index + 1))
+                continue
+            if self._depth == 0:
+                if char == "{":
+                    self._depth, self._expect = 1, "key"
+                continue
+            if char == '"':
+                self._in_string = True
+                if self._depth == 1 and self._expect == "key":
+                    self._key_start, self._expect = index, "key_string"
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                if self._depth == 1:
+                    if self._expect == "value":
+                        fields.extend(self._emit(index))
+                    self._depth = 0
+                    continue
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "value":
+                    fields.extend(self._emit(index + 1))
+            elif self._depth == 1:
+                if char == ":" and self._expect == "colon":
+                    self._value_start, self._expect = index + 1, "value"
+                elif char == ",":
+                    if self._expect == "value":
+                        fields.extend(self._emit(index))
+                    self._expect = "key"
+        return [(key, value) for key, value in fields if key is not None]
+
+
+class StreamTimer:
+    """ストリーミング応答の受信時刻の記録（AsyncHTTPClient.requestのon_dataに渡す）"""
+
+    def __init__(self, start_time: Optional[float] = None):
+        self.start_time = start_time if start_time is not None else time.perf_counter()
+        self.decoder = SSEDecoder()
+        self.parser = IncrementalJSONParser()
+        self.time_to_first_token: Optional[float] = None
+        self.time_to_first_field: Optional[float] = None
+        self.field_times: Dict[str, float] = {}
+        self.total_time: Optional[float] = None
+
+    def on_data(self, data: bytes):
+        elapsed = time.perf_counter() - self.start_time
+        for content, reasoning in self.decoder.feed(data):
+            if self.time_to_first_token is None and (content or reasoning):
+                self.time_to_first_token = elapsed
+            for name, value in self.parser.feed(content):
+                if name in self.field_times:
+                    continue
+                self.field_times[name] = elapsed
+                if self.time_to_first_field is None and value not in (None, ""):
+                    self.time_to_first_field = elapsed
+        self.total_time = elapsed
+
+    def timing(self, offset: float = 0.0) -> Dict:
+        """ログのstream_timing（offsetはスロットリングで待った時間など、各時刻から差し引く秒数）"""
+        def adjust(value: Optional[float]) -> Optional[float]:
+            return max(0.0, value - offset) if value is not None else None
+
+        return {
+            "time_to_first_token": adjust(self.time_to_first_token),
+            "time_to_first_field": adjust(self.time_to_first_field),
+            "field_times": {name: adjust(value) for name, value in self.field_times.items()},
+            "total_time": adjust(self.total_time),
+        }
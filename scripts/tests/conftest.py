@@ -0,0 +1,33 @@
+"""
+@ai[2026-10-20 13:00] scripts/ のテストの共通設定
+目的: scripts/ のロジックを、実際の推論サーバーなしでモック推論サーバーに対して確認する
+意図: scripts/ をimportパスに加え、mock_serverでプロセス内のMockLLMServerを起動する（ポートは自動割り当て）
+      実行: python3 -m pytest -q scripts/tests
+"""
+
+import os
+import sys
+
+import pytest
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+from mock_llm_server import RESPONSE_EXAMPLES_DIR, MockLLM, MockLLMServer, MockSettings, build_corpus  # noqa: E402
+
+
+@pytest.fixture
+def mock_server():
+    """設定（MockSettingsの項目）を指定してモック推論サーバーを起動し、URLとサーバーを返す関数"""
+    servers = []
+
+    def start(**settings):
+        corpus = build_corpus(str(RESPONSE_EXAMPLES_DIR), "chat", [])
+        server = MockLLMServer(MockLLM(MockSettings(**settings), corpus))
+        servers.append(server)
+        return server.start(), server
+
+    yield start
+    for server in servers:
+        server.stop()
@@ -0,0 +1,91 @@
+"""ウィンドウ分割（split_windows）と、ウィンドウごとの抽出結果の統合（merge_accounts）"""
+
+from chunked_extraction import WindowSettings, merge_accounts, split_windows
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+
+TEXT = "\n".join(f"{index:02d}: " + "あ" * 30 for index in range(20)) + "\n"
+
+
+def account(**values) -> dict:
+    return {"confidence": None, **values}
+
+
+class TestSplitWindows:
+    def test_short_documents_are_not_split(self):
+        assert split_windows("短いドキュメント", WindowSettings(100, 20)) == ["短いドキュメント"]
+
+    def test_windows_cover_the_document_with_overlap(self):
+        windows = split_windows(TEXT, WindowSettings(200, 60))
+        assert len(windows) > 1
+        assert all(len(window) <= 200 for window in windows)
+        # すべての行がいずれかのウィンドウに完全に含まれる
+        assert all(any(line in window for window in windows) for line in TEXT.splitlines())
+        for previous, current in zip(windows, windows[1:]):
+            assert current.splitlines()[0] in previous
+
+    def test_windows_break_at_line_boundaries(self):
+        for window in split_windows(TEXT, WindowSettings(200, 60)):
+            assert window.endswith("\n")
+            assert window.split("\n", 1)[0][:2].isdigit()
+
+    def test_long_lines_are_split_by_length(self):
+        windows = split_windows("x" * 1000, WindowSettings(300, 50))
+        assert all(len(window) <= 300 for window in windows)
+        assert "".join(window[50 if index else 0:] for index, window in enumerate(windows)) == "x" * 1000
+
+    def test_overlap_is_capped_at_half_a_window(self):
+        windows = split_windows("x" * 1000, WindowSettings(100, 100))
+        assert len(windows) < 1000 / 10
+
+
+class TestMergeAccounts:
+    def test_values_from_different_windows_are_combined(self):
+        merged, conflicts = merge_accounts([account(title="銀行", userID="alice"), account(password="secret")])
+        assert (merged["title"], merged["userID"], merged["password"]) == ("銀行", "alice", "secret")
+        assert conflicts == {}
+
+    def test_empty_values_do_not_conflict(self):
+        merged, conflicts = merge_accounts([account(userID="alice"), account(userID=""), account(userID=None)])
+        assert merged["userID"] == "alice"
+        assert conflicts == {}
+
+    def test_conflicts_use_the_most_common_value(self):
+        merged, conflicts = merge_accounts([account(userID="bob"), account(userID="alice"), account(userID="alice")])
+        assert merged["userID"] == "alice"
+        assert conflicts == {"userID": ["bob", "alice"]}
+
+    def test_ties_prefer_the_earlier_window(self):
+        merged, _ = merge_accounts([account(userID="bob"), account(userID="alice")])
+        assert merged["userID"] == "bob"
+
+    def test_note_conflicts_use_the_longest_value(self):
+        merged, conflicts = merge_accounts([account(note="短い"), account(note="より詳しい補足"), account(note="短い")])
+        assert merged["note"] == "より詳しい補足"
+        assert "note" in conflicts
+
+    def test_failed_windows_are_ignored_and_confidence_is_the_minimum(self):
+        merged, _ = merge_accounts([None, account(userID="alice", confidence=0.9), account(confidence=0.4)])
+        assert merged["userID"] == "alice"
+        assert merged["confidence"] == 0.4
+
+    def test_all_windows_failed(self):
+        merged, conflicts = merge_accounts([None, None])
+        assert all(value is None for value in merged.values())
+        assert conflicts == {}
+
+
+class TestChunkedExtractionWithMockServer:
+    def test_long_documents_are_extracted_per_window(self, mock_server, tmp_path):
+        url, server = mock_server()
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                              options=HTTPOptions(chunking=WindowSettings(100, 20)))
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[3], runs=1, per_run=True))
+        ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+
+        chunked = backend.summary()['chunked']
+        assert chunked['cells'] == 1 and chunked['windows'] > 1
+        assert server.mock.stats['requests'] == chunked['windows']
+        log_files = discover_log_files(str(tmp_path))
+        assert len(log_files) == 1 and not log_files[0].error
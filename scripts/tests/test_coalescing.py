@@ -0,0 +1,139 @@
+"""同一リクエストの合流（RequestCoalescer）の判定と、モック推論サーバーへの送信回数"""
+
+import asyncio
+import json
+
+import pytest
+
+from async_http import AsyncHTTPClient, AsyncHTTPServer
+from coalescing_gateway import (
+    COALESCE_ALWAYS, COALESCE_DETERMINISTIC, COALESCE_OFF, COALESCED_HEADER, CoalescingGateway, RequestCoalescer,
+    is_deterministic, should_coalesce
+)
+from experiment_engine import chat_completions_url
+
+
+def body(**sampling) -> dict:
+    return {"model": "mock", "messages": [{"role": "user", "content": "口座情報を抽出してください"}], **sampling}
+
+
+async def send_concurrently(url: str, coalescer: RequestCoalescer, bodies: list) -> list:
+    client = AsyncHTTPClient(max_connections=len(bodies))
+    endpoint = chat_completions_url(url)
+
+    async def send(request_body: dict):
+        async def post():
+            return await client.request("POST", endpoint, json.dumps(request_body).encode('utf-8'),
+                                        {"Content-Type": "application/json"}, timeout=10)
+        return await coalescer.run(request_body, post)
+
+    try:
+        return await asyncio.gather(*(send(request_body) for request_body in bodies))
+    finally:
+        await client.close()
+
+
+class TestDeterminism:
+    def test_zero_temperature_or_seed_is_deterministic(self):
+        assert is_deterministic(body(temperature=0))
+        assert is_deterministic(body(temperature=0.0))
+        assert is_deterministic(body(temperature=0.7, seed=1))
+        assert not is_deterministic(body(temperature=0.7))
+        assert not is_deterministic(body())
+
+    def test_mode_decides_which_requests_are_coalesced(self):
+        assert should_coalesce(body(temperature=0), COALESCE_DETERMINISTIC)
+        assert not should_coalesce(body(temperature=0.7), COALESCE_DETERMINISTIC)
+        assert should_coalesce(body(temperature=0.7), COALESCE_ALWAYS)
+        assert not should_coalesce(body(temperature=0), COALESCE_OFF)
+
+    def test_streaming_requests_are_never_coalesced(self):
+        assert not should_coalesce(body(temperature=0, stream=True), COALESCE_ALWAYS)
+
+
+class TestCoalescerWithMockServer:
+    def test_identical_deterministic_requests_are_sent_once(self, mock_server):
+        url, server = mock_server(latency="fixed:0.2")
+        coalescer = RequestCoalescer(COALESCE_DETERMINISTIC)
+        results = asyncio.run(send_concurrently(url, coalescer, [body(temperature=0)] * 4))
+        assert server.mock.stats['requests'] == 1
+        assert sorted(coalesced for _, coalesced in results) == [False, True, True, True]
+        assert len({response.body for response, _ in results}) == 1
+        assert coalescer.summary()['coalesced'] == 3
+        assert coalescer.summary()['saved_tokens'] > 0
+
+    def test_sampled_requests_are_sent_separately(self, mock_server):
+        url, server = mock_server(latency="fixed:0.2")
+        coalescer = RequestCoalescer(COALESCE_DETERMINISTIC)
+        results = asyncio.run(send_concurrently(url, coalescer, [body(temperature=0.7)] * 3))
+        assert server.mock.stats['requests'] == 3
+        assert not any(coalesced for _, coalesced in results)
+
+    def test_different_requests_are_not_merged(self, mock_server):
+        url, server = mock_server(latency="fixed:0.2")
+        coalescer = RequestCoalescer(COALESCE_DETERMINISTIC)
+        asyncio.run(send_concurrently(url, coalescer, [body(temperature=0), body(temperature=0, max_tokens=10)]))
+        assert server.mock.stats['requests'] == 2
+
+    def test_leader_failure_is_propagated_to_followers(self):
+        coalescer = RequestCoalescer(COALESCE_DETERMINISTIC)
+
+        async def failing_send():
+            await asyncio.sleep(0.05)
+            raise ConnectionError("upstream closed")
+
+        async def run():
+            return await asyncio.gather(*(coalescer.run(body(temperature=0), failing_send) for _ in range(3)),
+                                        return_exceptions=True)
+
+        results = asyncio.run(run())
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert coalescer.summary()['coalesced'] == 0
+
+    def test_followers_resend_when_the_leader_is_cancelled(self):
+        coalescer = RequestCoalescer(COALESCE_DETERMINISTIC)
+        sent = []
+
+        async def send():
+            sent.append(1)
+            await asyncio.sleep(0.05)
+            return "response"
+
+        async def run():
+            leader = asyncio.ensure_future(coalescer.run(body(temperature=0), send))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(coalescer.run(body(temperature=0), send))
+            await asyncio.sleep(0.01)
+            leader.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await leader
+            return await follower
+
+        assert asyncio.run(run()) == ("response", False)
+        assert len(sent) == 2
+
+
+class TestGatewayWithMockServer:
+    def test_gateway_forwards_identical_requests_once(self, mock_server):
+        url, server = mock_server(latency="fixed:0.2")
+        upstream_url = url[:-len("/v1")]
+
+        async def run():
+            upstream = AsyncHTTPClient(max_connections=8)
+            gateway = CoalescingGateway(upstream_url, upstream, RequestCoalescer(COALESCE_DETERMINISTIC), timeout=10)
+            http_server = AsyncHTTPServer(gateway.handle)
+            gateway_url = await http_server.start()
+            try:
+                results = await send_concurrently(gateway_url, RequestCoalescer(COALESCE_OFF),
+                                                  [body(temperature=0)] * 3 + [body(temperature=0.7)])
+            finally:
+                await http_server.close()
+                await upstream.close()
+            return results, gateway.summary()
+
+        results, summary = asyncio.run(run())
+        assert all(response.status == 200 for response, _ in results)
+        assert sorted(response.headers[COALESCED_HEADER] for response, _ in results) == \
+            ["follower", "follower", "leader", "leader"]
+        assert server.mock.stats['requests'] == 2
+        assert (summary['received'], summary['upstream_requests'], summary['saved_requests']) == (4, 2, 2)
@@ -0,0 +1,70 @@
+"""統合レポートの抽出時間の集計（cold start実行をwarm実行と分けた統計）"""
+
+import pytest
+
+from aitest_logs import build_log, load_test_case, write_log
+from generate_combined_report import calculate_timing_stats, parse_log_file
+from log_layout import discover_log_files, log_path
+
+# (testcase, level, run, 抽出時間, cold_start)  cold_startがNoneのログはフラグのない旧形式
+RUNS = [
+    ("chat", 1, 1, 5.0, True),
+    ("chat", 1, 2, 1.0, False),
+    ("chat", 1, 3, 2.0, False),
+    ("chat", 2, 1, 7.0, True),
+    ("chat", 2, 2, 3.0, False),
+    ("contract", 1, 1, 4.0, None),
+]
+
+
+def write_logs(root: str):
+    for testcase, level, run, extraction_time, cold_start in RUNS:
+        log = build_log(load_test_case(testcase, level), "abs", "json", "ja", {}, extraction_time,
+                        cold_start=bool(cold_start))
+        if cold_start is None:
+            del log["cold_start"]
+        write_log(log_path(root, testcase, "abs", "json", "ja", level, run), log)
+
+
+@pytest.fixture
+def timing_stats(tmp_path):
+    write_logs(str(tmp_path))
+    return calculate_timing_stats([parse_log_file(str(log.path)) for log in discover_log_files(str(tmp_path))])
+
+
+class TestColdWarmTiming:
+    def test_overall_statistics_use_warm_runs_only(self, timing_stats):
+        overall = timing_stats['overall']
+        assert sorted(overall['extraction_times']) == [1.0, 2.0, 3.0, 4.0]
+        assert overall['avg_extraction_time'] == 2.5
+        assert (overall['min_extraction_time'], overall['max_extraction_time']) == (1.0, 4.0)
+        assert overall['total_extraction_time'] == 10.0
+        # テストケース数はcold startも含む
+        assert overall['test_case_count'] == len(RUNS)
+
+    def test_cold_starts_are_reported_separately(self, timing_stats):
+        overall = timing_stats['overall']
+        assert sorted(overall['cold_extraction_times']) == [5.0, 7.0]
+        assert overall['cold_start_count'] == 2
+        assert overall['avg_cold_extraction_time'] == 6.0
+        assert overall['max_cold_extraction_time'] == 7.0
+
+    def test_buckets_split_cold_and_warm_per_pattern_and_level(self, timing_stats):
+        chat = timing_stats['by_pattern']["Chat"]
+        assert sorted(chat['extraction_times']) == [1.0, 2.0, 3.0]
+        assert chat['avg_extraction_time'] == 2.0
+        assert (chat['cold_start_count'], chat['avg_cold_extraction_time']) == (2, 6.0)
+
+        level1 = timing_stats['by_level'][1]
+        assert sorted(level1['extraction_times']) == [1.0, 2.0, 4.0]
+        assert level1['cold_extraction_times'] == [5.0]
+
+        chat_level2 = timing_stats['by_pattern_level']["Chat"][2]
+        assert chat_level2['test_case_count'] == 1
+        assert (chat_level2['avg_extraction_time'], chat_level2['max_cold_extraction_time']) == (3.0, 7.0)
+
+    def test_logs_without_the_flag_are_counted_as_warm(self, timing_stats):
+        contract = timing_stats['by_pattern']["Contract"]
+        assert contract['extraction_times'] == [4.0]
+        assert contract['cold_start_count'] == 0
+        assert contract['avg_cold_extraction_time'] == 0
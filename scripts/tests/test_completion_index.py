@@ -0,0 +1,112 @@
+"""完了状況の索引（completion_index.jsonl）とレジューム"""
+
+import json
+import multiprocessing
+
+from experiment_engine import (
+    COMPLETION_INDEX_FILE, CompletionIndex, ExperimentEngine, ExperimentJob, JobResult, RoundRobinScheduler
+)
+from http_backend import HTTPBackend
+from run_external_llm_experiment_resumable import build_remaining_jobs
+
+PATTERN = "chat_abs_json"
+
+
+def job_result(job: ExperimentJob, output_dir: str, errors: dict = None) -> JobResult:
+    """ジョブの全セルのログを書き、結果を返す（errorsは (level, run) → エラーメッセージ）"""
+    errors = errors or {}
+    log_files = []
+    for level, run in job.cells():
+        error = errors.get((level, run))
+        path = job.log_path(output_dir, level, run, error=error is not None)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'error': error} if error else {'expected_fields': []}, f)
+        log_files.append(path)
+    return JobResult(job=job, success=not errors, elapsed=1.0, timeout=10.0, log_files=log_files)
+
+
+def append_results(output_dir: str, start: int, count: int):
+    index = CompletionIndex(output_dir)
+    for run in range(start, start + count):
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1,), run_start=run)
+        index.record(job_result(job, output_dir))
+
+
+def pending_cells(lanes: dict) -> set:
+    return {(level, run) for jobs in lanes.values() for job in jobs for level, run in job.cells()}
+
+
+class TestCompletionIndex:
+    def test_records_cell_status(self, tmp_path):
+        index = CompletionIndex(str(tmp_path))
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1, 2, 3))
+        index.record(job_result(job, str(tmp_path), {(2, 1): "無効なJSON形式です", (3, 1): "HTTPエラー: 503"}))
+        assert index.load() == {
+            (PATTERN, "ja", 1, 1): "success",
+            (PATTERN, "ja", 2, 1): "deterministic",
+            (PATTERN, "ja", 3, 1): "transient",
+        }
+        assert index.completed() == {PATTERN: {(1, 1)}}
+
+    def test_success_is_kept_when_a_later_failure_is_recorded(self, tmp_path):
+        index = CompletionIndex(str(tmp_path))
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1,))
+        index.record(job_result(job, str(tmp_path)))
+        index.record(JobResult(job=job, success=False, elapsed=1.0, timeout=1.0, timed_out=True))
+        assert index.completed() == {PATTERN: {(1, 1)}}
+
+    def test_rebuild_from_logs_matches_recorded_index(self, tmp_path):
+        index = CompletionIndex(str(tmp_path))
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1, 2), runs=2)
+        index.record(job_result(job, str(tmp_path), {(2, 2): "無効なJSON形式です"}))
+        recorded = index.load()
+        (tmp_path / COMPLETION_INDEX_FILE).unlink()
+        assert index.rebuild() == 4
+        assert index.load() == recorded
+
+    def test_ignores_truncated_lines(self, tmp_path):
+        index = CompletionIndex(str(tmp_path))
+        append_results(str(tmp_path), 1, 1)
+        with open(index.path, 'a', encoding='utf-8') as f:
+            f.write('{"pattern": "chat_abs')
+        assert index.completed() == {PATTERN: {(1, 1)}}
+
+    def test_compaction_keeps_appends_from_other_processes(self, tmp_path):
+        index = CompletionIndex(str(tmp_path))
+        append_results(str(tmp_path), 1, 1200)
+        with open(index.path, 'r', encoding='utf-8') as f:
+            lines = f.readlines()
+        with open(index.path, 'a', encoding='utf-8') as f:
+            f.writelines(lines * 4)  # 重複した追記で詰め直しのしきい値（2 × セル数 + 1000行）を超える
+        writers = [multiprocessing.Process(target=append_results, args=(str(tmp_path), 2000 + i * 100, 100))
+                   for i in range(4)]
+        for writer in writers:
+            writer.start()
+        for _ in range(5):
+            index.load()
+        for writer in writers:
+            writer.join()
+        assert len(index.completed()[PATTERN]) == 1200 + 400
+        with open(index.path, 'r', encoding='utf-8') as f:
+            assert sum(1 for _ in f) < 1200 * 5
+
+
+class TestResume:
+    def test_resume_runs_only_missing_cells(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1, 2), runs=2)
+        CompletionIndex(str(tmp_path)).record(job_result(job, str(tmp_path), {(2, 2): "HTTPエラー: 503"}))
+        lanes = build_remaining_jobs(str(tmp_path), [PATTERN], [1, 2], 3)
+        assert pending_cells(lanes) == {(2, 2), (1, 3), (2, 3)}
+
+    def test_interrupted_experiment_resumes_against_mock_server(self, mock_server, tmp_path):
+        url, server = mock_server()
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30)
+        first = {PATTERN: [ExperimentJob.from_pattern(PATTERN, levels=(1,), run_start=1)]}
+        ExperimentEngine(backend, RoundRobinScheduler(first), str(tmp_path), sinks=[]).run()
+
+        lanes = build_remaining_jobs(str(tmp_path), [PATTERN], [1], 3)
+        assert pending_cells(lanes) == {(1, 2), (1, 3)}
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30)
+        ExperimentEngine(backend, RoundRobinScheduler(lanes), str(tmp_path), sinks=[]).run()
+        assert pending_cells(build_remaining_jobs(str(tmp_path), [PATTERN], [1], 3)) == set()
+        assert server.mock.stats['requests'] == 3
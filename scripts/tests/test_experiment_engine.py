@@ -0,0 +1,100 @@
+"""共通の実験エンジン: HTTPバックエンドのみの引数の検証（HTTPOptions）と、機能ごとの統計の表示（FEATURE_REPORTS）"""
+
+import argparse
+import json
+
+import pytest
+
+from chunked_extraction import WindowSettings
+from coalescing_gateway import RequestCoalescer
+from experiment_engine import ConsoleSink, ExperimentEngine, JSONSummarySink, RoundRobinScheduler, build_jobs
+from http_backend import FEATURE_REPORTS, HTTPBackend, HTTPOptions
+from request_hedging import RequestHedger
+from run_external_llm_experiment import add_external_llm_arguments, build_external_backend, http_options_from_args
+
+
+def parse(*argv) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    add_external_llm_arguments(parser)
+    return parser.parse_args(["--external-llm-url", "http://127.0.0.1:9/v1", "--external-llm-model", "mock",
+                              *argv])
+
+
+class TestHTTPOptions:
+    def test_defaults_disable_every_feature(self):
+        options = HTTPOptions(sampling=None, input_compaction=[])
+        assert options.sampling == {} and options.input_compaction is None
+        assert options.cache is None and not options.streaming
+
+    def test_invalid_combinations_are_rejected(self):
+        with pytest.raises(ValueError):
+            HTTPOptions(structured_output="json_object")
+        with pytest.raises(ValueError):
+            HTTPOptions(hedge_url="http://127.0.0.1:9/v1")
+        with pytest.raises(ValueError):
+            HTTPOptions(streaming=True, coalescer=RequestCoalescer())
+        with pytest.raises(ValueError):
+            HTTPOptions(streaming=True, hedger=RequestHedger())
+        with pytest.raises(ValueError):
+            HTTPOptions(streaming=True, chunking=WindowSettings(100, 20))
+
+
+class TestHTTPOptionsFromArgs:
+    def test_swift_backend_has_no_options(self, tmp_path):
+        assert http_options_from_args(parse(), str(tmp_path)) is None
+
+    def test_http_only_flags_are_rejected_together_on_the_swift_backend(self, tmp_path):
+        args = parse("--cache-dir", str(tmp_path / "cache"), "--rps", "5", "--stream", "--compact-input")
+        with pytest.raises(SystemExit) as error:
+            http_options_from_args(args, str(tmp_path))
+        message = str(error.value)
+        assert all(name in message for name in ["--cache-dir", "--rps / --tpm", "--stream", "--compact-input"])
+        # Swiftバックエンドで同じ機能を使うプロキシを案内する
+        assert "response_cache.py proxy" in message and "rate_limiter.py proxy" in message
+
+    def test_invalid_combinations_exit_with_the_reason(self, tmp_path):
+        with pytest.raises(SystemExit) as error:
+            http_options_from_args(parse("--backend", "http", "--stream", "--hedge"), str(tmp_path))
+        assert "ストリーミング" in str(error.value)
+        with pytest.raises(SystemExit):
+            http_options_from_args(parse("--backend", "http", "--chunk-window", "500", "--mode", "two-steps"),
+                                   str(tmp_path))
+
+    def test_flags_become_options(self, tmp_path):
+        options = http_options_from_args(
+            parse("--backend", "http", "--cache-dir", str(tmp_path / "cache"), "--coalesce", "always",
+                  "--structured-output", "json_schema", "--compact-input", "--compaction-steps", "whitespace",
+                  "--chunk-window", "800", "--chunk-overlap", "100"), str(tmp_path))
+        assert options.cache is not None and options.coalescer.mode == "always"
+        assert options.structured_output == "json_schema"
+        assert options.input_compaction == ["whitespace"]
+        assert options.chunking.to_dict() == {"window_chars": 800, "overlap_chars": 100}
+        assert options.hedger is None and options.hedge_url is None
+
+
+class TestFeatureReports:
+    def test_reports_skip_disabled_and_idle_features(self):
+        backend = HTTPBackend(external_llm_url="http://127.0.0.1:9/v1", external_llm_model="mock")
+        stats = {'cache': None, 'coalesce': RequestCoalescer().summary(), 'requests': 3}
+        assert backend.report(stats) == []
+
+    def test_engine_prints_one_line_per_used_feature(self, mock_server, tmp_path, capsys):
+        url, server = mock_server(latency="fixed:0.1")
+        args = parse("--backend", "http", "--external-llm-url", url, "--cache-dir", str(tmp_path / "cache"),
+                     "--coalesce", "always", "--compact-input")
+        backend = build_external_backend(args, str(tmp_path / "run"))
+        summary_path = tmp_path / "run" / "experiment_summary.json"
+        # 同じセルの2回の実行を並行して送り、2回目を合流させる
+        jobs = build_jobs(["chat_abs_json"], levels=[1], runs=2, per_run=False)
+        ExperimentEngine(backend, RoundRobinScheduler(jobs), str(tmp_path / "run"),
+                         sinks=[ConsoleSink(), JSONSummarySink(str(summary_path))]).run()
+
+        with open(summary_path, encoding='utf-8') as f:
+            stats = json.load(f)['backend_stats']
+        lines = backend.report(stats)
+        assert lines == [FEATURE_REPORTS[key](stats[key]) for key in ('cache', 'coalesce', 'input_compaction')]
+        output = capsys.readouterr().out
+        assert all(f"   {line}" in output for line in lines)
+        assert "応答キャッシュ" in output and "同一リクエストの合流" in output and "テストデータの圧縮" in output
+        assert stats['coalesce']['coalesced'] >= 1
+        assert server.mock.stats['requests'] == stats['cache']['misses'] - stats['coalesce']['coalesced']
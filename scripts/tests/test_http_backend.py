@@ -0,0 +1,108 @@
+"""Python実装のHTTPバックエンド: JSON応答の解析、keep-aliveのHTTPクライアント、Swift版と同じリクエストとログ"""
+
+import asyncio
+import json
+
+from aitest_extraction import parse_account_info
+from async_http import AsyncHTTPClient, AsyncHTTPServer, HTTPResponse
+from check_backend_parity import RESPONSE_EXAMPLES_DIR, check_response_examples, check_swift_logs
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend
+from log_layout import discover_log_files
+
+
+def run_experiment(url: str, output_dir: str, levels=(1, 2)) -> HTTPBackend:
+    backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30)
+    scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json", "contract_strict_json"], levels=levels, runs=1,
+                                               per_run=True))
+    ExperimentEngine(backend, scheduler, output_dir, sinks=[]).run()
+    return backend
+
+
+class TestParseAccountInfo:
+    def test_candidates_are_tried_in_swift_order(self):
+        assert parse_account_info('説明\n```json\n{"userID": "alice", "port": "22"}\n```')["port"] == 22
+        assert parse_account_info('analysis... assistantfinal: {"userID": "bob"}')["userID"] == "bob"
+        assert parse_account_info('前置き {"password": "line1\nline2"} 後書き')["password"] == "line1\nline2"
+
+    def test_type_mismatches_fail_like_jsondecoder(self):
+        assert parse_account_info('{"userID": 123}') is None
+        assert parse_account_info('{"port": 22.5}') is None
+        assert parse_account_info("JSONはありません") is None
+
+    def test_response_examples_match_swift(self):
+        checked, mismatches = check_response_examples(RESPONSE_EXAMPLES_DIR)
+        assert checked > 0 and mismatches == []
+
+
+class TestAsyncHTTPClient:
+    def test_connections_are_kept_alive(self):
+        async def handler(request):
+            return HTTPResponse(200, "OK", {"content-type": "application/json"},
+                                json.dumps({"path": request.path, "body": request.json()}).encode('utf-8'))
+
+        async def scenario():
+            server = AsyncHTTPServer(handler)
+            url = await server.start()
+            client = AsyncHTTPClient()
+            try:
+                responses = [await client.request("POST", f"{url}/echo?n={n}", json.dumps({"n": n}).encode('utf-8'))
+                             for n in range(3)]
+            finally:
+                await client.close()
+                await server.close()
+            return responses, client.stats()
+
+        responses, stats = asyncio.run(scenario())
+        assert [response.json() for response in responses] == [{"path": f"/echo?n={n}", "body": {"n": n}}
+                                                                for n in range(3)]
+        assert [response.reused for response in responses] == [False, True, True]
+        assert stats == {'requests': 3, 'connections_opened': 1}
+
+    def test_chunked_response_body(self):
+        async def serve(reader, writer):
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+                         b"5\r\nhello\r\n7;ext=1\r\n, world\r\n0\r\nX-Trailer: 1\r\n\r\n")
+            await writer.drain()
+
+        async def scenario():
+            server = await asyncio.start_server(serve, "127.0.0.1", 0)
+            port = server.sockets[0].getsockname()[1]
+            client = AsyncHTTPClient()
+            pieces = []
+            try:
+                response = await client.request("GET", f"http://127.0.0.1:{port}/", on_data=pieces.append, timeout=5)
+            finally:
+                await client.close()
+                server.close()
+                await server.wait_closed()
+            return response, pieces
+
+        response, pieces = asyncio.run(scenario())
+        assert response.text() == "hello, world"
+        assert pieces == [b"hello", b", world"]
+
+
+class TestHTTPBackendWithMockServer:
+    def test_requests_and_scoring_match_swift(self, mock_server, tmp_path):
+        """ログのrequest_contentはSwift版と同じリクエストボディで、抽出値の採点もSwift版の規則と一致する"""
+        url, server = mock_server()
+        backend = run_experiment(url, str(tmp_path))
+        log_files = discover_log_files(str(tmp_path))
+        assert len(log_files) == 4 and not any(log_file.error for log_file in log_files)
+        assert server.mock.stats['requests'] == backend.summary()['http']['requests'] == 4
+
+        checked, mismatches = check_swift_logs(str(tmp_path))
+        assert checked == 4 and mismatches == []
+
+    def test_unparseable_responses_are_error_logs(self, mock_server, tmp_path):
+        url, _ = mock_server(malformed_rate=1.0)
+        run_experiment(url, str(tmp_path), levels=(1,))
+        log_files = discover_log_files(str(tmp_path))
+        assert len(log_files) == 2 and all(log_file.error for log_file in log_files)
+        for log_file in log_files:
+            with open(log_file.path, encoding='utf-8') as f:
+                log = json.load(f)
+            assert log["error_type"] == "ExtractionError"
+            assert parse_account_info(log["ai_response"]) is None
@@ -0,0 +1,56 @@
+"""負荷試験のニー（スループットが伸びなくなる点）の判定"""
+
+import argparse
+import asyncio
+
+import pytest
+
+from load_test import find_knee, run_load_test
+
+
+def steps(*points) -> list:
+    """(負荷, スループット[, エラー率]) から find_knee に渡すステップを作る"""
+    return [{'load': point[0], 'throughput': point[1], 'error_rate': point[2] if len(point) > 2 else 0.0,
+             'latency': {'p95': 1.0}} for point in points]
+
+
+class TestFindKnee:
+    def test_known_knee(self):
+        curve = steps((1, 10.0), (2, 19.5), (4, 38.0), (8, 72.0), (16, 80.0), (32, 81.0))
+        knee = find_knee(curve, min_scaling=0.5, max_error_rate=0.05)
+        assert (knee['load'], knee['throughput'], knee['reason']) == (8, 72.0, "scaling")
+        assert knee['max_throughput'] == 81.0
+        assert curve[4]['scaling_efficiency'] == pytest.approx((80.0 / 72.0 - 1) / 1.0)
+
+    def test_curve_that_keeps_scaling_has_no_knee_before_the_last_step(self):
+        knee = find_knee(steps((1, 10.0), (2, 20.0), (4, 40.0), (8, 80.0)), 0.5, 0.05)
+        assert (knee['load'], knee['reason']) == (8, "last_step")
+
+    def test_flat_curve_has_no_knee_beyond_the_first_step(self):
+        # 最初から飽和しているサーバーは負荷を上げてもスループットが変わらない
+        knee = find_knee(steps((1, 10.0), (2, 10.1), (4, 9.9), (8, 10.0)), 0.5, 0.05)
+        assert (knee['load'], knee['reason']) == (1, "scaling")
+
+    def test_error_rate_stops_the_search(self):
+        knee = find_knee(steps((1, 10.0), (2, 20.0), (4, 40.0, 0.2), (8, 80.0)), 0.5, 0.05)
+        assert (knee['load'], knee['reason']) == (2, "error_rate")
+
+    def test_no_knee_when_the_first_step_fails(self):
+        knee = find_knee(steps((1, 0.0, 1.0), (2, 0.0, 1.0)), 0.5, 0.05)
+        assert knee['load'] is None and knee['reason'] == "error_rate"
+
+
+class TestLoadTestWithMockServer:
+    def test_knee_matches_the_server_concurrency_limit(self, mock_server):
+        url, _ = mock_server(latency="fixed:0.1", max_concurrency=2)
+        args = argparse.Namespace(patterns=["chat_abs_json"], levels=[1], language="ja", external_llm_url=url,
+                                  external_llm_model="mock", arrival_rates=None, concurrency_levels=[1, 2, 4, 8],
+                                  max_connections=None, timeout=10.0, step_duration=0.5, seed=0,
+                                  abort_error_rate=0.5, min_scaling=0.5, max_error_rate=0.05)
+        result = asyncio.run(run_load_test(args))
+        assert [step['load'] for step in result['steps']] == [1, 2, 4, 8]
+        assert all(step['error_rate'] == 0.0 for step in result['steps'])
+        # 同時に2件までしか処理しないサーバーは、2並列を超えるとスループットが伸びない
+        assert result['knee']['load'] == 2
+        assert result['knee']['reason'] == "scaling"
+        assert result['steps'][3]['latency']['p50'] > 2 * result['steps'][0]['latency']['p50']
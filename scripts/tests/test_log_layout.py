@@ -0,0 +1,102 @@
+"""ログの配置（flat / sharded）のパスとファイル名、探索（discover_log_files）と配置の判定（detect_layout）"""
+
+import json
+import os
+import sys
+from pathlib import Path
+
+import generate_combined_report
+from aitest_logs import build_error_log, build_log, load_test_case, write_log
+from log_layout import (
+    LAYOUT_FLAT, LAYOUT_SHARDED, detect_layout, discover_log_files, log_path, parse_log_file_name
+)
+
+# (testcase, algo, level, run, error)
+LOGS = [
+    ("chat", "abs", 1, 1, False),
+    ("chat", "abs", 1, 2, True),
+    ("chat", "strict", 2, 1, False),
+    ("contract", "abs", 3, 1, False),
+]
+
+
+def write_logs(root: str, layout: str, logs=LOGS):
+    for testcase, algo, level, run, error in logs:
+        test_case = load_test_case(testcase, level)
+        log = (build_error_log(test_case, algo, "json", "ja", "JSON解析エラー", 1.0) if error
+               else build_log(test_case, algo, "json", "ja", {}, 1.0))
+        write_log(log_path(root, testcase, algo, "json", "ja", level, run, error=error, layout=layout,
+                           create=True), log)
+
+
+def found(root, **conditions) -> list:
+    return sorted((log.testcase, log.algo, log.level, log.run, log.error)
+                  for log in discover_log_files(root, **conditions))
+
+
+class TestPaths:
+    def test_flat_and_sharded_paths_round_trip(self, tmp_path):
+        for layout, directory in [(LAYOUT_FLAT, tmp_path), (LAYOUT_SHARDED, tmp_path / "chat" / "abs" / "level2")]:
+            path = log_path(str(tmp_path), "chat", "abs", "json", "ja", 2, 7, error=True, layout=layout)
+            assert Path(path).parent == directory
+            log = parse_log_file_name(path)
+            assert (log.testcase, log.algo, log.method, log.language, log.level, log.run, log.error) == \
+                ("chat", "abs", "json", "ja", 2, 7, True)
+            assert log.pattern == "chat_abs_json"
+
+    def test_other_file_names_are_not_logs(self):
+        assert parse_log_file_name("experiment_summary.json") is None
+        assert parse_log_file_name("chat_abs_json_ja_level1_run1.json.tmp") is None
+
+
+class TestDiscovery:
+    def test_flat_and_sharded_logs_are_found_alike(self, tmp_path):
+        write_logs(str(tmp_path / "flat"), LAYOUT_FLAT)
+        write_logs(str(tmp_path / "sharded"), LAYOUT_SHARDED)
+        expected = sorted(LOGS)
+        assert found(tmp_path / "flat") == expected
+        assert found(tmp_path / "sharded") == expected
+
+    def test_conditions_narrow_both_layouts(self, tmp_path):
+        write_logs(str(tmp_path), LAYOUT_FLAT, LOGS[:2])
+        write_logs(str(tmp_path), LAYOUT_SHARDED, LOGS[2:])
+        assert found(tmp_path, testcase="chat") == sorted(LOGS[:3])
+        assert found(tmp_path, algo="abs", include_errors=False) == [LOGS[0], LOGS[3]]
+        assert found(tmp_path, level=2) == [LOGS[2]]
+        assert found(tmp_path, testcase="voice") == []
+
+    def test_subexperiment_directories_are_searched_on_request(self, tmp_path):
+        write_logs(str(tmp_path / "202610191200_format"), LAYOUT_SHARDED)
+        assert found(tmp_path) == []
+        assert found(tmp_path, include_subexperiments=True) == sorted(LOGS)
+
+
+class TestDetectLayout:
+    def test_empty_and_flat_directories(self, tmp_path):
+        assert detect_layout(tmp_path) == LAYOUT_FLAT
+        write_logs(str(tmp_path), LAYOUT_FLAT)
+        assert detect_layout(tmp_path) == LAYOUT_FLAT
+
+    def test_a_mixed_directory_is_sharded(self, tmp_path):
+        write_logs(str(tmp_path), LAYOUT_FLAT, LOGS[:2])
+        write_logs(str(tmp_path), LAYOUT_SHARDED, LOGS[2:3])
+        os.makedirs(tmp_path / "202610191200_format")
+        assert detect_layout(tmp_path) == LAYOUT_SHARDED
+
+
+class TestCombinedReport:
+    def run_report(self, monkeypatch, log_dir) -> dict:
+        monkeypatch.setattr(sys, "argv", ["generate_combined_report.py", str(log_dir)])
+        generate_combined_report.main()
+        with open(log_dir / "detailed_metrics.json", encoding='utf-8') as f:
+            return json.load(f)
+
+    def test_report_finds_sharded_logs(self, tmp_path, monkeypatch, capsys):
+        write_logs(str(tmp_path / "flat"), LAYOUT_FLAT)
+        write_logs(str(tmp_path / "sharded"), LAYOUT_SHARDED)
+        flat = self.run_report(monkeypatch, tmp_path / "flat")
+        sharded = self.run_report(monkeypatch, tmp_path / "sharded")
+        assert f"構造化ログ: {len(LOGS)}個" in capsys.readouterr().out
+        assert sum(sharded['metrics']['overall'].values()) > 0
+        assert sharded['metrics'] == flat['metrics']
+        assert sharded['rates'] == flat['rates']
@@ -0,0 +1,131 @@
+"""モック推論サーバー: 決定的な応答の選択、障害の注入、SSEでの送信、同時処理数の上限"""
+
+import http.client
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from aitest_extraction import build_prompt, build_request_body, parse_account_info
+from mock_llm_server import SOURCE_EXAMPLE, SOURCE_EXPECTED
+
+
+def chat_body(testcase: str = "chat", level: int = 1, **overrides) -> dict:
+    return build_request_body("mock", build_prompt(testcase, "abs", "json", "ja", level), **overrides)
+
+
+def post(url: str, body: dict, timeout: float = 10):
+    """(ステータス, ヘッダー, 本文) を返す"""
+    request = urllib.request.Request(f"{url}/chat/completions", data=json.dumps(body).encode('utf-8'),
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.status, response.headers, response.read().decode('utf-8')
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read().decode('utf-8')
+
+
+def content_of(text: str) -> str:
+    return json.loads(text)["choices"][0]["message"]["content"]
+
+
+class TestResponses:
+    def test_documents_are_identified_and_answered(self, mock_server):
+        url, server = mock_server()
+        # chatは応答例、それ以外は期待値から組み立てた応答を返す
+        for testcase in ("chat", "contract"):
+            status, _, text = post(url, chat_body(testcase))
+            assert status == 200
+            assert parse_account_info(content_of(text)) is not None
+        stats = server.mock.stats
+        assert stats[f"source_{SOURCE_EXAMPLE}"] == 1 and stats[f"source_{SOURCE_EXPECTED}"] == 1
+        assert stats['unidentified_documents'] == 0
+
+    def test_same_request_sequence_gets_the_same_responses(self, mock_server):
+        """応答は同一ボディの何回目かで決まり、他のリクエストとの到着順には依存しない"""
+        bodies = [chat_body("chat", level) for level in (1, 2, 3)]
+
+        def responses(order) -> dict:
+            url, _ = mock_server(seed=7, error_rate=0.3, malformed_rate=0.3)
+            received = {}
+            for occurrence in (1, 2):
+                for index in order:
+                    status, _, text = post(url, bodies[index])
+                    received[(index, occurrence)] = (status, json.loads(text).get("choices"))
+            return received
+
+        assert responses([0, 1, 2]) == responses([2, 1, 0])
+
+    def test_models_and_stats_endpoints(self, mock_server):
+        url, _ = mock_server(model="served-model")
+        post(url, chat_body())
+        with urllib.request.urlopen(f"{url}/models", timeout=5) as response:
+            assert json.load(response)["data"][0]["id"] == "served-model"
+        with urllib.request.urlopen(url[:-len("/v1")] + "/stats", timeout=5) as response:
+            assert json.load(response)["stats"]["requests"] == 1
+
+
+class TestFaultInjection:
+    def test_errors_carry_retry_after(self, mock_server):
+        url, server = mock_server(error_rate=1.0, error_statuses=[429], retry_after=2)
+        status, headers, text = post(url, chat_body())
+        assert status == 429 and headers["Retry-After"] == "2"
+        assert json.loads(text)["error"]["code"] == 429
+        assert server.mock.stats['status_429'] == 1
+
+    def test_malformed_responses_have_no_json(self, mock_server):
+        url, _ = mock_server(malformed_rate=1.0)
+        status, _, text = post(url, chat_body())
+        assert status == 200 and parse_account_info(content_of(text)) is None
+
+    def test_disconnects_close_without_a_response(self, mock_server):
+        url, server = mock_server(disconnect_rate=1.0)
+        with pytest.raises((http.client.RemoteDisconnected, urllib.error.URLError, ConnectionError)):
+            post(url, chat_body())
+        assert server.mock.stats['kind_disconnect'] == 1
+
+    def test_latency_is_scaled(self, mock_server):
+        url, _ = mock_server(latency="fixed:2", time_scale=0.1)
+        start_time = time.perf_counter()
+        post(url, chat_body())
+        assert time.perf_counter() - start_time == pytest.approx(0.2, abs=0.1)
+
+    def test_response_format_can_be_rejected(self, mock_server):
+        url, server = mock_server(reject_response_format=True)
+        status, _, _ = post(url, chat_body(response_format={"type": "json_object"}))
+        assert status == 400 and server.mock.stats['requests'] == 0
+        assert post(url, chat_body())[0] == 200
+
+
+class TestStreaming:
+    def test_sse_chunks_rebuild_the_same_content(self, mock_server):
+        # 応答例のないテストケースは期待値から組み立てた応答になるため、ストリーミングの有無で内容が変わらない
+        url, _ = mock_server()
+        expected = content_of(post(url, chat_body("contract"))[2])
+        status, headers, text = post(url, chat_body("contract", stream=True, stream_options={"include_usage": True}))
+        assert status == 200 and headers["Content-Type"] == "text/event-stream"
+
+        events = [line[len("data: "):] for line in text.split("\n\n") if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        streamed = "".join(chunk["choices"][0]["delta"].get("content", "") for chunk in chunks if chunk["choices"])
+        assert streamed == expected
+        assert len(chunks) > 3
+        assert chunks[-1]["usage"]["completion_tokens"] == len(chunks) - 3
+
+
+class TestConcurrencyLimit:
+    def test_requests_beyond_the_limit_wait(self, mock_server):
+        url, server = mock_server(latency="fixed:0.2", max_concurrency=2)
+        threads = [threading.Thread(target=post, args=(url, chat_body("chat", level % 3 + 1))) for level in range(4)]
+        start_time = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        # 2件ずつ処理するため、4件の処理には2回分の遅延がかかる
+        assert time.perf_counter() - start_time == pytest.approx(0.4, abs=0.15)
+        assert server.mock.stats['peak_concurrency'] == 2
@@ -0,0 +1,120 @@
+"""複数ドキュメントの応答の分割（split_batch_response）と、ドキュメントごとのログ"""
+
+import argparse
+import asyncio
+import json
+
+from aitest_extraction import BATCH_SECTION_HEADER, split_batch_response
+from http_backend import HTTPBackend
+from log_layout import discover_log_files
+from multi_document_batch import analyze_batches, batch_label, document_batches, extract_batch, run_batch_size
+
+
+def section(index: int, **fields) -> str:
+    return f"{BATCH_SECTION_HEADER.format(index=index)}\n```json\n{json.dumps(fields, ensure_ascii=False)}\n```"
+
+
+def batch_args(url: str = "http://127.0.0.1:9/v1", **overrides) -> argparse.Namespace:
+    values = dict(external_llm_url=url, external_llm_model="mock", algo="abs", language="ja", runs=1, seed=0,
+                  warmup=0, concurrency=2, max_connections=4, rps=None, tpm=None, rate_limit_dir=None,
+                  max_throttle_retries=0)
+    values.update(overrides)
+    return argparse.Namespace(**values)
+
+
+def read_logs(output_dir: str) -> dict:
+    logs = {}
+    for log_file in discover_log_files(output_dir):
+        with open(log_file.path, encoding='utf-8') as f:
+            logs[(log_file.testcase, log_file.level)] = (log_file.error, json.load(f))
+    return logs
+
+
+class TestSplitBatchResponse:
+    def test_sections_are_split_in_order(self):
+        text = "\n\n".join([section(1, userID="alice"), section(2, userID="bob"), section(3, userID="carol")])
+        sections = split_batch_response(text, 3)
+        assert ['"alice"' in sections[0], '"bob"' in sections[1], '"carol"' in sections[2]] == [True] * 3
+        assert all("DOCUMENT" not in part for part in sections)
+
+    def test_sections_are_matched_by_number_not_position(self):
+        text = "\n".join([section(2, userID="bob"), section(1, userID="alice")])
+        first, second = split_batch_response(text, 2)
+        assert '"alice"' in first and '"bob"' in second
+
+    def test_missing_documents_are_empty(self):
+        text = "\n".join([section(1, userID="alice"), section(3, userID="carol")])
+        assert split_batch_response(text, 3)[1] == ""
+
+    def test_duplicate_and_out_of_range_numbers_are_ignored(self):
+        text = "\n".join([section(1, userID="alice"), section(1, userID="again"), section(5, userID="extra")])
+        first, second = split_batch_response(text, 2)
+        assert '"alice"' in first and '"again"' not in first
+        assert second == ""
+
+    def test_headers_in_markdown_variants(self):
+        text = "**DOCUMENT 1:**\n{\"userID\": \"alice\"}\n## document 2\n{\"userID\": \"bob\"}"
+        assert split_batch_response(text, 2) == ['{"userID": "alice"}', '{"userID": "bob"}']
+
+    def test_without_headers_code_blocks_are_matched_in_order(self):
+        text = "```json\n{\"userID\": \"alice\"}\n```\n```json\n{\"userID\": \"bob\"}\n```"
+        assert split_batch_response(text, 2) == ['```json\n{"userID": "alice"}\n```', '```json\n{"userID": "bob"}\n```']
+        assert split_batch_response(text, 3) == ["", "", ""]
+        assert split_batch_response('{"userID": "alice"}', 1) == ['{"userID": "alice"}']
+
+
+class TestDocumentBatches:
+    def test_batches_are_deterministic_per_run(self):
+        documents = [("chat", 1), ("chat", 2), ("contract", 1), ("voice", 3), ("password", 2)]
+        batches = document_batches(documents, 2, run=1, seed=0)
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert sorted(document for batch in batches for document in batch) == sorted(documents)
+        assert document_batches(documents, 2, run=1, seed=0) == batches
+        # Kが違っても同じ実行は同じ順序
+        assert [document for batch in document_batches(documents, 4, 1, 0) for document in batch] == \
+            [document for batch in batches for document in batch]
+
+
+class TestExtractBatch:
+    def test_missing_and_reordered_documents(self, tmp_path):
+        """応答の順序が入れ替わった場合は番号で対応づけ、見つからないドキュメントだけをエラーにする"""
+        content = "\n".join([section(3, title="契約", userID="carol"), section(1, title="チャット", userID="alice")])
+        backend = HTTPBackend(external_llm_url="http://127.0.0.1:9/v1", external_llm_model="mock")
+
+        async def send(body, timeout, sample=0, headers=None):
+            return content, None
+
+        backend.send = send
+        batch = [("chat", 1), ("voice", 1), ("contract", 1)]
+        paths = asyncio.run(extract_batch(backend, batch_args(), str(tmp_path), batch, run=1, size=3))
+        assert len(paths) == 3
+
+        logs = read_logs(str(tmp_path))
+        assert [logs[document][0] for document in batch] == [False, True, False]
+        assert logs[("chat", 1)][1]["batch"]["index"] == 1
+        assert logs[("contract", 1)][1]["batch"]["index"] == 3
+        extracted = {field["name"]: field["value"] for field in logs[("chat", 1)][1]["expected_fields"]}
+        assert extracted["userID"] == "alice"
+        extracted = {field["name"]: field["value"] for field in logs[("contract", 1)][1]["expected_fields"]}
+        assert extracted["userID"] == "carol"
+        assert logs[("voice", 1)][1]["error_type"] == "ExtractionError"
+
+
+class TestBatchWithMockServer:
+    def test_each_document_gets_its_own_log(self, mock_server, tmp_path):
+        url, server = mock_server()
+        args = batch_args(url)
+        documents = [("chat", 1), ("contract", 2), ("voice", 3)]
+        for size in (1, 3):
+            asyncio.run(run_batch_size(args, str(tmp_path), documents, size))
+        assert server.mock.stats['requests'] == 3 + 1
+
+        logs = read_logs(str(tmp_path / batch_label(3)))
+        assert sorted(logs) == sorted(documents)
+        assert not any(error for error, _ in logs.values())
+        assert sorted(log["batch"]["index"] for _, log in logs.values()) == [1, 2, 3]
+
+        summary = analyze_batches(str(tmp_path))
+        assert summary['baseline'] == batch_label(1)
+        assert summary['batch_sizes'][batch_label(3)]['requests'] == 1
+        assert summary['batch_sizes'][batch_label(3)]['stats']['error_rate'] == 0.0
@@ -0,0 +1,79 @@
+"""429/503のRetry-Afterの解釈と再送（send_with_throttle）"""
+
+import asyncio
+import time
+from email.utils import formatdate
+
+import pytest
+
+from async_http import AsyncHTTPClient, HTTPResponse
+from experiment_engine import chat_completions_url
+from rate_limiter import SharedRateLimiter, retry_after_seconds, send_with_throttle
+
+BODY = {"model": "mock", "messages": [{"role": "user", "content": "ping"}], "temperature": 0}
+
+
+def response_with(retry_after: str = None) -> HTTPResponse:
+    return HTTPResponse(429, "Too Many Requests", {"retry-after": retry_after} if retry_after else {}, b"")
+
+
+def send(url: str, limiter: SharedRateLimiter = None, max_throttle_retries: int = 2) -> HTTPResponse:
+    async def run():
+        client = AsyncHTTPClient(max_connections=4)
+        try:
+            return await send_with_throttle(client, chat_completions_url(url), BODY,
+                                            {"Content-Type": "application/json"}, 10, limiter, max_throttle_retries)
+        finally:
+            await client.close()
+    return asyncio.run(run())
+
+
+class TestRetryAfter:
+    def test_seconds(self):
+        assert retry_after_seconds(response_with("2.5")) == 2.5
+        assert retry_after_seconds(response_with("-1")) == 0.0
+
+    def test_http_date(self):
+        assert retry_after_seconds(response_with(formatdate(time.time() + 30, usegmt=True))) == \
+            pytest.approx(30, abs=2)
+        assert retry_after_seconds(response_with(formatdate(time.time() - 30, usegmt=True))) == 0.0
+
+    def test_missing_or_invalid(self):
+        assert retry_after_seconds(response_with()) is None
+        assert retry_after_seconds(response_with("soon")) is None
+
+
+class TestSendWithThrottleAgainstMockServer:
+    def test_retries_throttled_requests_for_retry_after(self, mock_server):
+        url, server = mock_server(error_rate=1.0, error_statuses=[429], retry_after=0.05)
+        response = send(url, max_throttle_retries=2)
+        assert response.status == 429
+        assert server.mock.stats['requests'] == 3
+        assert response.throttle_delay == pytest.approx(0.1)
+
+    def test_recovers_after_throttling(self, mock_server):
+        url, server = mock_server(error_rate=0.5, error_statuses=[503], retry_after=0.01, seed=3)
+        response = send(url, max_throttle_retries=10)
+        assert response.status == 200
+        assert server.mock.stats['status_503'] >= 1
+        assert response.throttle_delay == pytest.approx(0.01 * (server.mock.stats['requests'] - 1))
+
+    def test_server_errors_without_retry_after_are_returned(self, mock_server):
+        url, server = mock_server(error_rate=1.0, error_statuses=[503])
+        assert send(url).status == 503
+        assert server.mock.stats['requests'] == 1
+
+    def test_other_errors_are_not_retried(self, mock_server):
+        url, server = mock_server(error_rate=1.0, error_statuses=[500], retry_after=0.01)
+        assert send(url).status == 500
+        assert server.mock.stats['requests'] == 1
+
+    def test_retry_after_blocks_the_shared_limiter(self, mock_server, tmp_path):
+        url, server = mock_server(error_rate=1.0, error_statuses=[429], retry_after=0.05)
+        limiter = SharedRateLimiter(str(tmp_path), requests_per_second=1000)
+        response = send(url, limiter, max_throttle_retries=1)
+        assert server.mock.stats['requests'] == 2
+        assert limiter.retry_after_events == 1
+        # 待機は共有状態の次のacquireで行い、スロットリング遅延として数える
+        assert response.throttle_delay >= 0.04
+        assert limiter.summary()['throttle_seconds'] >= 0.04
@@ -0,0 +1,119 @@
+"""ヘッジリクエスト: (algo, レベル)ごとのしきい値、ヘッジ率の上限、複製が先に返った場合の応答の選択"""
+
+import asyncio
+
+import pytest
+
+from async_http import HTTPResponse
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+from request_hedging import HEDGED_HEADER, UNKNOWN_KEY, RequestHedger, hedge_key
+from simulated_backend import LatencyModel
+
+KEY = ("abs", 1)
+
+
+def delayed(delays, status: int = 200):
+    """attempt番目の送信がdelays[attempt]秒後に応答するsend関数"""
+    sent = []
+
+    async def send(attempt: int) -> HTTPResponse:
+        sent.append(attempt)
+        await asyncio.sleep(delays[attempt])
+        return HTTPResponse(status, "OK", {}, str(attempt).encode('utf-8'))
+
+    return send, sent
+
+
+def run_all(hedger: RequestHedger, requests):
+    async def scenario():
+        return [await hedger.run(KEY, send) for send in requests]
+    return asyncio.run(scenario())
+
+
+class TestThreshold:
+    def test_no_hedging_until_min_samples(self):
+        hedger = RequestHedger(quantile=0.5, min_samples=3)
+        sends = [delayed([0.01, 0.0]) for _ in range(3)]
+        run_all(hedger, [send for send, _ in sends])
+        assert all(sent == [0] for _, sent in sends)
+        assert hedger.threshold(KEY) == pytest.approx(0.01, abs=0.02)
+        assert hedger.threshold(("abs", 2)) is None
+        assert hedger.summary()['hedged'] == 0
+
+    def test_window_keeps_only_recent_samples(self):
+        hedger = RequestHedger(min_samples=1, window=2)
+        for value in (5.0, 1.0, 2.0):
+            hedger._record(KEY, value, value)
+        assert list(hedger.samples[KEY]) == [1.0, 2.0]
+
+    def test_hedge_key(self):
+        assert hedge_key("chat_strict_json_ja_level3") == ("strict", 3)
+        assert hedge_key(None) == UNKNOWN_KEY
+
+
+class TestHedging:
+    def test_faster_hedge_wins_and_primary_is_cancelled(self):
+        hedger = RequestHedger(quantile=0.5, min_samples=2, max_hedge_rate=1.0)
+        run_all(hedger, [delayed([0.01])[0] for _ in range(2)])
+        send, sent = delayed([5.0, 0.01])
+        (response,) = run_all(hedger, [send])
+        assert sent == [0, 1] and response.body == b"1"
+        assert response.headers[HEDGED_HEADER] == "hedge"
+        summary = hedger.summary()
+        assert (summary['hedged'], summary['hedge_wins']) == (1, 1)
+        # 応答時間には先に返った複製の時間を記録する（最初のリクエストの5秒を待たない）
+        assert summary['latency']['max'] < 1.0
+
+    def test_primary_is_used_when_it_returns_first(self):
+        hedger = RequestHedger(quantile=0.5, min_samples=2, max_hedge_rate=1.0)
+        run_all(hedger, [delayed([0.01])[0] for _ in range(2)])
+        (response,) = run_all(hedger, [delayed([0.1, 5.0])[0]])
+        assert response.body == b"0" and response.headers[HEDGED_HEADER] == "primary"
+        assert (hedger.hedged, hedger.hedge_wins) == (1, 0)
+
+    def test_primary_result_when_neither_succeeds(self):
+        hedger = RequestHedger(quantile=0.5, min_samples=2, max_hedge_rate=1.0)
+        run_all(hedger, [delayed([0.01])[0] for _ in range(2)])
+        (response,) = run_all(hedger, [delayed([0.1, 0.05], status=500)[0]])
+        assert response.status == 500 and response.body == b"0"
+
+    def test_hedge_rate_budget(self):
+        hedger = RequestHedger(quantile=0.5, min_samples=2, max_hedge_rate=0.25)
+        run_all(hedger, [delayed([0.01])[0] for _ in range(2)])
+        sends = [delayed([0.2, 0.0]) for _ in range(6)]
+        run_all(hedger, [send for send, _ in sends])
+        # ヘッジするのは、ヘッジした件数がその時点のリクエスト数の25%未満の間だけ（3件目と5件目）
+        assert [len(sent) == 2 for _, sent in sends] == [True, False, True, False, False, False]
+        summary = hedger.summary()
+        assert (summary['requests'], summary['hedged'], summary['budget_skipped']) == (8, 2, 4)
+        assert summary['hedge_rate'] <= 0.25
+
+
+class TestHedgingWithMockServer:
+    def test_slow_primary_is_hedged_to_the_other_endpoint(self, mock_server, tmp_path, monkeypatch):
+        primary_url, primary = mock_server()
+        hedge_url, hedge = mock_server()
+        hedger = RequestHedger(quantile=0.95, min_samples=2, max_hedge_rate=1.0)
+        backend = HTTPBackend(external_llm_url=primary_url, external_llm_model="mock", default_timeout=30,
+                              options=HTTPOptions(hedger=hedger, hedge_url=hedge_url))
+
+        def run(output_dir: str):
+            scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1, 2], runs=2, per_run=True))
+            ExperimentEngine(backend, scheduler, output_dir, sinks=[]).run()
+
+        # 最初の実験で(abs, 1)・(abs, 2)の応答時間を記録し、以降は最初の送信先だけを遅くする
+        run(str(tmp_path / "fast"))
+        assert (hedger.hedged, hedge.mock.stats['requests']) == (0, 0)
+        monkeypatch.setattr(primary.mock, "latency", LatencyModel("fixed:5"))
+        run(str(tmp_path / "slow"))
+
+        summary = hedger.summary()
+        assert (summary['requests'], summary['hedged'], summary['hedge_wins']) == (8, 4, 4)
+        assert hedge.mock.stats['requests'] == 4
+        assert sorted(summary['by_cell']) == ["abs_level1", "abs_level2"]
+        log_files = discover_log_files(str(tmp_path / "slow"))
+        assert len(log_files) == 4 and not any(log_file.error for log_file in log_files)
+        assert summary['latency']['max'] < 2.0
+        assert backend.report(backend.summary())[0].startswith("ヘッジ: 4/8件 (50.0%, 複製が先に返った件数 4)")
@@ -0,0 +1,124 @@
+"""リクエストごとの計測（request_metrics.jsonl）: X-AITest-Cellの形式、応答本文の解析、ログとの結合、計測プロキシ"""
+
+import asyncio
+import json
+
+import pytest
+
+import generate_combined_report
+from aitest_extraction import build_prompt, build_request_body
+from async_http import AsyncHTTPClient, AsyncHTTPServer
+from document_index import DocumentIndex
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs, chat_completions_url
+from http_backend import HTTPBackend, HTTPOptions
+from instrumenting_proxy import CELL_HEADER, RUN_HEADER, InstrumentingProxy
+from log_layout import discover_log_files
+from request_metrics import (
+    REQUEST_METRICS_FILE, RequestMetricsWriter, index_request_metrics, lookup_request_metrics, message_from_body,
+    parse_request_cell, read_request_metrics, request_cell, usage_from_body
+)
+
+
+def sse(*chunks) -> bytes:
+    return "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks).encode('utf-8') + b"data: [DONE]\n\n"
+
+
+class TestRequestCell:
+    def test_round_trip(self):
+        cell = request_cell("chat", "strict-ex", "json", "ja", 2)
+        assert cell == "chat_strict-ex_json_ja_level2"
+        assert parse_request_cell(cell) == {"testcase": "chat", "algo": "strict-ex", "method": "json",
+                                            "language": "ja", "level": 2}
+
+    @pytest.mark.parametrize("cell", [None, "", "chat_abs_json_ja", "chat_abs_json_ja_levelX",
+                                      "chat_abs_json_ja_level1_run1"])
+    def test_other_values_are_not_cells(self, cell):
+        assert parse_request_cell(cell) is None
+
+
+class TestResponseBody:
+    def test_json_response(self):
+        body = json.dumps({"choices": [{"message": {"content": "{}", "reasoning_content": "考え中"}}],
+                           "usage": {"prompt_tokens": 10, "completion_tokens": 3}}).encode('utf-8')
+        assert usage_from_body(body) == {"prompt_tokens": 10, "completion_tokens": 3}
+        assert message_from_body(body) == ("{}", "考え中")
+
+    def test_sse_response(self):
+        body = sse({"choices": [{"delta": {"role": "assistant", "content": ""}}]},
+                   {"choices": [{"delta": {"reasoning": "r"}}]},
+                   {"choices": [{"delta": {"content": "{\"a\""}}]},
+                   {"choices": [{"delta": {"content": ": 1}"}}]},
+                   {"choices": [], "usage": {"prompt_tokens": 5, "completion_tokens": 4}})
+        assert usage_from_body(body) == {"prompt_tokens": 5, "completion_tokens": 4}
+        assert message_from_body(body) == ('{"a": 1}', "r")
+        assert message_from_body(b"not a response") == (None, None)
+
+
+class TestIndex:
+    def test_requests_of_the_same_run_are_summed(self):
+        cell = request_cell("chat", "abs", "json", "ja", 1)
+        index = index_request_metrics([
+            {'cell': cell, 'run': 1, 'status': 500, 'ttfb': 0.5, 'total_time': 1.0, 'completion_tokens': None},
+            {'cell': cell, 'run': 1, 'status': 200, 'ttfb': 0.25, 'total_time': 2.0, 'completion_tokens': 40},
+            {'cell': None, 'testcase': "voice", 'level': 3, 'run': 2, 'status': 200, 'total_time': 4.0},
+        ])
+        merged = lookup_request_metrics(index, "chat", "abs", "json", "ja", 1, 1)
+        assert merged == {'requests': 2, 'status': 200, 'model': None, 'ttfb': 0.75, 'total_time': 3.0,
+                          'completion_tokens': 40}
+        # ヘッダーのない記録はtestcase・level・runで対応付ける
+        assert lookup_request_metrics(index, "voice", "strict", "json", "ja", 3, 2)['total_time'] == 4.0
+        assert lookup_request_metrics(index, "chat", "abs", "json", "ja", 1, 2) is None
+
+
+class TestRecordingWithMockServer:
+    def test_http_backend_records_are_joined_to_the_logs(self, mock_server, tmp_path):
+        url, _ = mock_server()
+        writer = RequestMetricsWriter(str(tmp_path / REQUEST_METRICS_FILE))
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                              options=HTTPOptions(request_metrics=writer))
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1, 2], runs=2, per_run=True))
+        ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+
+        records = read_request_metrics(str(tmp_path / REQUEST_METRICS_FILE))
+        assert len(records) == writer.records == 4
+        assert sorted((parse_request_cell(record['cell'])['level'], record['run']) for record in records) == \
+            [(1, 1), (1, 2), (2, 1), (2, 2)]
+        assert all(record['status'] == 200 and record['completion_tokens'] > 0 for record in records)
+
+        index = index_request_metrics(generate_combined_report.load_request_metrics(str(tmp_path)))
+        for log_file in discover_log_files(str(tmp_path)):
+            result = generate_combined_report.parse_log_file(str(log_file.path))
+            generate_combined_report.attach_request_metrics(result, str(log_file.path), index)
+            assert result['test_cases'][0]['request_metrics']['requests'] == 1
+
+    def test_proxy_records_cells_and_identifies_documents(self, mock_server, tmp_path):
+        url, _ = mock_server()
+        upstream = url[:-len("/v1")]
+        output = tmp_path / REQUEST_METRICS_FILE
+        body = json.dumps(build_request_body("mock", build_prompt("voice", "abs", "json", "ja", 2))).encode('utf-8')
+
+        async def scenario():
+            upstream_client = AsyncHTTPClient()
+            proxy = InstrumentingProxy(upstream, upstream_client, RequestMetricsWriter(str(output)),
+                                       identifier=DocumentIndex().identify)
+            server = AsyncHTTPServer(proxy.handle)
+            proxy_url = await server.start()
+            client = AsyncHTTPClient()
+            try:
+                cell = request_cell("voice", "abs", "json", "ja", 2)
+                with_cell = await client.request("POST", chat_completions_url(proxy_url), body,
+                                                 {CELL_HEADER: cell, RUN_HEADER: "3"})
+                without_cell = await client.request("POST", chat_completions_url(proxy_url), body)
+            finally:
+                await client.close()
+                await upstream_client.close()
+                await server.close()
+            return with_cell, without_cell
+
+        responses = asyncio.run(scenario())
+        assert [response.status for response in responses] == [200, 200]
+        first, second = read_request_metrics(str(output))
+        assert (first['cell'], first['run'], first['testcase']) == ("voice_abs_json_ja_level2", 3, None)
+        assert (second['cell'], second['run'], second['testcase'], second['level']) == (None, None, "voice", 2)
+        assert first['response_bytes'] == len(responses[0].body)
+        assert first['total_time'] >= first['ttfb'] > 0
@@ -0,0 +1,89 @@
+"""応答キャッシュのキー（request_key）とサンプル番号ごとの記録・再生"""
+
+import pytest
+
+from async_http import HTTPResponse
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from response_cache import MODE_RECORD, MODE_REPLAY, CacheMiss, ResponseCache, request_key
+
+MESSAGES = [{"role": "user", "content": "口座情報を抽出してください"}]
+
+
+def body(**fields) -> dict:
+    return {"model": "mock", "messages": MESSAGES, "temperature": 0, **fields}
+
+
+def ok(content: str = "{}") -> HTTPResponse:
+    return HTTPResponse(200, "OK", {"content-type": "application/json"}, content.encode('utf-8'), total_time=0.5)
+
+
+class TestRequestKey:
+    def test_field_order_does_not_matter(self):
+        assert request_key({"temperature": 0, "model": "mock", "messages": MESSAGES}) == request_key(body())
+
+    def test_transport_fields_are_ignored(self):
+        assert request_key(body(stream=True, stream_options={"include_usage": True}, user="a")) == request_key(body())
+
+    def test_integer_and_float_sampling_values_are_equal(self):
+        assert request_key(body(temperature=0)) == request_key(body(temperature=0.0))
+        assert request_key(body(top_p=1)) == request_key(body(top_p=1.0))
+
+    def test_fields_that_change_the_response_change_the_key(self):
+        keys = {
+            request_key(body()),
+            request_key(body(temperature=0.7)),
+            request_key(body(model="other")),
+            request_key(body(max_tokens=10)),
+            request_key(body(seed=1)),
+            request_key(body(response_format={"type": "json_object"})),
+            request_key({**body(), "messages": [{"role": "user", "content": "別のドキュメント"}]}),
+        }
+        assert len(keys) == 7
+
+
+class TestSamples:
+    def test_samples_are_stored_by_run(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        cache.store(body(), ok('{"run": 3}'), sample=2)
+        assert cache.lookup(body(), sample=0) is None
+        assert cache.lookup(body(), sample=2).body == b'{"run": 3}'
+        assert cache.lookup(body(), sample=2).total_time == 0.5
+
+    def test_failed_responses_are_not_stored(self, tmp_path):
+        cache = ResponseCache(str(tmp_path))
+        cache.store(body(), HTTPResponse(503, "Service Unavailable", {}, b""), sample=0)
+        assert cache.entries() == []
+
+    def test_replay_mode_raises_on_miss(self, tmp_path):
+        ResponseCache(str(tmp_path)).store(body(), ok(), sample=0)
+        replay = ResponseCache(str(tmp_path), mode=MODE_REPLAY)
+        assert replay.lookup(body(), sample=0) is not None
+        with pytest.raises(CacheMiss):
+            replay.lookup(body(), sample=1)
+
+    def test_record_mode_always_sends(self, tmp_path):
+        ResponseCache(str(tmp_path)).store(body(), ok(), sample=0)
+        assert ResponseCache(str(tmp_path), mode=MODE_RECORD).lookup(body(), sample=0) is None
+
+
+class TestCacheWithMockServer:
+    def test_rerun_is_served_from_cache(self, mock_server, tmp_path):
+        url, server = mock_server()
+        cache_dir = str(tmp_path / "cache")
+
+        def run(output_dir: str) -> ResponseCache:
+            cache = ResponseCache(cache_dir)
+            backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                                  options=HTTPOptions(cache=cache))
+            scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1], runs=2, per_run=True))
+            ExperimentEngine(backend, scheduler, output_dir, sinks=[]).run()
+            return cache
+
+        first = run(str(tmp_path / "first"))
+        assert (first.stats['hits'], first.stats['misses'], first.stats['stored']) == (0, 2, 2)
+        assert server.mock.stats['requests'] == 2
+
+        second = run(str(tmp_path / "second"))
+        assert (second.stats['hits'], second.stats['misses']) == (2, 0)
+        assert server.mock.stats['requests'] == 2
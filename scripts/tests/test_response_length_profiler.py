@@ -0,0 +1,99 @@
+"""応答の長さの分析: 1トークンあたりのデコード時間の当てはめ、JSON以外の出力の推定、algo・レベル別の集計"""
+
+import json
+import sys
+
+import pytest
+
+import response_length_profiler
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from request_metrics import REQUEST_METRICS_FILE, RequestMetricsWriter, request_cell
+from response_length_profiler import (
+    PROFILE_FILE, UNKNOWN, correlation, load_records, profile_response_lengths, seconds_per_token, wasted_tokens
+)
+
+
+def record(tokens: int, total_time: float, algo: str = "abs", level: int = 1, content_chars: int = 100,
+           payload_chars: int = 80, **fields) -> dict:
+    values = {'cell': request_cell("chat", algo, "json", "ja", level), 'model': "m", 'status': 200,
+              'completion_tokens': tokens, 'total_time': total_time, 'content_chars': content_chars,
+              'payload_chars': payload_chars, 'reasoning_chars': 0, 'reasoning_tokens': None}
+    values.update(fields)
+    return values
+
+
+class TestDecodeRate:
+    def test_regression(self):
+        records = [record(tokens, 0.5 + 0.01 * tokens) for tokens in (100, 200, 400)]
+        rate = seconds_per_token(records)
+        assert rate['method'] == "regression"
+        assert rate['seconds_per_token'] == pytest.approx(0.01)
+        assert rate['fixed_seconds'] == pytest.approx(0.5)
+
+    def test_ratio_when_every_response_has_the_same_length(self):
+        rate = seconds_per_token([record(100, 1.0), record(100, 3.0)])
+        assert (rate['method'], rate['seconds_per_token'], rate['fixed_seconds']) == ("ratio", 0.02, 0.0)
+
+    def test_correlation(self):
+        assert correlation([1, 2], [1, 2]) is None
+        assert correlation([1, 1, 1], [1, 2, 3]) is None
+        assert correlation([1, 2, 3], [2, 4, 6]) == pytest.approx(1.0)
+
+
+class TestWastedTokens:
+    def test_reasoning_tokens_and_non_json_content(self):
+        # 推論40トークン＋残り60トークンのうちJSON以外（20%）
+        assert wasted_tokens(record(100, 1.0, reasoning_tokens=40)) == pytest.approx(40 + 60 * 0.2)
+
+    def test_reasoning_share_is_estimated_from_characters(self):
+        assert wasted_tokens(record(100, 1.0, content_chars=100, payload_chars=100, reasoning_chars=300)) == \
+            pytest.approx(75)
+
+
+class TestProfile:
+    def test_groups_and_wasted_time(self):
+        records = [record(100, 1.5, algo="abs", level=1), record(200, 2.5, algo="abs", level=2),
+                   record(300, 3.5, algo="persona", level=1, content_chars=200, payload_chars=50),
+                   dict(record(100, 1.0), status=500), dict(record(100, 1.5), cell=None, level=None)]
+        profile = profile_response_lengths(records)
+        assert profile['requests'] == 4
+        assert profile['decode_rates']['m']['seconds_per_token'] == pytest.approx(0.01)
+        assert sorted(profile['by_algo']) == ["abs", "persona", UNKNOWN]
+        assert sorted(profile['by_level']) == ["level1", "level2", UNKNOWN]
+        persona = profile['by_algo']["persona"]
+        assert persona['non_json_share'] == pytest.approx(0.75)
+        assert persona['avg_wasted_time'] == pytest.approx(300 * 0.75 * 0.01)
+        assert profile['by_model_algo_level']["m / abs / level2"]['requests'] == 1
+
+    def test_no_records(self):
+        assert profile_response_lengths([]) == {'requests': 0, 'decode_rates': {}, 'overall': None, 'by_algo': {},
+                                                'by_level': {}, 'by_model': {}, 'by_model_algo_level': {}}
+
+
+class TestProfilerWithMockServer:
+    def test_decode_rate_matches_the_token_interval(self, mock_server, tmp_path, monkeypatch):
+        url, _ = mock_server(latency="fixed:0.05", token_interval=0.005)
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                              options=HTTPOptions(request_metrics=RequestMetricsWriter(
+                                  str(tmp_path / REQUEST_METRICS_FILE))))
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json", "contract_strict_json"], levels=[1, 2, 3],
+                                                   runs=1, per_run=True))
+        ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+
+        profile = profile_response_lengths(load_records([str(tmp_path)]))
+        assert profile['requests'] == 6
+        rate = profile['decode_rates']['mock']
+        assert rate['method'] == "regression"
+        assert rate['seconds_per_token'] == pytest.approx(0.005, rel=0.25)
+        # 固定部分には最初のトークンまでの遅延（latency）が含まれる
+        assert rate['fixed_seconds'] >= 0.04
+        assert profile['overall']['token_latency_correlation'] > 0.9
+        # モックの応答は```jsonで囲まれているため、JSON以外の出力がある
+        assert 0 < profile['overall']['non_json_share'] < 0.5
+        assert sorted(profile['by_algo']) == ["abs", "strict"]
+
+        monkeypatch.setattr(sys, "argv", ["response_length_profiler.py", str(tmp_path)])
+        response_length_profiler.main()
+        with open(tmp_path / PROFILE_FILE, encoding='utf-8') as f:
+            assert json.load(f)['requests'] == 6
@@ -0,0 +1,128 @@
+"""失敗の分類（一時的 / 決定的）と、セルの再試行・隔離"""
+
+import json
+import random
+
+from experiment_engine import (
+    FAILURE_DETERMINISTIC, FAILURE_TRANSIENT, CellFailureStore, ExperimentEngine, ExperimentJob, JobResult,
+    RetryingScheduler, RetryPolicy, RoundRobinScheduler, build_jobs, classify_cells, classify_error_log
+)
+from http_backend import HTTPBackend
+
+PATTERN = "chat_abs_json"
+
+
+def write_log(job: ExperimentJob, output_dir: str, level: int, run: int, error: dict = None) -> str:
+    path = job.log_path(output_dir, level, run, error=error is not None)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(error or {'expected_fields': []}, f)
+    return path
+
+
+def run_with_retries(url: str, output_dir: str, runs: int = 1, quarantine_after: int = 2) -> RetryingScheduler:
+    backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30)
+    scheduler = RetryingScheduler(RoundRobinScheduler(build_jobs([PATTERN], levels=[1], runs=runs, per_run=True)),
+                                  CellFailureStore(output_dir, quarantine_after),
+                                  RetryPolicy(max_attempts=2, base_delay=0.01, max_delay=0.01), random.Random(0))
+    ExperimentEngine(backend, scheduler, output_dir, sinks=[], concurrency=1).run()
+    return scheduler
+
+
+class TestClassifyErrorLog:
+    def test_server_errors_and_throttling_are_transient(self):
+        for status in (500, 502, 503, 408, 429):
+            assert classify_error_log({'error': f"HTTPエラー: {status}"}) == (FAILURE_TRANSIENT, f"HTTP {status}")
+
+    def test_other_client_errors_are_deterministic(self):
+        assert classify_error_log({'error': "HTTPエラー: 400"}) == (FAILURE_DETERMINISTIC, "HTTP 400")
+
+    def test_connection_errors_and_timeouts_are_transient(self):
+        assert classify_error_log({'error': "接続できません", 'error_type': "URLError"})[0] == FAILURE_TRANSIENT
+        assert classify_error_log({'error': "無効なレスポンス形式です"})[0] == FAILURE_TRANSIENT
+        assert classify_error_log({'error': "The request timed out."})[0] == FAILURE_TRANSIENT
+
+    def test_parse_failures_are_deterministic(self):
+        assert classify_error_log({'error': "無効なJSON形式です", 'error_type': "ExtractionError"}) == \
+            (FAILURE_DETERMINISTIC, "無効なJSON形式です")
+        assert classify_error_log({})[0] == FAILURE_DETERMINISTIC
+
+
+class TestClassifyCells:
+    def test_cells_are_judged_by_their_own_log(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1, 2, 3))
+        log_files = [write_log(job, str(tmp_path), 1, 1),
+                     write_log(job, str(tmp_path), 2, 1, {'error': "無効なJSON形式です"})]
+        outcomes = classify_cells(JobResult(job=job, success=False, elapsed=1.0, timeout=10.0, returncode=1,
+                                            log_files=log_files))
+        assert outcomes[(1, 1)] is None
+        assert outcomes[(2, 1)] == (FAILURE_DETERMINISTIC, "無効なJSON形式です")
+        # ログのないセルはプロセスの異常終了として一時的な失敗
+        assert outcomes[(3, 1)][0] == FAILURE_TRANSIENT
+
+    def test_cells_without_logs_after_timeout_are_transient(self):
+        job = ExperimentJob.from_pattern(PATTERN, levels=(1,))
+        outcomes = classify_cells(JobResult(job=job, success=False, elapsed=10.0, timeout=10.0, timed_out=True))
+        assert outcomes[(1, 1)] == (FAILURE_TRANSIENT, "タイムアウト (10秒)")
+
+
+class TestCellFailureStore:
+    def test_transient_failures_never_quarantine(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN)
+        store = CellFailureStore(str(tmp_path), quarantine_after=2)
+        for _ in range(5):
+            store.record_failure(job, 1, 1, FAILURE_TRANSIENT, "HTTP 503")
+        assert not store.is_quarantined(job, 1, 1)
+        assert store.quarantined() == []
+
+    def test_deterministic_failures_quarantine_across_resumes(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN)
+        store = CellFailureStore(str(tmp_path), quarantine_after=2)
+        store.record_failure(job, 1, 1, FAILURE_DETERMINISTIC, "無効なJSON形式です")
+        store.record_failure(job, 1, 1, FAILURE_TRANSIENT, "HTTP 503")
+        store.save()
+        resumed = CellFailureStore(str(tmp_path), quarantine_after=2)
+        assert not resumed.is_quarantined(job, 1, 1)
+        entry = resumed.record_failure(job, 1, 1, FAILURE_DETERMINISTIC, "無効なJSON形式です")
+        assert entry['quarantined'] and entry['deterministic_failures'] == 2 and entry['failures'] == 3
+        assert resumed.is_quarantined(job, 1, 1)
+        assert not resumed.is_quarantined(job, 2, 1)
+
+    def test_success_clears_the_history(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN)
+        store = CellFailureStore(str(tmp_path), quarantine_after=1)
+        store.record_failure(job, 1, 1, FAILURE_DETERMINISTIC, "無効なJSON形式です")
+        store.record_success(job, 1, 1)
+        assert not store.is_quarantined(job, 1, 1)
+
+    def test_entries_quarantined_by_transient_failures_are_released(self, tmp_path):
+        job = ExperimentJob.from_pattern(PATTERN)
+        key = CellFailureStore.key(job, 1, 1)
+        with open(tmp_path / "cell_failures.json", 'w', encoding='utf-8') as f:
+            json.dump({'cells': {key: {'failures': 3, 'quarantined': True, 'last_kind': FAILURE_TRANSIENT}}}, f)
+        assert not CellFailureStore(str(tmp_path), quarantine_after=3).is_quarantined(job, 1, 1)
+
+
+class TestRetryingSchedulerWithMockServer:
+    def test_exhausted_transient_failures_stay_pending(self, mock_server, tmp_path):
+        url, server = mock_server(error_rate=1.0, error_statuses=[503])
+        scheduler = run_with_retries(url, str(tmp_path), runs=2, quarantine_after=1)
+        assert scheduler.retries_scheduled == 2
+        assert scheduler.newly_quarantined == []
+        assert CellFailureStore(str(tmp_path), 1).quarantined() == []
+        assert server.mock.stats['requests'] == 4
+
+    def test_deterministic_failures_are_not_retried_and_are_quarantined(self, mock_server, tmp_path):
+        url, server = mock_server(malformed_rate=1.0)
+        scheduler = run_with_retries(url, str(tmp_path), runs=1, quarantine_after=1)
+        assert scheduler.retries_scheduled == 0
+        assert scheduler.newly_quarantined == [f"{PATTERN}_ja_level1_run1"]
+        # 隔離したセルはレジュームでスキップされる
+        resumed = run_with_retries(url, str(tmp_path), runs=1, quarantine_after=1)
+        assert resumed.skipped_cells == 1
+        assert server.mock.stats['requests'] == 1
+
+    def test_successful_cells_are_not_retried(self, mock_server, tmp_path):
+        url, _ = mock_server()
+        scheduler = run_with_retries(url, str(tmp_path), runs=2)
+        assert scheduler.retries_scheduled == 0
+        assert scheduler.store.cells == {}
@@ -0,0 +1,104 @@
+"""サンプリング設定のスイープ: 設定の組み合わせ、スコアを保つ中で最も安い設定の推奨、構造化出力との比較"""
+
+import argparse
+
+import pytest
+
+from http_backend import STRUCTURED_OUTPUT_OFF
+from sampling_sweep import (
+    BASELINE_SAMPLING, OBJECTIVE_LATENCY, OBJECTIVE_TOKENS, OVERALL, analyze_sweep, parse_stop, recommend,
+    run_setting, sampling_grid, setting_grid, setting_label
+)
+
+
+def setting(sampling: dict, score: float, latency: float, tokens=None, structured_output=STRUCTURED_OUTPUT_OFF):
+    stats = {'normalized_score': score, 'avg_latency': latency, 'avg_completion_tokens': tokens}
+    return {'sampling': sampling, 'structured_output': structured_output, 'stats': {'abs': stats, OVERALL: stats}}
+
+
+def sweep_args(url: str) -> argparse.Namespace:
+    return argparse.Namespace(external_llm_url=url, external_llm_model="mock", warmup=0, max_connections=4,
+                              rps=None, tpm=None, rate_limit_dir=None, max_throttle_retries=0,
+                              patterns=["chat_abs_json"], levels=[1, 2], runs=2, concurrency=2)
+
+
+class TestGrid:
+    def test_stop_values(self):
+        assert parse_stop("none") is None
+        assert parse_stop('["```", "\\n\\n"]') == ["```", "\n\n"]
+        assert parse_stop("\\n\\n") == ["\n\n"]
+
+    def test_baseline_comes_first_and_duplicates_are_removed(self):
+        grid = sampling_grid([1.0, 0.0], [1.0], ["none", "```"], ["none", "low"])
+        assert grid[0] == BASELINE_SAMPLING
+        # 8通りのうちtemperature 1.0・stopなし・reasoning_effortなしはベースラインと同じ
+        assert len(grid) == 2 * 2 * 2
+        assert {"temperature": 0.0, "top_p": 1.0, "stop": ["```"], "reasoning_effort": "low"} in grid
+
+    def test_structured_output_settings(self):
+        grid = [BASELINE_SAMPLING, {"temperature": 0.0, "top_p": 1.0}]
+        assert setting_grid(grid, ["json_schema"]) == [(BASELINE_SAMPLING, "off"), (grid[0], "json_schema"),
+                                                       (grid[1], "json_schema")]
+        assert len(setting_grid(grid, ["off", "json_schema"])) == 4
+        assert setting_label(3, {"temperature": 0.2, "top_p": 0.9, "stop": ["a", "b"], "reasoning_effort": "low"},
+                             "json_schema") == "03_t0.2_p0.9_stop2_effort-low_json-schema"
+
+
+class TestRecommend:
+    SETTINGS = {
+        'baseline': setting(BASELINE_SAMPLING, 0.80, 4.0, 400),
+        'fast_but_worse': setting({"temperature": 0.0, "top_p": 1.0, "stop": ["```"]}, 0.70, 1.0, 100),
+        'fast_enough': setting({"temperature": 0.0, "top_p": 1.0}, 0.79, 2.0, 300),
+        'fewest_tokens': setting({"temperature": 0.2, "top_p": 1.0}, 0.85, 3.0, 200),
+    }
+
+    def test_cheapest_setting_within_the_tolerance(self):
+        recommendation = recommend(self.SETTINGS, 'baseline', 0.02, OBJECTIVE_LATENCY)['abs']
+        assert recommendation['setting'] == 'fast_enough'
+        assert recommendation['cost_reduction'] == pytest.approx(0.5)
+        # 許容差を広げるとスコアの低い設定も候補になる
+        assert recommend(self.SETTINGS, 'baseline', 0.2, OBJECTIVE_LATENCY)['abs']['setting'] == 'fast_but_worse'
+
+    def test_token_objective(self):
+        recommendations = recommend(self.SETTINGS, 'baseline', 0.02, OBJECTIVE_TOKENS)
+        assert list(recommendations) == ['abs', OVERALL]
+        assert recommendations['abs']['setting'] == 'fewest_tokens'
+        assert recommendations['abs']['cost_reduction'] == pytest.approx(0.5)
+
+    def test_baseline_is_kept_when_nothing_is_cheaper(self):
+        settings = {'baseline': setting(BASELINE_SAMPLING, 0.8, 1.0),
+                    'slower': setting({"temperature": 0.0, "top_p": 1.0}, 0.9, 2.0)}
+        assert recommend(settings, 'baseline', 0.02, OBJECTIVE_LATENCY)['abs']['setting'] == 'baseline'
+
+
+class TestSweepWithMockServer:
+    def test_settings_are_sent_and_analyzed(self, mock_server, tmp_path, monkeypatch):
+        url, server = mock_server(latency="fixed:0.01", reject_response_format=True)
+        sent = []
+        plan = server.mock.plan
+        monkeypatch.setattr(server.mock, "plan", lambda body: sent.append(body) or plan(body))
+
+        args = sweep_args(url)
+        grid = setting_grid(sampling_grid([0.0], [1.0], ["none"], ["none"]), ["json_schema"])
+        for index, (sampling, structured_output) in enumerate(grid):
+            run_setting(args, str(tmp_path), setting_label(index, sampling, structured_output), sampling,
+                        structured_output)
+        assert {(body["temperature"], "response_format" in body) for body in sent} == {(1.0, False), (0.0, False)}
+
+        summary = analyze_sweep(str(tmp_path), 0.02, OBJECTIVE_LATENCY)
+        settings = summary['settings']
+        assert summary['baseline'] == "00_t1_p1"
+        assert sorted(settings) == ["00_t1_p1", "01_t1_p1_json-schema", "02_t0_p1_json-schema"]
+        for stats in settings.values():
+            assert stats['stats'][OVERALL]['tests'] == 4 and stats['stats'][OVERALL]['error_rate'] == 0.0
+            assert stats['stats'][OVERALL]['avg_completion_tokens'] > 0
+
+        # モックはresponse_formatに400を返すため、自由形式にフォールバックしたことを記録する
+        comparison = summary['structured_output']["01_t1_p1_json-schema"]
+        assert comparison['free_form'] == "00_t1_p1" and comparison['supported'] is False
+
+        recommendation = summary['recommendations'][OVERALL]
+        baseline_score = settings["00_t1_p1"]['stats'][OVERALL]['normalized_score']
+        eligible = [stats['stats'][OVERALL]['avg_latency'] for stats in settings.values()
+                    if stats['stats'][OVERALL]['normalized_score'] >= baseline_score - 0.02]
+        assert recommendation['cost'] == min(eligible)
@@ -0,0 +1,140 @@
+"""擬似バックエンド（遅延分布・エラー率・クラッシュ率）と、Swift版の規則に沿ったログ出力"""
+
+import argparse
+import json
+import random
+
+import pytest
+
+from aitest_logs import (
+    AI_VERIFICATION_FIELDS, AI_VERIFICATION_PLACEHOLDER, expected_value, field_status, load_test_case
+)
+from benchmark_orchestrator import benchmark, build_cell_jobs
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, SequentialScheduler, build_jobs
+from generate_combined_report import parse_log_file
+from http_backend import HTTPBackend
+from log_layout import LAYOUT_FLAT, discover_log_files
+from simulated_backend import (
+    ENV_CRASH_RATE, ENV_ERROR_RATE, ENV_LATENCY, ENV_SEED, ENV_TIME_SCALE, LatencyModel, SimulatedBackend
+)
+
+
+def read_logs(output_dir: str) -> list:
+    logs = []
+    for log_file in discover_log_files(output_dir):
+        with open(log_file.path, encoding='utf-8') as f:
+            logs.append((log_file, json.load(f)))
+    return logs
+
+
+def benchmark_args(backend: str) -> argparse.Namespace:
+    return argparse.Namespace(backend=backend, concurrency=2, patterns=["chat_abs_json", "chat_strict_json"],
+                              levels=[1, 2], latency="fixed:0.5", time_scale=0.0, error_rate=0.0, crash_rate=0.0,
+                              seed=0, log_layout=LAYOUT_FLAT, keep_logs=True)
+
+
+class TestLatencyModel:
+    def test_distributions(self):
+        rng = random.Random(0)
+        assert LatencyModel("fixed:1.5").sample(rng) == 1.5
+        assert all(0.5 <= LatencyModel("uniform:0.5:3").sample(rng) <= 3.0 for _ in range(100))
+        # 負の値は0に切り詰める
+        assert all(LatencyModel("normal:0:5").sample(rng) >= 0.0 for _ in range(100))
+
+    @pytest.mark.parametrize("spec", ["gamma:1", "fixed", "uniform:1", "lognormal:1:2:3"])
+    def test_invalid_specs(self, spec):
+        with pytest.raises(ValueError):
+            LatencyModel(spec)
+
+
+class TestFieldStatus:
+    def test_swift_rules(self):
+        assert field_status("userID", None, "alice") == "missing"
+        assert field_status("userID", "", "alice") == "missing"
+        assert field_status("userID", "alice", "alice") == "correct"
+        assert field_status("userID", "bob", "alice") == "wrong"
+        assert all(field_status(name, "anything", "") == "pending" for name in AI_VERIFICATION_FIELDS)
+
+
+class TestSimulatedBackend:
+    def test_accurate_cells_are_scored_correct(self, tmp_path):
+        backend = SimulatedBackend(latency="fixed:2.0", accuracy=1.0, time_scale=0, seed=0)
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1, 2], runs=2))
+        summary = ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+        assert summary['succeeded'] == 1 and summary['failed'] == 0
+        assert backend.simulated_seconds == 2.0 * 4
+
+        logs = read_logs(str(tmp_path))
+        assert len(logs) == 4 and not any(log_file.error for log_file, _ in logs)
+        # 最初の抽出のみcold start
+        assert sorted(log["cold_start"] for _, log in logs) == [False, False, False, True]
+        for log_file, log in logs:
+            assert log["extraction_time"] == 2.0 and log["error"] is None
+            test_case = load_test_case(log_file.testcase, log_file.level)
+            for field in log["expected_fields"]:
+                if expected_value(test_case, field["name"]) not in ("", AI_VERIFICATION_PLACEHOLDER):
+                    assert field["status"] in ("correct", "pending"), field["name"]
+
+    def test_error_logs_and_crashes(self, tmp_path):
+        backend = SimulatedBackend(latency="fixed:0.1", error_rate=1.0, crash_rate=1.0, time_scale=0, seed=0)
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1], runs=1))
+        summary = ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+        assert summary['failed'] == 1
+
+        logs = read_logs(str(tmp_path))
+        assert len(logs) == 1 and logs[0][0].error
+        log = logs[0][1]
+        assert log["error_type"] == "ExtractionError"
+        assert {field["status"] for field in log["expected_fields"]} == {"missing"}
+
+    def test_timeout_stops_the_job(self, tmp_path):
+        backend = SimulatedBackend(latency="fixed:10", time_scale=0.01, seed=0, default_timeout=0.05)
+        scheduler = SequentialScheduler(build_jobs(["chat_abs_json"], levels=[1, 2], runs=1)["chat_abs_json"])
+        summary = ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+        assert summary['failed'] == 1
+        assert read_logs(str(tmp_path)) == []
+
+
+class TestBenchmark:
+    def test_cell_jobs_cycle_through_patterns_and_levels(self):
+        jobs = build_cell_jobs(5, ["chat_abs_json", "chat_strict_json"], [1, 2])
+        assert [(job.algo, job.levels, job.run_start) for job in jobs] == [
+            ("abs", (1,), 1), ("abs", (2,), 1), ("strict", (1,), 1), ("strict", (2,), 1), ("abs", (1,), 2)
+        ]
+
+    @pytest.mark.parametrize("backend", ["inprocess", "subprocess"])
+    def test_every_cell_is_logged_and_aggregated(self, backend, tmp_path, monkeypatch):
+        # subprocessではbuild_backendがCLIモードの設定を環境変数に書き込むため、テスト後に元に戻す
+        for name in [ENV_LATENCY, ENV_ERROR_RATE, ENV_CRASH_RATE, ENV_TIME_SCALE, ENV_SEED]:
+            monkeypatch.setenv(name, "")
+        result = benchmark(6, benchmark_args(backend), str(tmp_path))
+        assert (result['succeeded_jobs'], result['failed_jobs']) == (6, 0)
+        assert result['logs_found'] == result['logs_aggregated'] == 6
+        assert result['ideal_inference_seconds'] == 0.0
+
+
+class TestLogsWithMockServer:
+    def test_simulated_and_http_logs_share_the_schema(self, mock_server, tmp_path):
+        """擬似バックエンドとHTTPバックエンドのログは同じ規則で書かれ、レポートで同じように解析できる"""
+        url, _ = mock_server()
+        backends = {
+            'simulated': SimulatedBackend(latency="fixed:0.1", accuracy=1.0, time_scale=0, seed=0),
+            'http': HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30),
+        }
+        logs = {}
+        for name, backend in backends.items():
+            scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1], runs=1, per_run=True))
+            ExperimentEngine(backend, scheduler, str(tmp_path / name), sinks=[]).run()
+            [(log_file, log)] = read_logs(str(tmp_path / name))
+            assert not log_file.error
+            logs[name] = (log_file, log)
+
+        simulated, http = logs['simulated'][1], logs['http'][1]
+        assert set(simulated) <= set(http)
+        expected_names = load_test_case("chat", 1).expected_fields
+        assert [field["name"] for field in simulated["expected_fields"]] == expected_names
+        assert [field["name"] for field in http["expected_fields"]] == expected_names
+
+        parsed = {name: parse_log_file(log_file.path) for name, (log_file, _) in logs.items()}
+        assert parsed['simulated']['experiment'] == parsed['http']['experiment']
+        assert len(parsed['simulated']['test_cases']) == len(parsed['http']['test_cases']) == 1
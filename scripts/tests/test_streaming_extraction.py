@@ -0,0 +1,139 @@
+"""SSEのイベント分割（SSEDecoder）、項目の逐次解析（IncrementalJSONParser）と受信時刻の記録（StreamTimer）"""
+
+import json
+
+import streaming_extraction
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+from streaming_extraction import IncrementalJSONParser, SSEDecoder, StreamTimer
+
+
+def event(content: str = None, reasoning: str = None) -> bytes:
+    delta = {}
+    if content is not None:
+        delta["content"] = content
+    if reasoning is not None:
+        delta["reasoning_content"] = reasoning
+    chunk = {"choices": [{"index": 0, "delta": delta}]}
+    return b"data: " + json.dumps(chunk, ensure_ascii=False).encode('utf-8') + b"\n\n"
+
+
+def parse_in_pieces(text: str, size: int) -> list:
+    parser = IncrementalJSONParser()
+    fields = []
+    for start in range(0, len(text), size):
+        fields.extend(parser.feed(text[start:start + size]))
+    return fields
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSSEDecoder:
+    def test_content_and_reasoning_deltas(self):
+        decoder = SSEDecoder()
+        assert decoder.feed(event("口座") + event(reasoning="考え中") + event("情報")) == \
+            [("口座", ""), ("", "考え中"), ("情報", "")]
+
+    def test_events_split_mid_line_are_buffered(self):
+        data = event("abc") + event("def")
+        decoder = SSEDecoder()
+        deltas = []
+        for index in range(len(data)):
+            deltas.extend(decoder.feed(data[index:index + 1]))
+        assert deltas == [("abc", ""), ("def", "")]
+
+    def test_multibyte_characters_split_across_chunks(self):
+        data = event("パスワード")
+        decoder = SSEDecoder()
+        middle = data.index("ス".encode('utf-8')) + 1
+        assert decoder.feed(data[:middle]) == []
+        assert decoder.feed(data[middle:]) == [("パスワード", "")]
+
+    def test_done_comments_and_invalid_events_are_skipped(self):
+        decoder = SSEDecoder()
+        data = b": keep-alive\n\n" + b"event: ping\n" + b"data: {not json}\n\n" + event("ok") + b"data: [DONE]\n\n"
+        assert decoder.feed(data) == [("ok", "")]
+
+
+class TestIncrementalJSONParser:
+    def test_fields_are_returned_when_each_value_closes(self):
+        parser = IncrementalJSONParser()
+        assert parser.feed('{"title": "銀行", "user') == [("title", "銀行")]
+        assert parser.feed('ID": "alice", "port": 8') == [("userID", "alice")]
+        assert parser.feed('0, "note": null}') == [("port", 80), ("note", None)]
+
+    def test_nested_objects_and_arrays_are_returned_whole(self):
+        text = '{"account": {"userID": "alice", "tags": ["a", {"b": [1, 2]}]}, "ids": [[1], [2, 3]], "ok": true}'
+        assert parse_in_pieces(text, 5) == [("account", {"userID": "alice", "tags": ["a", {"b": [1, 2]}]}),
+                                            ("ids", [[1], [2, 3]]), ("ok", True)]
+
+    def test_escaped_quotes_and_backslashes_inside_strings(self):
+        value = 'pa"ss\\word}, "fake": 1'
+        text = json.dumps({"pass\"word": value, "path": "C:\\\\", "after": 1})
+        assert parse_in_pieces(text, 1000) == [('pass"word', value), ("path", "C:\\\\"), ("after", 1)]
+
+    def test_chunks_split_mid_token_and_mid_escape(self):
+        text = json.dumps({"note": 'a "quoted" \\ value', "number": -12.5e3, "flag": False, "empty": None})
+        expected = [("note", 'a "quoted" \\ value'), ("number", -12.5e3), ("flag", False), ("empty", None)]
+        for size in (1, 2, 3, 7):
+            assert parse_in_pieces(text, size) == expected
+        # エスケープの直後で分割
+        split = text.index('\\"') + 1
+        parser = IncrementalJSONParser()
+        assert parser.feed(text[:split]) == []
+        assert parser.feed(text[split:]) == expected
+
+    def test_code_fences_and_preamble_are_skipped(self):
+        text = '以下が抽出結果です。\n```json\n{\n  "title": "メール",\n  "userID": "bob"\n}\n```\n'
+        assert parse_in_pieces(text, 4) == [("title", "メール"), ("userID", "bob")]
+
+    def test_a_second_object_after_the_first_is_parsed(self):
+        parser = IncrementalJSONParser()
+        assert parser.feed('{"a": 1} 補足 {"b": 2}') == [("a", 1), ("b", 2)]
+
+
+class TestStreamTimer:
+    def test_first_token_first_field_and_field_times(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(streaming_extraction.time, "perf_counter", clock)
+        timer = StreamTimer(start_time=0.0)
+        for now, data in [(0.5, event(reasoning="考え中")), (1.0, event('{"title": null, ')),
+                          (1.5, event('"userID": "al')), (2.0, event('ice"}')), (2.5, b"data: [DONE]\n\n")]:
+            clock.now = now
+            timer.on_data(data)
+        assert timer.time_to_first_token == 0.5
+        # nullの項目は「最初の項目」に数えない
+        assert timer.time_to_first_field == 2.0
+        assert timer.field_times == {"title": 1.0, "userID": 2.0}
+        assert timer.timing(offset=1.0) == {"time_to_first_token": 0.0, "time_to_first_field": 1.0,
+                                            "field_times": {"title": 0.0, "userID": 1.0}, "total_time": 1.5}
+
+    def test_no_tokens(self):
+        timer = StreamTimer()
+        timer.on_data(b"data: [DONE]\n\n")
+        assert timer.time_to_first_token is None and timer.time_to_first_field is None
+        assert timer.field_times == {}
+
+
+class TestStreamingWithMockServer:
+    def test_stream_timing_is_logged(self, mock_server, tmp_path):
+        url, _ = mock_server(latency="fixed:0.05", token_interval=0.002)
+        backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                              options=HTTPOptions(streaming=True))
+        scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json"], levels=[1], runs=1, per_run=True))
+        ExperimentEngine(backend, scheduler, str(tmp_path), sinks=[]).run()
+
+        log_files = discover_log_files(str(tmp_path))
+        assert len(log_files) == 1 and not log_files[0].error
+        with open(log_files[0].path, encoding='utf-8') as f:
+            timing = json.load(f)["stream_timing"]
+        assert 0.05 <= timing["time_to_first_token"] <= timing["time_to_first_field"] <= timing["total_time"]
+        assert timing["field_times"]
+        assert max(timing["field_times"].values()) <= timing["total_time"]
@@ -0,0 +1,139 @@
+"""構造化出力（response_formatのJSONスキーマ）と、未対応のサーバーでのresponse_formatなしへのフォールバック"""
+
+import json
+import threading
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from aitest_extraction import ACCOUNT_STRING_FIELDS, account_info_response_format, decode_account_info
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import RESPONSE_FORMAT_UNSUPPORTED_STATUSES, STRUCTURED_OUTPUT_JSON_SCHEMA, HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+from two_steps_extraction import main_category_response_format
+
+
+def run_structured(url: str, output_dir: str, patterns=("chat_abs_json", "contract_abs_json")) -> HTTPBackend:
+    backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                          options=HTTPOptions(structured_output=STRUCTURED_OUTPUT_JSON_SCHEMA))
+    scheduler = RoundRobinScheduler(build_jobs(list(patterns), levels=[1, 2], runs=1, per_run=True))
+    ExperimentEngine(backend, scheduler, output_dir, sinks=[]).run()
+    return backend
+
+
+def record_bodies(monkeypatch, server) -> list:
+    """モック推論サーバーが応答したリクエストボディ"""
+    bodies = []
+    plan = server.mock.plan
+    monkeypatch.setattr(server.mock, "plan", lambda body: bodies.append(body) or plan(body))
+    return bodies
+
+
+class RejectingFront:
+    """response_formatを含むリクエストに指定のステータスを返し、それ以外をモック推論サーバーに転送する"""
+
+    def __init__(self, upstream: str, status: int):
+        front = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if "response_format" in json.loads(raw):
+                    front.rejected += 1
+                    status, body = front.status, b'{"error": {"message": "unsupported"}}'
+                else:
+                    request = urllib.request.Request(upstream + self.path, data=raw,
+                                                     headers={"Content-Type": "application/json"})
+                    try:
+                        with urllib.request.urlopen(request, timeout=10) as response:
+                            status, body = response.status, response.read()
+                    except urllib.error.HTTPError as e:
+                        status, body = e.code, e.read()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.status = status
+        self.rejected = 0
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TestSchemas:
+    def test_account_info_schema_is_strict_and_nullable(self):
+        schema = account_info_response_format()["json_schema"]
+        assert schema["strict"] is True
+        assert schema["schema"]["required"] == ACCOUNT_STRING_FIELDS + ["port"]
+        assert schema["schema"]["properties"]["port"] == {"type": ["integer", "null"]}
+        # スキーマどおりの応答はdecode_account_infoで解析できる
+        values = {name: None for name in schema["schema"]["required"]}
+        assert decode_account_info(json.dumps(dict(values, userID="alice", port=22)))["port"] == 22
+
+    def test_category_schema_enumerates_the_definitions(self):
+        schema = main_category_response_format()["json_schema"]["schema"]
+        assert "work" in schema["properties"]["mainCategory"]["enum"]
+
+    def test_response_format_only_when_enabled(self):
+        backend = HTTPBackend(external_llm_url="http://127.0.0.1:9/v1", external_llm_model="mock")
+        assert "response_format" not in backend.request_body("prompt", account_info_response_format())
+        backend.options = HTTPOptions(structured_output=STRUCTURED_OUTPUT_JSON_SCHEMA)
+        assert backend.request_body("prompt", account_info_response_format())["response_format"]["type"] == \
+            "json_schema"
+        assert "response_format" not in backend.request_body("prompt")
+
+
+class TestStructuredOutputWithMockServer:
+    def test_schema_is_sent_and_parse_failures_disappear(self, mock_server, tmp_path, monkeypatch):
+        # 自由形式ではすべての応答がJSONを含まないが、構造化出力の応答はJSONのみになる
+        url, server = mock_server(malformed_rate=1.0)
+        bodies = record_bodies(monkeypatch, server)
+        backend = run_structured(url, str(tmp_path))
+
+        assert len(bodies) == 4 and all(body["response_format"]["json_schema"]["name"] == "account_info"
+                                        for body in bodies)
+        log_files = discover_log_files(str(tmp_path))
+        assert len(log_files) == 4 and not any(log_file.error for log_file in log_files)
+        assert backend.summary()['structured_output'] == {'mode': STRUCTURED_OUTPUT_JSON_SCHEMA, 'supported': True,
+                                                          'requests': 4, 'fallbacks': 0}
+
+    def test_rejected_response_format_falls_back_once(self, mock_server, tmp_path, monkeypatch):
+        url, server = mock_server(reject_response_format=True)
+        bodies = record_bodies(monkeypatch, server)
+        backend = run_structured(url, str(tmp_path))
+
+        # 400で拒否されたリクエストだけを送り直し、以降はresponse_formatなしで送る
+        # （最初の拒否の前に送信済みのリクエストも送り直す）
+        assert len(bodies) == 4 and not any("response_format" in body for body in bodies)
+        structured_output = backend.summary()['structured_output']
+        assert structured_output['supported'] is False
+        assert 1 <= structured_output['requests'] == structured_output['fallbacks'] < 4
+        assert not any(log_file.error for log_file in discover_log_files(str(tmp_path)))
+        assert f"response_formatなしで送り直し {structured_output['fallbacks']}件" in \
+            backend.report(backend.summary())[0]
+
+    @pytest.mark.parametrize("status", RESPONSE_FORMAT_UNSUPPORTED_STATUSES)
+    def test_every_unsupported_status_falls_back(self, mock_server, tmp_path, status):
+        url, _ = mock_server()
+        front = RejectingFront(url[:-len("/v1")], status)
+        try:
+            backend = run_structured(front.url, str(tmp_path), patterns=["chat_abs_json"])
+        finally:
+            front.stop()
+        assert front.rejected == backend.structured_fallbacks >= 1
+        assert backend.structured_output_supported is False
+        assert not any(log_file.error for log_file in discover_log_files(str(tmp_path)))
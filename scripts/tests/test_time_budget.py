@@ -0,0 +1,93 @@
+"""時間予算モード（TimeBudgetScheduler）のラウンドと締め切りの扱い"""
+
+from experiment_engine import JobResult, LatencyEstimator, TimeBudgetScheduler
+
+CELLS = [("chat_abs_json", 1), ("chat_abs_json", 2)]
+
+
+def scheduler(budget: float = 100.0, initial_estimate: float = 10.0, **kwargs) -> TimeBudgetScheduler:
+    return TimeBudgetScheduler(CELLS, budget, estimator=LatencyEstimator(initial_estimate=initial_estimate),
+                               safety_margin=0.05, **kwargs)
+
+
+def advance(target: TimeBudgetScheduler, seconds: float):
+    """経過時間を進める（開始時刻を過去にずらす）"""
+    target.start_time -= seconds
+
+
+def finish(target: TimeBudgetScheduler, job, elapsed: float, success: bool = True, timed_out: bool = False,
+           timeout: float = 600.0):
+    target.on_result(JobResult(job=job, success=success, elapsed=elapsed, timeout=timeout, timed_out=timed_out))
+
+
+def run_round(target: TimeBudgetScheduler, elapsed: float = 10.0):
+    jobs = [target.next_job() for _ in CELLS]
+    assert all(job is not None for job in jobs)
+    for job in jobs:
+        advance(target, elapsed)
+        finish(target, job, elapsed)
+
+
+class TestRounds:
+    def test_rounds_continue_while_the_next_round_fits(self):
+        target = scheduler(budget=100.0)
+        run_round(target)  # 20秒
+        run_round(target)  # 40秒
+        run_round(target)  # 60秒
+        run_round(target)  # 80秒: 次のラウンド（推定20秒）は残り20秒 - マージン5秒に収まらない
+        assert target.next_job() is None
+        assert target.is_finished()
+        assert target.completed_rounds == 4
+        assert "収まらない" in target.stop_reason
+        summary = target.summary()
+        assert all(cell['completed_runs'] == 4 for cell in summary['cells'].values())
+
+    def test_estimate_uses_measured_latency(self):
+        target = scheduler(budget=100.0, initial_estimate=1.0)
+        run_round(target, elapsed=30.0)  # 実測30秒 → 次のラウンドの推定60秒は残り40秒に収まらない
+        assert target.next_job() is None
+        assert target.completed_rounds == 1
+
+    def test_timeout_is_limited_by_remaining_time(self):
+        target = scheduler(budget=100.0)
+        job = target.next_job()
+        assert target.timeout_for(job, 60.0) == 60.0
+        advance(target, 90.0)
+        assert 0.0 < target.timeout_for(job, 600.0) <= 10.0
+
+
+class TestDeadline:
+    def test_runs_cut_by_the_deadline_are_not_counted(self):
+        target = scheduler(budget=100.0)
+        run_round(target)
+        first, second = target.next_job(), target.next_job()
+        finish(target, first, 10.0)
+        advance(target, 75.0)
+        timeout = target.timeout_for(second, 600.0)
+        finish(target, second, timeout, success=False, timed_out=True, timeout=timeout)
+        assert target.next_job() is None
+        assert target.completed_rounds == 1
+        assert "締め切り" in target.stop_reason
+        cells = target.summary()['cells']
+        assert cells["chat_abs_json_level2"] == {'pattern': "chat_abs_json", 'level': 2,
+                                                 'completed_runs': 1, 'failed_runs': 0}
+        # 中断した実行の所要時間は推定に含めない
+        assert target.estimator.samples[("chat_abs_json", 2)] == [10.0]
+
+    def test_ordinary_timeouts_are_counted_as_failures(self):
+        target = scheduler(budget=10000.0)
+        job = target.next_job()
+        timeout = target.timeout_for(job, 600.0)
+        finish(target, job, timeout, success=False, timed_out=True, timeout=timeout)
+        assert target.failed_runs[("chat_abs_json", 1)] == 1
+        assert target.next_job() is not None
+
+    def test_ordinary_timeouts_shorter_than_the_maximum_are_counted_as_failures(self):
+        # バックエンドのタイムアウトがmax_run_timeoutより短くても、締め切りで短くしていなければ通常の失敗
+        target = scheduler(budget=10000.0)
+        job = target.next_job()
+        timeout = target.timeout_for(job, 30.0)
+        assert timeout == 30.0
+        finish(target, job, timeout, success=False, timed_out=True, timeout=timeout)
+        assert target.failed_runs[("chat_abs_json", 1)] == 1
+        assert target.next_job() is not None
@@ -0,0 +1,98 @@
+"""到着トレースの読み込み・再生の間隔と、時間帯ごとの集計"""
+
+import asyncio
+import json
+import time
+
+import pytest
+
+from experiment_engine import chat_completions_url
+from trace_replay import build_request, read_trace, replay, summarize, summarize_windows
+
+# 到着時刻（トレースの秒）。ファイルには順序を入れ替えて書く
+OFFSETS = [0.0, 0.2, 0.25, 1.0, 3.1]
+
+
+def write_trace(path, offsets=OFFSETS) -> str:
+    lines = [{"timestamp": f"2026-10-20T09:00:{offset:06.3f}", "document": f"chat:{index % 3 + 1}",
+              "pattern": "chat_abs_json"} for index, offset in enumerate(offsets)]
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in reversed(lines):
+            f.write(json.dumps(line) + "\n")
+    return str(path)
+
+
+def requests_for(records) -> dict:
+    return {(record.document, record.algo, record.method): build_request(record, "mock", "ja") for record in records}
+
+
+def record_arrivals(monkeypatch, server) -> list:
+    """モック推論サーバーがリクエストを受け取った時刻"""
+    arrivals = []
+    plan = server.mock.plan
+
+    def recording_plan(body):
+        arrivals.append(time.perf_counter())
+        return plan(body)
+
+    monkeypatch.setattr(server.mock, "plan", recording_plan)
+    return arrivals
+
+
+class TestReadTrace:
+    def test_records_are_sorted_and_offset_from_the_first_arrival(self, tmp_path):
+        records = read_trace(write_trace(tmp_path / "trace.jsonl"))
+        assert [record.offset for record in records] == pytest.approx(OFFSETS)
+        assert [record.index for record in records] == list(range(len(OFFSETS)))
+        assert {(record.algo, record.method) for record in records} == {("abs", "json")}
+
+    def test_csv_with_numeric_timestamps_and_algo(self, tmp_path):
+        path = tmp_path / "trace.csv"
+        path.write_text("timestamp,document,algo\n1000.5,voice:2,strict\n1000.0,Tests/TestData/OCRText/accoca_ocr.txt,"
+                        "abs\n", encoding='utf-8')
+        records = read_trace(str(path), limit=1)
+        assert len(records) == 1
+        assert (records[0].offset, records[0].algo, records[0].method) == (0.0, "abs", "json")
+        assert "X-AITest-Cell" not in build_request(records[0], "mock", "ja")['headers']
+
+    def test_records_need_a_document_and_a_pattern(self, tmp_path):
+        path = tmp_path / "trace.jsonl"
+        path.write_text(json.dumps({"timestamp": 0, "document": "chat:1"}) + "\n", encoding='utf-8')
+        with pytest.raises(ValueError):
+            read_trace(str(path))
+
+
+class TestReplayWithMockServer:
+    def test_inter_arrival_spacing_and_windows_are_kept(self, mock_server, tmp_path, monkeypatch):
+        url, server = mock_server(latency="fixed:0.01")
+        arrivals = record_arrivals(monkeypatch, server)
+        records = read_trace(write_trace(tmp_path / "trace.jsonl"))
+        time_scale = 2.0
+        results = asyncio.run(replay(records, requests_for(records), chat_completions_url(url), time_scale,
+                                     max_in_flight=0, timeout=10))
+
+        assert len(arrivals) == len(OFFSETS)
+        gaps = [later - earlier for earlier, later in zip(arrivals, arrivals[1:])]
+        expected = [(later - earlier) / time_scale for earlier, later in zip(OFFSETS, OFFSETS[1:])]
+        assert gaps == pytest.approx(expected, abs=0.05)
+        assert all(result['error'] is None for result in results)
+        assert all(result['queue_delay'] < 0.05 for result in results)
+
+        windows = summarize_windows(results, 1.0)
+        assert [(window['window_start'], window['window_end']) for window in windows] == \
+            [(0.0, 1.0), (1.0, 2.0), (2.0, 3.0), (3.0, 4.0)]
+        # 到着がない時間帯も含める
+        assert [window['arrivals'] for window in windows] == [3, 1, 0, 1]
+        assert windows[0]['arrival_rate'] == 3.0
+        assert windows[2]['end_to_end']['p50'] is None
+        assert summarize(results)['arrivals'] == len(OFFSETS)
+
+    def test_bursts_wait_for_free_workers(self, mock_server, tmp_path, monkeypatch):
+        url, _ = mock_server(latency="fixed:0.1")
+        records = read_trace(write_trace(tmp_path / "trace.jsonl", [0.0, 0.0, 0.0]))
+        results = asyncio.run(replay(records, requests_for(records), chat_completions_url(url), 1.0,
+                                     max_in_flight=1, timeout=10))
+        queue_delays = sorted(result['queue_delay'] for result in results)
+        assert queue_delays == pytest.approx([0.0, 0.1, 0.2], abs=0.05)
+        assert all(result['end_to_end'] == pytest.approx(result['queue_delay'] + result['service_time'])
+                   for result in results)
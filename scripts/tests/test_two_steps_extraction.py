@@ -0,0 +1,126 @@
+"""2ステップ抽出: 判定応答の解析、サブカテゴリからAccountInfoへの変換、カテゴリ判定のメモ"""
+
+import asyncio
+import json
+
+from experiment_engine import ExperimentEngine, RoundRobinScheduler, build_jobs
+from http_backend import HTTPBackend, HTTPOptions
+from log_layout import discover_log_files
+from two_steps_extraction import (
+    STEP_MAIN_CATEGORY, STEP_SUB_CATEGORY, StepMemo, convert_to_account, extract_json_from_markdown, judged_category,
+    two_steps_category
+)
+
+
+def run_two_steps(url: str, output_dir: str, memo: StepMemo, runs: int = 2) -> HTTPBackend:
+    backend = HTTPBackend(external_llm_url=url, external_llm_model="mock", default_timeout=30,
+                          options=HTTPOptions(step_memo=memo))
+    scheduler = RoundRobinScheduler(build_jobs(["chat_abs_json", "creditcard_abs_json"], levels=[1], runs=runs,
+                                               mode="two-steps", per_run=True))
+    ExperimentEngine(backend, scheduler, output_dir, sinks=[]).run()
+    return backend
+
+
+def read_logs(output_dir: str) -> list:
+    logs = []
+    for log_file in discover_log_files(output_dir):
+        with open(log_file.path, encoding='utf-8') as f:
+            logs.append((log_file, json.load(f)))
+    return logs
+
+
+class TestParsing:
+    def test_json_is_taken_from_the_code_block_then_the_braces(self):
+        assert extract_json_from_markdown('前置き\n```json\n{"a": 1}\n```\n{"b": 2}') == '{"a": 1}'
+        assert extract_json_from_markdown('判定: {"mainCategory": "work"} です') == '{"mainCategory": "work"}'
+        assert extract_json_from_markdown("  no json  ") == "no json"
+
+    def test_judged_category(self):
+        assert judged_category('```json\n{"mainCategory": "financial"}\n```', "mainCategory") == "financial"
+        assert judged_category('{"mainCategory": 3}', "mainCategory") is None
+        assert judged_category("分かりません", "subCategory") is None
+
+
+class TestConvertToAccount:
+    def test_mapping_keys(self):
+        account = convert_to_account({"serviceName": "社内サーバー", "loginID": "admin", "portNumber": "2222",
+                                      "hostOrIPAddress": "10.0.0.1", "accountName": "ignored", "note": None},
+                                     "workServer")
+        assert account == {"title": "社内サーバー", "userID": "admin", "port": 2222, "host": "10.0.0.1"}
+
+    def test_note_append_fields_use_their_format(self):
+        account = convert_to_account({"title": "カード", "note": "メモ", "cardNumber": 4111111111111111,
+                                      "cvv": "123"}, "financialCreditCard")
+        assert account["note"] == "メモ\n\nカード番号: 4111111111111111\nセキュリティコード: 123"
+
+    def test_two_steps_category_uses_display_names(self):
+        category = two_steps_category("work", "workServer")
+        assert (category["main_category"], category["sub_category"]) == ("work", "workServer")
+        assert category["main_category_display"] != "work"
+        assert two_steps_category("unknown", "unknownSub")["sub_category_display"] == "unknownSub"
+
+
+class TestStepMemo:
+    def test_failed_judgments_are_not_recorded(self, tmp_path):
+        memo = StepMemo(str(tmp_path))
+        body = {"model": "mock", "messages": [{"role": "user", "content": "判定"}]}
+
+        async def failing():
+            raise ValueError("invalid")
+
+        async def judge():
+            return "work", '{"mainCategory": "work"}'
+
+        async def scenario():
+            try:
+                await memo.judge(STEP_MAIN_CATEGORY, "document", body, failing)
+            except ValueError:
+                pass
+            return [await memo.judge(STEP_MAIN_CATEGORY, "document", body, judge) for _ in range(2)]
+
+        assert asyncio.run(scenario()) == [("work", False), ("work", True)]
+        assert memo.summary()['hits'][STEP_MAIN_CATEGORY] == 1
+        # ドキュメントかリクエストが変われば判定し直す
+        assert memo.path(STEP_MAIN_CATEGORY, "document", body) != memo.path(STEP_MAIN_CATEGORY, "other", body)
+        assert memo.path(STEP_MAIN_CATEGORY, "document", body) != \
+            memo.path(STEP_MAIN_CATEGORY, "document", dict(body, temperature=0.0))
+
+
+class TestTwoStepsWithMockServer:
+    def test_memo_skips_repeated_category_requests(self, mock_server, tmp_path):
+        url, server = mock_server()
+        memo = StepMemo(str(tmp_path / "memo"))
+        backend = run_two_steps(url, str(tmp_path / "run"), memo)
+
+        # 2ドキュメント×2実行: 判定は各ドキュメント1回ずつ（2ステップ×2）、抽出は毎回（4）
+        assert server.mock.stats['requests'] == 2 * 2 + 4
+        assert server.mock.stats['source_category'] == 4
+        assert memo.summary()['misses'] == {STEP_MAIN_CATEGORY: 2, STEP_SUB_CATEGORY: 2}
+        assert memo.summary()['hits'] == {STEP_MAIN_CATEGORY: 2, STEP_SUB_CATEGORY: 2}
+        assert backend.report(backend.summary())[0].startswith("カテゴリ判定のメモ: ヒット4件, ミス4件")
+
+        logs = read_logs(str(tmp_path / "run"))
+        assert len(logs) == 4 and not any(log_file.error for log_file, _ in logs)
+        categories = {log_file.testcase: log["two_steps_category"]["sub_category"] for log_file, log in logs}
+        assert categories == {"chat": "workServer", "creditcard": "financialCreditCard"}
+        # 各ドキュメントの2回の実行のうち、1回だけがメモを使う
+        assert sorted((log_file.testcase, log["two_steps_timing"]["step1a_memoized"]) for log_file, log in logs) == \
+            [("chat", False), ("chat", True), ("creditcard", False), ("creditcard", True)]
+        for _, log in logs:
+            timing = log["two_steps_timing"]
+            memoized = timing["step1a_memoized"]
+            assert timing["step1b_memoized"] == memoized
+            if memoized:
+                assert timing["step1a_time"] == timing["step1b_time"] == 0.0
+            assert log["extraction_time"] == timing["step1a_time"] + timing["step1b_time"] + timing["step2_time"]
+
+    def test_memo_is_shared_across_experiments(self, mock_server, tmp_path):
+        url, server = mock_server()
+        memo_dir = str(tmp_path / "memo")
+        run_two_steps(url, str(tmp_path / "first"), StepMemo(memo_dir), runs=1)
+        requests = server.mock.stats['requests']
+        memo = StepMemo(memo_dir)
+        run_two_steps(url, str(tmp_path / "second"), memo, runs=1)
+        # 2回目の実験は抽出（Step 2）のみを送る
+        assert server.mock.stats['requests'] - requests == 2
+        assert sum(memo.summary()['misses'].values()) == 0
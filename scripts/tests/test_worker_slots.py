@@ -0,0 +1,89 @@
+"""共有ワーカースロット（WorkerSlotPool）の優先度レーンと、終了したプロセスの申請の削除"""
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from worker_slots import PRIORITY_BATCH, PRIORITY_HIGH, WAITING_DIR, WorkerSlotPool
+
+POLL = 0.01
+
+
+def pools(queue_dir: str, slots: int = 1):
+    batch = WorkerSlotPool(queue_dir, slots=slots, priority=PRIORITY_BATCH, poll_interval=POLL)
+    high = WorkerSlotPool(queue_dir, priority=PRIORITY_HIGH, poll_interval=POLL)
+    return batch, high
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_ticket(queue_dir: str, pid: int, name: str = "high_0.000000_stale_1.json"):
+    with open(os.path.join(queue_dir, WAITING_DIR, name), 'w', encoding='utf-8') as f:
+        json.dump({'pid': pid, 'label': "stale", 'since': 0.0}, f)
+
+
+class TestPriorityLane:
+    def test_slot_count_is_shared_through_the_queue_dir(self, tmp_path):
+        batch, high = pools(str(tmp_path), slots=3)
+        assert (batch.slots, high.slots) == (3, 3)
+
+    def test_pending_high_ticket_makes_batch_yield_the_freed_slot(self, tmp_path):
+        batch, high = pools(str(tmp_path))
+
+        async def run():
+            order = []
+            running = await batch.acquire("sweep-1")
+
+            async def take(pool: WorkerSlotPool, label: str):
+                slot = await pool.acquire(label)
+                order.append(label)
+                await asyncio.sleep(POLL * 5)
+                pool.release(slot)
+
+            waiting_batch = asyncio.ensure_future(take(batch, "sweep-2"))
+            await asyncio.sleep(POLL * 5)
+            waiting_high = asyncio.ensure_future(take(high, "check"))
+            await asyncio.sleep(POLL * 5)
+            # 実行中のbatchのセルは中断されない
+            assert order == [] and len(high.waiting_high()) == 1
+            batch.release(running)
+            await asyncio.gather(waiting_batch, waiting_high)
+            return order
+
+        assert asyncio.run(run()) == ["check", "sweep-2"]
+        assert high.waiting_high() == []
+        assert (batch.acquired, high.acquired) == (2, 1)
+
+    def test_batch_waits_while_a_live_high_ticket_is_pending(self, tmp_path):
+        batch, _ = pools(str(tmp_path))
+        write_ticket(str(tmp_path), os.getpid())
+        polls = []
+
+        def should_stop() -> bool:
+            polls.append(1)
+            return len(polls) > 10
+
+        # スロットは空いているが、生きているプロセスのhighの申請があるため確保しない
+        assert asyncio.run(batch.acquire("sweep", should_stop=should_stop)) is None
+        assert batch.acquired == 0
+        assert len(batch.waiting_high()) == 1
+
+    def test_tickets_from_dead_processes_are_cleared(self, tmp_path):
+        batch, high = pools(str(tmp_path))
+        write_ticket(str(tmp_path), dead_pid())
+
+        async def run():
+            return await asyncio.wait_for(batch.acquire("sweep"), timeout=5)
+
+        slot = asyncio.run(run())
+        assert slot is not None and slot.waited < 1.0
+        assert os.listdir(os.path.join(str(tmp_path), WAITING_DIR)) == []
+        assert high.status()['slots'][0]['busy']
+        batch.release(slot)
+        assert not high.status()['slots'][0]['busy']
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-20 08:30] 時刻付きのドキュメント到着トレースの再生（トレース駆動の負荷試験）
+目的: 本番の偏りのある（バースト的な）到着パターンで、抽出リクエストの待ち時間と応答時間がどう変わるかを時間帯ごとに示す
+背景: load_test.py や --concurrency の実験は一定の同時実行数・到着率で測るため、
+      バーストの間に待ちが積み上がり、その後に解消される様子は分からなかった
+意図: トレースファイル（JSONLまたはCSV）の1レコード = 1ドキュメントの到着として、次の項目を読む
+      - timestamp: 到着時刻（秒の数値、またはISO 8601の日時）。最初のレコードからの経過時間を再生の予定時刻にする
+      - document: テストケースとレベル（chat:2 のような {testcase}:{level}）、またはテキストファイルのパス
+      - pattern（{testcase}_{algo}_{method}、algoとmethodのみ使う）、またはalgo（methodは省略時json）
+      プロンプトは再生前にすべて組み立て（build_prompt / complete_prompt）、予定時刻（--time-scaleで圧縮）に到着させる
+      クライアントの同時実行数を --max-in-flight で制限し（抽出サービスのワーカー数に相当）、
+      リクエストごとに次の時間を記録する（いずれも実時間の秒）
+      - 待ち時間（queue_delay）: 予定時刻から送信を始めるまで（空きワーカー待ちと送信の遅れ）
+      - 処理時間（service_time）: 送信から応答完了まで（サーバー側の待ちを含む）
+      - 応答時間（end_to_end）: 予定時刻から応答完了まで
+      到着時刻（トレースの時刻）で --window 秒ごとの時間帯に分け、到着数・エラー率と各時間のp50 / p95 / p99を集計し、
+      trace_replay.json（時間帯ごとと全体の集計）とtrace_replay_requests.jsonl（リクエストごと）に保存する
+
+トレースの例（JSONL）:
+    {"timestamp": "2026-10-20T09:00:00.000", "document": "chat:2", "pattern": "chat_abs_json"}
+    {"timestamp": "2026-10-20T09:00:00.350", "document": "Tests/TestData/OCRText/accoca_ocr.txt", "algo": "strict"}
+
+使用例:
+    python3 scripts/trace_replay.py traces/2026-10-20_morning.jsonl --external-llm-url http://host:8000/v1 \\
+        --external-llm-model gpt-oss-20b --time-scale 10 --max-in-flight 8 --window 60
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aitest_extraction import (
+    DEFAULT_API_KEY, build_prompt, build_request_body, complete_prompt, load_prompt_template
+)
+from aitest_logs import LEVEL_NAMES, REPO_ROOT, TESTCASE_DIRS, parse_test_data
+from async_http import AsyncHTTPClient, HTTPClientError
+from experiment_engine import chat_completions_url, create_experiment_dir, parse_pattern
+from metrics_utils import format_value, percentile
+from request_metrics import request_cell, usage_from_body
+
+RESULT_FILE = "trace_replay.json"
+REQUESTS_FILE = "trace_replay_requests.jsonl"
+DEFAULT_TIMEOUT = 300.0
+DEFAULT_WINDOW = 60.0
+# 最初のリクエストを送るまでの余裕（プロンプトの組み立てやイベントループの起動で最初の予定時刻に遅れないように）
+START_DELAY = 0.1
+TIMING_FIELDS = ["queue_delay", "service_time", "end_to_end"]
+
+
+@dataclass(frozen=True)
+class TraceRecord:
+    """トレースの1レコード（offsetは最初のレコードからの秒数）"""
+    index: int
+    offset: float
+    document: str
+    algo: str
+    method: str
+
+
+def parse_timestamp(value) -> float:
+    """秒の数値、またはISO 8601の日時をエポック秒に変換"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip()
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).timestamp()
+
+
+def read_trace(path: str, limit: Optional[int] = None) -> List[TraceRecord]:
+    """トレースファイル（拡張子が.csvならCSV、それ以外はJSONL）を読み込み、到着順に並べる"""
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    parsed = []
+    for number, row in enumerate(rows, start=1):
+        if not row.get("document") or not (row.get("pattern") or row.get("algo")):
+            raise ValueError(f"{path}: {number}件目のレコードにdocumentとpattern（またはalgo）が必要です")
+        if row.get("pattern"):
+            _, algo, method = parse_pattern(row["pattern"])
+        else:
+            algo, method = row["algo"], row.get("method") or "json"
+        parsed.append((parse_timestamp(row["timestamp"]), row["document"], algo, method))
+    parsed.sort(key=lambda item: item[0])
+    parsed = parsed[:limit] if limit else parsed
+    first = parsed[0][0] if parsed else 0.0
+    return [TraceRecord(index, timestamp - first, document, algo, method)
+            for index, (timestamp, document, algo, method) in enumerate(parsed)]
+
+
+def document_cell(document: str):
+    """{testcase}:{level} の参照なら (testcase, level)、ファイルのパスならNone"""
+    testcase, _, level = document.partition(":")
+    if testcase in TESTCASE_DIRS and level.isdigit() and int(level) in LEVEL_NAMES:
+        return testcase, int(level)
+    return None
+
+
+def build_request(record: TraceRecord, model: str, language: str) -> Dict:
+    """レコードのリクエスト（X-AITest-Cellはテストケースとレベルを参照する場合のみ）"""
+    cell = document_cell(record.document)
+    if cell:
+        testcase, level = cell
+        prompt = build_prompt(testcase, record.algo, record.method, language, level)
+        cell_header = request_cell(testcase, record.algo, record.method, language, level)
+    else:
+        path = Path(record.document)
+        path = path if path.is_absolute() or path.exists() else REPO_ROOT / path
+        _, text = parse_test_data(path.read_text(encoding="utf-8"))
+        prompt = complete_prompt(load_prompt_template(record.algo, record.method, language), text, language)
+        cell_header = None
+    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {DEFAULT_API_KEY}"}
+    if cell_header:
+        headers["X-AITest-Cell"] = cell_header
+    body = json.dumps(build_request_body(model, prompt), ensure_ascii=False).encode('utf-8')
+    return {'headers': headers, 'body': body}
+
+
+# ---------------------------------------------------------------------------
+# 再生
+# ---------------------------------------------------------------------------
+
+async def replay(records: List[TraceRecord], requests: Dict, url: str, time_scale: float,
+                 max_in_flight: int, timeout: float) -> List[Dict]:
+    """レコードを予定時刻に到着させ、リクエストごとの待ち時間・処理時間・応答時間を返す"""
+    client = AsyncHTTPClient(max_connections=max_in_flight or len(records) or 1)
+    slots = asyncio.Semaphore(max_in_flight) if max_in_flight else None
+    results: List[Dict] = []
+    start = time.perf_counter() + START_DELAY
+
+    async def send(record: TraceRecord, scheduled: float):
+        request = requests[(record.document, record.algo, record.method)]
+        result = {'index': record.index, 'offset': record.offset, 'document': record.document,
+                  'algo': record.algo, 'method': record.method, 'status': None, 'error': None,
+                  'completion_tokens': None}
+        async with slots or nullcontext():
+            dispatched = time.perf_counter()
+            try:
+                response = await client.request("POST", url, request['body'], request['headers'], timeout=timeout)
+                result['status'] = response.status
+                if response.status == 200:
+                    result['completion_tokens'] = (usage_from_body(response.body) or {}).get('completion_tokens')
+                else:
+                    result['error'] = f"HTTP {response.status}"
+            except HTTPClientError as e:
+                result['error'] = str(e)
+            finished = time.perf_counter()
+        result['queue_delay'] = max(0.0, dispatched - scheduled)
+        result['service_time'] = finished - dispatched
+        result['end_to_end'] = finished - scheduled
+        results.append(result)
+
+    tasks = []
+    try:
+        for record in records:
+            scheduled = start + record.offset / time_scale
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(send(record, scheduled)))
+        await asyncio.gather(*tasks)
+    finally:
+        await client.close()
+    return sorted(results, key=lambda result: result['index'])
+
+
+# ---------------------------------------------------------------------------
+# 集計
+# ---------------------------------------------------------------------------
+
+def timing_stats(values: List[float]) -> Dict[str, Optional[float]]:
+    if not values:
+        return {'mean': None, 'p50': None, 'p95': None, 'p99': None, 'max': None}
+    return {'mean': sum(values) / len(values), 'p50': percentile(values, 0.50), 'p95': percentile(values, 0.95),
+            'p99': percentile(values, 0.99), 'max': max(values)}
+
+
+def summarize(results: List[Dict], window: Optional[float] = None) -> Dict:
+    """到着数・エラー率と、成功したリクエストの待ち時間・処理時間・応答時間（windowがあれば到着率も）"""
+    succeeded = [result for result in results if result['error'] is None]
+    summary = {
+        'arrivals': len(results),
+        'errors': len(results) - len(succeeded),
+        'error_rate': (len(results) - len(succeeded)) / len(results) if results else 0.0,
+    }
+    if window:
+        summary['arrival_rate'] = len(results) / window
+    for name in TIMING_FIELDS:
+        summary[name] = timing_stats([result[name] for result in succeeded])
+    return summary
+
+
+def summarize_windows(results: List[Dict], window: float) -> List[Dict]:
+    """到着時刻（トレースの時刻）でwindow秒ごとに集計（到着がない時間帯も含める）"""
+    if not results:
+        return []
+    groups: Dict[int, List[Dict]] = {}
+    for result in results:
+        groups.setdefault(int(result['offset'] // window), []).append(result)
+    return [{'window_start': number * window, 'window_end': (number + 1) * window,
+             **summarize(groups.get(number, []), window)}
+            for number in range(max(groups) + 1)]
+
+
+def print_windows(result: Dict):
+    print("\n" + "=" * 80)
+    print(f"🕒 時間帯ごとの待ち時間と応答時間（{result['window']:g}秒ごと、トレースの時刻）")
+    print("=" * 80)
+    for window in result['windows'] + [dict(result['overall'], window_start=None)]:
+        label = f"{window['window_start']:>7.0f}秒〜" if window['window_start'] is not None else "    全体"
+        queue, end_to_end = window['queue_delay'], window['end_to_end']
+        print(f"   {label}: 到着 {window['arrivals']:>4}件, 待ち p50 {format_value(queue['p50'], '.2f')} / "
+              f"p95 {format_value(queue['p95'], '.2f')} / p99 {format_value(queue['p99'], '.2f')}秒, "
+              f"応答 p50 {format_value(end_to_end['p50'], '.2f')} / p95 {format_value(end_to_end['p95'], '.2f')} / "
+              f"p99 {format_value(end_to_end['p99'], '.2f')}秒, エラー率 {window['error_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="時刻付きのドキュメント到着トレースを再生し、時間帯ごとの待ち時間・応答時間を集計")
+    parser.add_argument("trace", help="トレースファイル（JSONL、または拡張子.csvのCSV）")
+    parser.add_argument("--external-llm-url", required=True, help="外部LLMサーバーのURL")
+    parser.add_argument("--external-llm-model", required=True, help="外部LLMモデル名")
+    parser.add_argument("--language", default="ja", choices=["ja", "en"], help="プロンプトの言語")
+    parser.add_argument("--time-scale", type=float, default=1.0,
+                        help="再生速度の倍率（10なら到着間隔を1/10に圧縮、デフォルト: 1）")
+    parser.add_argument("--max-in-flight", type=int, default=8,
+                        help="同時に送るリクエスト数の上限（抽出サービスのワーカー数、0は無制限、デフォルト: 8）")
+    parser.add_argument("--window", type=float, default=DEFAULT_WINDOW,
+                        help=f"集計する時間帯の長さ（トレースの秒、デフォルト: {DEFAULT_WINDOW:g}）")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"1リクエストのタイムアウト（秒、デフォルト: {DEFAULT_TIMEOUT:g}）")
+    parser.add_argument("--limit", type=int, help="再生するレコード数の上限（到着順の先頭から）")
+    parser.add_argument("--output-dir", help="結果の出力ディレクトリ（指定しない場合は自動作成）")
+    args = parser.parse_args()
+    if args.time_scale <= 0 or args.window <= 0 or args.max_in_flight < 0:
+        parser.error("--time-scale と --window は正の値、--max-in-flight は0以上で指定してください")
+
+    records = read_trace(args.trace, args.limit)
+    if not records:
+        parser.error(f"トレースにレコードがありません: {args.trace}")
+    requests = {}
+    for record in records:
+        key = (record.document, record.algo, record.method)
+        if key not in requests:
+            requests[key] = build_request(record, args.external_llm_model, args.language)
+    duration = records[-1].offset
+    print(f"🎞️ トレースを再生します（{len(records)}件, {duration:.1f}秒 → {duration / args.time_scale:.1f}秒, "
+          f"{len(requests)}種類のリクエスト, 同時実行数 {args.max_in_flight or '無制限'}）")
+
+    results = asyncio.run(replay(records, requests, chat_completions_url(args.external_llm_url), args.time_scale,
+                                 args.max_in_flight, args.timeout))
+    result = {
+        'timestamp': datetime.now().isoformat(),
+        'trace': args.trace,
+        'url': args.external_llm_url,
+        'model': args.external_llm_model,
+        'language': args.language,
+        'time_scale': args.time_scale,
+        'max_in_flight': args.max_in_flight,
+        'window': args.window,
+        'trace_duration': duration,
+        'overall': summarize(results),
+        'windows': summarize_windows(results, args.window),
+    }
+    print_windows(result)
+
+    output_dir = args.output_dir or create_experiment_dir("trace_replay")
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, RESULT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, REQUESTS_FILE), 'w', encoding='utf-8') as f:
+        for request_result in results:
+            f.write(json.dumps(request_result, ensure_ascii=False) + "\n")
+    print(f"💾 結果を保存しました: {os.path.join(output_dir, RESULT_FILE)}, {os.path.join(output_dir, REQUESTS_FILE)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 22:30] 2ステップ抽出（カテゴリ判定→サブカテゴリ別抽出）のPython実装
+目的: HTTPバックエンドで two-steps モードの外部LLM実験を行い、各ステップの所要時間を分けて記録する
+背景: 2ステップ抽出はメインカテゴリ判定（Step 1a）、サブカテゴリ判定（Step 1b）、抽出（Step 2）の3回モデルを呼ぶ。
+      同じドキュメントを繰り返す実験で抽出のばらつきだけを見たい場合、Step 1a/1bは毎回同じ判定を得るための
+      オーバーヘッドになっていた
+意図: 以下のSwift実装と同じプロンプト・変換規則になるように移植する（変更時は両方を更新すること）
+      - CategoryDefinitionLoader.generateMainCategoryJudgmentPrompt / generateSubCategoryJudgmentPrompt /
+        generateExtractionPrompt（Sources/AITest/CategoryDefinitionLoader.swift）
+      - TwoStepsProcessor.extractJSONFromMarkdown（Sources/AITest/TwoStepsProcessor.swift）
+      - SubCategoryConverter.convert（Sources/AITest/SubCategoryConverter.swift）
+      Swift版との差異:
+      - 判定・抽出結果はHTTP応答本文全体ではなくmessage.contentから解析する
+        （Swift版の外部LLM経路はrawResponseが応答本文全体のため、```jsonブロックを含む判定結果を解析できない）
+      - nullの値は未抽出として扱う（Swift版はNSNullを"<null>"という文字列に変換してしまう）
+      StepMemoを指定した場合、Step 1a/1bの判定結果を(ドキュメント, リクエスト)のハッシュで記録し、2回目以降は再利用する
+
+@ai[2026-10-20 01:30] 各ステップの構造化出力（response_format）のスキーマを追加
+意図: 判定はカテゴリIDの列挙、抽出はサブカテゴリのmapping（generateExtractionPromptのスキーマと同じ項目・型）から作る
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aitest_extraction import json_schema_response_format
+from aitest_logs import REPO_ROOT
+from response_cache import request_key
+
+CATEGORY_DEFINITIONS_DIR = REPO_ROOT / "Sources" / "AITest" / "CategoryDefinitions"
+
+STEP_MAIN_CATEGORY = "main_category"
+STEP_SUB_CATEGORY = "sub_category"
+
+# SubCategoryConverterがAccountInfoに設定するマッピングキー（number, authKeyは無視される）
+CONVERTED_STRING_KEYS = {"title", "userID", "password", "host", "url", "note"}
+NOTE_APPEND_KEY = "note:append"
+
+
+class CategoryNotFound(Exception):
+    """ExtractionError.invalidInput に相当（判定結果のカテゴリが定義にない）"""
+
+
+# ---------------------------------------------------------------------------
+# カテゴリ定義とプロンプト（CategoryDefinitionLoader）
+# ---------------------------------------------------------------------------
+
+@lru_cache(maxsize=None)
+def load_category_definition() -> Dict:
+    with open(CATEGORY_DEFINITIONS_DIR / "category_definitions.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+@lru_cache(maxsize=None)
+def load_sub_category_definition(sub_category: str) -> Dict:
+    path = CATEGORY_DEFINITIONS_DIR / "subcategories" / f"{sub_category}.json"
+    if not path.exists():
+        raise CategoryNotFound(f"サブカテゴリ定義ファイルが見つかりません: {sub_category}")
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def find_main_category(main_category: str) -> Optional[Dict]:
+    return next((category for category in load_category_definition()["mainCategories"]
+                 if category["id"] == main_category), None)
+
+
+def sub_category_ids(main_category: str) -> List[str]:
+    """getSubCategoryIdsと同じく、メインカテゴリに属するサブカテゴリIDを定義順に返す"""
+    category = find_main_category(main_category)
+    if category is None:
+        raise CategoryNotFound(f"メインカテゴリが見つかりません: {main_category}")
+    return category["subcategories"]
+
+
+def main_category_prompt(text: str, language: str) -> str:
+    """generateMainCategoryJudgmentPromptと同じプロンプト"""
+    definition = load_category_definition()
+    entries = []
+    for number, category in enumerate(definition["mainCategories"], start=1):
+        examples = "\n".join(f"   - {example}" for example in category["examples"][language])
+        entries.append(f"{number}. **{category['id']}（{category['name'][language]}）**\n"
+                       f"   {category['description'][language]}\n"
+                       f"   例:\n"
+                       f"{examples}")
+    return (definition["prompts"]["mainCategoryJudgment"][language]
+            .replace("{MAIN_CATEGORY_DEFINITIONS}", "\n\n".join(entries))
+            .replace("{TEXT}", text))
+
+
+def sub_category_prompt(text: str, main_category: str, language: str) -> str:
+    """generateSubCategoryJudgmentPromptと同じプロンプト"""
+    ids = sub_category_ids(main_category)
+    entries = [f"{number}. {sub_category}: {load_sub_category_definition(sub_category)['description'][language]}"
+               for number, sub_category in enumerate(ids, start=1)]
+    category = find_main_category(main_category)
+    return (load_category_definition()["prompts"]["subCategoryJudgment"][language]
+            .replace("{MAIN_CATEGORY_NAME}", category["name"].get(language) or main_category)
+            .replace("{SUB_CATEGORY_COUNT}", str(len(ids)))
+            .replace("{SUB_CATEGORY_DEFINITIONS}", "\n\n".join(entries))
+            .replace("{TEXT}", text))
+
+
+def mapping_fields(definition: Dict, language: str) -> List[Dict]:
+    mapping = definition.get("mapping", {})
+    if language == "ja":
+        return mapping.get("ja") or []
+    return mapping.get("en") or mapping.get("ja") or []
+
+
+EXTRACTION_TEMPLATES = {
+    "ja": """あなたはプライベート情報管理のアシスタントです。
+
+添付したドキュメント（メッセージ、会話ログ、設定ファイルなど）から{TITLE}に関する情報を抽出してください。
+
+ドキュメントに含まれる可能性のあるデータ：
+- アカウント情報（ID、パスワード、URL等）
+- SSH秘密鍵（PEM形式など）
+- API認証キー
+- その他の設定情報
+
+出力は次のスキーマ構造に厳密に一致させ、**純粋なJSONオブジェクトのみ**を出力してください。
+
+{SCHEMA}
+
+制約条件：
+1. `title` と `note` には必ず有効な文字列を記入してください。
+2. 他の項目は、ドキュメントに記載がなければ **null** を入れてください。
+3. 各キーの順序は上記と同じにしてください。
+4. 出力は **1個の純粋なJSONオブジェクト** のみ。改行や説明を付け加えないでください。
+5. JSON構文（括弧、カンマ、クォート）の整合性を守り、**正確な構造体としてパース可能**な状態で返してください。
+
+以下のドキュメントを分析してください：
+
+{TEXT}""",
+    "en": """You are an assistant for private information management.
+
+Extract information about {TITLE} from the attached document.
+
+Output must strictly match the following schema and return a **pure JSON object only**.
+
+{SCHEMA}
+
+Constraints:
+1. Provide valid strings for `title` and `note`.
+2. For other fields, put **null** if not present in the document.
+3. Keep the keys in the exact same order as above.
+4. Return **exactly one pure JSON object**. Do not add line breaks or explanations.
+5. Ensure valid JSON syntax (braces, commas, quotes) so it is precisely parseable.
+
+=== Attached Document ===
+
+{TEXT}
+
+-------------------""",
+}
+
+
+def extraction_prompt(text: str, sub_category: str, language: str) -> str:
+    """generateExtractionPromptと同じプロンプト（mappingの項目順にスキーマを組み立てる）"""
+    definition = load_sub_category_definition(sub_category)
+    fields = mapping_fields(definition, language)
+    if not fields:
+        raise CategoryNotFound(f"mapping配列が見つからないか空です: subCategoryId={sub_category}")
+    lines = []
+    for field in fields:
+        field_type = "integer" if (field.get("type") or "").lower() == "integer" else "string"
+        lines.append(f'  "{field["name"]}": {field_type},' if field.get("required")
+                     else f'  "{field["name"]}": {field_type} | null,')
+    lines[-1] = lines[-1][:-1]
+    schema = "{\n" + "\n".join(lines) + "\n}"
+    template = EXTRACTION_TEMPLATES[language].replace("{TITLE}", definition["name"][language]).replace("{SCHEMA}", schema)
+    return template.replace("{TEXT}", text)
+
+
+def main_category_response_format() -> Dict:
+    ids = [category["id"] for category in load_category_definition()["mainCategories"]]
+    return json_schema_response_format("main_category", {"mainCategory": {"type": "string", "enum": ids}})
+
+
+def sub_category_response_format(main_category: str) -> Dict:
+    return json_schema_response_format("sub_category",
+                                       {"subCategory": {"type": "string", "enum": sub_category_ids(main_category)}})
+
+
+def extraction_response_format(sub_category: str, language: str) -> Dict:
+    """generateExtractionPromptのスキーマと同じ項目・型（requiredでない項目はnullを許す）"""
+    properties = {}
+    for field in mapping_fields(load_sub_category_definition(sub_category), language):
+        field_type = "integer" if (field.get("type") or "").lower() == "integer" else "string"
+        properties[field["name"]] = {"type": field_type if field.get("required") else [field_type, "null"]}
+    return json_schema_response_format(sub_category, properties)
+
+
+# ---------------------------------------------------------------------------
+# 応答の解析とAccountInfoへの変換
+# ---------------------------------------------------------------------------
+
+_CODE_BLOCK_PATTERN = re.compile(r"```json\s*([\s\S]*?)\s*```")
+
+
+def extract_json_from_markdown(text: str) -> str:
+    """extractJSONFromMarkdownと同じく、```jsonブロック、最初の{から最後の}、全体の順に取り出す"""
+    match = _CODE_BLOCK_PATTERN.search(text)
+    if match:
+        return match.group(1).strip()
+    first, last = text.find("{"), text.rfind("}")
+    if first >= 0 and last >= 0 and first <= last:
+        return text[first:last + 1].strip()
+    return text.strip()
+
+
+def parse_json_object(content: str) -> Optional[Dict]:
+    try:
+        value = json.loads(extract_json_from_markdown(content))
+    except ValueError:
+        return None
+    return value if isinstance(value, dict) else None
+
+
+def judged_category(content: str, key: str) -> Optional[str]:
+    """判定応答から mainCategory / subCategory の値を取り出す（文字列でなければNone）"""
+    value = (parse_json_object(content) or {}).get(key)
+    return value if isinstance(value, str) else None
+
+
+def _stringify(value) -> Optional[str]:
+    """SubCategoryConverter.stringifyと同じ変換（NSNumberの整数値は整数として文字列化）"""
+    if isinstance(value, str):
+        return value or None
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, ensure_ascii=False)
+
+
+def convert_to_account(values: Dict, sub_category: str) -> Dict:
+    """SubCategoryConverter.convertと同じ規則でサブカテゴリのJSONをAccountInfo相当の辞書に変換"""
+    account: Dict = {}
+    appended_notes: List[str] = []
+    for field in mapping_fields(load_sub_category_definition(sub_category), "ja"):
+        value = values.get(field["name"])
+        if value is None:
+            continue
+        key = field.get("mappingKey") or field["name"]
+        if key == NOTE_APPEND_KEY:
+            text = _stringify(value)
+            if text:
+                if field.get("format"):
+                    appended_notes.append(field["format"].replace("%@", text, 1))
+                elif field.get("description"):
+                    appended_notes.append(f"{field['description']}: {text}")
+                else:
+                    appended_notes.append(text)
+        elif key in CONVERTED_STRING_KEYS:
+            account[key] = _stringify(value)
+        elif key == "port":
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and float(value).is_integer():
+                account["port"] = int(value)
+            elif isinstance(value, str) and re.fullmatch(r"[+-]?\d+", value):
+                account["port"] = int(value)
+    if appended_notes:
+        extra = "\n".join(appended_notes)
+        account["note"] = f"{account['note']}\n\n{extra}" if account.get("note") else extra
+    return account
+
+
+def two_steps_category(main_category: str, sub_category: str) -> Dict[str, str]:
+    """generateStructuredLogのtwo_steps_category（表示名は日本語、定義がなければID）"""
+    category = find_main_category(main_category)
+    try:
+        sub_category_display = load_sub_category_definition(sub_category)["name"]["ja"]
+    except CategoryNotFound:
+        sub_category_display = sub_category
+    return {
+        "main_category": main_category,
+        "main_category_display": category["name"]["ja"] if category else main_category,
+        "sub_category": sub_category,
+        "sub_category_display": sub_category_display,
+    }
+
+
+# ---------------------------------------------------------------------------
+# 判定結果のメモ
+# ---------------------------------------------------------------------------
+
+def document_key(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class StepMemo:
+    """
+    Step 1a/1bの判定結果を記録するディレクトリ（{memo_dir}/{ドキュメントのハッシュ[:16]}/{step}_{リクエストのハッシュ}.json）
+    キーはドキュメント本文とリクエストボディ（モデル・サンプリング設定・プロンプト）の両方のハッシュで、
+    いずれかが変われば判定し直す。同じキーの並行リクエストは最初の1件だけを送り、残りはその結果を使う
+    エントリ: {'step', 'value', 'content', 'elapsed', 'recorded_at'}
+    """
+
+    def __init__(self, memo_dir: str):
+        self.memo_dir = memo_dir
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.hits = {STEP_MAIN_CATEGORY: 0, STEP_SUB_CATEGORY: 0}
+        self.misses = {STEP_MAIN_CATEGORY: 0, STEP_SUB_CATEGORY: 0}
+        self.saved_seconds = 0.0
+
+    def path(self, step: str, document: str, body: Dict) -> str:
+        return os.path.join(self.memo_dir, document_key(document)[:16], f"{step}_{request_key(body)}.json")
+
+    def load(self, path: str) -> Optional[Dict]:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, path: str, entry: Dict):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, path)
+
+    async def judge(self, step: str, document: str, body: Dict,
+                    compute: Callable[[], Awaitable[Tuple[str, str]]]) -> Tuple[str, bool]:
+        """
+        判定結果を返す（(値, メモから取得したか)）
+        compute は (値, 応答content) を返す。失敗（例外）した判定は記録しない
+        """
+        path = self.path(step, document, body)
+        lock = self._locks.setdefault(path, asyncio.Lock())
+        async with lock:
+            entry = await asyncio.to_thread(self.load, path)
+            if entry is not None:
+                self.hits[step] += 1
+                self.saved_seconds += entry.get("elapsed", 0.0)
+                return entry["value"], True
+            start_time = time.perf_counter()
+            value, content = await compute()
+            self.misses[step] += 1
+            await asyncio.to_thread(self.store, path, {
+                "step": step, "value": value, "content": content,
+                "elapsed": time.perf_counter() - start_time, "recorded_at": time.time()
+            })
+            return value, False
+
+    def summary(self) -> Dict:
+        return {'memo_dir': self.memo_dir, 'hits': dict(self.hits), 'misses': dict(self.misses),
+                'saved_seconds': self.saved_seconds}
+
+    @staticmethod
+    def report(summary: Dict) -> Optional[str]:
+        """summary()を実験終了時の表示の1行にする"""
+        return (f"カテゴリ判定のメモ: ヒット{sum(summary['hits'].values())}件, "
+                f"ミス{sum(summary['misses'].values())}件 (省いた判定時間 {summary['saved_seconds']:.1f}秒)")
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+@ai[2026-10-19 16:00] 複数の実験プロセスで共有するワーカースロットと優先度レーン
+目的: 同じマシンで夜間の長時間スイープとプロンプト調整中の短い確認を同時に実行する場合に、
+      確認用の実行が長時間スイープの待ち行列の後ろに回らないようにする
+背景: 各実行スクリプトは自分のプロセス内だけで並列数を管理しており、別プロセスの実験との
+      割り込みや順序付けの手段がなかった
+意図: キューディレクトリ内のスロットファイルをflockで確保した数だけ推論を同時実行する
+      - batch（デフォルト）: 待機中のhighの申請がある間は新しいスロットを確保しない
+      - high: 申請ファイルを置いてから空きスロットを待ち、空いた次のスロットをbatchより先に確保する
+      実行中のジョブは中断せず、スロットの解放（ジョブの完了）を待つだけにする
+      プロセスが異常終了した場合もflockは自動で解放され、申請ファイルはPIDの生存確認で無効化される
+
+使用例:
+    # 夜間スイープ（4スロットを共有）
+    python3 scripts/run_external_llm_experiment.py ... --queue-dir /tmp/aitest_queue --slots 4 --concurrency 4
+    # 別のターミナルから優先実行（次に空いたスロットで実行される）
+    python3 scripts/run_external_llm_experiment.py ... --queue-dir /tmp/aitest_queue --priority high --runs 1
+    # スロットの使用状況
+    python3 scripts/worker_slots.py /tmp/aitest_queue
+"""
+
+import argparse
+import asyncio
+import fcntl
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+PRIORITY_HIGH = "high"
+PRIORITY_BATCH = "batch"
+PRIORITIES = [PRIORITY_BATCH, PRIORITY_HIGH]
+
+CONFIG_FILE = "config.json"
+SLOTS_DIR = "slots"
+WAITING_DIR = "waiting"
+DEFAULT_SLOTS = 1
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class WorkerSlot:
+    """確保したスロット（ロックしたファイルを保持）"""
+
+    def __init__(self, index: int, handle, waited: float):
+        self.index = index
+        self.handle = handle
+        self.waited = waited
+
+
+class WorkerSlotPool:
+    """キューディレクトリ上のスロット群"""
+
+    _ticket_counter = itertools.count(1)
+
+    def __init__(self, queue_dir: str, slots: Optional[int] = None, priority: str = PRIORITY_BATCH,
+                 poll_interval: float = 0.5):
+        if priority not in PRIORITIES:
+            raise ValueError(f"無効な優先度: {priority}（{', '.join(PRIORITIES)}のいずれか）")
+        self.queue_dir = queue_dir
+        self.priority = priority
+        self.poll_interval = poll_interval
+        self.slots_dir = os.path.join(queue_dir, SLOTS_DIR)
+        self.waiting_dir = os.path.join(queue_dir, WAITING_DIR)
+        os.makedirs(self.slots_dir, exist_ok=True)
+        os.makedirs(self.waiting_dir, exist_ok=True)
+        self.slots = self._load_slots(slots)
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _load_slots(self, slots: Optional[int]) -> int:
+        """スロット数はキューディレクトリのconfig.jsonで共有する（--slots指定時のみ更新）"""
+        path = os.path.join(self.queue_dir, CONFIG_FILE)
+        if slots is not None:
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'slots': slots}, f)
+            return slots
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return int(json.load(f).get('slots', DEFAULT_SLOTS))
+        except (OSError, ValueError):
+            return DEFAULT_SLOTS
+
+    def waiting_high(self) -> List[Dict]:
+        """待機中のhighの申請（終了したプロセスの申請は削除）"""
+        tickets = []
+        for name in sorted(os.listdir(self.waiting_dir)):
+            if not name.startswith(PRIORITY_HIGH):
+                continue
+            path = os.path.join(self.waiting_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    ticket = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not _pid_alive(ticket.get('pid', 0)):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            tickets.append(ticket)
+        return tickets
+
+    def _try_lock(self, label: str) -> Optional[WorkerSlot]:
+        for index in range(self.slots):
+            handle = open(os.path.join(self.slots_dir, f"slot{index}.lock"), 'a+', encoding='utf-8')
+            try:
+                fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                handle.close()
+                continue
+            handle.seek(0)
+            handle.truncate()
+            json.dump({'pid': os.getpid(), 'priority': self.priority, 'label': label,
+                       'since': time.time()}, handle, ensure_ascii=False)
+            handle.flush()
+            return WorkerSlot(index, handle, 0.0)
+        return None
+
+    async def acquire(self, label: str = "", should_stop: Optional[Callable[[], bool]] = None) -> Optional[WorkerSlot]:
+        """空きスロットを確保（should_stopがTrueを返した場合はNone）"""
+        start_time = time.time()
+        ticket_path = None
+        if self.priority == PRIORITY_HIGH:
+            ticket_name = f"{PRIORITY_HIGH}_{time.time():.6f}_{os.getpid()}_{next(self._ticket_counter)}.json"
+            ticket_path = os.path.join(self.waiting_dir, ticket_name)
+            with open(ticket_path, 'w', encoding='utf-8') as f:
+                json.dump({'pid': os.getpid(), 'label': label, 'since': start_time}, f, ensure_ascii=False)
+        try:
+            while not (should_stop and should_stop()):
+                if self.priority == PRIORITY_HIGH or not self.waiting_high():
+                    slot = self._try_lock(label)
+                    # 確保直後にhighの申請が現れていたら譲る
+                    if slot and self.priority == PRIORITY_BATCH and self.waiting_high():
+                        self.release(slot)
+                        slot = None
+                    if slot:
+                        slot.waited = time.time() - start_time
+                        self.acquired += 1
+                        self.total_wait += slot.waited
+                        self.max_wait = max(self.max_wait, slot.waited)
+                        return slot
+                await asyncio.sleep(self.poll_interval)
+            return None
+        finally:
+            if ticket_path:
+                try:
+                    os.remove(ticket_path)
+                except OSError:
+                    pass
+
+    def release(self, slot: WorkerSlot):
+        slot.handle.seek(0)
+        slot.handle.truncate()
+        fcntl.flock(slot.handle, fcntl.LOCK_UN)
+        slot.handle.close()
+
+    def status(self) -> Dict:
+        """各スロットの使用状況（ロックを取れたスロットは空き）"""
+        slots = []
+        for index in range(self.slots):
+            path = os.path.join(self.slots_dir, f"slot{index}.lock")
+            with open(path, 'a+', encoding='utf-8') as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+                    slots.append({'slot': index, 'busy': False})
+                except BlockingIOError:
+                    handle.seek(0)
+                    try:
+                        holder = json.loads(handle.read() or "{}")
+                    except ValueError:
+                        holder = {}
+                    slots.append(dict(holder, slot=index, busy=True))
+        return {'queue_dir': self.queue_dir, 'slots': slots, 'waiting_high': self.waiting_high()}
+
+    def summary(self) -> Dict:
+        return {
+            'queue_dir': self.queue_dir,
+            'priority': self.priority,
+            'slots': self.slots,
+            'acquired': self.acquired,
+            'total_wait_seconds': self.total_wait,
+            'max_wait_seconds': self.max_wait
+        }
+
+
+def add_slot_arguments(parser: argparse.ArgumentParser):
+    """実行スクリプト共通のスロット共有の引数を追加"""
+    parser.add_argument("--queue-dir", help="他の実験プロセスとワーカースロットを共有するキューディレクトリ")
+    parser.add_argument("--slots", type=int, help="キューディレクトリ全体の同時実行数（指定時のみ更新、未設定時は1）")
+    parser.add_argument("--priority", default=PRIORITY_BATCH, choices=PRIORITIES,
+                        help="優先度（high: 待機中のbatchより先に次の空きスロットで実行、デフォルト: batch）")
+
+
+def slot_pool_from_args(args) -> Optional[WorkerSlotPool]:
+    """--queue-dirが指定された場合のみスロットプールを作成"""
+    if not args.queue_dir:
+        return None
+    return WorkerSlotPool(args.queue_dir, slots=args.slots, priority=args.priority)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ワーカースロットの使用状況を表示")
+    parser.add_argument("queue_dir", help="キューディレクトリ")
+    args = parser.parse_args()
+
+    status = WorkerSlotPool(args.queue_dir).status()
+    print(f"🎛️ キューディレクトリ: {status['queue_dir']}")
+    for slot in status['slots']:
+        if slot['busy']:
+            elapsed = time.time() - slot.get('since', time.time())
+            print(f"   スロット{slot['slot']}: 🔄 {slot.get('priority', '?')} {slot.get('label', '')} "
+                  f"(PID {slot.get('pid', '?')}, {elapsed:.0f}秒経過)")
+        else:
+            print(f"   スロット{slot['slot']}: 空き")
+    for ticket in status['waiting_high']:
+        print(f"   ⏫ 待機中(high): {ticket.get('label', '')} (PID {ticket.get('pid')})")
+
+
+if __name__ == "__main__":
+    main()